@@ -0,0 +1,27 @@
+"""Add prefetch and concurrency settings to AMQP channels.
+
+Revision ID: 0003_amqp_channel_prefetch_concurrency
+Revises: 0002_add_sms_twilio_connections_git_a9aaeda
+Create Date: 2017-10-02 11:24:51.214409
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '0003_amqp_channel_prefetch_concurrency'
+down_revision = '0002_add_sms_twilio_connections_git_a9aaeda'
+
+from alembic import op
+import sqlalchemy as sa
+
+# Zato
+from zato.common.odb import model
+
+def upgrade():
+    op.add_column(model.ChannelAMQP.__tablename__, sa.Column('prefetch_count', sa.Integer(), nullable=True))
+    op.add_column(model.ChannelAMQP.__tablename__, sa.Column('max_concurrency', sa.Integer(), nullable=True))
+    op.add_column(model.ChannelAMQP.__tablename__, sa.Column('preserve_order', sa.Boolean(), nullable=True))
+
+def downgrade():
+    op.drop_column(model.ChannelAMQP.__tablename__, 'preserve_order')
+    op.drop_column(model.ChannelAMQP.__tablename__, 'max_concurrency')
+    op.drop_column(model.ChannelAMQP.__tablename__, 'prefetch_count')
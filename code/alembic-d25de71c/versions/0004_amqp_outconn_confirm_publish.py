@@ -0,0 +1,23 @@
+"""Add publisher confirms to outgoing AMQP connections.
+
+Revision ID: 0004_amqp_outconn_confirm_publish
+Revises: 0003_amqp_channel_prefetch_concurrency
+Create Date: 2017-10-03 09:12:37.481150
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '0004_amqp_outconn_confirm_publish'
+down_revision = '0003_amqp_channel_prefetch_concurrency'
+
+from alembic import op
+import sqlalchemy as sa
+
+# Zato
+from zato.common.odb import model
+
+def upgrade():
+    op.add_column(model.OutgoingAMQP.__tablename__, sa.Column('confirm_publish', sa.Boolean(), nullable=True))
+
+def downgrade():
+    op.drop_column(model.OutgoingAMQP.__tablename__, 'confirm_publish')
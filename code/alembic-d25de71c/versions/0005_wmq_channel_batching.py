@@ -0,0 +1,25 @@
+"""Add batching of messages to WebSphere MQ channels.
+
+Revision ID: 0005_wmq_channel_batching
+Revises: 0004_amqp_outconn_confirm_publish
+Create Date: 2017-10-04 10:41:12.204518
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '0005_wmq_channel_batching'
+down_revision = '0004_amqp_outconn_confirm_publish'
+
+from alembic import op
+import sqlalchemy as sa
+
+# Zato
+from zato.common.odb import model
+
+def upgrade():
+    op.add_column(model.ChannelWMQ.__tablename__, sa.Column('batch_size', sa.Integer(), nullable=True))
+    op.add_column(model.ChannelWMQ.__tablename__, sa.Column('linger_time', sa.Integer(), nullable=True))
+
+def downgrade():
+    op.drop_column(model.ChannelWMQ.__tablename__, 'linger_time')
+    op.drop_column(model.ChannelWMQ.__tablename__, 'batch_size')
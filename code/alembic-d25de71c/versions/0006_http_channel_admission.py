@@ -0,0 +1,25 @@
+"""Add admission control limits to HTTP channels.
+
+Revision ID: 0006_http_channel_admission
+Revises: 0005_wmq_channel_batching
+Create Date: 2017-10-09 12:16:41.582201
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '0006_http_channel_admission'
+down_revision = '0005_wmq_channel_batching'
+
+from alembic import op
+import sqlalchemy as sa
+
+# Zato
+from zato.common.odb import model
+
+def upgrade():
+    op.add_column(model.HTTPSOAP.__tablename__, sa.Column('max_concurrency', sa.Integer(), nullable=True))
+    op.add_column(model.HTTPSOAP.__tablename__, sa.Column('max_queue_size', sa.Integer(), nullable=True))
+
+def downgrade():
+    op.drop_column(model.HTTPSOAP.__tablename__, 'max_queue_size')
+    op.drop_column(model.HTTPSOAP.__tablename__, 'max_concurrency')
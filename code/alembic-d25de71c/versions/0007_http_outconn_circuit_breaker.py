@@ -0,0 +1,31 @@
+"""Add circuit breakers to outgoing HTTP/SOAP connections.
+
+Revision ID: 0007_http_outconn_circuit_breaker
+Revises: 0006_http_channel_admission
+Create Date: 2017-10-11 09:52:17.310448
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '0007_http_outconn_circuit_breaker'
+down_revision = '0006_http_channel_admission'
+
+from alembic import op
+import sqlalchemy as sa
+
+# Zato
+from zato.common.odb import model
+
+_int_columns = ('cb_error_rate', 'cb_slow_call_rate', 'cb_slow_call_time', 'cb_window_size', 'cb_open_time')
+
+def upgrade():
+    op.add_column(model.HTTPSOAP.__tablename__, sa.Column('has_circuit_breaker', sa.Boolean(), nullable=True))
+
+    for name in _int_columns:
+        op.add_column(model.HTTPSOAP.__tablename__, sa.Column(name, sa.Integer(), nullable=True))
+
+def downgrade():
+    for name in reversed(_int_columns):
+        op.drop_column(model.HTTPSOAP.__tablename__, name)
+
+    op.drop_column(model.HTTPSOAP.__tablename__, 'has_circuit_breaker')
@@ -0,0 +1,37 @@
+"""Add subscriptions of live message browsers.
+
+Revision ID: 0008_web_socket_msg_browser_sub
+Revises: 0007_http_outconn_circuit_breaker
+Create Date: 2017-10-19 10:12:41.107352
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '0008_web_socket_msg_browser_sub'
+down_revision = '0007_http_outconn_circuit_breaker'
+
+from alembic import op
+import sqlalchemy as sa
+
+# Zato
+from zato.common.odb import model
+
+def upgrade():
+
+    op.create_table(
+        model.WebSocketMsgBrowserSub.__tablename__,
+        sa.Column('id', sa.Integer(), sa.Sequence('web_socket_msg_browser_sub_seq'), nullable=False, primary_key=True),
+        sa.Column('pattern', sa.String(200), nullable=False),
+
+        sa.Column('client_id', sa.Integer(), sa.ForeignKey('web_socket_client.id', name='wsmbs_client_id_fkey',
+            ondelete='CASCADE'), nullable=False),
+
+        sa.Column('cluster_id', sa.Integer(), sa.ForeignKey('cluster.id', name='wsmbs_cluster_id_fkey',
+            ondelete='CASCADE'), nullable=False),
+        )
+
+    op.create_index('wsmbs_cli_idx', model.WebSocketMsgBrowserSub.__tablename__, ['cluster_id', 'client_id'], unique=False)
+
+def downgrade():
+    op.drop_index('wsmbs_cli_idx', model.WebSocketMsgBrowserSub.__tablename__)
+    op.drop_table(model.WebSocketMsgBrowserSub.__tablename__)
@@ -0,0 +1,23 @@
+"""Add the backend of distributed locks to clusters.
+
+Revision ID: 0009_cluster_lock_backend
+Revises: 0008_web_socket_msg_browser_sub
+Create Date: 2017-10-19 11:04:27.518203
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '0009_cluster_lock_backend'
+down_revision = '0008_web_socket_msg_browser_sub'
+
+from alembic import op
+import sqlalchemy as sa
+
+# Zato
+from zato.common.odb import model
+
+def upgrade():
+    op.add_column(model.Cluster.__tablename__, sa.Column('lock_backend', sa.String(30), nullable=True))
+
+def downgrade():
+    op.drop_column(model.Cluster.__tablename__, 'lock_backend')
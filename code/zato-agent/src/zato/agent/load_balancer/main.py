@@ -9,7 +9,7 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 # stdlib
-import os, sys
+import os, signal, sys
 
 # ConcurrentLogHandler - updates stlidb's logging config on import so this needs to stay
 import cloghandler
@@ -28,6 +28,13 @@ if __name__ == '__main__':
     if not options.get('fg', None):
         store_pidfile(component_dir, get_lb_agent_json_config(repo_dir)['pid_file'])
 
+    # SIGTERM, e.g. from 'zato stop', exits the agent the same way Ctrl-C does so that it can shut down cleanly
+    signal.signal(signal.SIGTERM, lambda *ignored: sys.exit(0))
+
     lba = LoadBalancerAgent(repo_dir)
     lba.start_load_balancer()
-    lba.serve_forever()
+
+    try:
+        lba.serve_forever()
+    finally:
+        lba.server_close()
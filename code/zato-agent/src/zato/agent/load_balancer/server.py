@@ -26,6 +26,7 @@ import yaml
 # Zato
 from zato.agent.load_balancer.config import backend_template, config_from_string, string_from_config, zato_item_token
 from zato.agent.load_balancer.haproxy_stats import HAProxyStats
+from zato.agent.load_balancer.weights import LoadAwareWeights
 from zato.common import MISC, TRACE1, ZATO_OK
 from zato.common.haproxy import haproxy_stats, validate_haproxy_config
 from zato.common.repo import RepoManager
@@ -66,6 +67,7 @@ class LoadBalancerAgent(SSLServer):
         self.config = self._read_config()
         self.start_time = datetime.utcnow().replace(tzinfo=UTC).isoformat()
         self.haproxy_stats = HAProxyStats(self.config.global_["stats_socket"])
+        self.load_aware_weights = LoadAwareWeights(self.haproxy_stats, self.json_config.get('load_aware_weights'))
 
         RepoManager(self.repo_dir).ensure_repo_consistency()
 
@@ -86,6 +88,13 @@ class LoadBalancerAgent(SSLServer):
         """ Starts the HAProxy load balancer in background.
         """
         self._re_start_load_balancer("HAProxy didn't start in [{}] seconds. ", 'Failed to start HAProxy. ')
+        self.load_aware_weights.start()
+
+    def server_close(self):
+        """ Stops adjusting weights of servers before the agent's own socket is closed.
+        """
+        self.load_aware_weights.stop()
+        SSLServer.server_close(self)
 
     def restart_load_balancer(self):
         """ Restarts the HAProxy load balancer without disrupting existing connections.
@@ -351,6 +360,11 @@ class LoadBalancerAgent(SSLServer):
                 version = line.split("Version:")[1]
                 return version.strip().split(".")
 
+    def _lb_agent_get_servers_load(self):
+        """ Returns configuration of load-aware weights along with the last read load and weight of each server.
+        """
+        return self.load_aware_weights.get_state()
+
     def _lb_agent_ping(self):
         """ Always return ZATO_OK.
         """
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017 Dariusz Suchojad <dsuch at zato.io>
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+import logging
+from threading import Event, RLock, Thread
+from traceback import format_exc
+
+logger = logging.getLogger(__name__)
+
+# ################################################################################################################################
+
+# Backend whose servers have their weights adjusted
+backend_name = 'bck_http_plain'
+
+# Default configuration, each key can be overridden in lb-agent.conf's 'load_aware_weights' section
+default_config = {
+    'is_active': False,  # Weights are static unless explicitly enabled
+    'interval': 5,       # How often, in seconds, to read servers' load and adjust weights
+    'min_weight': 1,     # Weights never go below this value ..
+    'max_weight': 100,   # .. nor above this one
+    'max_step': 25,      # At most that many weight points of change in one interval to prevent oscillations
+    'in_flight_ref': 20, # That many requests in flight halve a server's weight
+    'avg_rtime_ref': 500,# An average response time of that many milliseconds halves a server's weight
+}
+
+# ################################################################################################################################
+
+class ServerLoad(object):
+    """ Load of a single server as reported by HAProxy - requests currently in flight (scur), requests queued
+    in HAProxy (qcur) and average response time, in milliseconds, of the last 1024 requests (rtime).
+    """
+    __slots__ = ('name', 'status', 'in_flight', 'queued', 'rtime', 'weight')
+
+    def __init__(self, name, status, in_flight, queued, rtime, weight):
+        self.name = name
+        self.status = status
+        self.in_flight = in_flight
+        self.queued = queued
+        self.rtime = rtime
+        self.weight = weight
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'status': self.status,
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'rtime': self.rtime,
+            'weight': self.weight,
+        }
+
+# ################################################################################################################################
+
+def _as_int(value):
+    return int(value) if value else 0
+
+# ################################################################################################################################
+
+def parse_show_stat(stat):
+    """ Parses output of HAProxy's 'show stat' command and yields a ServerLoad object for each server in the Zato backend.
+    Column positions are taken from the CSV header because they differ between HAProxy versions.
+    """
+    columns = None
+
+    for line in stat.splitlines():
+
+        if not line.strip():
+            continue
+
+        if line.startswith('#'):
+            columns = dict((name.strip(), idx) for idx, name in enumerate(line[1:].split(',')))
+            continue
+
+        if not columns:
+            continue
+
+        line = line.split(',')
+        pxname, svname = line[columns['pxname']], line[columns['svname']]
+
+        if pxname != backend_name or svname in ('FRONTEND', 'BACKEND'):
+            continue
+
+        # Response time is available in HAProxy 1.5+ only
+        rtime_idx = columns.get('rtime')
+
+        yield ServerLoad(svname, line[columns['status']], _as_int(line[columns['scur']]), _as_int(line[columns['qcur']]),
+            _as_int(line[rtime_idx]) if rtime_idx is not None else 0, _as_int(line[columns['weight']]))
+
+# ################################################################################################################################
+
+def compute_weight(load, config, current_weight=None):
+    """ Returns a new weight for a server given its current load. Each of in-flight requests and average response time
+    contributes independently so that a server stuck with a few long-running requests and one serving many fast ones
+    are both given less traffic than an idle one.
+    """
+    min_weight = config['min_weight']
+    max_weight = config['max_weight']
+
+    in_flight_factor = (load.in_flight + load.queued) / config['in_flight_ref']
+    rtime_factor = load.rtime / config['avg_rtime_ref']
+
+    weight = int(round(max_weight / (1 + in_flight_factor + rtime_factor)))
+
+    # Do not let weights jump too far at once
+    if current_weight is not None:
+        max_step = config['max_step']
+        weight = max(current_weight - max_step, min(current_weight + max_step, weight))
+
+    return max(min_weight, min(max_weight, weight))
+
+# ################################################################################################################################
+
+class LoadAwareWeights(object):
+    """ Periodically reads each server's load through HAProxy's stats socket and adjusts its weight accordingly.
+    """
+    def __init__(self, haproxy_stats, config=None):
+        self.haproxy_stats = haproxy_stats
+        self.config = dict(default_config)
+        self.config.update(config or {})
+        self.update_lock = RLock()
+        self.stopped = Event()
+        self.thread = None
+        self.last_load = {}
+
+    def start(self):
+        if not self.config['is_active']:
+            logger.info('Load-aware weights are not active')
+            return
+
+        self.stopped.clear()
+
+        self.thread = Thread(target=self._run, name='LoadAwareWeights')
+        self.thread.daemon = True
+        self.thread.start()
+
+        logger.info('Started load-aware weights with config `%s`', self.config)
+
+    def stop(self):
+        """ Stops adjusting weights, waiting for an adjustment in progress, if there is any, to complete.
+        """
+        self.stopped.set()
+
+        if self.thread:
+            self.thread.join(self.config['interval'])
+            self.thread = None
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                self.adjust()
+            except Exception, e:
+                logger.warn('Could not adjust weights, e:`%s`', format_exc(e))
+
+            self.stopped.wait(self.config['interval'])
+
+    def adjust(self):
+        """ Reads current load of each server and updates weights of those whose computed value changed.
+        """
+        with self.update_lock:
+            last_load = {}
+
+            for load in parse_show_stat(self.haproxy_stats.execute('show stat')):
+
+                # Servers that are DOWN or in MAINT do not receive traffic regardless of their weight,
+                # unlike ones in transitional states, such as 'UP 1/3' or 'UP, going down'.
+                if not load.status.startswith('UP'):
+                    continue
+
+                weight = compute_weight(load, self.config, load.weight)
+
+                if weight != load.weight:
+                    self.haproxy_stats.execute('set weight {}/{} {}'.format(backend_name, load.name, weight))
+                    logger.debug('Weight of `%s` changed from %s to %s (in_flight:%s, queued:%s, rtime:%s)',
+                        load.name, load.weight, weight, load.in_flight, load.queued, load.rtime)
+                    load.weight = weight
+
+                last_load[load.name] = load
+
+            self.last_load = last_load
+
+    def get_state(self):
+        """ Returns the last read load and weight of each server.
+        """
+        with self.update_lock:
+            return {
+                'config': self.config,
+                'servers': dict((name, load.to_dict()) for name, load in self.last_load.items())
+            }
+
+# ################################################################################################################################
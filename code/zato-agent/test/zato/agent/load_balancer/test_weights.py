@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from unittest import TestCase
+
+# Zato
+from zato.agent.load_balancer.weights import compute_weight, default_config, LoadAwareWeights, parse_show_stat, ServerLoad
+
+# ################################################################################################################################
+
+show_stat = """\
+# pxname,svname,qcur,qmax,scur,smax,slim,stot,bin,bout,dreq,dresp,ereq,econ,eresp,wretr,wredis,status,weight,act,rtime,
+front_http_plain,FRONTEND,,,3,10,,100,0,0,0,0,0,,,,,OPEN,,,,
+bck_http_plain,http_plain--server1,0,0,4,8,,50,0,0,,0,,0,0,0,0,UP,100,1,120,
+bck_http_plain,http_plain--server2,2,5,20,25,,50,0,0,,0,,0,0,0,0,UP 1/3,100,1,,
+bck_http_plain,http_plain--server3,0,0,0,0,,50,0,0,,0,,0,0,0,0,DOWN,100,1,0,
+bck_http_plain,BACKEND,2,5,24,33,,150,0,0,0,0,,0,0,0,0,UP,300,3,100,
+other_backend,server1,0,0,5,5,,50,0,0,,0,,0,0,0,0,UP,100,1,0,
+"""
+
+# ################################################################################################################################
+
+class FakeHAProxyStats(object):
+    def __init__(self, stat):
+        self.stat = stat
+        self.commands = []
+
+    def execute(self, command):
+        self.commands.append(command)
+        if command == 'show stat':
+            return self.stat
+
+# ################################################################################################################################
+
+def get_load(in_flight=0, queued=0, rtime=0, weight=100, status='UP'):
+    return ServerLoad('server1', status, in_flight, queued, rtime, weight)
+
+# ################################################################################################################################
+
+class ParseShowStatTestCase(TestCase):
+
+    def test_parse(self):
+        servers = dict((load.name, load.to_dict()) for load in parse_show_stat(show_stat))
+
+        # Only servers of the Zato backend are returned, without the BACKEND and FRONTEND summary lines
+        self.assertListEqual(sorted(servers), ['http_plain--server1', 'http_plain--server2', 'http_plain--server3'])
+
+        self.assertDictEqual(servers['http_plain--server1'], {
+            'name': 'http_plain--server1', 'status': 'UP', 'in_flight': 4, 'queued': 0, 'rtime': 120, 'weight': 100})
+
+        # Empty columns are zeros
+        self.assertEquals(servers['http_plain--server2']['rtime'], 0)
+        self.assertEquals(servers['http_plain--server2']['queued'], 2)
+
+    def test_parse_no_rtime(self):
+
+        # HAProxy 1.4 has no rtime column
+        stat = '# pxname,svname,qcur,scur,status,weight,\nbck_http_plain,server1,1,2,UP,50,\n'
+        load = list(parse_show_stat(stat))[0]
+
+        self.assertEquals(load.rtime, 0)
+        self.assertEquals(load.in_flight, 2)
+        self.assertEquals(load.weight, 50)
+
+# ################################################################################################################################
+
+class ComputeWeightTestCase(TestCase):
+
+    def test_idle(self):
+        self.assertEquals(compute_weight(get_load(), default_config), default_config['max_weight'])
+
+    def test_reference_values_halve_weight(self):
+        self.assertEquals(compute_weight(get_load(in_flight=default_config['in_flight_ref']), default_config), 50)
+        self.assertEquals(compute_weight(get_load(rtime=default_config['avg_rtime_ref']), default_config), 50)
+
+        # Queued requests count as ones in flight
+        self.assertEquals(compute_weight(get_load(in_flight=10, queued=10), default_config), 50)
+
+        # Both factors contribute independently
+        self.assertEquals(compute_weight(get_load(in_flight=20, rtime=500), default_config), 33)
+
+    def test_min_weight(self):
+        self.assertEquals(compute_weight(get_load(in_flight=100000), default_config), default_config['min_weight'])
+
+    def test_max_step(self):
+        config = dict(default_config, max_step=10)
+
+        # Would be 50 without the current weight taken into account
+        self.assertEquals(compute_weight(get_load(in_flight=20), config, 100), 90)
+        self.assertEquals(compute_weight(get_load(in_flight=20), config, 10), 20)
+
+        # Within max_step of the current weight
+        self.assertEquals(compute_weight(get_load(in_flight=20), config, 45), 50)
+
+        # Bounds apply to clamped values too
+        self.assertEquals(compute_weight(get_load(), dict(config, max_weight=95), 90), 95)
+
+# ################################################################################################################################
+
+class LoadAwareWeightsTestCase(TestCase):
+
+    def test_adjust(self):
+        stats = FakeHAProxyStats(show_stat)
+        weights = LoadAwareWeights(stats, {'is_active': True})
+        weights.adjust()
+
+        # server1 is barely loaded, server2 is in a transitional state but still adjusted, server3 is down
+        self.assertListEqual(stats.commands, [
+            'show stat',
+            'set weight bck_http_plain/http_plain--server1 75',
+            'set weight bck_http_plain/http_plain--server2 75',
+        ])
+
+        servers = weights.get_state()['servers']
+        self.assertListEqual(sorted(servers), ['http_plain--server1', 'http_plain--server2'])
+        self.assertEquals(servers['http_plain--server2']['weight'], 75)
+
+    def test_start_stop(self):
+        weights = LoadAwareWeights(FakeHAProxyStats(show_stat), {'is_active': True, 'interval': 60})
+        weights.start()
+
+        thread = weights.thread
+        weights.stop()
+
+        # The thread does not wait for the next interval once stopped
+        self.assertFalse(thread.is_alive())
+        self.assertIsNone(weights.thread)
+
+    def test_not_active(self):
+        weights = LoadAwareWeights(FakeHAProxyStats(show_stat))
+        weights.start()
+        weights.stop()
+
+        self.assertIsNone(weights.thread)
+
+# ################################################################################################################################
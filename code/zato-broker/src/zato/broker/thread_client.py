@@ -13,9 +13,6 @@ import logging, time
 from threading import Thread
 from traceback import format_exc
 
-# anyjson
-from anyjson import dumps, loads
-
 # Bunch
 from bunch import Bunch
 
@@ -25,6 +22,7 @@ import redis
 # Zato
 from zato.common import BROKER, TRACE1, ZATO_NONE
 from zato.common.broker_message import KEYS, MESSAGE_TYPE, TOPICS
+from zato.common.json_ import dumps, loads
 from zato.common.util import new_cid
 
 logger = logging.getLogger(__name__)
@@ -19,7 +19,7 @@ from sqlalchemy.exc import IntegrityError
 
 # Zato
 from zato.cli import common_odb_opts, get_tech_account_opts, ZatoCommand
-from zato.common import CACHE, DATA_FORMAT, IPC, MISC, PUBSUB, SIMPLE_IO, WEB_SOCKET
+from zato.common import CACHE, DATA_FORMAT, IPC, LOCK_BACKEND, MISC, PUBSUB, SIMPLE_IO, WEB_SOCKET
 from zato.common.odb.model import CacheBuiltin, ChannelWebSocket, Cluster, HTTPBasicAuth, HTTPSOAP, JWT, PubSubEndpoint, \
      PubSubSubscription, PubSubTopic, RBACClientRole, RBACPermission, RBACRole, RBACRolePermission, Service, WSSDefinition
 from zato.common.pubsub import new_sub_key
@@ -150,6 +150,9 @@ zato_services = {
     'zato.email.smtp.get-list': 'zato.server.service.internal.email.smtp.GetList',
     'zato.email.smtp.ping': 'zato.server.service.internal.email.smtp.Ping',
 
+    # Enmasse
+    'zato.enmasse.import': 'zato.server.service.internal.enmasse.Import',
+
     # Helpers
     'zato.helpers.echo': 'zato.server.service.internal.helpers.Echo',
     'zato.helpers.input-logger': 'zato.server.service.internal.helpers.InputLogger',
@@ -464,6 +467,7 @@ class Create(ZatoCommand):
     opts.append({'name':'broker_host', 'help':"Redis host"})
     opts.append({'name':'broker_port', 'help':'Redis port'})
     opts.append({'name':'cluster_name', 'help':'Name of the cluster to create'})
+    opts.append({'name':'--lock_backend', 'help':'Backend of distributed locks, either odb (default) or kvdb'})
 
     opts += get_tech_account_opts('for web-admin instances to use')
 
@@ -480,6 +484,8 @@ class Create(ZatoCommand):
               'odb_type', 'odb_host', 'odb_port', 'odb_user', 'odb_db_name',
               'broker_host', 'broker_port', 'lb_host', 'lb_port', 'lb_agent_port'):
             setattr(cluster, name, getattr(args, name))
+
+        cluster.lock_backend = getattr(args, 'lock_backend', None) or LOCK_BACKEND.DEFAULT
         session.add(cluster)
 
         # TODO: getattrs below should be squared away - one of the attrs should win
@@ -25,7 +25,16 @@ config_template = """{
   "work_dir": "../",
   "verify_fields": {},
   "log_config": "./logging.conf",
-  "pid_file": "zato-lb-agent.pid"
+  "pid_file": "zato-lb-agent.pid",
+  "load_aware_weights": {
+    "is_active": false,
+    "interval": 5,
+    "min_weight": 1,
+    "max_weight": 100,
+    "max_step": 25,
+    "in_flight_ref": 20,
+    "avg_rtime_ref": 500
+  }
 }
 """
 
@@ -78,6 +87,7 @@ frontend front_http_plain
     default_backend bck_http_plain
 
     option forwardfor
+    http-request set-header X-Request-Start t=%Ts%ms
     option httplog # ZATO frontend front_http_plain:option log-http-requests
     bind 127.0.0.1:11223 # ZATO frontend front_http_plain:bind
     maxconn 200 # ZATO frontend front_http_plain:maxconn
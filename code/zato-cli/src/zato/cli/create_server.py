@@ -120,9 +120,26 @@ jwt_secret={{jwt_secret}}
 enforce_service_invokes=False
 return_tracebacks=True
 default_error_message="An error has occurred"
+http_max_concurrency=0 # How many HTTP requests a worker may handle at a time, 0 = no limit
+http_max_queue_size=0 # How many HTTP requests over the limit may wait for their turn before new ones are rejected with 503
+http_queue_timeout=1 # In seconds, how long an HTTP request may wait for its turn
+http_retry_after=1 # In seconds, returned in Retry-After along with 503 to clients whose requests were rejected
+json_codec=simplejson # One of json, simplejson or rapidjson, used by channels, SimpleIO, the broker client and the cache
+xml_max_size=20000000 # In bytes, larger XML documents are rejected without being parsed, 0 = no limit
+vault_auth_cache_max_size=10000 # How many successful authentication results to cache per Vault connection, 0 = no caching
+vault_auth_cache_token_ttl=60 # In seconds, for how long to cache token lookups, for which Vault reports no lease
+vault_auth_cache_max_ttl=300 # In seconds, for how long at most to cache tokens with longer leases, 0 = until their leases end
+vault_auth_cache_negative_ttl=5 # In seconds, for how long to cache failed authentication attempts, 0 = no negative caching
+vault_auth_cache_negative_max_size=1000 # How many failed authentication attempts to cache per Vault connection
+stomp_channel_ack_mode=auto # Either auto or client-individual, in which case messages are acknowledged once handled
+stomp_channel_prefetch=20 # How many unacknowledged messages a broker may send to each STOMP channel
+stomp_channel_pool_size=10 # How many messages each STOMP channel may handle concurrently
+search_bulk_max_docs=500 # Bulk indexers of ElasticSearch and Solr connections send documents once there are that many of them
+search_bulk_max_bytes=5000000 # Or once they take up that many bytes
+search_bulk_flush_interval=1 # Or, in seconds, that long after the oldest of them was added
 
 [websphere_mq]
-ipc_tcp_start_port=34567
+ipc_pool_size=20 # How many requests from servers a connector may handle concurrently
 
 [stats]
 expire_after=168 # In hours, 168 = 7 days = 1 week
@@ -209,6 +226,7 @@ sms=True
 include_internal=False
 service=True
 out=True
+sample_every=1
 
 [content_type]
 json = {JSON}
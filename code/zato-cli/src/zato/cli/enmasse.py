@@ -153,6 +153,34 @@ def test_item(item, cond):
             return False
     return True
 
+def get_import_order(item_types):
+    """Given item types to import, return them sorted so that each one comes after all the types its objects may depend on.
+    Definitions come first, as they have always done, and types are otherwise sorted by name."""
+    security_types = [sinfo.name for sinfo in SERVICES if sinfo.is_security]
+    ordered = []
+
+    def add(item_type, seen):
+        if item_type in ordered or item_type in seen:
+            return
+        seen.add(item_type)
+
+        sinfo = SERVICE_BY_NAME.get(item_type)
+        for dep_info in (sinfo.object_dependencies.values() if sinfo else ()):
+            dep_type = dep_info['dependent_type']
+            for dep_type in (security_types if dep_type == 'def_sec' else [dep_type]):
+                add(dep_type, seen)
+
+        ordered.append(item_type)
+
+    def sort_key(item_type):
+        is_def = SERVICE_BY_NAME[item_type].is_security or 'def' in item_type
+        return (not is_def, item_type)
+
+    for item_type in sorted(item_types, key=sort_key):
+        add(item_type, set())
+
+    return [item_type for item_type in ordered if item_type in item_types]
+
 class ServiceInfo(object):
     def __init__(self, prefix=None,
                  name=None,
@@ -454,15 +482,33 @@ class DependencyScanner(object):
         self.ignore_missing = ignore_missing
         #: (item_type, name): [(item_type, name), ..]
         self.missing = {}
+        #: (item_type, field): {value: item, ..}, built on first use
+        self.index = {}
 
 # ################################################################################################################################
 
     def find(self, item_type, fields):
-        if item_type == 'sec_def':
+        if item_type == 'def_sec':
             return self.find_sec(fields)
+
+        if len(fields) == 1:
+            (field, value), = fields.items()
+            return self.get_index(item_type, field).get(value)
+
         lst = self.json.get(item_type, ())
         return find_first(lst, lambda item: dict_match(item, fields))
 
+# ################################################################################################################################
+
+    def get_index(self, item_type, field):
+        index = self.index.get((item_type, field))
+        if index is None:
+            index = self.index[(item_type, field)] = {}
+            # The first item with a given value wins, as it would with a linear scan
+            for item in reversed(self.json.get(item_type, ())):
+                index[item.get(field)] = item
+        return index
+
 # ################################################################################################################################
 
     def find_sec(self, fields):
@@ -491,7 +537,7 @@ class DependencyScanner(object):
 
             value = item.get(dep_key)
             if value != dep_info.get('empty_value'):
-                dep = self.find({dep_info['dependent_field']: value})
+                dep = self.find(dep_info['dependent_type'], {dep_info['dependent_field']: value})
                 if dep is None:
                     key = (dep_info['dependent_type'], item[dep_key])
                     names = self.missing.setdefault(key, [])
@@ -570,16 +616,6 @@ class ObjectImporter(object):
 
         return results
 
-# ################################################################################################################################
-
-    def remove_from_import_list(self, item_type, name):
-        lst = self.json.get(item_type, [])
-        item = find_first(lst, lambda item: item.name == name)
-        if item:
-            lst.remove(item)
-        else:
-            raise KeyError('Tried to remove missing %r named %r' % (item_type, name))
-
 # ################################################################################################################################
 
     def should_skip_item(self, item_type, attrs, is_edit):
@@ -587,31 +623,6 @@ class ObjectImporter(object):
         if item_type == 'rbac_role' and attrs.name == 'Root':
             return True
 
-# ################################################################################################################################
-
-    def _import(self, item_type, attrs, is_edit):
-        attrs_dict = dict(attrs)
-        attrs.cluster_id = self.client.cluster_id
-
-        response = self._import_object(item_type, attrs, is_edit)
-        if response.ok:
-            object_id = response.data['id']
-            response = self._maybe_change_password(object_id, item_type, attrs)
-
-        # We quit on first error encountered
-        if response and not response.ok:
-            raw = (item_type, attrs_dict, response.details)
-            self.results.add_error(raw, ERROR_COULD_NOT_IMPORT_OBJECT, "Could not import (is_edit {}) '{}' with '{}', response from '{}' was '{}'",
-                                   is_edit, attrs.name, attrs_dict, item_type, response.details)
-            return self.results
-
-        # It's been just imported so we don't want to create in next steps (this in fact would result in an error as the object already exists).
-        if is_edit:
-            self.remove_from_import_list(item_type, attrs.name)
-
-        # We'll see how expensive this call is. Seems to be but let's see in practice if it's a burden.
-        self.object_mgr.refresh_by_type(item_type)
-
 # ################################################################################################################################
 
     def add_warning(self, results, item_type, value_dict, item):
@@ -631,75 +642,55 @@ class ObjectImporter(object):
                         "{} has no 'name' key ({})",
                         dict(item), item_type)
 
-                if item_type == 'http_soap':
-                    connection = item.get('connection')
-                    transport = item.get('transport')
-
-                    item = find_first(self.object_mgr.objects.http_soap,
-                        lambda item: connection == item.connection and
-                                     transport == item.transport and
-                                     name == item.name)
-                    if item is not None:
-                        self.add_warning(results, item_type, item, item)
-                else:
-                    existing = self.object_mgr.find(item_type, {'name': name})
-                    if existing is not None:
-                        self.add_warning(results, item_type, item, existing)
+                existing = self.object_mgr.find(item_type, self.get_key_fields(item_type, item))
+                if existing is not None:
+                    self.add_warning(results, item_type, item, existing)
 
         return results
 
 # ################################################################################################################################
 
-    def import_objects(self, already_existing):
-        existing_defs = []
-        existing_other = []
+    def get_key_fields(self, item_type, item):
+        """Return fields uniquely identifying an item of a given type."""
+        fields = {'name': item.get('name')}
 
-        new_defs = []
-        new_other = []
+        # The same name may be used by each kind of HTTP/SOAP objects
+        if item_type == 'http_soap':
+            fields['connection'] = item.get('connection')
+            fields['transport'] = item.get('transport')
 
-        #
-        # Update already existing objects first, definitions before any object that may depend on them ..
-        #
-        for w in already_existing.warnings:
-            item_type, _ = w.value_raw
-            existing = existing_defs if 'def' in item_type else existing_other
-            existing.append(w)
+        return fields
 
-        #
-        # .. actually invoke the updates now ..
-        #
-        for w in existing_defs + existing_other:
-            item_type, attrs = w.value_raw
+# ################################################################################################################################
 
-            if self.should_skip_item(item_type, attrs, True):
-                continue
+    def import_objects(self, already_existing):
+        """Import all objects in one call to the server which creates or updates them in a single transaction.
+        Objects already existing in ODB are updated, everything else is created, and types are sorted so that
+        objects always come after all the ones they depend on."""
+        existing = set()
+        for w in already_existing.warnings:
+            item_type, attrs = w.value_raw
+            existing.add((item_type, tuple(sorted(self.get_key_fields(item_type, attrs).items()))))
 
-            results = self._import(item_type, attrs, True)
-            if results:
-                return results
+        objects = []
+        for item_type in get_import_order(self.json):
+            for attrs in self.json[item_type]:
+                is_edit = (item_type, tuple(sorted(self.get_key_fields(item_type, attrs).items()))) in existing
 
-        #
-        # Create new objects, again, definitions come first ..
-        #
-        for item_type, items in self.json.items():
-            if SERVICE_BY_NAME[item_type].is_security or 'def' in item_type:
-                new_defs.append({item_type: items})
-            else:
-                new_other.append({item_type: items})
+                if self.should_skip_item(item_type, attrs, is_edit):
+                    continue
 
-        #
-        # .. actually create the objects now.
-        #
-        for elem in new_defs + new_other:
-            for item_type, attr_list in elem.items():
-                for attrs in attr_list:
+                objects.append(self._get_import_object(item_type, attrs, is_edit))
 
-                    if self.should_skip_item(item_type, attrs, False):
-                        continue
+        self.logger.info('Importing {} object(s)'.format(len(objects)))
+        response = self.client.invoke('zato.enmasse.import', {'objects': objects})
 
-                    results = self._import(item_type, attrs, False)
-                    if results:
-                        return results
+        if response.ok:
+            self.logger.info('Created {} and updated {} object(s)'.format(response.data['created'], response.data['updated']))
+        else:
+            raw = (len(objects), response.details)
+            self.results.add_error(raw, ERROR_COULD_NOT_IMPORT_OBJECT, "Could not import {} object(s), response was '{}'",
+                                   len(objects), response.details)
 
         return self.results
 
@@ -711,55 +702,49 @@ class ObjectImporter(object):
 
 # ################################################################################################################################
 
-    def _import_object(self, def_type, item, is_edit):
-        sinfo = SERVICE_BY_NAME[def_type]
-
-        if is_edit:
-            service_name = sinfo.get_service_name('edit')
-        else:
-            service_name = sinfo.get_service_name('create')
+    def _get_import_object(self, item_type, attrs, is_edit):
+        """Return a description of an object to import, in the format zato.enmasse.import expects."""
+        sinfo = SERVICE_BY_NAME[item_type]
+        attrs.cluster_id = self.client.cluster_id
 
         # service and service_name are interchangeable
         required = sinfo.get_required_keys()
-        self._swap_service_name(required, item, 'service', 'service_name')
-        self._swap_service_name(required, item, 'service_name', 'service')
+        self._swap_service_name(required, attrs, 'service', 'service_name')
+        self._swap_service_name(required, attrs, 'service_name', 'service')
 
         # Fetch an item from a cache of ODB object and assign its ID to item so that the Edit service knows what to update.
         if is_edit:
-            odb_item = self.object_mgr.find(def_type, {'name': item.name})
-            item.id = odb_item.id
+            attrs.id = self.object_mgr.find(item_type, self.get_key_fields(item_type, attrs)).id
 
+        # Dependencies already in ODB are known by their IDs, the server fills in IDs of ones created during the import.
+        deps = []
         for field_name, info in sinfo.object_dependencies.items():
-            if item.get(field_name) != info.get('empty_value') and 'id_field' in info:
+            if not test_item(attrs, info.get('condition')):
+                continue
+
+            if attrs.get(field_name) != info.get('empty_value') and 'id_field' in info:
                 dep_obj = self.object_mgr.find(info['dependent_type'], {
-                    info['dependent_field']: item[field_name]
+                    info['dependent_field']: attrs[field_name]
                 })
-                item[info['id_field']] = dep_obj.id
-
-        self.logger.debug("Invoking {} for {}".format(service_name, sinfo.name))
-        response = self.client.invoke(service_name, item)
-        if response.ok:
-            verb = 'Updated' if is_edit else 'Created'
-            self.logger.info("{} object '{}' with {}".format(verb, item.name, service_name))
-        return response
-
-# ################################################################################################################################
-
-    def _maybe_change_password(self, object_id, item_type, attrs):
-        sinfo = SERVICE_BY_NAME[item_type]
-        service_name = sinfo.get_service_name('change-password')
-        if service_name is None or 'password' not in attrs:
-            return None
-
-        response = self.client.invoke(service_name, {
-            'id': object_id,
-            'password1': attrs.password,
-            'password2': attrs.password,
-        })
-
-        if response.ok:
-            self.logger.info("Updated password for '{}' ({})".format(attrs.name, service_name))
-        return response
+                if dep_obj is not None:
+                    attrs[info['id_field']] = dep_obj.id
+                else:
+                    deps.append({
+                        'id_field': info['id_field'],
+                        'dependent_type': info['dependent_type'],
+                        'value': attrs[field_name],
+                    })
+
+        password_service = sinfo.get_service_name('change-password')
+
+        return {
+            'item_type': item_type,
+            'service_name': sinfo.get_service_name('edit' if is_edit else 'create'),
+            'request': attrs,
+            'deps': deps,
+            'is_security': bool(sinfo.is_security),
+            'password_service': password_service if 'password' in attrs else None,
+        }
 
 class ObjectManager(object):
     def __init__(self, client, logger):
@@ -773,7 +758,15 @@ class ObjectManager(object):
             return self.find_sec(fields)
         # This probably isn't necessary any more:
         item_type = item_type.replace('-', '_')
-        lst = self.objects.get(item_type, ())
+
+        # Only objects of a given name or ID need to be checked if either is known
+        for key in ('name', 'id'):
+            if key in fields:
+                lst = self.index.get(item_type, {}).get((key, fields[key]), ())
+                break
+        else:
+            lst = self.objects.get(item_type, ())
+
         return find_first(lst, lambda item: dict_match(item, fields))
 
 # ################################################################################################################################
@@ -905,10 +898,17 @@ class ObjectManager(object):
 
             self.objects[sinfo.name].append(item)
 
+        # Objects by name and ID, to look them up without scanning all of them
+        self.index[sinfo.name] = index = {}
+        for item in self.objects[sinfo.name]:
+            for key in ('name', 'id'):
+                index.setdefault((key, item.get(key)), []).append(item)
+
 # ################################################################################################################################
 
     def _refresh_objects(self):
         self.objects = Bunch()
+        self.index = {}
         for sinfo in SERVICES:
             self.refresh_by_type(sinfo.name)
 
@@ -281,6 +281,12 @@ class SEARCH:
             TIMEOUT = ValueConstant('10')
             POOL_SIZE = ValueConstant('5')
 
+    class BULK:
+        class DEFAULT:
+            MAX_DOCS = 500 # Buffered documents are sent once there are that many of them
+            MAX_BYTES = 5000000 # Or once they take up that many bytes
+            FLUSH_INTERVAL = 1.0 # Or, in seconds, that long after the oldest of them was added
+
     class ZATO:
         class DEFAULTS(Constants):
             PAGE_SIZE = ValueConstant(50)
@@ -511,6 +517,9 @@ class KVDB(Attrs):
     TRANSLATION = 'zato:kvdb:data-dict:translation'
     TRANSLATION_ID = TRANSLATION + ':id'
 
+    class DEFAULT:
+        TRANSLATIONS_MISSING_MAX_SIZE = 10000 # How many translations known not to exist each worker keeps track of at most
+
     SERVICE_USAGE = 'zato:stats:service:usage:'
     SERVICE_TIME_BASIC = 'zato:stats:service:time:basic:'
     SERVICE_TIME_RAW = 'zato:stats:service:time:raw:'
@@ -725,6 +734,59 @@ class MSG_PATTERN_TYPE:
         def __iter__(self):
             return iter((self.JSON_POINTER, self.XPATH))
 
+class INVOKE_RETRY:
+    class DEFAULT:
+        BACKOFF = 1.0 # Each subsequent delay is that many times longer than the previous one, 1.0 = constant delay
+        JITTER = 0.0 # Up to what fraction of a delay may be randomly added to or subtracted from it
+        BUDGET_RATIO = 0.2 # How many retries a worker may spend per each original invocation
+        BUDGET_MIN_PER_SECOND = 10 # How many retries per second a worker may always spend regardless of the ratio
+        BUDGET_MAX_TOKENS = 100 # Up to how many unused retries a worker may accumulate
+
+class HTTP_ADMISSION:
+    class DEFAULT:
+        MAX_CONCURRENCY = 0 # How many requests may be handled at a time, 0 = no limit
+        MAX_QUEUE_SIZE = 0 # How many requests over the limit may wait for their turn before new ones are rejected
+        QUEUE_TIMEOUT = 1 # In seconds, how long a request may wait for its turn before it is rejected
+        RETRY_AFTER = 1 # In seconds, what to return in Retry-After to clients whose requests were rejected
+
+class CIRCUIT_BREAKER:
+    class STATE:
+        CLOSED = 'closed' # Calls go through
+        OPEN = 'open' # Calls are rejected without invoking the remote end
+        HALF_OPEN = 'half-open' # A single trial call goes through to decide whether to close or open again
+
+    class DEFAULT:
+        ERROR_RATE = 50 # In percent, errors among recent calls above which the breaker opens
+        SLOW_CALL_RATE = 0 # In percent, slow calls among recent calls above which the breaker opens, 0 = not checked
+        SLOW_CALL_TIME = 0 # In milliseconds, calls lasting at least that long are slow, 0 = not checked
+        WINDOW_SIZE = 100 # How many most recent calls the rates are computed for
+        MIN_CALLS = 10 # How many calls there must be at least before the rates are computed at all
+        OPEN_TIME = 30 # In seconds, how long the breaker stays open before a trial call is let through
+
+class VAULT_AUTH_CACHE:
+    class DEFAULT:
+        MAX_SIZE = 10000 # How many successful authentication results to keep per Vault connection, 0 = no caching
+        TOKEN_TTL = 60 # In seconds, for how long to cache token lookups, for which Vault reports no lease
+        NEGATIVE_TTL = 5 # In seconds, for how long to cache failed authentication attempts, 0 = no negative caching
+        NEGATIVE_MAX_SIZE = 1000 # How many failed authentication attempts to keep per Vault connection
+        RENEW_AFTER = 0.75 # After what part of its lease a token used by clients is renewed in background
+        MAX_TTL = 300 # In seconds, for how long at most to cache tokens with longer leases, 0 = until their leases end
+
+class LOCK_BACKEND:
+    ODB = 'odb' # SQL locks in the ODB or, if it is SQLite, fcntl-based ones
+    KVDB = 'kvdb' # Redis locks in KVDB
+    DEFAULT = ODB
+
+class JSON_CODEC:
+    JSON = 'json' # stdlib, decimals are serialized as floats
+    SIMPLEJSON = 'simplejson' # C speedups, decimals are serialized without losing precision
+    RAPIDJSON = 'rapidjson' # Fastest, anything it cannot serialize is handed over to simplejson
+    DEFAULT = SIMPLEJSON
+
+class XML_PARSER:
+    class DEFAULT:
+        MAX_SIZE = 20000000 # In bytes, larger XML documents are rejected without being parsed, 0 = no limit
+
 class HTTP_SOAP_SERIALIZATION_TYPE:
     STRING_VALUE = NameId('String', 'string')
     SUDS = NameId('Suds', 'suds')
@@ -856,6 +918,8 @@ class EMAIL:
         PING_ADDRESS = 'invalid@invalid'
         GET_CRITERIA = 'UNSEEN'
         IMAP_DEBUG_LEVEL = 0
+        SMTP_POOL_SIZE = 5 # How many SMTP sessions to keep open to each server
+        SMTP_MAX_IDLE_TIME = 60 # In seconds, after that much time unused, an SMTP session is closed
 
     class IMAP:
         class MODE(Constants):
@@ -868,6 +932,12 @@ class EMAIL:
             SSL = ValueConstant('ssl')
             STARTTLS = ValueConstant('starttls')
 
+class FTP:
+    class DEFAULT:
+        POOL_SIZE = 5 # How many logged-in sessions to keep to each FTP server
+        MAX_IDLE_TIME = 60 # In seconds, after that much time unused, an FTP session is closed
+        CHECKOUT_TIMEOUT = 30 # In seconds, how long to wait for a free session if a connection's timeout is not set
+
 class NOTIF:
     class DEFAULT:
         CHECK_INTERVAL = 5 # In seconds
@@ -886,6 +956,8 @@ class CASSANDRA:
         PORT = ValueConstant(9042)
         PROTOCOL_VERSION = ValueConstant(4)
         KEYSPACE = ValueConstant('not-set')
+        EXEC_MANY_CONCURRENCY = ValueConstant(20) # How many statements execute_many runs concurrently by default
+        MAX_PREPARED = ValueConstant(1000) # How many prepared statements to cache per connection
 
     class COMPRESSION(Constants):
         DISABLED = ValueConstant('disabled')
@@ -939,6 +1011,8 @@ class STOMP:
         TIMEOUT = 10 # In seconds
         USERNAME = 'guest'
         ACK_MODE = 'client-individual'
+        PREFETCH = 20 # How many unacknowledged messages a broker may send to a channel
+        POOL_SIZE = 10 # How many messages a channel may handle concurrently
 
 CONTENT_TYPE = Bunch(
     JSON = 'application/json',
@@ -966,6 +1040,9 @@ class WEB_SOCKET:
     class DEFAULT:
         NEW_TOKEN_TIMEOUT = 5
         TOKEN_TTL = 3600
+        DELIVERY_TIMEOUT = 10 # In seconds, how long to wait for all clients to respond to an outgoing request
+        CLIENT_CACHE_TTL = 5 # In seconds, how long to cache results of looking up clients to deliver requests to
+        CLIENT_CACHE_MAX_SIZE = 1000 # How many such results to keep at most, oldest ones are dropped first
 
         class LIVE_MSG_BROWSER:
             CHANNEL = 'zato.web.admin.msg.live.browser'
@@ -996,6 +1073,8 @@ class AMQP:
     class DEFAULT:
         POOL_SIZE = 10
         PRIORITY = 5
+        MAX_CONCURRENCY = 1
+        CONFIRM_TIMEOUT = 30 # In seconds
 
     class ACK_MODE:
         ACK = NameId('Ack', 'ack')
@@ -1005,6 +1084,12 @@ class AMQP:
             def __iter__(self):
                 return iter((self.ACK, self.REJECT))
 
+class WEBSPHERE_MQ:
+    class DEFAULT:
+        BATCH_SIZE = 1  # How many messages a channel may receive before handing them over to a server in one call
+        LINGER_TIME = 0 # In milliseconds, how long to wait for a batch to fill up
+        CONNECTOR_TIMEOUT = 60 # In seconds, how long servers wait for responses from their connectors
+
 # Need to use such a constant because we can sometimes be interested in setting
 # default values which evaluate to boolean False.
 NO_DEFAULT_VALUE = 'NO_DEFAULT_VALUE'
@@ -477,6 +477,22 @@ class SERVER_STATUS(Constants):
 
     STATUS_CHANGED = ValueConstant('')
 
+class DATA_DICT(Constants):
+    code_start = 107000
+
+    CHANGED = ValueConstant('')
+
+class MSG_BROWSER(Constants):
+    code_start = 107200
+
+    SUBSCRIBE = ValueConstant('')
+    UNSUBSCRIBE = ValueConstant('')
+
+class BATCH(Constants):
+    code_start = 107400
+
+    MESSAGES = ValueConstant('')
+
 code_to_name = {}
 
 # To prevent 'RuntimeError: dictionary changed size during iteration'
@@ -56,8 +56,9 @@ class InternalServerError(Reportable):
         super(InternalServerError, self).__init__(cid, msg, INTERNAL_SERVER_ERROR)
 
 class ServiceUnavailable(Reportable):
-    def __init__(self, cid, msg):
+    def __init__(self, cid, msg, retry_after=None):
         super(ServiceUnavailable, self).__init__(cid, msg, SERVICE_UNAVAILABLE)
+        self.retry_after = retry_after # In seconds, returned to HTTP clients in the Retry-After header
 
 class PubSubSubscriptionExists(BadRequest):
     pass
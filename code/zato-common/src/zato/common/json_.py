@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from datetime import date, datetime, time
+from decimal import Decimal
+from json import dumps as json_dumps, loads as json_loads
+from logging import getLogger
+
+# pyrapidjson
+from rapidjson import dumps as rapidjson_dumps, loads as rapidjson_loads
+
+# simplejson
+from simplejson import dumps as simplejson_dumps, loads as simplejson_loads
+
+# Zato
+from zato.common import JSON_CODEC
+
+# ################################################################################################################################
+
+logger = getLogger(__name__)
+
+# ################################################################################################################################
+
+def default(value, _date_types=(date, datetime, time)):
+    """ Serializes values of types that JSON knows nothing about.
+    """
+    if isinstance(value, _date_types):
+        return value.isoformat()
+
+    # Only codecs other than simplejson ever get here - simplejson encodes Decimal objects as numbers without losing precision
+    if isinstance(value, Decimal):
+        return float(value)
+
+    raise TypeError('Object `{!r}` is not JSON serializable'.format(value))
+
+# ################################################################################################################################
+
+def _json_dumps(data, _dumps=json_dumps, _default=default):
+    return _dumps(data, default=_default)
+
+def _simplejson_dumps(data, _dumps=simplejson_dumps, _default=default):
+    return _dumps(data, default=_default, use_decimal=True)
+
+def _rapidjson_supports(data, _scalar_types=(basestring, int, float, type(None)), _sequence_types=(list, tuple)):
+    """ Returns True if rapidjson can serialize data on its own. It turns dictionary keys of any type into strings
+    but knows no values other than these of JSON types, not even long integers.
+    """
+    stack = [data]
+
+    while stack:
+        value = stack.pop()
+
+        if isinstance(value, dict):
+            stack.extend(value.itervalues())
+
+        elif isinstance(value, _sequence_types):
+            stack.extend(value)
+
+        elif not isinstance(value, _scalar_types):
+            return False
+
+    return True
+
+def _rapidjson_dumps(data, _dumps=rapidjson_dumps, _fallback=_simplejson_dumps, _supports=_rapidjson_supports):
+
+    # rapidjson cannot be given a default function so anything it does not know, e.g. datetime objects,
+    # is serialized with simplejson instead. This is checked upfront so that no data is ever serialized twice.
+    return _dumps(data) if _supports(data) else _fallback(data)
+
+# ################################################################################################################################
+
+
+# Codec name -> (dumps, loads)
+codecs = {
+    JSON_CODEC.JSON: (_json_dumps, json_loads),
+    JSON_CODEC.SIMPLEJSON: (_simplejson_dumps, simplejson_loads),
+    JSON_CODEC.RAPIDJSON: (_rapidjson_dumps, rapidjson_loads),
+}
+
+_current = {}
+
+def set_codec(name):
+    """ Sets the codec all of the process will use from now on.
+    """
+    if name not in codecs:
+        raise ValueError('Unknown JSON codec `{}`, expected one of `{}`'.format(name, sorted(codecs)))
+
+    _current['dumps'], _current['loads'] = codecs[name]
+    _current['name'] = name
+
+    logger.debug('JSON codec set to `%s`', name)
+
+def get_codec():
+    return _current['name']
+
+
+set_codec(JSON_CODEC.DEFAULT)
+
+# ################################################################################################################################
+
+def dumps(data, _current=_current):
+    return _current['dumps'](data)
+
+def loads(data, _current=_current):
+    return _current['loads'](data)
+
+# ################################################################################################################################
+
+
+if __name__ == '__main__':
+
+    # Compares codecs using payloads of sizes typical for Zato services, run as python -m zato.common.json_
+
+    from timeit import Timer
+
+    def get_item(idx):
+        return {
+            'id': idx,
+            'name': 'Customer {}'.format(idx),
+            'is_active': idx % 2 == 0,
+            'balance': 1234.56 + idx,
+            'segment': None,
+            'tags': ['retail', 'priority', 'eu'],
+            'address': {'street': 'Main Street {}'.format(idx), 'city': 'Vienna', 'postcode': '1010'},
+        }
+
+    payloads = (
+        ('small', {'response': get_item(1)}),
+        ('medium', {'response': [get_item(idx) for idx in range(50)]}),
+        ('large', {'response': [get_item(idx) for idx in range(2500)]}),
+    )
+
+    for payload_name, payload in payloads:
+        encoded = json_dumps(payload)
+        repeats = max(1, 2000000 // len(encoded))
+
+        print('{} payload, {} bytes, {} repeats'.format(payload_name, len(encoded), repeats))
+
+        for codec_name in sorted(codecs):
+            codec_dumps, codec_loads = codecs[codec_name]
+            dumps_time = Timer(lambda: codec_dumps(payload)).timeit(repeats)
+            loads_time = Timer(lambda: codec_loads(encoded)).timeit(repeats)
+
+            print('  {:<12} dumps {:>8.1f} MB/s, loads {:>8.1f} MB/s'.format(
+                codec_name, len(encoded) * repeats / dumps_time / 1e6, len(encoded) * repeats / loads_time / 1e6))
+
+# ################################################################################################################################
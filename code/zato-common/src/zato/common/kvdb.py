@@ -10,6 +10,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 # stdlib
 from calendar import timegm
+from collections import OrderedDict
 from importlib import import_module
 from logging import getLogger
 from string import punctuation
@@ -69,7 +70,8 @@ class LuaContainer(object):
 class KVDB(object):
     """ A wrapper around the Zato's key-value database.
     """
-    def __init__(self, conn=None, config=None, decrypt_func=None):
+    def __init__(self, conn=None, config=None, decrypt_func=None,
+            translations_missing_max_size=_KVDB.DEFAULT.TRANSLATIONS_MISSING_MAX_SIZE):
         self.conn = conn
         self.config = config
         self.decrypt_func = decrypt_func
@@ -78,6 +80,17 @@ class KVDB(object):
         self.run_lua = self.lua_container.run_lua # So it's more natural to use it
         self.has_sentinel = False
 
+        # A worker-local, read-through copy of data dictionary translations, keyed by translation names.
+        self.translations = {}
+
+        # Names of translations known not to exist. Unlike existing ones, there is no limit to how many names can be
+        # looked up so only the most recently added ones are kept.
+        self.translations_missing = OrderedDict()
+        self.translations_missing_max_size = translations_missing_max_size
+
+        # Incremented each time translations are invalidated so that results of reads started earlier are not cached.
+        self.translations_gen = 0
+
     def _get_connection_class(self):
         """ Returns a concrete class to create Redis connections off basing on whether we use Redis sentinels or not.
         Abstracted out to a separate method so it's easier to test the whole class in separation.
@@ -163,10 +176,104 @@ class KVDB(object):
     def subscribe(self, *args, **kwargs):
         return self.conn.subscribe(*args, **kwargs)
 
+# ################################################################################################################################
+
+    # Data dictionaries
+
+    def _translation_name(self, system1, key1, value1, system2, key2):
+        return _KVDB.SEPARATOR.join((_KVDB.TRANSLATION, system1, key1, value1, system2, key2))
+
+    def load_translations(self):
+        """ Populates the local cache of translations with everything there is in the KVDB, using SCAN to find them,
+        so that the KVDB is not blocked for the duration of a single KEYS command, followed by a pipeline of HGETs.
+        """
+        gen = self.translations_gen
+        names = set(self.conn.scan_iter(_KVDB.TRANSLATION + _KVDB.SEPARATOR + '*', 1000))
+
+        with self.conn.pipeline() as p:
+            for name in names:
+                p.hget(name, 'value2')
+            values = p.execute()
+
+        # Translations were invalidated while we were reading them in
+        if gen != self.translations_gen:
+            return
+
+        for name, value in zip(names, values):
+            self._set_translation(name, value)
+
+        logger.info('Loaded %d translation(s)', len(names))
+
+    def invalidate_translations(self):
+        """ Drops all the translations cached so they are read in anew from the KVDB.
+        """
+        self.translations_gen += 1
+        self.translations.clear()
+        self.translations_missing.clear()
+        self.load_translations()
+
+    def _set_translation(self, name, value):
+        """ Caches a translation read in from the KVDB, value is None if there is no such translation.
+        """
+        if value is not None:
+            self.translations[name] = value
+            self.translations_missing.pop(name, None)
+        else:
+            self.translations.pop(name, None)
+
+            if len(self.translations_missing) >= self.translations_missing_max_size:
+                self.translations_missing.popitem(False)
+
+            self.translations_missing[name] = True
+
     def translate(self, system1, key1, value1, system2, key2, default=''):
-        return self.conn.hget(
-            _KVDB.SEPARATOR.join(
-                (_KVDB.TRANSLATION, system1, key1, value1, system2, key2)), 'value2') or default
+        """ Returns a value that value1 of key1 in system1 translates to in key2 of system2 or default if there is no such
+        translation. Answered from the local cache, the KVDB is consulted only for translations not cached yet.
+        """
+        name = self._translation_name(system1, key1, value1, system2, key2)
+
+        try:
+            value = self.translations[name]
+        except KeyError:
+            if name in self.translations_missing:
+                return default
+
+            gen = self.translations_gen
+            value = self.conn.hget(name, 'value2')
+            if gen == self.translations_gen:
+                self._set_translation(name, value)
+
+        return value or default
+
+    def translate_many(self, items, default=''):
+        """ Like self.translate but for a list of (system1, key1, value1, system2, key2) tuples - returns a list of translated
+        values, in the same order. All of the values not found in the local cache are read in from the KVDB in one round trip.
+        """
+        names = [self._translation_name(*item) for item in items]
+        missing = [name for name in names if name not in self.translations and name not in self.translations_missing]
+
+        if missing:
+            gen = self.translations_gen
+
+            with self.conn.pipeline() as p:
+                for name in missing:
+                    p.hget(name, 'value2')
+                values = dict(zip(missing, p.execute()))
+
+            if gen == self.translations_gen:
+                for name, value in values.items():
+                    self._set_translation(name, value)
+        else:
+            values = {}
+
+        out = []
+        for name in names:
+            value = values[name] if name in values else self.translations.get(name)
+            out.append(value or default)
+
+        return out
+
+# ################################################################################################################################
 
     def copy(self):
         """ Returns an KVDB with the configuration copied over from self. Note that
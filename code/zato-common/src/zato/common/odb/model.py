@@ -105,6 +105,9 @@ class Cluster(Base):
     cw_srv_id = Column(Integer(), nullable=True)
     cw_srv_keep_alive_dt = Column(DateTime(), nullable=True)
 
+    # Backend of distributed locks of all servers in the cluster, one of LOCK_BACKEND, NULL = the default one
+    lock_backend = Column(String(30), nullable=True)
+
     def __init__(self, id=None, name=None, description=None, odb_type=None,
                  odb_host=None, odb_port=None, odb_user=None, odb_db_name=None,
                  odb_schema=None, broker_host=None,
@@ -518,6 +521,18 @@ class HTTPSOAP(Base):
 
     cache_expiry = Column(Integer, nullable=True, default=0)
 
+    # Channels only - how many requests may be handled at a time and how many more may wait for their turn, NULL = no limit
+    max_concurrency = Column(Integer, nullable=True)
+    max_queue_size = Column(Integer, nullable=True)
+
+    # Outgoing connections only - an optional circuit breaker, NULLs in thresholds mean defaults
+    has_circuit_breaker = Column(Boolean, nullable=True, default=False)
+    cb_error_rate = Column(Integer, nullable=True)
+    cb_slow_call_rate = Column(Integer, nullable=True)
+    cb_slow_call_time = Column(Integer, nullable=True)
+    cb_window_size = Column(Integer, nullable=True)
+    cb_open_time = Column(Integer, nullable=True)
+
     security_id = Column(Integer, ForeignKey('sec_base.id', ondelete='CASCADE'), nullable=True)
     security = relationship(SecurityBase, backref=backref('http_soap_list', order_by=name, cascade='all, delete, delete-orphan'))
 
@@ -971,6 +986,9 @@ class OutgoingAMQP(Base):
     app_id = Column(String(200), nullable=True)
     pool_size = Column(SmallInteger(), nullable=False)
 
+    # Whether to wait for the broker to confirm each message published
+    confirm_publish = Column(Boolean(), nullable=True)
+
     def_id = Column(Integer, ForeignKey('conn_def_amqp.id', ondelete='CASCADE'), nullable=False)
     def_ = relationship(ConnDefAMQP, backref=backref('out_conns_amqp', cascade='all, delete, delete-orphan'))
 
@@ -1156,6 +1174,13 @@ class ChannelAMQP(Base):
     ack_mode = Column(String(20), nullable=False)
     data_format = Column(String(20), nullable=True)
 
+    # How many unacknowledged messages the broker may deliver and how many of them may be handled concurrently
+    prefetch_count = Column(Integer, nullable=True)
+    max_concurrency = Column(Integer, nullable=True)
+
+    # Whether messages of the same routing key should be handled in the order they were received in
+    preserve_order = Column(Boolean(), nullable=True)
+
     service_id = Column(Integer, ForeignKey('service.id', ondelete='CASCADE'), nullable=False)
     service = relationship(Service, backref=backref('channels_amqp', order_by=name, cascade='all, delete, delete-orphan'))
 
@@ -1215,6 +1240,11 @@ class ChannelWMQ(Base):
     queue = Column(String(200), nullable=False)
     data_format = Column(String(20), nullable=True)
 
+    # How many messages to hand over to a server at most in one call and how long, in milliseconds,
+    # to wait for a batch to fill up before handing over what has been received so far.
+    batch_size = Column(Integer(), nullable=True)
+    linger_time = Column(Integer(), nullable=True)
+
     service_id = Column(Integer, ForeignKey('service.id', ondelete='CASCADE'), nullable=False)
     service = relationship(Service, backref=backref('channels_wmq', order_by=name, cascade='all, delete, delete-orphan'))
 
@@ -1222,7 +1252,7 @@ class ChannelWMQ(Base):
     def_ = relationship(ConnDefWMQ, backref=backref('channels_wmq', cascade='all, delete, delete-orphan'))
 
     def __init__(self, id=None, name=None, is_active=None, queue=None,
-                 def_id=None, def_name=None, service_name=None, data_format=None):
+                 def_id=None, def_name=None, service_name=None, data_format=None, batch_size=None, linger_time=None):
         self.id = id
         self.name = name
         self.is_active = is_active
@@ -1231,6 +1261,8 @@ class ChannelWMQ(Base):
         self.def_name = def_name # Not used by the DB
         self.service_name = service_name # Not used by the DB
         self.data_format = data_format
+        self.batch_size = batch_size
+        self.linger_time = linger_time
 
 # ################################################################################################################################
 
@@ -1959,6 +1991,28 @@ class WebSocketClientPubSubKeys(Base):
 
 # ################################################################################################################################
 
+class WebSocketMsgBrowserSub(Base):
+    """ A word a live message browser, connected as a given WebSocket client, is subscribed to. Messages are delivered
+    to the client if they contain all of its words.
+    """
+    __tablename__ = 'web_socket_msg_browser_sub'
+    __table_args__ = (
+        Index('wsmbs_cli_idx', 'cluster_id', 'client_id', unique=False),
+    {})
+
+    id = Column(Integer, Sequence('web_socket_msg_browser_sub_seq'), primary_key=True)
+    pattern = Column(String(200), nullable=False)
+
+    client_id = Column(Integer, ForeignKey('web_socket_client.id', ondelete='CASCADE'), nullable=False)
+    client = relationship(
+        WebSocketClient, backref=backref('msg_browser_sub_list', order_by=id, cascade='all, delete, delete-orphan'))
+
+    cluster_id = Column(Integer, ForeignKey('cluster.id', ondelete='CASCADE'), nullable=False)
+    cluster = relationship(Cluster, backref=backref(
+        'web_socket_msg_browser_sub_list', order_by=id, cascade='all, delete, delete-orphan'))
+
+# ################################################################################################################################
+
 class WebSocketSubscription(Base):
     """ Persistent subscriptions pertaining to a given long-running, possibly restartable, WebSocket connection.
     """
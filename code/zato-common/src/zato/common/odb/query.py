@@ -385,7 +385,7 @@ def _out_amqp(session, cluster_id):
         OutgoingAMQP.id, OutgoingAMQP.name, OutgoingAMQP.is_active,
         OutgoingAMQP.delivery_mode, OutgoingAMQP.priority, OutgoingAMQP.content_type,
         OutgoingAMQP.content_encoding, OutgoingAMQP.expiration, OutgoingAMQP.pool_size, OutgoingAMQP.user_id,
-        OutgoingAMQP.app_id, ConnDefAMQP.name.label('def_name'), OutgoingAMQP.def_id).\
+        OutgoingAMQP.app_id, OutgoingAMQP.confirm_publish, ConnDefAMQP.name.label('def_name'), OutgoingAMQP.def_id).\
         filter(OutgoingAMQP.def_id==ConnDefAMQP.id).\
         filter(ConnDefAMQP.id==OutgoingAMQP.def_id).\
         filter(Cluster.id==ConnDefAMQP.cluster_id).\
@@ -446,7 +446,8 @@ def _channel_amqp(session, cluster_id):
         ChannelAMQP.queue, ChannelAMQP.consumer_tag_prefix,
         ConnDefAMQP.name.label('def_name'), ChannelAMQP.def_id,
         ChannelAMQP.pool_size, ChannelAMQP.ack_mode,
-        ChannelAMQP.data_format,
+        ChannelAMQP.data_format, ChannelAMQP.prefetch_count,
+        ChannelAMQP.max_concurrency, ChannelAMQP.preserve_order,
         Service.name.label('service_name'),
         Service.impl_name.label('service_impl_name')).\
         filter(ChannelAMQP.def_id==ConnDefAMQP.id).\
@@ -500,7 +501,7 @@ def _channel_wmq(session, cluster_id):
     return session.query(
         ChannelWMQ.id, ChannelWMQ.name, ChannelWMQ.is_active,
         ChannelWMQ.queue, ConnDefWMQ.name.label('def_name'), ChannelWMQ.def_id,
-        ChannelWMQ.data_format, Service.name.label('service_name'),
+        ChannelWMQ.data_format, ChannelWMQ.batch_size, ChannelWMQ.linger_time, Service.name.label('service_name'),
         Service.impl_name.label('service_impl_name')).\
         filter(ChannelWMQ.def_id==ConnDefWMQ.id).\
         filter(ChannelWMQ.service_id==Service.id).\
@@ -618,6 +619,14 @@ def _http_soap(session, cluster_id):
         HTTPSOAP.sec_use_rbac,
         HTTPSOAP.cache_id,
         HTTPSOAP.cache_expiry,
+        HTTPSOAP.max_concurrency,
+        HTTPSOAP.max_queue_size,
+        HTTPSOAP.has_circuit_breaker,
+        HTTPSOAP.cb_error_rate,
+        HTTPSOAP.cb_slow_call_rate,
+        HTTPSOAP.cb_slow_call_time,
+        HTTPSOAP.cb_window_size,
+        HTTPSOAP.cb_open_time,
         Cache.name.label('cache_name'),
         Cache.cache_type,
         TLSCACert.name.label('sec_tls_ca_cert_name'),
@@ -50,9 +50,6 @@ from urlparse import urlparse
 # alembic
 from alembic import op
 
-# anyjson
-from anyjson import dumps, loads
-
 # Bunch
 from bunch import Bunch, bunchify
 
@@ -109,10 +106,12 @@ from validate import is_boolean, is_integer, VdtTypeError
 
 # Zato
 from zato.common import CHANNEL, CLI_ARG_SEP, curdir as common_curdir, DATA_FORMAT, engine_def, engine_def_sqlite, KVDB, MISC, \
-     SECRET_SHADOW, SIMPLE_IO, soap_body_path, soap_body_xpath, TLS, TRACE1, ZatoException, zato_no_op_marker, ZATO_NOT_GIVEN, \
-     ZMQ
+     SECRET_SHADOW, SIMPLE_IO, soap_body_path, soap_body_xpath, TLS, TRACE1, XML_PARSER, ZatoException, zato_no_op_marker, \
+     ZATO_NOT_GIVEN, ZMQ
 from zato.common.broker_message import SERVICE
 from zato.common.crypto import CryptoManager
+from zato.common.exception import BadRequest
+from zato.common.json_ import dumps, loads
 from zato.common.odb.model import HTTPBasicAuth, HTTPSOAP, IntervalBasedJob, Job, Server, Service
 from zato.common.odb.query import _service as _service
 
@@ -122,6 +121,13 @@ logger = logging.getLogger(__name__)
 logging.addLevelName(TRACE1, "TRACE1")
 
 _repr_template = Template('<$class_name at $mem_loc$attrs>')
+
+# Created once and shared by everything that parses incoming XML. It never resolves entities, loads DTDs or accesses
+# the network, and huge_tree is off so documents nested too deeply or with overly large text nodes are rejected.
+xml_parser = objectify.makeparser(resolve_entities=False, load_dtd=False, no_network=True, huge_tree=False)
+
+# Set through set_xml_max_size from server.conf's misc.xml_max_size
+_xml_config = {'max_size': XML_PARSER.DEFAULT.MAX_SIZE}
 _uncamelify_re = re.compile(r'((?<=[a-z])[A-Z]|(?<!\A)[A-Z](?=[a-z]))')
 
 _epoch = datetime.utcfromtimestamp(0) # Start of UNIX epoch
@@ -511,6 +517,24 @@ def get_body_payload(body):
 
 # ################################################################################################################################
 
+def set_xml_max_size(max_size):
+    """ Sets how large, in bytes, XML documents parse_xml accepts by default in all of the process, 0 meaning no limit.
+    """
+    _xml_config['max_size'] = max_size
+
+def parse_xml(cid, data, max_size=None, _parser=xml_parser, _xml_config=_xml_config):
+    """ Parses data into an objectified XML tree, provided it is not larger than max_size bytes, or than what
+    set_xml_max_size was last given if max_size is None.
+    """
+    max_size = _xml_config['max_size'] if max_size is None else max_size
+
+    if max_size and len(data) > max_size:
+        raise BadRequest(cid, 'XML document too large, {} > {} bytes'.format(len(data), max_size))
+
+    return objectify.fromstring(data, _parser)
+
+# ################################################################################################################################
+
 def payload_from_request(cid, request, data_format, transport):
     """ Converts a raw request to a payload suitable for usage with SimpleIO.
     """
@@ -520,7 +544,7 @@ def payload_from_request(cid, request, data_format, transport):
                 if isinstance(request, objectify.ObjectifiedElement):
                     soap = request
                 else:
-                    soap = objectify.fromstring(request)
+                    soap = parse_xml(cid, request)
                 body = soap_body_xpath(soap)
                 if not body:
                     raise ZatoException(cid, 'Client did not send the [{}] element'.format(soap_body_path))
@@ -529,7 +553,7 @@ def payload_from_request(cid, request, data_format, transport):
                 if isinstance(request, objectify.ObjectifiedElement):
                     payload = request
                 else:
-                    payload = objectify.fromstring(request)
+                    payload = parse_xml(cid, request)
         elif data_format in(DATA_FORMAT.DICT, DATA_FORMAT.JSON):
             if not request:
                 return ''
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import TestCase
+
+# mock
+from mock import MagicMock
+
+# Zato
+from zato.common import JSON_CODEC
+from zato.common import json_
+
+# ################################################################################################################################
+
+class JSONCodecTestCase(TestCase):
+
+    def tearDown(self):
+        json_.set_codec(JSON_CODEC.DEFAULT)
+
+    def test_set_codec(self):
+        for name in (JSON_CODEC.JSON, JSON_CODEC.SIMPLEJSON, JSON_CODEC.RAPIDJSON):
+            json_.set_codec(name)
+            self.assertEquals(json_.get_codec(), name)
+            self.assertDictEqual(json_.loads(json_.dumps({'a': [1, 2.5, None, True, 'zz']})), {'a': [1, 2.5, None, True, 'zz']})
+
+        self.assertRaises(ValueError, json_.set_codec, 'abc')
+
+    def test_dates(self):
+        data = {'dt': datetime(2017, 1, 2, 3, 4, 5), 'd': date(2017, 1, 2)}
+
+        for name in json_.codecs:
+            json_.set_codec(name)
+            self.assertDictEqual(json_.loads(json_.dumps(data)), {'dt': '2017-01-02T03:04:05', 'd': '2017-01-02'})
+
+    def test_decimal(self):
+        value = Decimal('12345678901234567.89')
+
+        json_.set_codec(JSON_CODEC.SIMPLEJSON)
+        self.assertEquals(json_.dumps({'a': value}), '{"a": 12345678901234567.89}')
+
+        json_.set_codec(JSON_CODEC.RAPIDJSON)
+        self.assertIn('12345678901234567.89', json_.dumps({'a': value}))
+
+        json_.set_codec(JSON_CODEC.JSON)
+        self.assertEquals(json_.loads(json_.dumps({'a': Decimal('1.5')})), {'a': 1.5})
+
+    def test_rapidjson_supports(self):
+        self.assertTrue(json_._rapidjson_supports({'a': [1, 2.5, None, True, ('zz', {1: 'b'})]}))
+
+        for value in (datetime(2017, 1, 2), Decimal('1.5'), 2 ** 64, set()):
+            self.assertFalse(json_._rapidjson_supports({'a': [{'b': value}]}))
+
+    def test_rapidjson_fallback(self):
+        rapidjson_dumps = MagicMock()
+
+        # Data rapidjson knows nothing about is serialized with simplejson only, rapidjson is not even tried
+        data = json_._rapidjson_dumps({'a': datetime(2017, 1, 2)}, _dumps=rapidjson_dumps)
+        self.assertEquals(data, '{"a": "2017-01-02T00:00:00"}')
+        self.assertListEqual(rapidjson_dumps.mock_calls, [])
+
+    def test_not_serializable(self):
+        for name in json_.codecs:
+            json_.set_codec(name)
+            self.assertRaises(TypeError, json_.dumps, {'a': object()})
+
+# ################################################################################################################################
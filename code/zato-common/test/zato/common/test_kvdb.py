@@ -18,6 +18,7 @@ from bunch import Bunch
 from nose.tools import eq_
 
 # Zato
+from zato.common import KVDB as KVDB_CONST
 from zato.common.kvdb import KVDB
 from zato.common.test import rand_string, rand_int
 
@@ -95,3 +96,108 @@ class KVDBTestCase(TestCase):
         kvdb.init()
 
         self.assertTrue(isinstance(kvdb.conn, FakeStrictRedis))
+
+# ##############################################################################
+
+class FakeRedis(object):
+    """ Just enough of Redis for data dictionary translations to be tested.
+    """
+    def __init__(self, data):
+        self.data = data
+        self.commands = []
+        self.queued = None
+
+    def scan_iter(self, match, count):
+        self.commands.append('SCAN')
+        return iter([key for key in self.data if key.startswith(match[:-1])])
+
+    def hget(self, name, key):
+        if self.queued is not None:
+            self.queued.append(name)
+        else:
+            self.commands.append('HGET')
+            return self.data.get(name)
+
+    def pipeline(self):
+        self.queued = []
+        return self
+
+    def execute(self):
+        self.commands.append('PIPELINE')
+        out = [self.data.get(name) for name in self.queued]
+        self.queued = None
+        return out
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *ignored):
+        pass
+
+def _name(value1):
+    return KVDB_CONST.SEPARATOR.join((KVDB_CONST.TRANSLATION, 'sys1', 'key1', value1, 'sys2', 'key2'))
+
+class TranslationTestCase(TestCase):
+
+    def get_kvdb(self, **kwargs):
+        kvdb = KVDB(conn=FakeRedis({
+            _name('a'): 'b',
+            _name('c'): 'd',
+        }), **kwargs)
+        kvdb.load_translations()
+        return kvdb
+
+    def test_translate_cached(self):
+        kvdb = self.get_kvdb()
+        eq_(kvdb.conn.commands, ['SCAN', 'PIPELINE'])
+
+        eq_(kvdb.translate('sys1', 'key1', 'a', 'sys2', 'key2'), 'b')
+        eq_(kvdb.translate('sys1', 'key1', 'c', 'sys2', 'key2'), 'd')
+        eq_(kvdb.conn.commands, ['SCAN', 'PIPELINE'])
+
+    def test_translate_read_through(self):
+        kvdb = self.get_kvdb()
+        kvdb.conn.data[_name('e')] = 'f'
+
+        eq_(kvdb.translate('sys1', 'key1', 'e', 'sys2', 'key2'), 'f')
+        eq_(kvdb.translate('sys1', 'key1', 'zzz', 'sys2', 'key2', 'default'), 'default')
+
+        # Both a hit and a miss are cached
+        eq_(kvdb.translate('sys1', 'key1', 'e', 'sys2', 'key2'), 'f')
+        eq_(kvdb.translate('sys1', 'key1', 'zzz', 'sys2', 'key2', 'default'), 'default')
+        eq_(kvdb.conn.commands, ['SCAN', 'PIPELINE', 'HGET', 'HGET'])
+
+    def test_translate_many(self):
+        kvdb = self.get_kvdb()
+        kvdb.conn.data[_name('e')] = 'f'
+
+        items = [('sys1', 'key1', value, 'sys2', 'key2') for value in ('a', 'e', 'zzz', 'c')]
+        eq_(kvdb.translate_many(items, 'default'), ['b', 'f', 'default', 'd'])
+        eq_(kvdb.translate_many(items, 'default'), ['b', 'f', 'default', 'd'])
+
+        # Only a single round trip for all the values missing
+        eq_(kvdb.conn.commands, ['SCAN', 'PIPELINE', 'PIPELINE'])
+
+    def test_invalidate(self):
+        kvdb = self.get_kvdb()
+        kvdb.conn.data[_name('a')] = 'new'
+
+        eq_(kvdb.translate('sys1', 'key1', 'a', 'sys2', 'key2'), 'b')
+
+        kvdb.invalidate_translations()
+        eq_(kvdb.translate('sys1', 'key1', 'a', 'sys2', 'key2'), 'new')
+
+    def test_missing_max_size(self):
+        kvdb = self.get_kvdb(translations_missing_max_size=2)
+
+        for value1 in 'x', 'y', 'z':
+            eq_(kvdb.translate('sys1', 'key1', value1, 'sys2', 'key2', 'default'), 'default')
+
+        # Only the most recently looked up names of translations that do not exist are kept
+        eq_(list(kvdb.translations_missing), [_name('y'), _name('z')])
+
+        kvdb.translate_many([('sys1', 'key1', 'w', 'sys2', 'key2')])
+        eq_(list(kvdb.translations_missing), [_name('z'), _name('w')])
+
+        # Existing translations are not affected
+        eq_(sorted(kvdb.translations), [_name('a'), _name('c')])
@@ -20,7 +20,8 @@ from bunch import Bunch
 from lxml import etree
 
 # Zato
-from zato.common import ParsingException, soap_body_xpath, zato_path
+from zato.common import DATA_FORMAT, ParsingException, soap_body_xpath, URL_TYPE, XML_PARSER, zato_path
+from zato.common.exception import BadRequest
 from zato.common import util
 from zato.common.test.tls_material import ca_cert
 
@@ -75,6 +76,40 @@ class XPathTestCase(TestCase):
 
 # ################################################################################################################################
 
+class ParseXMLTestCase(TestCase):
+
+    def test_max_size(self):
+        self.assertRaises(BadRequest, util.parse_xml, 'cid', '<a>{}</a>'.format('x' * 100), 100)
+        self.assertEquals(util.parse_xml('cid', '<a>{}</a>'.format('x' * 10), 100).text, 'x' * 10)
+
+    def test_set_max_size(self):
+        data = '<a>{}</a>'.format('x' * 100)
+
+        try:
+            util.set_xml_max_size(100)
+            self.assertRaises(BadRequest, util.parse_xml, 'cid', data)
+
+            # No limit at all
+            util.set_xml_max_size(0)
+            self.assertEquals(util.parse_xml('cid', data).text, 'x' * 100)
+
+        finally:
+            util.set_xml_max_size(XML_PARSER.DEFAULT.MAX_SIZE)
+
+    def test_entities_not_resolved(self):
+        data = '<!DOCTYPE a [<!ENTITY e SYSTEM "file:///etc/passwd">]><a>&e;</a>'
+        self.assertFalse(util.parse_xml('cid', data).text)
+
+    def test_payload_from_parsed_request(self):
+        soap = util.parse_xml('cid', """<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/">
+            <soapenv:Body><a><b>1</b></a></soapenv:Body></soapenv:Envelope>""")
+
+        payload = util.payload_from_request('cid', soap, DATA_FORMAT.XML, URL_TYPE.SOAP)
+        self.assertEquals(payload.b, 1)
+        self.assertIs(payload.getroottree().getroot(), soap)
+
+# ################################################################################################################################
+
 class TLSTestCase(TestCase):
     def test_validate_tls_cert_from_payload(self):
         info = util.get_tls_from_payload(ca_cert)
@@ -14,18 +14,27 @@ import os
 from datetime import datetime, timedelta
 from errno import ENOENT
 from hashlib import sha256
+from math import ceil
 from pwd import getpwuid
 from tempfile import gettempdir
 from threading import current_thread
+from uuid import uuid4
 
 # gevent
-from gevent import sleep, spawn
+from gevent import sleep, spawn, Timeout
+from gevent.event import Event
+from gevent.lock import Semaphore
+from gevent.threadpool import ThreadPool
 
 # portalocker
 from portalocker import lock, LockException, LOCK_NB, LOCK_EX, unlock
 
+# Redis
+from redis.client import Script
+
 # SQLAlchemy
 from sqlalchemy import func
+from sqlalchemy.exc import DBAPIError
 
 # Zato
 from zato.common.util import make_repr
@@ -40,6 +49,7 @@ has_debug = logger.isEnabledFor(logging.DEBUG)
 class MAX:
     LEN_NS = 8
     LEN_NAME = 128
+    FLOCK_THREADS = 10
 
 class DEFAULT:
     TTL = 60
@@ -50,6 +60,11 @@ class LOCK_TYPE:
     PERMANENT = 'permanent'
     TRANSIENT = 'transient'
 
+class REDIS_KEY:
+    LOCK = 'zato:distlock:lock:{}'
+    FENCING_TOKEN = 'zato:distlock:fencing-token:{}'
+    RELEASED = 'zato:distlock:released:{}'
+
 # ################################################################################################################################
 
 class LockTimeout(Exception):
@@ -58,11 +73,52 @@ class LockTimeout(Exception):
 
 # ################################################################################################################################
 
+class LocalQueue(object):
+    """ Makes greenlets of a single process wait for a lock locally so that only one of them at a time contends
+    for the backend lock of a given name.
+    """
+    def __init__(self):
+
+        # Lock ID -> [semaphore, number of greenlets holding or waiting for it]
+        self.items = {}
+
+    def acquire(self, lock_id, block):
+        """ Waits up to block seconds for the local lock, or does not wait at all if block is False.
+        """
+        item = self.items.get(lock_id)
+        if not item:
+            item = self.items[lock_id] = [Semaphore(), 0]
+
+        item[1] += 1
+
+        if block:
+            acquired = item[0].acquire(timeout=block)
+        else:
+            acquired = item[0].acquire(blocking=False)
+
+        if not acquired:
+            self._decr(lock_id, item)
+
+        return acquired
+
+    def release(self, lock_id):
+        item = self.items[lock_id]
+        item[0].release()
+        self._decr(lock_id, item)
+
+    def _decr(self, lock_id, item):
+        item[1] -= 1
+        if not item[1]:
+            del self.items[lock_id]
+
+# ################################################################################################################################
+
 class LockInfo(object):
     __slots__ = ('lock', 'namespace', 'name', 'priv_id', 'pub_id', 'ttl', 'acquired', 'lock_type', 'block', 'block_interval',
-        'release')
+        'release', 'fencing_token')
 
-    def __init__(self, lock, namespace, name, priv_id, pub_id, ttl, acquired, lock_type, block, block_interval):
+    def __init__(self, lock, namespace, name, priv_id, pub_id, ttl, acquired, lock_type, block, block_interval,
+            fencing_token=None):
         self.lock = lock
         self.namespace = namespace
         self.name = name
@@ -74,6 +130,7 @@ class LockInfo(object):
         self.block = block
         self.block_interval = block_interval
         self.release = self.lock.release
+        self.fencing_token = fencing_token
 
     def __repr__(self):
         return make_repr(self)
@@ -86,10 +143,12 @@ class LockInfo(object):
 class Lock(object):
     """ Base class for all backend-specific locks.
     """
-    def __init__(self, os_user_name, session, namespace, name, ttl, block, block_interval, _permanent=LOCK_TYPE.PERMANENT,
-            _transient=LOCK_TYPE.TRANSIENT):
+    def __init__(self, os_user_name, session, namespace, name, ttl, block, block_interval, local_queue=None, kvdb=None,
+            lua_scripts=None, _permanent=LOCK_TYPE.PERMANENT, _transient=LOCK_TYPE.TRANSIENT):
         self.os_user_name = os_user_name
         self.session = session() if session else None
+        self.kvdb = kvdb
+        self.lua_scripts = lua_scripts
         self.namespace = namespace
         self.name = name
         self.ttl = ttl
@@ -100,10 +159,33 @@ class Lock(object):
         self.released = False
         self.block = block
         self.block_interval = block_interval
+        self.local_queue = local_queue or LocalQueue()
+        self.released_event = Event()
+        self.fencing_token = None
 
     def _acquire_impl(self, *args, **kwargs):
         raise NotImplementedError('Must be implemented in subclasses')
 
+    def _acquire_impl_blocking(self, timeout, _utcnow=datetime.utcnow):
+        """ Waits up to timeout seconds for the lock. Used by backends that cannot wait for a lock natively
+        and subclasses should override it whenever they can.
+        """
+        until = _utcnow() + timedelta(seconds=timeout)
+
+        while _utcnow() < until:
+            sleep(self.block_interval)
+            if self._acquire_impl():
+                return True
+
+        return False
+
+    def _release_impl(self):
+        raise NotImplementedError('Must be implemented in subclasses')
+
+    def _after_release(self):
+        """ Invoked each time release is called, regardless of whether the lock was held or not.
+        """
+
 # ################################################################################################################################
 
     def __enter__(self, pub_hash_func=sha256, _permanent=LOCK_TYPE.PERMANENT):
@@ -122,39 +204,39 @@ class Lock(object):
             self._sustain()
 
         return LockInfo(self, self.namespace, self.name, self.priv_id, self.pub_id, self.ttl, self.acquired, self.lock_type,
-            self.block, self.block_interval)
+            self.block, self.block_interval, self.fencing_token)
 
     acquire = __enter__
 
 # ################################################################################################################################
 
     def _acquire(self, _utcnow=datetime.utcnow, _has_debug=has_debug):
-        """ Try to acquire a lock by its ID. If not possible and block is not False
-        sleep for that many seconds as block points to.
+        """ Try to acquire a lock by its ID. If not possible and block is not False wait for that many seconds
+        as block points to. Greenlets of the same process first wait for each other locally and only one of them
+        at a time waits for the backend lock, using the backend's own mechanism for that if it has one.
         """
-        acquired = self._acquire_impl()
-
-        # Ok, we do not have the lock. If configured to, let's wait until we can obtain one or we time out.
-
         _block = self.block
-        _block_interval = self.block_interval
+        start = _utcnow()
 
-        if _block and not acquired:
+        acquired = self.local_queue.acquire(self.priv_id, _block)
 
-            now = _utcnow()
-            until = now + timedelta(seconds=_block)
+        if acquired:
+            acquired = self._acquire_impl()
 
-            while now < until:
-                sleep(_block_interval)
-                acquired = self._acquire_impl()
-                if acquired:
-                    break
-                now = _utcnow()
+            # Ok, we do not have the lock. If configured to, let's wait until we can obtain one or we time out.
+            if not acquired and _block:
+                remaining = _block - (_utcnow() - start).total_seconds()
+                if remaining > 0:
+                    acquired = self._acquire_impl_blocking(remaining)
 
+            # Let other greenlets from this process try their luck
             if not acquired:
-                msg = 'Could not obtain lock for `{}` `{}` within {}s'.format(self.namespace, self.name, _block)
-                logger.warn(msg)
-                raise LockTimeout(msg)
+                self.local_queue.release(self.priv_id)
+
+        if _block and not acquired:
+            msg = 'Could not obtain lock for `{}` `{}` within {}s'.format(self.namespace, self.name, _block)
+            logger.warn(msg)
+            raise LockTimeout(msg)
 
         if _has_debug:
             logger.debug('Acquired status for %s (%s %s) is %s', self.priv_id, self.namespace, self.name, acquired)
@@ -163,19 +245,10 @@ class Lock(object):
 
 # ################################################################################################################################
 
-    def _wait_in_greenlet(self, _utcnow=datetime.utcnow, _timedelta=timedelta):
-        """ Sleeps until self.ttl is reached or until the lock is released and then releases the lock if it is still held.
+    def _wait_in_greenlet(self):
+        """ Waits until self.ttl is reached or until the lock is released and then releases the lock if it is still held.
         """
-        now = _utcnow()
-        until = now + _timedelta(seconds=self.ttl)
-
-        while now < until:
-            if self.released:
-                break
-            now = _utcnow()
-            sleep(0.1)
-
-        if not self.released:
+        if not self.released_event.wait(self.ttl):
             self.release()
 
 # ################################################################################################################################
@@ -186,6 +259,29 @@ class Lock(object):
         """
         spawn(self._wait_in_greenlet)
 
+# ################################################################################################################################
+
+    def release(self, _has_debug=has_debug):
+        """ Releases the lock if it has not been released already assuming we managed to acquire the lock at all.
+        """
+        try:
+            if self.acquired and not self.released:
+
+                try:
+                    self._release_impl()
+                finally:
+
+                    # Even if the backend could not release the lock, other greenlets of this process must not
+                    # wait locally for a lock that nothing will release anymore.
+                    self.released = True
+                    self.released_event.set()
+                    self.local_queue.release(self.priv_id)
+
+                if _has_debug:
+                    logger.debug('Released %s', self.priv_id)
+        finally:
+            self._after_release()
+
 # ################################################################################################################################
 
     def __exit__(self, type, value, traceback):
@@ -197,17 +293,10 @@ class SQLLock(Lock):
     """ Base class for all SQL-backed locks.
     """
 
-    def release(self, _has_debug=has_debug):
-        """ Releases the lock if it has not been released already assuming we managed to acquire the lock at all.
-        """
-        if self.acquired and not self.released:
-
-            self.session.execute(self._release_func(self.priv_id))
-            self.released = True
-
-            if _has_debug:
-                logger.debug('Released %s', self.priv_id)
+    def _release_impl(self):
+        self.session.execute(self._release_func(self.priv_id))
 
+    def _after_release(self):
         self.session.close()
 
 # ################################################################################################################################
@@ -224,6 +313,11 @@ class MySQLLock(SQLLock):
     def _acquire_impl(self):
         return self.session.execute(self._acquire_func(self.priv_id, 0)).scalar()
 
+    def _acquire_impl_blocking(self, timeout, _ceil=ceil):
+        """ GET_LOCK waits on the server side until the lock is released or the timeout, in whole seconds, is reached.
+        """
+        return self.session.execute(self._acquire_func(self.priv_id, int(_ceil(timeout)))).scalar()
+
 # ################################################################################################################################
 
 class PostgresSQLLock(SQLLock):
@@ -232,9 +326,61 @@ class PostgresSQLLock(SQLLock):
     _acquire_func = func.pg_try_advisory_lock
     _release_func = func.pg_advisory_unlock
 
+    _acquire_blocking_func = func.pg_advisory_lock
+
+    # SQLSTATE of lock_not_available
+    _lock_not_available = '55P03'
+
     def _acquire_impl(self):
         return self.session.execute(self._acquire_func(self.priv_id)).scalar()
 
+    def _acquire_impl_blocking(self, timeout):
+        """ Waits in PostgreSQL itself, up to lock_timeout, for the lock to be released.
+        """
+        # lock_timeout of 0 means no timeout at all hence the lower bound of 1 ms
+        self.session.execute('SET LOCAL lock_timeout = {}'.format(max(1, int(timeout * 1000))))
+
+        try:
+            self.session.execute(self._acquire_blocking_func(self.priv_id))
+        except DBAPIError, e:
+            if self._lock_not_available not in str(e):
+                raise
+            self.session.rollback()
+            return False
+        else:
+            return True
+
+# ################################################################################################################################
+
+class FlockThreads(object):
+    """ Threads in which FCNTLLock waits in flock for locks to be released. They are not taken from the hub's threadpool
+    because DNS resolution runs in it too, and each thread whose caller timed out stays blocked until its lock is released.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.busy = 0
+        self.pool = None
+
+    def is_full(self):
+        return self.busy >= self.size
+
+    def spawn(self, func, *args):
+        if not self.pool:
+            self.pool = ThreadPool(self.size)
+
+        self.busy += 1
+
+        result = self.pool.spawn(func, *args)
+        result.rawlink(self._on_done)
+
+        return result
+
+    def _on_done(self, _ignored):
+        self.busy -= 1
+
+
+flock_threads = FlockThreads(MAX.FLOCK_THREADS)
+
 # ################################################################################################################################
 
 class FCNTLLock(Lock):
@@ -252,7 +398,11 @@ user={}
         super(FCNTLLock, self).__init__(*args, **kwargs)
         self.tmp_file = None
 
-    def _acquire_impl(self, _flags=LOCK_EX | LOCK_NB, tmp_dir=gettempdir(), _utcnow=datetime.utcnow):
+    def _open_tmp_file(self, tmp_dir=gettempdir(), _utcnow=datetime.utcnow):
+        """ Opens the file to lock, unless it is already open.
+        """
+        if self.tmp_file:
+            return
 
         current = current_thread()
 
@@ -263,16 +413,86 @@ user={}
             ))
         self.tmp_file.flush()
 
+    def _acquire_impl(self, _flags=LOCK_EX | LOCK_NB):
+
+        self._open_tmp_file()
+
         try:
             lock(self.tmp_file, _flags)
         except LockException:
             return False
-        else:
+
+        if self._is_current():
             return True
 
-    def release(self, _has_debug=has_debug):
+        # We locked a file that another process removed in the meantime, try again with a new one
+        self._reopen_tmp_file()
+
+        try:
+            lock(self.tmp_file, _flags)
+        except LockException:
+            return False
+        else:
+            return self._is_current()
+
+    def _is_current(self):
+        """ Returns True if our file is still the one on disk. It will not be if a previous owner removed it
+        while we were waiting for the lock, in which case the lock we hold is meaningless.
+        """
+        try:
+            return os.fstat(self.tmp_file.fileno()).st_ino == os.stat(self.tmp_file.name).st_ino
+        except OSError, e:
+            if e.errno != ENOENT:
+                raise
+            return False
+
+    def _reopen_tmp_file(self):
         unlock(self.tmp_file)
         self.tmp_file.close()
+        self.tmp_file = None
+        self._open_tmp_file()
+
+    def _acquire_impl_blocking(self, timeout, _flags=LOCK_EX, _utcnow=datetime.utcnow, _flock_threads=flock_threads):
+        """ Blocks in flock in a separate thread so that the kernel itself wakes us up once the lock is released.
+        If all such threads are already waiting for other locks, the lock is polled for instead.
+        """
+        until = _utcnow() + timedelta(seconds=timeout)
+
+        while True:
+
+            remaining = max(0, (until - _utcnow()).total_seconds())
+
+            if _flock_threads.is_full():
+                return super(FCNTLLock, self)._acquire_impl_blocking(remaining)
+
+            result = _flock_threads.spawn(lock, self.tmp_file, _flags)
+
+            try:
+                result.get(timeout=remaining)
+            except Timeout:
+
+                # The thread is still waiting for flock so once it obtains the lock it needs to give it back straightaway.
+                # This thread now owns the file so we no longer can use it.
+                tmp_file = self.tmp_file
+                self.tmp_file = None
+
+                def _on_late_result(result):
+                    if result.successful():
+                        unlock(tmp_file)
+                    tmp_file.close()
+
+                result.rawlink(_on_late_result)
+
+                return False
+
+            if self._is_current():
+                return True
+
+            # The file was removed by the previous owner so we need to start over with a new one
+            self._reopen_tmp_file()
+
+    def _release_impl(self):
+        unlock(self.tmp_file)
 
         try:
             os.remove(self.tmp_file.name)
@@ -283,27 +503,122 @@ user={}
             if e.errno != ENOENT:
                 raise
 
-        if _has_debug:
-            logger.debug('Unlocked `%s`', self.tmp_file)
+    def _after_release(self):
+        if self.tmp_file:
+            self.tmp_file.close()
+
+# ################################################################################################################################
+
+class RedisLock(Lock):
+    """ Distributed locks based on Redis. Each acquisition sets the lock's key with SET NX PX to a value unique
+    to the owner and returns a fencing token that is greater than any previously returned for the same lock.
+    Owners release the lock only if it is still theirs and they notify waiters that the lock can be taken.
+    """
+    _acquire_lua = """
+        if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+            return redis.call('incr', KEYS[2])
+        end
+        return 0
+    """
+
+    _acquire_no_ttl_lua = """
+        if redis.call('set', KEYS[1], ARGV[1], 'NX') then
+            return redis.call('incr', KEYS[2])
+        end
+        return 0
+    """
+
+    _release_lua = """
+        if redis.call('get', KEYS[1]) == ARGV[1] then
+            redis.call('del', KEYS[1])
+            redis.call('del', KEYS[2])
+            redis.call('rpush', KEYS[2], '1')
+            redis.call('pexpire', KEYS[2], ARGV[2])
+            return 1
+        end
+        return 0
+    """
+
+    lua_programs = ('_acquire_lua', '_acquire_no_ttl_lua', '_release_lua')
+
+    def __init__(self, *args, **kwargs):
+        super(RedisLock, self).__init__(*args, **kwargs)
+        self.owner_id = uuid4().hex
+        self.lock_key = None
+        self.fencing_key = None
+        self.released_key = None
+
+    def _run_lua(self, program, keys, args):
+        return self.lua_scripts[program](keys, args, self.kvdb.conn)
+
+    def _acquire_impl(self):
+
+        # Keys are computed here rather than in __init__ because pub_id is not known until the lock is acquired
+        if not self.lock_key:
+            self.lock_key = REDIS_KEY.LOCK.format(self.pub_id)
+            self.fencing_key = REDIS_KEY.FENCING_TOKEN.format(self.pub_id)
+            self.released_key = REDIS_KEY.RELEASED.format(self.pub_id)
+
+        keys = [self.lock_key, self.fencing_key]
+
+        if self.ttl:
+            fencing_token = self._run_lua('_acquire_lua', keys, [self.owner_id, int(self.ttl * 1000)])
+        else:
+            fencing_token = self._run_lua('_acquire_no_ttl_lua', keys, [self.owner_id])
+
+        if fencing_token:
+            self.fencing_token = fencing_token
+            return True
+
+        return False
+
+    def _acquire_impl_blocking(self, timeout, _utcnow=datetime.utcnow, _ceil=ceil):
+        """ Waits for the lock's current owner to signal its release. The wait is capped by block_interval
+        because a lock that expires on its own sends no such signal.
+        """
+        until = _utcnow() + timedelta(seconds=timeout)
+
+        while True:
+            remaining = (until - _utcnow()).total_seconds()
+            if remaining <= 0:
+                return False
+
+            # BLPOP accepts whole seconds only
+            self.kvdb.conn.blpop(self.released_key, int(_ceil(min(remaining, self.block_interval))))
+
+            if self._acquire_impl():
+                return True
+
+    def _release_impl(self):
+        self._run_lua('_release_lua', [self.lock_key, self.released_key], [self.owner_id, int(self.block_interval * 1000)])
 
 # ################################################################################################################################
 
 class LockManager(object):
-    """ A distributed lock manager based on SQL or, if only IPC is needed, on fcntl.
+    """ A distributed lock manager based on SQL or Redis or, if only IPC is needed, on fcntl.
     """
     _lock_impl = {
         'postgresql+pg8000': PostgresSQLLock,
         'oracle': OracleLock,
         'mysql+pymysql': MySQLLock,
         'fcntl': FCNTLLock,
+        'redis': RedisLock,
         }
 
-    def __init__(self, backend_type, default_namespace, session=None):
+    def __init__(self, backend_type, default_namespace, session=None, kvdb=None):
         self.backend_type = backend_type
         self.default_namespace = default_namespace
         self.session = session
+        self.kvdb = kvdb
         self._lock_class = self._lock_impl[backend_type]
         self.user_name = getpwuid(os.getuid()).pw_name
+        self.local_queue = LocalQueue()
+
+        # Registered once for all locks, each script is sent to Redis only the first time it runs and later on invoked by its SHA1
+        if self._lock_class is RedisLock:
+            self.lua_scripts = dict((name, Script(None, getattr(RedisLock, name))) for name in RedisLock.lua_programs)
+        else:
+            self.lua_scripts = None
 
     def __call__(self, name, namespace='', ttl=DEFAULT.TTL, block=DEFAULT.BLOCK, block_interval=DEFAULT.BLOCK_INTERVAL,
             max_len_ns=MAX.LEN_NS, max_len_name=MAX.LEN_NAME):
@@ -318,8 +633,15 @@ class LockManager(object):
             logger.warn(msg)
             raise ValueError(msg)
 
+        # Waiting for a lock in intervals of 0 would be a busy loop, or in Redis, would block without a timeout
+        if not block_interval > 0:
+            msg = 'Block interval must be greater than 0 instead of `{}`'.format(block_interval)
+            logger.warn(msg)
+            raise ValueError(msg)
+
         return self._lock_class(
-            self.user_name, self.session, namespace or self.default_namespace, name, ttl, block, block_interval)
+            self.user_name, self.session, namespace or self.default_namespace, name, ttl, block, block_interval,
+            self.local_queue, self.kvdb, self.lua_scripts)
 
     def acquire(self, *args, **kwargs):
         return self(*args, **kwargs).acquire()
@@ -7,14 +7,24 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 """
 
 # stdlib
+from datetime import datetime
+from hashlib import sha1
 from unittest import TestCase
 
+# Bunch
+from bunch import Bunch
+
 # gevent
-from gevent import sleep
+from gevent import sleep, spawn, spawn_later
+
+# Redis
+from redis import StrictRedis
+from redis.exceptions import ConnectionError, NoScriptError
 
 # Zato
+from zato.common.kvdb import KVDB
 from zato.common.test import rand_int, rand_string
-from zato.distlock import DEFAULT, LockManager, LockTimeout, LOCK_TYPE
+from zato.distlock import DEFAULT, flock_threads, LocalQueue, LockManager, LockTimeout, LOCK_TYPE
 
 # ################################################################################################################################
 
@@ -24,6 +34,9 @@ class _Base(TestCase):
     backend_type = None
     is_set_up = False
 
+    def get_lock_manager(self, default_ns):
+        return LockManager(self.backend_type, default_ns)
+
 # ################################################################################################################################
 
     def test_lock_info_name_no_namespace(self):
@@ -33,7 +46,7 @@ class _Base(TestCase):
 
         name = rand_string()
         default_ns = rand_string()
-        lock_manager = LockManager(self.backend_type, default_ns)
+        lock_manager = self.get_lock_manager(default_ns)
 
         with lock_manager(name) as lock_info:
             self.assertEquals(lock_info.namespace, default_ns)
@@ -54,7 +67,7 @@ class _Base(TestCase):
         name = rand_string()
         default_ns = rand_string()
         ns = rand_string(7)
-        lock_manager = LockManager(self.backend_type, default_ns)
+        lock_manager = self.get_lock_manager(default_ns)
 
         with lock_manager(name, ns) as lock_info:
             self.assertEquals(lock_info.namespace, ns)
@@ -78,7 +91,7 @@ class _Base(TestCase):
         ttl = rand_int()
         block = rand_int()
         block_interval = rand_int()
-        lock_manager = LockManager(self.backend_type, default_ns)
+        lock_manager = self.get_lock_manager(default_ns)
 
         with lock_manager(name, ns, ttl, block, block_interval) as lock_info:
             self.assertEquals(lock_info.namespace, ns)
@@ -99,7 +112,7 @@ class _Base(TestCase):
         name = rand_string()
         default_ns = rand_string()
 
-        lock_manager = LockManager(self.backend_type, default_ns)
+        lock_manager = self.get_lock_manager(default_ns)
 
         lock1 = lock_manager.acquire(name, ttl=1)
         self.assertEquals(lock1.acquired, True)
@@ -123,7 +136,7 @@ class _Base(TestCase):
         name = rand_string()
         default_ns = rand_string()
 
-        lock_manager = LockManager(self.backend_type, default_ns)
+        lock_manager = self.get_lock_manager(default_ns)
 
         lock1 = lock_manager.acquire(name, ttl=10)
         self.assertEquals(lock1.acquired, True)
@@ -148,7 +161,7 @@ class _Base(TestCase):
         name = rand_string()
         default_ns = rand_string()
 
-        lock_manager = LockManager(self.backend_type, default_ns)
+        lock_manager = self.get_lock_manager(default_ns)
 
         lock1 = lock_manager.acquire(name, ttl=2)
         self.assertEquals(lock1.acquired, True)
@@ -162,6 +175,137 @@ class _Base(TestCase):
         else:
             self.fail('Expected a LockTimeout here')
 
+# ################################################################################################################################
+
+    def test_acquire_blocking_handoff(self):
+
+        if not self.is_set_up:
+            return
+
+        name = rand_string()
+        default_ns = rand_string()
+
+        # Each lock manager has its own local queue so the two behave as though they were in different processes
+        lock_manager1 = self.get_lock_manager(default_ns)
+        lock_manager2 = self.get_lock_manager(default_ns)
+
+        lock1 = lock_manager1.acquire(name, ttl=10)
+        self.assertEquals(lock1.acquired, True)
+
+        def _release():
+            sleep(0.5)
+            lock1.release()
+
+        spawn(_release)
+
+        # With a block interval that long the lock could not be obtained in time by polling
+        # so the handoff must have been signalled by the backend.
+        start = datetime.utcnow()
+        lock2 = lock_manager2.acquire(name, block=5, block_interval=5)
+        elapsed = (datetime.utcnow() - start).total_seconds()
+
+        self.assertEquals(lock2.acquired, True)
+        self.assertLess(elapsed, 2)
+
+        lock2.release()
+
+# ################################################################################################################################
+
+    def test_acquire_local_queue(self):
+
+        if not self.is_set_up:
+            return
+
+        name = rand_string()
+        default_ns = rand_string()
+
+        lock_manager = self.get_lock_manager(default_ns)
+        acquired = []
+
+        def _acquire(idx):
+            with lock_manager(name, block=5) as lock_info:
+                acquired.append((idx, lock_info.acquired))
+                sleep(0.1)
+
+        greenlets = [spawn(_acquire, idx) for idx in range(5)]
+        for g in greenlets:
+            g.join()
+
+        self.assertEquals(sorted(acquired), [(idx, True) for idx in range(5)])
+
+        # All the greenlets released their locks so there is nothing left in the local queue
+        self.assertDictEqual(lock_manager.local_queue.items, {})
+
+# ################################################################################################################################
+
+class LocalQueueTestCase(TestCase):
+
+    def test_acquire_release(self):
+        lock_id = rand_string()
+        queue = LocalQueue()
+
+        self.assertTrue(queue.acquire(lock_id, False))
+        self.assertEquals(queue.items[lock_id][1], 1)
+
+        # Already held so it cannot be acquired without blocking ..
+        self.assertFalse(queue.acquire(lock_id, False))
+
+        # .. nor with blocking for a moment ..
+        self.assertFalse(queue.acquire(lock_id, 0.1))
+        self.assertEquals(queue.items[lock_id][1], 1)
+
+        # .. but it can be once released.
+        queue.release(lock_id)
+        self.assertNotIn(lock_id, queue.items)
+
+        self.assertTrue(queue.acquire(lock_id, 0.1))
+        queue.release(lock_id)
+        self.assertNotIn(lock_id, queue.items)
+
+# ################################################################################################################################
+
+class LockManagerTestCase(TestCase):
+
+    def test_block_interval_invalid(self):
+        lock_manager = LockManager('fcntl', rand_string())
+
+        for block_interval in 0, -1:
+            self.assertRaises(ValueError, lock_manager, rand_string(), block_interval=block_interval)
+
+# ################################################################################################################################
+
+class FakeRedisConn(object):
+    """ Runs no Lua but keeps track of which scripts were loaded, like Redis does.
+    """
+    def __init__(self):
+        self.scripts = {}
+        self.loaded = []
+
+    def script_load(self, script):
+        sha = sha1(script).hexdigest()
+        self.scripts[sha] = script
+        self.loaded.append(sha)
+        return sha
+
+    def evalsha(self, sha, numkeys, *args):
+        if sha not in self.scripts:
+            raise NoScriptError()
+        return 1
+
+# ################################################################################################################################
+
+class RedisLuaScriptsTestCase(TestCase):
+
+    def test_scripts_loaded_once(self):
+        conn = FakeRedisConn()
+        lock_manager = LockManager('redis', rand_string(), kvdb=Bunch(conn=conn))
+
+        for x in range(3):
+            lock_manager.acquire(rand_string(), ttl=0).release()
+
+        # One script to acquire locks without a TTL and one to release them, each sent to Redis once
+        self.assertEquals(len(conn.loaded), 2)
+
 # ################################################################################################################################
 
 class FCNTLLockTestCase(_Base):
@@ -170,6 +314,50 @@ class FCNTLLockTestCase(_Base):
     def setUp(self):
         self.is_set_up = True
 
+    def test_release_error(self):
+
+        name = rand_string()
+        lock_manager = self.get_lock_manager(rand_string())
+
+        lock_info = lock_manager.acquire(name)
+
+        def _release_impl():
+            raise IOError('Release error')
+
+        lock_info.lock._release_impl = _release_impl
+        self.assertRaises(IOError, lock_info.release)
+
+        # The lock is not held locally anymore even though the backend could not release it ..
+        self.assertDictEqual(lock_manager.local_queue.items, {})
+
+        # .. and since closing the lock's file released it in the kernel too, it can be acquired again straightaway.
+        lock_info = lock_manager.acquire(name, block=1)
+        self.assertEquals(lock_info.acquired, True)
+        lock_info.release()
+
+    def test_flock_threads_full(self):
+
+        name = rand_string()
+        default_ns = rand_string()
+
+        lock_manager1 = self.get_lock_manager(default_ns)
+        lock_manager2 = self.get_lock_manager(default_ns)
+
+        lock_info1 = lock_manager1.acquire(name)
+
+        busy = flock_threads.busy
+        flock_threads.busy = flock_threads.size
+
+        try:
+            spawn_later(0.2, lock_info1.release)
+
+            # No threads to wait in flock are left so the lock is polled for instead
+            lock_info2 = lock_manager2.acquire(name, block=3, block_interval=0.1)
+            self.assertEquals(lock_info2.acquired, True)
+            lock_info2.release()
+        finally:
+            flock_threads.busy = busy
+
 # ################################################################################################################################
 
 class MySQLLockTestCase(_Base):
@@ -187,3 +375,66 @@ class PostgresSQLLockTestCase(_Base):
         self.is_set_up = False
 
 # ################################################################################################################################
+
+class RedisLockTestCase(_Base):
+    """ Runs against a local redis-server, if there is one.
+    """
+    backend_type = 'redis'
+
+    def setUp(self):
+        self.kvdb = KVDB(StrictRedis())
+
+        try:
+            self.kvdb.conn.ping()
+        except ConnectionError:
+            self.is_set_up = False
+        else:
+            self.is_set_up = True
+
+    def get_lock_manager(self, default_ns):
+        return LockManager(self.backend_type, default_ns, kvdb=self.kvdb)
+
+    def test_fencing_token(self):
+
+        if not self.is_set_up:
+            return
+
+        name = rand_string()
+        default_ns = rand_string()
+        lock_manager = self.get_lock_manager(default_ns)
+
+        lock1 = lock_manager.acquire(name, ttl=10)
+        lock1.release()
+
+        lock2 = lock_manager.acquire(name, ttl=10)
+        lock2.release()
+
+        # Each acquisition of a lock is given a greater fencing token than the previous one
+        self.assertGreater(lock2.fencing_token, lock1.fencing_token)
+
+    def test_release_not_owned(self):
+
+        if not self.is_set_up:
+            return
+
+        name = rand_string()
+        default_ns = rand_string()
+
+        lock_manager1 = self.get_lock_manager(default_ns)
+        lock_manager2 = self.get_lock_manager(default_ns)
+
+        # The first lock expires in Redis and is then taken over by another owner ..
+        lock1 = lock_manager1(name, ttl=1).acquire()
+        self.assertEquals(lock1.acquired, True)
+
+        lock2 = lock_manager2.acquire(name, ttl=10, block=5)
+        self.assertEquals(lock2.acquired, True)
+
+        # .. so when the first owner releases it, the second owner's lock is left intact.
+        lock1.lock._release_impl()
+        self.assertEquals(self.kvdb.conn.get(lock2.lock.lock_key), lock2.lock.owner_id)
+
+        lock2.release()
+        self.assertIsNone(self.kvdb.conn.get(lock2.lock.lock_key))
+
+# ################################################################################################################################
@@ -10,6 +10,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 # stdlib
 import logging, os, signal
+from contextlib import closing
 from datetime import datetime
 from logging import INFO
 from re import IGNORECASE
@@ -17,9 +18,6 @@ from tempfile import mkstemp
 from traceback import format_exc
 from uuid import uuid4
 
-# anyjson
-from anyjson import dumps
-
 # gevent
 import gevent
 import gevent.monkey # Needed for Cassandra
@@ -37,20 +35,22 @@ from springpython.context import DisposableObject
 from zato.broker import BrokerMessageReceiver
 from zato.broker.client import BrokerClient
 from zato.bunch import Bunch
-from zato.common import DATA_FORMAT, KVDB, SERVER_UP_STATUS, ZATO_ODB_POOL_NAME
+from zato.common import DATA_FORMAT, JSON_CODEC, KVDB, LOCK_BACKEND, SERVER_UP_STATUS, XML_PARSER, ZATO_ODB_POOL_NAME
 from zato.common.broker_message import HOT_DEPLOY, MESSAGE_TYPE, TOPICS
 from zato.common.ipc.api import IPCAPI
+from zato.common.json_ import dumps, set_codec as set_json_codec
 from zato.common.zato_keyutils import KeyUtils
 from zato.common.posix_ipc_util import ServerStartupIPC
 from zato.common.pubsub import SkipDelivery
 from zato.common.time_util import TimeUtil
 from zato.common.util import absolutize, get_config, get_kvdb_config_for_log, get_user_config_name, hot_deploy, \
      invoke_startup_services as _invoke_startup_services, new_cid, spawn_greenlet, StaticConfig, \
-     register_diag_handlers
+     register_diag_handlers, set_xml_max_size
 from zato.distlock import LockManager
 from zato.server.base.worker import WorkerStore
 from zato.server.config import ConfigStore
 from zato.server.connection.server import Servers
+from zato.server.live_browser import live_browser_patterns
 from zato.server.base.parallel.config import ConfigLoader
 from zato.server.base.parallel.http import HTTPHandler
 from zato.server.base.parallel.wmq import WMQIPC
@@ -108,6 +108,7 @@ class ParallelServer(DisposableObject, BrokerMessageReceiver, ConfigLoader, HTTP
         self.startup_jobs = None
         self.worker_store = None
         self.request_dispatcher_dispatch = None
+        self.http_gauges = None
         self.deployment_lock_expires = None
         self.deployment_lock_timeout = None
         self.deployment_key = ''
@@ -129,9 +130,11 @@ class ParallelServer(DisposableObject, BrokerMessageReceiver, ConfigLoader, HTTP
         self.sync_internal = None
         self.ipc_api = IPCAPI(False)
         self.ipc_forwarder = IPCAPI(True)
-        self.wmq_ipc_tcp_port = None
+        self.wmq_ipc_client = None
+        self.wmq_ipc_client_lock = gevent.lock.RLock()
         self.fifo_response_buffer_size = 0.1 # In megabytes
         self.live_msg_browser = None
+        self.msg_browser_index = None
         self.is_first_worker = None
         self.shmem_size = -1.0
         self.server_startup_ipc = ServerStartupIPC()
@@ -287,6 +290,12 @@ class ParallelServer(DisposableObject, BrokerMessageReceiver, ConfigLoader, HTTP
         """ Initializes parts of the server that don't depend on whether the
         server's been allowed to join the cluster or not.
         """
+        # JSON codec used by channels, SimpleIO, the broker client and the cache - needs to be set before anything is serialized
+        set_json_codec(self.fs_server_config.misc.get('json_codec') or JSON_CODEC.DEFAULT)
+
+        # Larger XML documents are rejected without being parsed
+        set_xml_max_size(int(self.fs_server_config.misc.get('xml_max_size', XML_PARSER.DEFAULT.MAX_SIZE)))
+
         # Patterns to match during deployment
         self.service_store.patterns_matcher.read_config(self.fs_server_config.deploy_patterns_allowed)
 
@@ -308,6 +317,9 @@ class ParallelServer(DisposableObject, BrokerMessageReceiver, ConfigLoader, HTTP
         for name, program in self.get_lua_programs():
             self.kvdb.lua_container.add_lua_program(name, program)
 
+        # Data dictionary translations are served from a local cache
+        self.kvdb.load_translations()
+
         # TimeUtil needs self.kvdb so it can be set now
         self.time_util = TimeUtil(self.kvdb)
 
@@ -383,14 +395,26 @@ class ParallelServer(DisposableObject, BrokerMessageReceiver, ConfigLoader, HTTP
         if not server:
             raise Exception('Server does not exist in the ODB')
 
-        # Set up the server-wide default lock manager
-        odb_data = self.config.odb_data
-        backend_type = 'fcntl' if odb_data.engine == 'sqlite' else odb_data.engine
-        self.zato_lock_manager = LockManager(backend_type, 'zato', self.odb.session)
+        # Set up the server-wide default lock manager - its backend is configured for the whole cluster
+        # because servers using different backends would not see each other's locks.
+        lock_backend = self.odb.cluster.lock_backend or LOCK_BACKEND.DEFAULT
+
+        if lock_backend not in (LOCK_BACKEND.ODB, LOCK_BACKEND.KVDB):
+            raise ValueError('Invalid lock_backend `{}` of cluster `{}`'.format(lock_backend, self.odb.cluster.name))
 
-        # Just to make sure distributed locking is configured correctly
-        with self.zato_lock_manager(uuid4().hex):
-            pass
+        if lock_backend == LOCK_BACKEND.KVDB:
+
+            # KVDB is not initialized yet so its locks will be first used for real when the deployment lock is taken
+            self.zato_lock_manager = LockManager('redis', 'zato', kvdb=self.kvdb)
+
+        else:
+            odb_data = self.config.odb_data
+            backend_type = 'fcntl' if odb_data.engine == 'sqlite' else odb_data.engine
+            self.zato_lock_manager = LockManager(backend_type, 'zato', self.odb.session)
+
+            # Just to make sure distributed locking is configured correctly
+            with self.zato_lock_manager(uuid4().hex):
+                pass
 
         # Basic metadata
         self.id = server.id
@@ -414,12 +438,18 @@ class ParallelServer(DisposableObject, BrokerMessageReceiver, ConfigLoader, HTTP
         self.worker_store.target_matcher.read_config(self.fs_server_config.invoke_target_patterns_allowed)
         self.set_up_config(server)
 
+        # Subscriptions of live message browsers are read once and then kept up to date through broker messages
+        if self.component_enabled.live_msg_browser:
+            with closing(self.odb.session()) as session:
+                self.msg_browser_index.load(live_browser_patterns(session, self.cluster_id))
+
         # Deploys services
         is_first, locally_deployed = self._after_init_common(server)
 
         # Initializes worker store, including connectors
         self.worker_store.init()
         self.request_dispatcher_dispatch = self.worker_store.request_dispatcher.dispatch
+        self.http_gauges = self.worker_store.request_dispatcher.gauges
 
         # Normalize hot-deploy configuration
         self.hot_deploy_config = Bunch()
@@ -469,7 +499,7 @@ class ParallelServer(DisposableObject, BrokerMessageReceiver, ConfigLoader, HTTP
 
                 # Will block for a few seconds at most, until is_ok is returned
                 # which indicates that a connector started or not.
-                is_ok = self.start_websphere_mq_connector(int(self.fs_server_config.websphere_mq.ipc_tcp_start_port))
+                is_ok = self.start_websphere_mq_connector(int(self.fs_server_config.websphere_mq.get('ipc_pool_size', 20)))
                 if is_ok:
                     self.create_initial_wmq_definitions(self.worker_store.worker_config.definition_wmq)
                     self.create_initial_wmq_outconns(self.worker_store.worker_config.out_wmq)
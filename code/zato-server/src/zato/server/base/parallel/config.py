@@ -18,6 +18,7 @@ from paste.util.converters import asbool
 from zato.bunch import Bunch
 from zato.common import MISC
 from zato.server.config import ConfigDict
+from zato.server.live_browser import PatternIndex
 from zato.server.message import JSONPointerStore, NamespaceStore, XPathStore
 from zato.url_dispatcher import Matcher
 
@@ -40,6 +41,9 @@ class ConfigLoader(object):
         self.live_msg_browser = self.fs_server_config.live_msg_browser
         self.live_msg_browser.include_internal = asbool(self.live_msg_browser.include_internal)
 
+        # Subscriptions of live message browsers, only each N-th message is matched against them if sample_every > 1
+        self.msg_browser_index = PatternIndex(self.live_msg_browser.get('sample_every') or 1)
+
         #
         # Cassandra - start
         #
@@ -12,6 +12,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 from datetime import datetime
 from httplib import INTERNAL_SERVER_ERROR, responses
 from logging import getLogger, INFO
+from time import time
 from traceback import format_exc
 
 # pytz
@@ -36,10 +37,18 @@ ACCESS_LOG_DT_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
 class HTTPHandler(object):
     """ Handles incoming HTTP requests.
     """
-    def on_wsgi_request(self, wsgi_environ, start_response, _new_cid=new_cid, _local_zone=get_localzone(),
-        _utcnow=datetime.utcnow, _INFO=INFO, _UTC=UTC, _ACCESS_LOG_DT_FORMAT=ACCESS_LOG_DT_FORMAT, **kwargs):
-        """ Handles incoming HTTP requests.
+    def on_wsgi_request(self, wsgi_environ, start_response, **kwargs):
+        """ Handles incoming HTTP requests, keeping track of how many are in flight.
         """
+        self.http_gauges.on_request(wsgi_environ, time())
+
+        try:
+            return self._on_wsgi_request(wsgi_environ, start_response, **kwargs)
+        finally:
+            self.http_gauges.on_response()
+
+    def _on_wsgi_request(self, wsgi_environ, start_response, _new_cid=new_cid, _local_zone=get_localzone(),
+        _utcnow=datetime.utcnow, _INFO=INFO, _UTC=UTC, _ACCESS_LOG_DT_FORMAT=ACCESS_LOG_DT_FORMAT, **kwargs):
         cid = kwargs.get('cid', _new_cid())
         request_ts_utc = _utcnow()
         wsgi_environ['zato.local_tz'] = _local_zone
@@ -9,23 +9,27 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 # stdlib
+import socket
 from binascii import unhexlify
 from datetime import datetime, timedelta
+from hashlib import sha1
+from itertools import count
 from json import dumps, loads
 from logging import getLogger
+from os import path
+from tempfile import gettempdir
 from traceback import format_exc
 
 # gevent
-from gevent import sleep
-
-# requests
-from requests import get, post
+from gevent import sleep, spawn, Timeout
+from gevent.event import AsyncResult
+from gevent.lock import RLock
 
 # Zato
-from zato.common import IPC, WebSphereMQCallData
+from zato.common import IPC, WEBSPHERE_MQ, WebSphereMQCallData
 from zato.common.broker_message import CHANNEL, DEFINITION, OUTGOING
 from zato.common.proc_util import start_python_process
-from zato.common.util import get_free_port
+from zato.server.connection.jms_wmq.ipc import FramedResponse, PATH, recv_frame, send_frame
 
 # ################################################################################################################################
 
@@ -33,7 +37,108 @@ logger = getLogger(__name__)
 
 # ################################################################################################################################
 
-address_pattern='http://127.0.0.1:{}/{}'
+def get_socket_path(deployment_key):
+    """ Returns path to a UNIX socket that a WebSphere MQ connector of a server with the given deployment key listens on.
+    All workers of a server share the same deployment key and will compute the same path.
+    """
+    return path.join(gettempdir(), 'zato-wmq-{}.sock'.format(sha1(deployment_key).hexdigest()[:16]))
+
+# ################################################################################################################################
+
+class ConnectorClient(object):
+    """ A persistent connection to a WebSphere MQ connector. Any number of greenlets may send requests concurrently
+    without waiting for each other's responses - each request is given an ID that the connector copies to its response
+    which lets a background reader greenlet hand the response over to the greenlet awaiting it.
+    """
+    def __init__(self, socket_path, username, password):
+        self.socket_path = socket_path
+        self.username = username
+        self.password = password
+        self.lock = RLock()
+        self.sock = None
+        self.pending = None
+        self.request_id = count(1)
+
+    def _connect(self, timeout):
+        """ Connects to the connector and authenticates. Must be called with self.lock held.
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+
+        try:
+            sock.connect(self.socket_path)
+            send_frame(sock, {'id': next(self.request_id), 'path': PATH.HELLO, 'data': {
+                'username': self.username, 'password': self.password}})
+            response = recv_frame(sock)
+        except Exception:
+            sock.close()
+            raise
+
+        if not response['status'].startswith('200'):
+            sock.close()
+            raise Exception('Could not connect to WebSphere MQ connector, `{}`'.format(response['data']))
+
+        # Responses may take arbitrarily long so it is up to each caller to time out
+        sock.settimeout(None)
+
+        self.sock = sock
+        self.pending = {}
+        spawn(self._read_responses, sock, self.pending)
+
+    def _read_responses(self, sock, pending):
+        try:
+            while True:
+                response = recv_frame(sock)
+                result = pending.pop(response['id'], None)
+
+                # Result will be None if its caller has already timed out
+                if result:
+                    result.set(FramedResponse(response['status'], response['data'], response['content_type']))
+
+        except Exception, e:
+            with self.lock:
+                if self.sock is sock:
+                    self.sock = None
+                sock.close()
+
+            # No responses will ever arrive for requests still waiting
+            for result in pending.values():
+                result.set_exception(e)
+            pending.clear()
+
+    def invoke(self, path, data, timeout=None):
+        """ Sends a request to the connector and waits for its response.
+        """
+        request_id = next(self.request_id)
+        result = AsyncResult()
+
+        with self.lock:
+            if not self.sock:
+                self._connect(timeout)
+
+            sock, pending = self.sock, self.pending
+            pending[request_id] = result
+
+            try:
+                send_frame(sock, {'id': request_id, 'path': path, 'data': data})
+            except Exception:
+                pending.pop(request_id, None)
+                sock.close()
+                self.sock = None
+                raise
+
+        try:
+            return result.get(timeout=timeout)
+        except Timeout:
+            raise Exception('No response from WebSphere MQ connector within {}s, path:`{}`'.format(timeout, path))
+        finally:
+            pending.pop(request_id, None)
+
+    def close(self):
+        with self.lock:
+            if self.sock:
+                self.sock.close()
+                self.sock = None
 
 # ################################################################################################################################
 
@@ -51,19 +156,33 @@ class WMQIPC(object):
 
 # ################################################################################################################################
 
-    def start_websphere_mq_connector(self, ipc_tcp_start_port, timeout=5):
-        """ Starts an HTTP server acting as a WebSphere MQ connector. Its port will be greater than ipc_tcp_start_port,
-        which is the starting point to find a free port from.
+    def get_wmq_client(self):
+        """ Returns a client connected to this server's WebSphere MQ connector, creating it first if necessary.
+        """
+        if not self.wmq_ipc_client:
+            with self.wmq_ipc_client_lock:
+                if not self.wmq_ipc_client:
+                    username, password = self.get_wmq_credentials()
+                    self.wmq_ipc_client = ConnectorClient(get_socket_path(self.deployment_key), username, password)
+
+        return self.wmq_ipc_client
+
+# ################################################################################################################################
+
+    def start_websphere_mq_connector(self, ipc_pool_size, timeout=5):
+        """ Starts a WebSphere MQ connector listening on a UNIX socket. It will handle up to ipc_pool_size requests
+        concurrently.
         """
-        self.wmq_ipc_tcp_port = get_free_port(ipc_tcp_start_port)
-        logger.info('Starting WebSphere MQ connector for server `%s` on `%s`', self.wmq_ipc_tcp_port, self.name)
+        socket_path = get_socket_path(self.deployment_key)
+        logger.info('Starting WebSphere MQ connector for server `%s` on `%s`', self.name, socket_path)
 
         # Credentials for both servers and connectors
         username, password = self.get_wmq_credentials()
 
         # User kernel's facilities to store configuration
         self.keyutils.user_set(b'zato-wmq', dumps({
-            'port': self.wmq_ipc_tcp_port,
+            'socket_path': socket_path,
+            'pool_size': ipc_pool_size,
             'username': username,
             'password': password,
             'server_port': self.port,
@@ -77,32 +196,28 @@ class WMQIPC(object):
         start_python_process(False, 'zato.server.connection.jms_wmq.jms.container', 'WebSphere MQ connector', '')
 
         # Wait up to timeout seconds for the connector to start as indicated by its responding to a PING request
-        now = datetime.utcnow()
-        until = timedelta(seconds=timeout)
+        until = datetime.utcnow() + timedelta(seconds=timeout)
         is_ok = False
-        address = address_pattern.format(self.wmq_ipc_tcp_port, 'ping')
-        auth = self.get_wmq_credentials()
 
-        while not is_ok or now >= until:
-            is_ok = self._ping_connector(address, auth)
+        while datetime.utcnow() < until:
+            is_ok = self._ping_connector()
             if is_ok:
                 break
             else:
                 sleep(0.2)
-                now = datetime.utcnow()
 
         if not is_ok:
-            logger.warn('WebSphere MQ connector (%s) could not be started after %s', address, timeout)
+            logger.warn('WebSphere MQ connector (%s) could not be started after %s', socket_path, timeout)
         else:
             return is_ok
 
 # ################################################################################################################################
 
-    def _ping_connector(self, address, auth):
+    def _ping_connector(self):
         try:
-            response = get(address, data='{}', auth=auth)
+            response = self.get_wmq_client().invoke(PATH.PING, {}, 1)
         except Exception:
-            logger.warn(format_exc())
+            logger.debug(format_exc())
         else:
             return response.ok
 
@@ -128,9 +243,8 @@ class WMQIPC(object):
 
 # ################################################################################################################################
 
-    def invoke_wmq_connector(self, msg, raise_on_error=True, address_pattern=address_pattern):
-        address = address_pattern.format(self.wmq_ipc_tcp_port, 'api')
-        response = post(address, data=dumps(msg), auth=self.get_wmq_credentials())
+    def invoke_wmq_connector(self, msg, raise_on_error=True, timeout=WEBSPHERE_MQ.DEFAULT.CONNECTOR_TIMEOUT):
+        response = self.get_wmq_client().invoke(PATH.API, msg, timeout)
 
         if not response.ok:
             if raise_on_error:
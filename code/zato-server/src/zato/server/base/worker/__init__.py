@@ -38,8 +38,9 @@ from gunicorn.workers.sync import SyncWorker as GunicornSyncWorker
 # Zato
 from zato.broker import BrokerMessageReceiver
 from zato.bunch import Bunch
-from zato.common import broker_message, CHANNEL, DATA_FORMAT, HTTP_SOAP_SERIALIZATION_TYPE, IPC, KVDB, MSG_PATTERN_TYPE, NOTIF, \
-     PUBSUB, SEC_DEF_TYPE, simple_types, TRACE1, ZATO_NONE, ZATO_ODB_POOL_NAME, ZMQ
+from zato.common import broker_message, CHANNEL, DATA_FORMAT, HTTP_ADMISSION, HTTP_SOAP_SERIALIZATION_TYPE, IPC, KVDB, \
+     MSG_PATTERN_TYPE, NOTIF, PUBSUB, SEARCH, SEC_DEF_TYPE, simple_types, TRACE1, VAULT_AUTH_CACHE, ZATO_NONE, \
+     ZATO_ODB_POOL_NAME, ZMQ
 from zato.common.broker_message import code_to_name, SERVICE
 from zato.common.dispatch import dispatcher
 from zato.common.match import Matcher
@@ -56,6 +57,7 @@ from zato.server.connection.cloud.aws.s3 import S3Wrapper
 from zato.server.connection.cloud.openstack.swift import SwiftWrapper
 from zato.server.connection.email import IMAPAPI, IMAPConnStore, SMTPAPI, SMTPConnStore
 from zato.server.connection.ftp import FTPStore
+from zato.server.connection.http_soap.admission import AdmissionControl
 from zato.server.connection.http_soap.channel import RequestDispatcher, RequestHandler
 from zato.server.connection.http_soap.outgoing import HTTPSOAPWrapper, SudsSOAPWrapper
 from zato.server.connection.http_soap.url_data import URLData
@@ -166,8 +168,14 @@ class WorkerStore(_WorkerStoreBase, BrokerMessageReceiver):
         self.stomp_channel_api = STOMPAPI(ChannelSTOMPConnStore())
 
         # Search
-        self.search_es_api = ElasticSearchAPI(ElasticSearchConnStore())
-        self.search_solr_api = SolrAPI(SolrConnStore())
+        misc = self.server.fs_server_config.misc
+        search_bulk_config = {
+            'max_docs': int(misc.get('search_bulk_max_docs', SEARCH.BULK.DEFAULT.MAX_DOCS)),
+            'max_bytes': int(misc.get('search_bulk_max_bytes', SEARCH.BULK.DEFAULT.MAX_BYTES)),
+            'flush_interval': float(misc.get('search_bulk_flush_interval', SEARCH.BULK.DEFAULT.FLUSH_INTERVAL)),
+        }
+        self.search_es_api = ElasticSearchAPI(ElasticSearchConnStore(search_bulk_config))
+        self.search_solr_api = SolrAPI(SolrConnStore(search_bulk_config))
 
         # SMS
         self.sms_twilio_api = TwilioAPI(TwilioConnStore())
@@ -190,7 +198,14 @@ class WorkerStore(_WorkerStoreBase, BrokerMessageReceiver):
         self.amqp_out_name_to_def = {} # Maps outgoing connection names to definition names, i.e. to connector names
 
         # Vault connections
-        self.vault_conn_api = VaultConnAPI()
+        self.vault_conn_api = VaultConnAPI(auth_cache_config={
+            'max_size': int(misc.get('vault_auth_cache_max_size', VAULT_AUTH_CACHE.DEFAULT.MAX_SIZE)),
+            'token_ttl': int(misc.get('vault_auth_cache_token_ttl', VAULT_AUTH_CACHE.DEFAULT.TOKEN_TTL)),
+            'max_ttl': int(misc.get('vault_auth_cache_max_ttl', VAULT_AUTH_CACHE.DEFAULT.MAX_TTL)),
+            'negative_ttl': int(misc.get('vault_auth_cache_negative_ttl', VAULT_AUTH_CACHE.DEFAULT.NEGATIVE_TTL)),
+            'negative_max_size': int(misc.get('vault_auth_cache_negative_max_size',
+                VAULT_AUTH_CACHE.DEFAULT.NEGATIVE_MAX_SIZE)),
+        })
 
         # Caches
         self.cache_api = CacheAPI(self.server)
@@ -246,8 +261,15 @@ class WorkerStore(_WorkerStoreBase, BrokerMessageReceiver):
         # Request dispatcher - matches URLs, checks security and dispatches HTTP
         # requests to services.
 
+        admission = AdmissionControl(
+            int(misc.get('http_max_concurrency', HTTP_ADMISSION.DEFAULT.MAX_CONCURRENCY)),
+            int(misc.get('http_max_queue_size', HTTP_ADMISSION.DEFAULT.MAX_QUEUE_SIZE)),
+            float(misc.get('http_queue_timeout', HTTP_ADMISSION.DEFAULT.QUEUE_TIMEOUT)),
+            int(misc.get('http_retry_after', HTTP_ADMISSION.DEFAULT.RETRY_AFTER)))
+
         self.request_dispatcher = RequestDispatcher(simple_io_config=self.worker_config.simple_io,
-            return_tracebacks=self.server.return_tracebacks, default_error_message=self.server.default_error_message)
+            return_tracebacks=self.server.return_tracebacks, default_error_message=self.server.default_error_message,
+            admission=admission)
         self.request_dispatcher.url_data = URLData(
             self, self.worker_config.http_soap,
             self.server.odb.get_url_security(self.server.cluster_id, 'channel')[0],
@@ -373,6 +395,11 @@ class WorkerStore(_WorkerStoreBase, BrokerMessageReceiver):
             'pool_size':config.pool_size, 'serialization_type':config.serialization_type,
             'timeout':config.timeout, 'content_type':config.content_type,
             }
+
+        for name in ('has_circuit_breaker', 'cb_error_rate', 'cb_slow_call_rate', 'cb_slow_call_time', 'cb_window_size',
+                'cb_open_time'):
+            wrapper_config[name] = config.get(name)
+
         wrapper_config.update(sec_config)
 
         if config.sec_tls_ca_cert_id and config.sec_tls_ca_cert_id != ZATO_NONE:
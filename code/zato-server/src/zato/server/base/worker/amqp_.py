@@ -113,6 +113,7 @@ class AMQP(WorkerImpl):
         """ Invokes a remote AMQP broker sending it a message with the specified routing key to an exchange through
         a named outgoing connection. Optionally, lower-level details can be provided in properties and they will be
         provided directly to the underlying AMQP library (kombu). Headers are AMQP headers attached to each message.
+        If msg is a list, each of its elements is published as a separate message, all of them in one go.
         """
         with self.update_lock:
             def_name = self.amqp_out_name_to_def[out_name]
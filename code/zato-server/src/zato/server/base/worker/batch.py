@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from logging import getLogger
+
+# Zato
+from zato.bunch import Bunch
+from zato.server.base.worker.common import WorkerImpl
+
+# ################################################################################################################################
+
+logger = getLogger(__name__)
+
+# ################################################################################################################################
+
+class Batch(WorkerImpl):
+    """ Callbacks for messages sent in batches.
+    """
+
+# ################################################################################################################################
+
+    def on_broker_msg_BATCH_MESSAGES(self, msg):
+        """ Handles, in order, each message of a batch, e.g. one for all objects of a given type imported in bulk.
+        """
+        logger.info('Handling %d message(s) of batch `%s`', len(msg.messages), msg.get('item_type'))
+
+        for item in msg.messages:
+            self.on_broker_msg(Bunch(item))
+
+# ################################################################################################################################
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from logging import getLogger
+
+# Zato
+from zato.server.base.worker.common import WorkerImpl
+
+# ################################################################################################################################
+
+logger = getLogger(__name__)
+
+# ################################################################################################################################
+
+class DataDict(WorkerImpl):
+    """ Callbacks for messages related to data dictionaries.
+    """
+
+# ################################################################################################################################
+
+    def on_broker_msg_DATA_DICT_CHANGED(self, msg):
+        """ Dictionary entries or translations changed - the local cache of translations needs to be reloaded.
+        """
+        self.kvdb.invalidate_translations()
+
+# ################################################################################################################################
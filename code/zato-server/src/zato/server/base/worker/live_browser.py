@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from logging import getLogger
+
+# Zato
+from zato.server.base.worker.common import WorkerImpl
+
+# ################################################################################################################################
+
+logger = getLogger(__name__)
+
+# ################################################################################################################################
+
+class LiveBrowser(WorkerImpl):
+    """ Callbacks for messages related to live message browsers.
+    """
+
+# ################################################################################################################################
+
+    def on_broker_msg_MSG_BROWSER_SUBSCRIBE(self, msg):
+        self.server.msg_browser_index.subscribe(msg.client, msg.patterns)
+
+# ################################################################################################################################
+
+    def on_broker_msg_MSG_BROWSER_UNSUBSCRIBE(self, msg):
+        for pub_client_id in msg.pub_client_id_list:
+            self.server.msg_browser_index.unsubscribe(pub_client_id)
+
+# ################################################################################################################################
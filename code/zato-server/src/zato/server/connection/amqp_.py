@@ -9,10 +9,11 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 # stdlib
+from collections import deque
 from datetime import datetime, timedelta
 from exceptions import IOError, OSError
 from logging import getLogger
-from socket import error as socket_error
+from socket import error as socket_error, timeout as socket_timeout
 from traceback import format_exc
 
 # amqp
@@ -20,6 +21,8 @@ from amqp.exceptions import ConnectionError as AMQPConnectionError
 
 # gevent
 from gevent import sleep, spawn
+from gevent.lock import RLock
+from gevent.pool import Pool
 
 # Kombu
 from kombu import Connection, Consumer as _Consumer, pools, Queue
@@ -90,8 +93,87 @@ class _AMQPProducers(object):
 
 # ################################################################################################################################
 
+class PublishNotConfirmed(Exception):
+    """ Raised if a broker rejected messages published in confirm mode or did not confirm them in time.
+    """
+    def __init__(self, msg, unconfirmed, rejected):
+        super(PublishNotConfirmed, self).__init__(msg)
+        self.unconfirmed = unconfirmed
+        self.rejected = rejected
+
+# ################################################################################################################################
+
+class _PublisherConfirms(object):
+    """ Tracks broker confirmations of messages published through a channel in confirm mode. Delivery tags are assigned
+    by the broker sequentially for each channel so the last one used is kept in the channel itself.
+    """
+    def __init__(self, channel):
+        self.channel = channel
+        self.pending = set()
+        self.nacked = []
+
+        if not getattr(channel, 'zato_confirm_mode', False):
+            channel.confirm_select()
+            channel.zato_confirm_mode = True
+            channel.zato_delivery_tag = 0
+
+        channel.events['basic_ack'].add(self.on_ack)
+        channel.events['basic_nack'].add(self.on_nack)
+
+    def add(self):
+        """ Must be called after each message published.
+        """
+        self.channel.zato_delivery_tag += 1
+        self.pending.add(self.channel.zato_delivery_tag)
+
+    def _confirm(self, delivery_tag, multiple):
+        if multiple:
+            confirmed = [tag for tag in self.pending if tag <= delivery_tag]
+        else:
+            confirmed = [delivery_tag] if delivery_tag in self.pending else []
+
+        self.pending.difference_update(confirmed)
+        return confirmed
+
+    def on_ack(self, delivery_tag, multiple):
+        self._confirm(delivery_tag, multiple)
+
+    def on_nack(self, delivery_tag, multiple):
+        self.nacked.extend(self._confirm(delivery_tag, multiple))
+
+    def wait(self, connection, timeout, _utcnow=datetime.utcnow):
+        """ Waits up to timeout seconds until all the messages published are confirmed. Raises PublishNotConfirmed if they are
+        not or if the broker rejected any of them.
+        """
+        total = len(self.pending)
+        until = _utcnow() + timedelta(seconds=timeout)
+
+        while self.pending:
+            remaining = (until - _utcnow()).total_seconds()
+            if remaining <= 0:
+                raise PublishNotConfirmed('{} of {} message(s) not confirmed by the broker within {}s'.format(
+                    len(self.pending), total, timeout), len(self.pending), len(self.nacked))
+
+            try:
+                connection.drain_events(timeout=remaining)
+            except socket_timeout:
+                pass
+
+        if self.nacked:
+            raise PublishNotConfirmed('{} of {} message(s) rejected by the broker'.format(len(self.nacked), total),
+                0, len(self.nacked))
+
+    def close(self):
+        self.channel.events['basic_ack'].discard(self.on_ack)
+        self.channel.events['basic_nack'].discard(self.on_nack)
+
+# ################################################################################################################################
+
 class Consumer(object):
     """ Consumes messages from AMQP queues. There is one Consumer object for each Zato AMQP channel.
+    If the channel's max_concurrency is greater than 1, messages are handled by a pool of greenlets, each acknowledging
+    its own message, and the broker is told through basic.qos to deliver no more than prefetch_count unacknowledged
+    messages at a time. With preserve_order set, messages of the same routing key are handled one after another.
     """
     def __init__(self, config, on_amqp_message):
         # type: (dict, Callable)
@@ -104,11 +186,85 @@ class Consumer(object):
         self.is_connected = False # Instance-level flag indicating whether we have an active connection now.
         self.timeout = 0.35
 
-    def _on_amqp_message(self, body, msg):
+        self.max_concurrency = int(self.config.get('max_concurrency') or AMQP.DEFAULT.MAX_CONCURRENCY)
+        self.prefetch_count = int(self.config.get('prefetch_count') or 0)
+        self.preserve_order = self.config.get('preserve_order') or False
+
+        # By default, allow each handler to have one message waiting for it
+        if self.max_concurrency > 1 and not self.prefetch_count:
+            self.prefetch_count = self.max_concurrency * 2
+
+        # Handlers send acks from their own greenlets so writes to the underlying connection must be serialized
+        self.ack_lock = RLock()
+
+        # Routing key -> messages waiting for the greenlet currently handling that routing key
+        self.ordered_backlog = {}
+
+        self.handlers = Pool(self.max_concurrency) if self.max_concurrency > 1 else None
+
+    def _handle_message(self, body, msg, _RECEIVED='RECEIVED', _ZATO_ACK_MODE_ACK=AMQP.ACK_MODE.ACK.id):
+        """ Invokes the channel's callback and acknowledges or rejects the message unless the callback did it itself.
+        """
         try:
-            return self.on_amqp_message(body, msg, self.name, self.config)
+            self.on_amqp_message(body, msg, self.name, self.config)
         except Exception, e:
             logger.warn(format_exc(e))
+            is_ok = False
+        else:
+            is_ok = True
+
+        with self.ack_lock:
+            if msg._state == _RECEIVED:
+                if not is_ok:
+
+                    # With concurrent handlers, a message left unacknowledged would take up one of the broker's prefetch_count
+                    # slots for good. It is requeued once, in case the error was a temporary one, and then rejected for good -
+                    # the broker will dead-letter it if the queue has a dead-letter exchange. Messages handled inline
+                    # are left unacknowledged, as previously.
+                    if self.handlers is not None:
+                        msg.reject(requeue=not msg.delivery_info.get('redelivered'))
+
+                elif self.config['ack_mode'] == _ZATO_ACK_MODE_ACK:
+                    msg.ack()
+                else:
+                    msg.reject()
+
+    def _handle_ordered(self, body, msg, routing_key):
+        """ Handles the message given on input and then all the messages of the same routing key that arrived in the meantime.
+        """
+        backlog = self.ordered_backlog[routing_key]
+
+        try:
+            self._handle_message(body, msg)
+            while backlog:
+                self._handle_message(*backlog.popleft())
+        finally:
+            del self.ordered_backlog[routing_key]
+
+    def _on_amqp_message(self, body, msg):
+
+        # Message handled inline, the next one will be taken off the queue only after this one has been processed.
+        # Note that the pool is compared with None because an empty one is considered False.
+        if self.handlers is None:
+            return self._handle_message(body, msg)
+
+        if self.preserve_order:
+            routing_key = msg.delivery_info.get('routing_key')
+            backlog = self.ordered_backlog.get(routing_key)
+
+            # Another greenlet is already handling this routing key so it will take this message too once it is done
+            if backlog is not None:
+                backlog.append((body, msg))
+                return
+
+            self.ordered_backlog[routing_key] = deque()
+
+            # Blocks until there is room in the pool - since the broker sends no more than prefetch_count messages,
+            # this is what limits the number of messages in flight.
+            self.handlers.spawn(self._handle_ordered, body, msg, routing_key)
+
+        else:
+            self.handlers.spawn(self._handle_message, body, msg)
 
 # ################################################################################################################################
 
@@ -131,6 +287,10 @@ class Consumer(object):
                 consumer = _Consumer(conn, queues=self.queue, callbacks=[self._on_amqp_message],
                     no_ack=_no_ack[self.config.ack_mode], tag_prefix='{}/{}'.format(
                         self.config.consumer_tag_prefix, get_component_name('amqp-consumer')))
+
+                if self.prefetch_count:
+                    consumer.qos(prefetch_count=self.prefetch_count)
+
                 consumer.consume()
             except Exception, e:
                 err_conn_attempts += 1
@@ -217,6 +377,11 @@ class Consumer(object):
                                 consumer = self._get_consumer()
                                 self.is_connected = True
 
+            # Give handlers still running a moment to complete, any message they do not acknowledge in that time
+            # will be redelivered by the broker once the connection is closed.
+            if self.handlers is not None:
+                self.handlers.join(timeout)
+
             if connection:
                 logger.info('Closing connection for `%s`', consumer)
                 connection.close()
@@ -317,9 +482,8 @@ class ConnectorAMQP(Connector):
 
 # ################################################################################################################################
 
-    def on_amqp_message(self, body, msg, channel_name, channel_config, _AMQPMessage=_AMQPMessage, _CHANNEL_AMQP=CHANNEL.AMQP,
-        _RECEIVED='RECEIVED', _ZATO_ACK_MODE_ACK=AMQP.ACK_MODE.ACK.id):
-        """ Invoked each time a message is taken off an AMQP queue.
+    def on_amqp_message(self, body, msg, channel_name, channel_config, _AMQPMessage=_AMQPMessage, _CHANNEL_AMQP=CHANNEL.AMQP):
+        """ Invoked each time a message is taken off an AMQP queue. The message is acknowledged or rejected by its consumer.
         """
         self.on_message_callback(
             channel_config['service_name'], body, channel=_CHANNEL_AMQP,
@@ -331,12 +495,6 @@ class ConnectorAMQP(Connector):
                 'amqp_msg': msg,
             }})
 
-        if msg._state == _RECEIVED:
-            if channel_config['ack_mode'] == _ZATO_ACK_MODE_ACK:
-                msg.ack()
-            else:
-                msg.reject()
-
 # ################################################################################################################################
 
     def _get_conn_string(self, needs_password=True):
@@ -547,8 +705,10 @@ class ConnectorAMQP(Connector):
 
     def invoke(self, out_name, msg, exchange='/', routing_key=None, properties=None, headers=None,
             _default_out_keys=_default_out_keys, **kwargs):
-        # type: (str, str, str, str, dict, dict, Any, Any)
-        """ Synchronously publishes a message to an AMQP broker.
+        # type: (str, object, str, str, dict, dict, Any, Any)
+        """ Synchronously publishes a message, or a list of messages, to an AMQP broker. A list of messages is published
+        through a single producer and, if the outgoing connection uses publisher confirms, the call returns only after
+        the broker confirms all of them.
         """
         with self.lock:
             outconn_config = self.outconns[out_name]
@@ -559,6 +719,7 @@ class ConnectorAMQP(Connector):
 
         acquire_block = kwargs.pop('acquire_block', True)
         acquire_timeout = kwargs.pop('acquire_block', None)
+        confirm_timeout = kwargs.pop('confirm_timeout', AMQP.DEFAULT.CONFIRM_TIMEOUT)
 
         # Dictionary of kwargs is built based on user input falling back to the defaults
         # as specified in the outgoing connection's configuration.
@@ -577,6 +738,33 @@ class ConnectorAMQP(Connector):
             kwargs.update(properties)
 
         with self._producers[out_name].acquire(acquire_block, acquire_timeout) as producer:
-            return producer.publish(msg, headers=headers, **kwargs)
+
+            if isinstance(msg, list):
+                return self._publish(producer, msg, outconn_config, confirm_timeout, headers, kwargs)
+            else:
+                return self._publish(producer, [msg], outconn_config, confirm_timeout, headers, kwargs)[0]
+
+# ################################################################################################################################
+
+    def _publish(self, producer, msgs, outconn_config, confirm_timeout, headers, kwargs):
+        """ Publishes all messages through the producer given on input, waiting for the broker's confirmations if needed.
+        """
+        if not outconn_config.get('confirm_publish'):
+            return [producer.publish(msg, headers=headers, **kwargs) for msg in msgs]
+
+        out = []
+        confirms = _PublisherConfirms(producer.channel)
+
+        try:
+            for msg in msgs:
+                out.append(producer.publish(msg, headers=headers, **kwargs))
+                confirms.add()
+
+            confirms.wait(producer.connection, confirm_timeout)
+
+        finally:
+            confirms.close()
+
+        return out
 
 # ################################################################################################################################
@@ -9,15 +9,18 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 # stdlib
+from collections import OrderedDict
 from logging import getLogger
 
 # Cassandra
 from cassandra.auth import PlainTextAuthProvider
 from cassandra.cluster import Cluster
+from cassandra.concurrent import execute_concurrent_with_args
 from cassandra.io.geventreactor import GeventConnection
 from cassandra.query import dict_factory
 
 # Zato
+from zato.common import CASSANDRA
 from zato.common.broker_message import DEFINITION
 from zato.server.connection import BaseConnPoolStore, BasePoolAPI
 
@@ -35,6 +38,69 @@ msg_to_stdlib = {
 
 # ################################################################################################################################
 
+class CassandraSession(object):
+    """ Wraps a driver session, all of whose methods and attributes remain available, adding a registry of named queries.
+    Each CQL statement is prepared once per session and then executed with bound parameters, which spares the coordinator
+    from parsing the same queries over and over again.
+    """
+    def __init__(self, session, max_prepared=CASSANDRA.DEFAULT.MAX_PREPARED.value):
+        self.session = session
+        self.max_prepared = max_prepared
+
+        # Query name -> CQL
+        self.queries = {}
+
+        # CQL -> prepared statement, least recently used ones are dropped first
+        self.prepared = OrderedDict()
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def prepare(self, query, *args, **kwargs):
+        """ Returns a prepared statement for CQL given on input, preparing it only if it has not been prepared already.
+        """
+        statement = self.prepared.pop(query, None)
+        if statement is None:
+            statement = self.session.prepare(query, *args, **kwargs)
+
+            if len(self.prepared) >= self.max_prepared:
+                self.prepared.popitem(last=False)
+
+        self.prepared[query] = statement
+        return statement
+
+    def add_query(self, name, query):
+        """ Registers CQL under a given name, overwriting any query previously registered under that name.
+        """
+        self.queries[name] = query
+
+    def remove_query(self, name):
+        self.queries.pop(name, None)
+
+    def get_statement(self, name):
+        """ Returns a prepared statement for a query registered under a given name.
+        """
+        query = self.queries.get(name)
+        if query is None:
+            raise KeyError('No such Cassandra query `{}` in `{}`'.format(name, sorted(self.queries)))
+
+        return self.prepare(query)
+
+    def execute_query(self, name, params=None, **kwargs):
+        """ Executes a named query with parameters bound to its prepared statement.
+        """
+        return self.session.execute(self.get_statement(name), params, **kwargs)
+
+    def execute_many(self, name, params_list, concurrency=CASSANDRA.DEFAULT.EXEC_MANY_CONCURRENCY.value,
+            raise_on_first_error=True):
+        """ Executes a named query once for each set of parameters from params_list with at most concurrency executions
+        in flight at a time. Returns a list of (success, result_or_exception) tuples, in the same order as parameters.
+        """
+        return execute_concurrent_with_args(self.session, self.get_statement(name), params_list, concurrency=concurrency,
+            raise_on_first_error=raise_on_first_error)
+
+# ################################################################################################################################
+
 class CassandraAPI(BasePoolAPI):
     """ API through which connections to Cassandra can be obtained.
     """
@@ -69,7 +135,7 @@ class CassandraConnStore(BaseConnPoolStore):
         session.row_factory = dict_factory
         session.set_keyspace(config.default_keyspace)
 
-        return session
+        return CassandraSession(session)
 
 # ################################################################################################################################
 
@@ -12,6 +12,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 from contextlib import contextmanager
 from cStringIO import StringIO
 from logging import getLogger, INFO
+from smtplib import SMTPDataError, SMTPRecipientsRefused, SMTPSenderRefused
 from traceback import format_exc
 
 # imbox
@@ -24,6 +25,7 @@ from outbox import AnonymousOutbox, Attachment, Email, Outbox
 
 # Zato
 from zato.common import IMAPMessage, EMAIL
+from zato.server.connection.queue import SessionPool
 from zato.server.store import BaseAPI, BaseStore
 
 logger = getLogger(__name__)
@@ -34,6 +36,9 @@ _modes = {
     EMAIL.SMTP.MODE.STARTTLS.value: 'TLS'
 }
 
+# Errors after which the server is still willing to accept further messages through the same session
+_message_errors = (SMTPDataError, SMTPRecipientsRefused, SMTPSenderRefused)
+
 # ################################################################################################################################
 
 class Imbox(_Imbox):
@@ -95,6 +100,24 @@ class _Connection(object):
 
 # ################################################################################################################################
 
+class _PooledOutboxMixin(object):
+    """ Keeps a reference to the SMTP session an Outbox authenticates, so that it can be checked before it is reused.
+    """
+    def authenticate(self, smtp):
+        super(_PooledOutboxMixin, self).authenticate(smtp)
+        self.smtp = smtp
+
+    def is_alive(self):
+        return self.smtp.noop()[0] == 250
+
+class _PooledOutbox(_PooledOutboxMixin, Outbox):
+    pass
+
+class _PooledAnonymousOutbox(_PooledOutboxMixin, AnonymousOutbox):
+    pass
+
+# ################################################################################################################################
+
 class SMTPConnection(_Connection):
     def __init__(self, config, config_no_sensitive):
         self.config = config
@@ -108,16 +131,33 @@ class SMTPConnection(_Connection):
             password = self.config.password.encode('utf-8') or None
             username = self.config.username.encode('utf-8') or None
 
-            self.conn_class = Outbox
+            self.conn_class = _PooledOutbox
 
             self.conn_args.insert(0, password)
             self.conn_args.insert(0, username)
 
         else:
-            self.conn_class = AnonymousOutbox
+            self.conn_class = _PooledAnonymousOutbox
 
-    def send(self, msg, from_=None):
+        # Authenticated sessions are reused across messages instead of connecting to the server for each message
+        self.pool = SessionPool(self.config.get('pool_size') or EMAIL.DEFAULT.SMTP_POOL_SIZE, self.config.name,
+            self._create_session, self._close_session, self._is_session_valid, EMAIL.DEFAULT.SMTP_MAX_IDLE_TIME,
+            self.config.timeout)
+
+    def _create_session(self):
+        conn = self.conn_class(*self.conn_args)
+        conn.connect()
+        return conn
 
+    def _close_session(self, conn):
+        conn.disconnect()
+
+    def _is_session_valid(self, conn):
+        return conn.is_alive()
+
+    def _get_email(self, msg):
+        """ Returns an Outbox email object along with its attachments built out of a message given on input.
+        """
         headers = msg.headers or {}
         atts = [Attachment(att['name'], StringIO(att['contents'])) for att in msg.attachments] if msg.attachments else []
 
@@ -133,16 +173,54 @@ class SMTPConnection(_Connection):
         body, html_body = (None, msg.body) if msg.is_html else (msg.body, None)
         email = Email(msg.to, msg.subject, body, html_body, msg.charset, headers, msg.is_rfc2231)
 
+        return email, atts
+
+    def _send(self, conn, msg, from_):
+        """ Sends a message through an already established session. Returns True if the message was sent or False
+        if it was rejected. Any other error is raised since the session may not be usable anymore.
+        """
         try:
-            with self.conn_class(*self.conn_args) as conn:
-                conn.send(email, atts, from_ or msg.from_)
+            email, atts = self._get_email(msg)
         except Exception, e:
-            logger.warn('Could not send an SMTP message to `%s`, e:`%s`', self.config_no_sensitive, format_exc(e))
+            logger.warn('Could not build an SMTP message to `%s`, e:`%s`', self.config_no_sensitive, format_exc(e))
+            return False
+
+        try:
+            conn.send(email, atts, from_ or msg.from_)
+        except _message_errors, e:
+            logger.warn('SMTP message rejected by `%s`, e:`%s`', self.config_no_sensitive, format_exc(e))
+            return False
         else:
             if logger.isEnabledFor(INFO):
                 atts_info = ', '.join(att.name for att in atts) if atts else None
                 logger.info('SMTP message `%r` sent from `%r` to `%r`, attachments:`%r`',
                     msg.subject, msg.from_, msg.to, atts_info)
+            return True
+
+    def send(self, msg, from_=None):
+        """ Sends a message through one of the pooled sessions. Returns True if the message was sent.
+        """
+        return self.send_many([msg], from_)[0]
+
+    def send_many(self, msgs, from_=None):
+        """ Sends all messages through a single pooled session. Returns a list of booleans, one for each message,
+        indicating whether that message was sent. If the session breaks, it is discarded and none of the messages
+        not sent by then are.
+        """
+        results = []
+
+        try:
+            with self.pool.session() as conn:
+                for msg in msgs:
+                    results.append(self._send(conn, msg, from_))
+        except Exception, e:
+            logger.warn('Could not send SMTP message(s) to `%s`, e:`%s`', self.config_no_sensitive, format_exc(e))
+            results.extend([False] * (len(msgs) - len(results)))
+
+        return results
+
+    def close(self):
+        self.pool.close()
 
 # ################################################################################################################################
 
@@ -159,6 +237,13 @@ class SMTPConnStore(BaseStore):
         config.mode_outbox = _modes[config.mode]
         return SMTPConnection(config, config_no_sensitive)
 
+    def _delete(self, name):
+        item = self.items.get(name)
+        if item and item.impl:
+            item.impl.close()
+
+        super(SMTPConnStore, self)._delete(name)
+
 # ################################################################################################################################
 
 class IMAPConnection(_Connection):
@@ -10,6 +10,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 # stdlib
 import logging
+from contextlib import contextmanager
 from copy import deepcopy
 from threading import RLock
 from traceback import format_exc
@@ -18,7 +19,8 @@ from traceback import format_exc
 from fs.ftpfs import FTPFS, _GLOBAL_DEFAULT_TIMEOUT
 
 # Zato
-from zato.common import Inactive, SECRET_SHADOW, TRACE1
+from zato.common import FTP, Inactive, SECRET_SHADOW, TRACE1
+from zato.server.connection.queue import SessionPool
 
 logger = logging.getLogger(__name__)
 
@@ -33,8 +35,59 @@ class FTPStore(object):
     """
     def __init__(self):
         self.conn_params = {}
+        self.pools = {}
         self._lock = RLock()
 
+    def _get_pool(self, params):
+        """ Returns a pool of sessions for the given connection, creating it if necessary. Must not be called
+        without holding onto self._lock.
+        """
+        pool = self.pools.get(params.name)
+
+        if not pool:
+
+            # Callers waiting for a free session give up after the same time they would wait for the server to respond
+            checkout_timeout = float(params.timeout) if params.timeout else FTP.DEFAULT.CHECKOUT_TIMEOUT
+
+            def create_session():
+                return self._create_session(params)
+
+            def is_session_valid(session):
+                session.ftp.voidcmd(b'NOOP')
+                return True
+
+            def close_session(session):
+                session.close()
+
+            pool = self.pools[params.name] = SessionPool(params.get('pool_size') or FTP.DEFAULT.POOL_SIZE, params.name,
+                create_session, close_session, is_session_valid, FTP.DEFAULT.MAX_IDLE_TIME, checkout_timeout)
+
+        return pool
+
+    def _create_session(self, params):
+        timeout = float(params.timeout) if params.timeout else _GLOBAL_DEFAULT_TIMEOUT
+        return FTPFacade(params.host, params.user, params.get('password'), params.acct, timeout, int(params.port),
+            params.dircache)
+
+    def _get_params(self, name):
+        """ Returns params of an active connection. Must not be called without holding onto self._lock.
+        """
+        params = self.conn_params[name]
+        if not params.is_active:
+            raise Inactive(params.name)
+
+        return params
+
+    def _close_pool(self, pool):
+        """ Closes all idle sessions of a pool that was removed from self.pools. Called without holding onto self._lock
+        because closing sessions requires network round-trips.
+        """
+        if pool:
+            try:
+                pool.close()
+            except Exception, e:
+                logger.warn('Could not close the FTP connection [{0}], e [{1}]'.format(pool.conn_name, format_exc(e)))
+
     def _add(self, params):
         """ Adds one set of params to the list of connection parameters. Must not
         be called without holding onto self._lock
@@ -64,27 +117,41 @@ class FTPStore(object):
             return [elem.encode('utf-8') for elem in sorted(self.conn_params)]
 
     def get(self, name):
+        """ Returns a new logged-in session, not taken from any pool, which the caller needs to close.
+        Use self.session to reuse sessions instead.
+        """
         with self._lock:
-            params = self.conn_params[name]
-            if params.is_active:
-                timeout = float(params.timeout) if params.timeout else _GLOBAL_DEFAULT_TIMEOUT
-                return FTPFacade(params.host, params.user, params.get('password'), params.acct, timeout, int(params.port), params.dircache)
-            else:
-                raise Inactive(params.name)
+            params = self._get_params(name)
+
+        return self._create_session(params)
+
+    @contextmanager
+    def session(self, name):
+        """ Returns a logged-in session checked out of the connection's pool for the duration of a 'with' block,
+        e.g. with self.outgoing.ftp.session('my.conn') as conn. The session is given back to the pool when the block ends,
+        or closed if the block raised an exception. Logging in and validating sessions takes place outside
+        of self._lock so that unrelated connections can be obtained concurrently.
+        """
+        with self._lock:
+            pool = self._get_pool(self._get_params(name))
+
+        session = pool.checkout()
+        is_reusable = False
+
+        try:
+            yield session
+            is_reusable = True
+        finally:
+            pool.checkin(session, is_reusable)
 
     def create_edit(self, params, old_name):
+        pool = None
+
         with self._lock:
             if params:
                 _name = old_name if old_name else params.name
-                ftp = params.get(_name)
-                try:
-                    if ftp:
-                        ftp.close()
-                except Exception, e:
-                    msg = 'Could not close the FTP connection [{0}], e [{1}]'.format(params.name, format_exc(e))
-                    logger.warn(msg)
-                finally:
-                    self._add(params)
+                pool = self.pools.pop(_name, None)
+                self._add(params)
 
             if old_name and old_name != params.name:
                 del self.conn_params[old_name]
@@ -92,12 +159,20 @@ class FTPStore(object):
             msg = 'FTP connection stored, name:[{}], old_name:[{}]'.format(params.name, old_name)
             logger.info(msg)
 
+        self._close_pool(pool)
+
     def change_password(self, name, password):
         with self._lock:
             self.conn_params[name].password = password
+            pool = self.pools.pop(name, None)
             logger.info('Password updated - FTP connection [{}]'.format(name))
 
+        self._close_pool(pool)
+
     def delete(self, name):
         with self._lock:
             del self.conn_params[name]
+            pool = self.pools.pop(name, None)
             logger.info('FTP connection [{}] deleted'.format(name))
+
+        self._close_pool(pool)
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from collections import deque
+
+# gevent
+from gevent.event import Event
+
+# Zato
+from zato.common import HTTP_ADMISSION
+from zato.common.exception import ServiceUnavailable
+
+# ################################################################################################################################
+
+class Limiter(object):
+    """ Lets at most max_concurrency requests in at a time. Up to max_queue_size requests over the limit may wait,
+    for no longer than queue_timeout seconds, for one of the requests in flight to finish - the slot of a finishing request
+    is handed over directly to the longest waiting one. Anything else is turned away at once.
+    """
+    def __init__(self, max_concurrency, max_queue_size, queue_timeout):
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self.waiting = deque()
+
+    def acquire(self):
+        """ Returns True if a request may be handled, possibly after waiting in the queue, or False if it should be rejected.
+        """
+        if self.in_flight < self.max_concurrency:
+            self.in_flight += 1
+            return True
+
+        if len(self.waiting) < self.max_queue_size:
+            event = Event()
+            self.waiting.append(event)
+            is_admitted = False
+
+            try:
+                is_admitted = event.wait(self.queue_timeout)
+            finally:
+
+                # Timed out or killed while waiting, e.g. with GreenletExit or Timeout. If a slot was handed over to us
+                # in the meantime, it is passed on to the next waiter, otherwise we just leave the queue.
+                if not is_admitted:
+                    if event.is_set():
+                        self.release()
+                    else:
+                        self.waiting.remove(event)
+
+            if is_admitted:
+                return True
+
+        self.rejected += 1
+        return False
+
+    def release(self):
+        if self.waiting:
+            self.waiting.popleft().set()
+        else:
+            self.in_flight -= 1
+
+    def get_stats(self):
+        return {
+            'max_concurrency': self.max_concurrency,
+            'max_queue_size': self.max_queue_size,
+            'in_flight': self.in_flight,
+            'waiting': len(self.waiting),
+            'rejected': self.rejected,
+        }
+
+# ################################################################################################################################
+
+class AdmissionControl(object):
+    """ Limits the number of HTTP requests a worker handles concurrently, both in total and per channel, so that a slow
+    dependency results in some of the requests being rejected with 503 Service Unavailable rather than in an ever growing
+    number of greenlets. A limit of 0 means no limit.
+    """
+    def __init__(self, max_concurrency=HTTP_ADMISSION.DEFAULT.MAX_CONCURRENCY,
+            max_queue_size=HTTP_ADMISSION.DEFAULT.MAX_QUEUE_SIZE, queue_timeout=HTTP_ADMISSION.DEFAULT.QUEUE_TIMEOUT,
+            retry_after=HTTP_ADMISSION.DEFAULT.RETRY_AFTER):
+        self.worker = Limiter(max_concurrency, max_queue_size, queue_timeout) if max_concurrency else None
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.channels = {}
+
+    def _get_channel_limiter(self, channel_item):
+        """ Returns a limiter for the channel or None if the channel has no limit. A new limiter is created each time
+        the channel's limits change, requests already in flight will release the one they acquired.
+        """
+        max_concurrency = channel_item.get('max_concurrency')
+        if not max_concurrency:
+            return
+
+        max_queue_size = channel_item.get('max_queue_size') or 0
+        limiter = self.channels.get(channel_item['name'])
+
+        if not (limiter and limiter.max_concurrency == max_concurrency and limiter.max_queue_size == max_queue_size):
+            limiter = self.channels[channel_item['name']] = Limiter(max_concurrency, max_queue_size, self.queue_timeout)
+
+        return limiter
+
+    def enter(self, cid, channel_item):
+        """ Returns a list of limiters acquired for the request, to be given to self.exit once the request is handled.
+        Raises ServiceUnavailable if the request cannot be admitted.
+        """
+        acquired = []
+
+        # Channel limits are checked first so that requests queued up for one slow channel do not hold onto worker slots
+        for limiter in (self._get_channel_limiter(channel_item), self.worker):
+            if limiter:
+                if limiter.acquire():
+                    acquired.append(limiter)
+                else:
+                    self.exit(acquired)
+                    raise ServiceUnavailable(cid, 'Too many requests in flight, channel:`{}`'.format(channel_item['name']),
+                        self.retry_after)
+
+        return acquired
+
+    def exit(self, acquired):
+        for limiter in acquired:
+            limiter.release()
+
+    def get_stats(self):
+        return {
+            'worker': self.worker.get_stats() if self.worker else None,
+            'channels': dict((name, limiter.get_stats()) for name, limiter in self.channels.items()),
+        }
+
+# ################################################################################################################################
@@ -11,12 +11,10 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 # stdlib
 import logging
 from hashlib import sha256
-from httplib import BAD_REQUEST, FORBIDDEN, INTERNAL_SERVER_ERROR, METHOD_NOT_ALLOWED, NOT_FOUND, UNAUTHORIZED
+from httplib import BAD_REQUEST, FORBIDDEN, INTERNAL_SERVER_ERROR, METHOD_NOT_ALLOWED, NOT_FOUND, SERVICE_UNAVAILABLE, \
+     UNAUTHORIZED
 from traceback import format_exc
 
-# anyjson
-from anyjson import dumps, loads
-
 # Django
 from django.http import QueryDict
 
@@ -29,9 +27,13 @@ from regex import compile as regex_compile
 # Zato
 from zato.common import CHANNEL, DATA_FORMAT, HTTP_RESPONSES, SEC_DEF_TYPE, SIMPLE_IO, TOO_MANY_REQUESTS, TRACE1, \
      URL_PARAMS_PRIORITY, URL_TYPE, zato_namespace, ZATO_ERROR, ZATO_NONE, ZATO_OK
+from zato.common.exception import ServiceUnavailable
+from zato.common.json_ import dumps, loads
 from zato.common.util import payload_from_request
 from zato.server.connection.http_soap import BadRequest, ClientHTTPError, Forbidden, MethodNotAllowed, NotFound, \
      TooManyRequests, Unauthorized
+from zato.server.connection.http_soap.admission import AdmissionControl
+from zato.server.connection.http_soap.gauges import HTTPGauges
 from zato.server.service.internal import AdminService
 
 # ################################################################################################################################
@@ -48,6 +50,7 @@ _status_method_not_allowed = b'{} {}'.format(METHOD_NOT_ALLOWED, HTTP_RESPONSES[
 _status_unauthorized = b'{} {}'.format(UNAUTHORIZED, HTTP_RESPONSES[UNAUTHORIZED])
 _status_forbidden = b'{} {}'.format(FORBIDDEN, HTTP_RESPONSES[FORBIDDEN])
 _status_too_many_requests = b'{} {}'.format(TOO_MANY_REQUESTS, HTTP_RESPONSES[TOO_MANY_REQUESTS])
+_status_service_unavailable = b'{} {}'.format(SERVICE_UNAVAILABLE, HTTP_RESPONSES[SERVICE_UNAVAILABLE])
 
 # ################################################################################################################################
 
@@ -152,13 +155,15 @@ class RequestDispatcher(object):
     """ Dispatches all the incoming HTTP/SOAP requests to appropriate handlers.
     """
     def __init__(self, url_data=None, security=None, request_handler=None, simple_io_config=None, return_tracebacks=None,
-            default_error_message=None):
+            default_error_message=None, admission=None):
         self.url_data = url_data
         self.security = security
         self.request_handler = request_handler
         self.simple_io_config = simple_io_config
         self.return_tracebacks = return_tracebacks
         self.default_error_message = default_error_message
+        self.gauges = HTTPGauges()
+        self.admission = admission or AdmissionControl()
 
 # ################################################################################################################################
 
@@ -225,6 +230,12 @@ class RequestDispatcher(object):
             if channel_item['audit_enabled']:
                 self.url_data.audit_set_request(cid, channel_item, payload, wsgi_environ)
 
+            channel_gauge = self.gauges.get_channel_gauge(channel_item['name'])
+            channel_gauge.incr()
+
+            # Will be populated if the request is admitted, i.e. not rejected because of too many requests in flight
+            admitted = None
+
             try:
 
                 # Raise 404 if the channel is inactive
@@ -240,6 +251,9 @@ class RequestDispatcher(object):
                             'Expected `%s` instead of `%s` for `%s`', expected_method, actual_method, channel_item['url_path'])
                         raise MethodNotAllowed(cid, 'Method `{}` is not allowed here'.format(actual_method))
 
+                # Will raise ServiceUnavailable if there are too many requests in flight or waiting for their turn
+                admitted = self.admission.enter(cid, channel_item)
+
                 # Need to read security info here so we know if POST needs to be
                 # parsed. If so, we do it here and reuse it in other places
                 # so it doesn't have to be parsed two or more times.
@@ -307,6 +321,11 @@ class RequestDispatcher(object):
                     elif isinstance(e, TooManyRequests):
                         status = _status_too_many_requests
 
+                    elif isinstance(e, ServiceUnavailable):
+                        status = _status_service_unavailable
+                        if e.retry_after:
+                            wsgi_environ['zato.http.response.headers']['Retry-After'] = str(e.retry_after)
+
                 else:
                     status_code = INTERNAL_SERVER_ERROR
                     response = _format_exc if self.return_tracebacks else self.default_error_message
@@ -331,6 +350,12 @@ class RequestDispatcher(object):
 
                 return response
 
+            finally:
+                channel_gauge.decr()
+
+                if admitted:
+                    self.admission.exit(admitted)
+
         # This is 404, no such URL path and SOAP action is known.
         else:
             response = response_404.format(cid, path_info, soap_action)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from collections import deque
+from logging import getLogger
+from math import ceil
+from time import time
+
+# Zato
+from zato.common import CIRCUIT_BREAKER
+from zato.common.exception import ServiceUnavailable
+
+# ################################################################################################################################
+
+logger = getLogger(__name__)
+
+# ################################################################################################################################
+
+_closed = CIRCUIT_BREAKER.STATE.CLOSED
+_open = CIRCUIT_BREAKER.STATE.OPEN
+_half_open = CIRCUIT_BREAKER.STATE.HALF_OPEN
+
+# ################################################################################################################################
+
+class CircuitOpen(ServiceUnavailable):
+    """ Raised when a call is rejected because the circuit breaker of a connection is open.
+    """
+
+# ################################################################################################################################
+
+class CircuitBreaker(object):
+    """ Keeps track of the outcomes of the most recent calls to a remote end and stops letting calls through,
+    i.e. opens, if too many of them failed or were slow. After open_time seconds, a single trial call is let through
+    (half-open state) - the breaker closes if the call succeeds in time or opens again otherwise.
+    """
+    def __init__(self, name, error_rate=CIRCUIT_BREAKER.DEFAULT.ERROR_RATE,
+            slow_call_rate=CIRCUIT_BREAKER.DEFAULT.SLOW_CALL_RATE, slow_call_time=CIRCUIT_BREAKER.DEFAULT.SLOW_CALL_TIME,
+            window_size=CIRCUIT_BREAKER.DEFAULT.WINDOW_SIZE, open_time=CIRCUIT_BREAKER.DEFAULT.OPEN_TIME,
+            min_calls=CIRCUIT_BREAKER.DEFAULT.MIN_CALLS):
+        self.name = name
+        self.error_rate = error_rate
+        self.slow_call_rate = slow_call_rate
+        self.slow_call_time = slow_call_time / 1000.0 # Milliseconds -> seconds
+        self.open_time = open_time
+        self.min_calls = min(min_calls, window_size)
+
+        self.state = _closed
+        self.opened_at = None
+        self.is_trial_in_progress = False
+
+        # Each outcome is an (is_error, is_slow) tuple, running totals are kept so the window need not be iterated
+        self.outcomes = deque(maxlen=window_size)
+        self.errors = 0
+        self.slow_calls = 0
+
+        # Statistics only
+        self.times_opened = 0
+        self.rejected = 0
+
+# ################################################################################################################################
+
+    def _reject(self, cid, retry_after):
+        self.rejected += 1
+        raise CircuitOpen(cid, 'Circuit breaker open for `{}`'.format(self.name), int(ceil(retry_after)))
+
+    def before_call(self, cid, _time=time):
+        """ Raises CircuitOpen if a call may not be made. Otherwise, returns a flag indicating whether it is a trial call,
+        which needs to be given to self.after_call along with the call's outcome.
+        """
+        if self.state == _closed:
+            return False
+
+        if self.state == _open:
+            remaining = self.opened_at + self.open_time - _time()
+
+            if remaining > 0:
+                self._reject(cid, remaining)
+
+            self.state = _half_open
+            logger.info('Circuit breaker half-open for `%s`', self.name)
+
+        # We are half-open here and only one trial call may be in progress at a time
+        if self.is_trial_in_progress:
+            self._reject(cid, 1)
+
+        self.is_trial_in_progress = True
+        return True
+
+    def after_call(self, is_trial, is_error, duration):
+        """ Records the outcome of a call - whether it failed and how long, in seconds, it took.
+        """
+        is_slow = bool(self.slow_call_time) and duration >= self.slow_call_time
+
+        if is_trial:
+            self.is_trial_in_progress = False
+
+            if is_error or is_slow:
+                self._open()
+            else:
+                self._close()
+
+        # Calls started before the breaker opened may still be finishing - they are not taken into account
+        elif self.state == _closed:
+            self._record(is_error, is_slow)
+
+            if len(self.outcomes) >= self.min_calls and self._is_over_threshold():
+                self._open()
+
+# ################################################################################################################################
+
+    def _record(self, is_error, is_slow):
+
+        # The oldest outcome is about to be dropped from the window
+        if len(self.outcomes) == self.outcomes.maxlen:
+            old_is_error, old_is_slow = self.outcomes[0]
+            self.errors -= old_is_error
+            self.slow_calls -= old_is_slow
+
+        self.outcomes.append((is_error, is_slow))
+        self.errors += is_error
+        self.slow_calls += is_slow
+
+    def _is_over_threshold(self):
+        total = len(self.outcomes)
+
+        if self.error_rate and self.errors * 100.0 / total >= self.error_rate:
+            return True
+
+        if self.slow_call_rate and self.slow_calls * 100.0 / total >= self.slow_call_rate:
+            return True
+
+        return False
+
+    def _open(self):
+        logger.warn('Circuit breaker open for `%s`, errors:`%s`, slow_calls:`%s`, calls:`%s`',
+            self.name, self.errors, self.slow_calls, len(self.outcomes))
+
+        self.state = _open
+        self.opened_at = time()
+        self.times_opened += 1
+
+    def _close(self):
+        logger.info('Circuit breaker closed for `%s`', self.name)
+
+        self.state = _closed
+        self.opened_at = None
+        self.outcomes.clear()
+        self.errors = 0
+        self.slow_calls = 0
+
+# ################################################################################################################################
+
+    def get_stats(self):
+        return {
+            'state': self.state,
+            'opened_at': self.opened_at,
+            'calls': len(self.outcomes),
+            'errors': self.errors,
+            'slow_calls': self.slow_calls,
+            'times_opened': self.times_opened,
+            'rejected': self.rejected,
+        }
+
+# ################################################################################################################################
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from time import time
+
+# ################################################################################################################################
+
+# Headers that front-end load-balancers and proxies set to the time they received a request, e.g. the load-balancer
+# created by zato create lb sets X-Request-Start to milliseconds since the epoch with http-request set-header
+# X-Request-Start t=%Ts%ms, whereas in nginx it is proxy_set_header X-Request-Start "t=${msec}";
+queue_start_headers = ('HTTP_X_REQUEST_START', 'HTTP_X_QUEUE_START')
+
+# ################################################################################################################################
+
+def get_queue_time(wsgi_environ, now, _headers=queue_start_headers):
+    """ Returns how many seconds a request spent queued before it was dispatched or None if it cannot be told. Front-ends
+    express the time either in seconds, milliseconds or microseconds since the epoch, with an optional 't=' prefix.
+    """
+    for name in _headers:
+        value = wsgi_environ.get(name)
+        if value:
+            break
+    else:
+        return
+
+    try:
+        start = float(value[2:] if value.startswith('t=') else value)
+    except ValueError:
+        return
+
+    if start > 1e14:
+        start /= 1e6
+    elif start > 1e11:
+        start /= 1e3
+
+    return max(now - start, 0)
+
+# ################################################################################################################################
+
+class Gauge(object):
+    """ Keeps track of how many requests are in flight.
+    """
+    __slots__ = ('current', 'peak', 'total')
+
+    def __init__(self):
+        self.current = 0
+        self.peak = 0
+        self.total = 0
+
+    def incr(self):
+        self.current += 1
+        self.total += 1
+
+        if self.current > self.peak:
+            self.peak = self.current
+
+    def decr(self):
+        self.current -= 1
+
+    def read(self, reset_peak=True):
+        out = {
+            'current': self.current,
+            'peak': self.peak,
+            'total': self.total,
+        }
+
+        # The peak is reported as the highest value seen since the previous read
+        if reset_peak:
+            self.peak = self.current
+
+        return out
+
+# ################################################################################################################################
+
+class Timing(object):
+    """ Minimum, maximum and mean of durations observed since the previous read.
+    """
+    __slots__ = ('count', 'sum', 'min', 'max')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+
+        if self.min is None or value < self.min:
+            self.min = value
+
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def read(self, reset=True):
+        out = {
+            'count': self.count,
+            'mean': self.sum / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+        }
+
+        if reset:
+            self.reset()
+
+        return out
+
+# ################################################################################################################################
+
+class HTTPGauges(object):
+    """ In-process gauges of HTTP requests handled by a single worker - requests in flight in the worker as a whole
+    and per each channel, as well as how long requests were queued before they were dispatched.
+    """
+    def __init__(self):
+        self.worker = Gauge()
+        self.channels = {}
+        self.queue_time = Timing()
+        self.last_read = time()
+
+    def get_channel_gauge(self, name):
+        gauge = self.channels.get(name)
+        if not gauge:
+            gauge = self.channels[name] = Gauge()
+        return gauge
+
+    def on_request(self, wsgi_environ, now):
+        """ Increments the worker's in-flight gauge and records the request's queue time, if known.
+        """
+        self.worker.incr()
+
+        queue_time = get_queue_time(wsgi_environ, now)
+        if queue_time is not None:
+            self.queue_time.add(queue_time)
+
+    def on_response(self):
+        self.worker.decr()
+
+    def read(self, reset=True):
+        """ Returns current state of all gauges. Unless reset is False, peaks and timings start afresh afterwards.
+        """
+        now = time()
+
+        out = {
+            'worker': self.worker.read(reset),
+            'channels': dict((name, gauge.read(reset)) for name, gauge in self.channels.items()),
+            'queue_time': self.queue_time.read(reset),
+            'since_last_read': now - self.last_read,
+        }
+
+        if reset:
+            self.last_read = now
+
+        return out
+
+# ################################################################################################################################
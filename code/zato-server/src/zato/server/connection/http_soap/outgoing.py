@@ -12,8 +12,10 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 from copy import deepcopy
 from cStringIO import StringIO
 from datetime import datetime
+from httplib import INTERNAL_SERVER_ERROR
 from json import dumps, loads
 from logging import DEBUG, getLogger
+from time import time
 from traceback import format_exc
 
 # gevent
@@ -30,9 +32,10 @@ import requests
 from requests.exceptions import Timeout as RequestsTimeout
 
 # Zato
-from zato.common import CONTENT_TYPE, DATA_FORMAT, Inactive, SEC_DEF_TYPE, soapenv11_namespace, soapenv12_namespace, TimeoutException, \
-     URL_TYPE, ZATO_NONE
+from zato.common import CIRCUIT_BREAKER, CONTENT_TYPE, DATA_FORMAT, Inactive, SEC_DEF_TYPE, soapenv11_namespace, \
+     soapenv12_namespace, TimeoutException, URL_TYPE, ZATO_NONE
 from zato.common.util import get_component_name
+from zato.server.connection.http_soap.circuit_breaker import CircuitBreaker
 from zato.server.connection.queue import ConnectionQueue
 
 logger = getLogger(__name__)
@@ -222,6 +225,22 @@ class HTTPSOAPWrapper(BaseHTTPSOAPWrapper):
         </s12:Header>
         """
         self.set_auth()
+        self.circuit_breaker = self._get_circuit_breaker() if self.config.get('has_circuit_breaker') else None
+
+    def _get_circuit_breaker(self):
+        default = CIRCUIT_BREAKER.DEFAULT
+
+        def get(name, default_value):
+            # 0 is a valid value, e.g. it turns error rate checks off, so only values not set at all are replaced
+            value = self.config.get(name)
+            return default_value if value is None else int(value)
+
+        return CircuitBreaker(self.config['name'],
+            get('cb_error_rate', default.ERROR_RATE),
+            get('cb_slow_call_rate', default.SLOW_CALL_RATE),
+            get('cb_slow_call_time', default.SLOW_CALL_TIME),
+            get('cb_window_size', default.WINDOW_SIZE),
+            get('cb_open_time', default.OPEN_TIME))
 
     def set_auth(self):
         self.requests_auth = self.auth if self.config['sec_type'] == SEC_DEF_TYPE.BASIC_AUTH else None
@@ -307,6 +326,23 @@ class HTTPSOAPWrapper(BaseHTTPSOAPWrapper):
 
         return soap_config['message'].format(header=soap_header, data=data), headers
 
+# ################################################################################################################################
+
+    def _invoke_http_circuit_breaker(self, cid, method, address, data, headers, hooks, *args, **kwargs):
+        """ Invokes the remote end unless the circuit breaker is open, which raises CircuitOpen, and records the outcome.
+        Exceptions, including timeouts, and HTTP 5xx responses count as errors.
+        """
+        is_trial = self.circuit_breaker.before_call(cid)
+        is_error = True
+        start = time()
+
+        try:
+            response = self.invoke_http(cid, method, address, data, headers, hooks, *args, **kwargs)
+            is_error = response.status_code >= INTERNAL_SERVER_ERROR
+            return response
+        finally:
+            self.circuit_breaker.after_call(is_trial, is_error, time() - start)
+
 # ################################################################################################################################
 
     def http_request(self, method, cid, data='', params=None, *args, **kwargs):
@@ -338,7 +374,8 @@ class HTTPSOAPWrapper(BaseHTTPSOAPWrapper):
         logger.info(
             'CID:`%s`, address:`%s`, qs:`%s`, auth:`%s`, kwargs:`%s`', cid, address, qs_params, self.requests_auth, kwargs)
 
-        response = self.invoke_http(cid, method, address, data, headers, {}, params=qs_params, *args, **kwargs)
+        invoke_http = self._invoke_http_circuit_breaker if self.circuit_breaker else self.invoke_http
+        response = invoke_http(cid, method, address, data, headers, {}, params=qs_params, *args, **kwargs)
 
         if logger.isEnabledFor(DEBUG):
             logger.debug('CID:`%s`, response:`%s`', cid, response.text)
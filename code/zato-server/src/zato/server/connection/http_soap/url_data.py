@@ -10,18 +10,24 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 # stdlib
 import logging
+from copy import deepcopy
 from datetime import datetime
 from json import dumps, loads
 from operator import itemgetter
 from threading import RLock
 from traceback import format_exc
 
+# lxml
+from lxml import etree
+
 # oauth
 from oauth.oauth import OAuthDataStore, OAuthConsumer, OAuthRequest, OAuthServer, OAuthSignatureMethod_HMAC_SHA1, \
      OAuthSignatureMethod_PLAINTEXT, OAuthToken
 
 # sec-wall
-from secwall.server import on_basic_auth, on_wsse_pwd
+from secwall.constants import AUTH_WSSE_VALIDATION_ERROR
+from secwall.core import AuthResult, SecurityException
+from secwall.server import on_basic_auth
 from secwall.wsse import WSSE
 
 # Zato
@@ -29,7 +35,7 @@ from zato.bunch import Bunch
 from zato.common import AUDIT_LOG, DATA_FORMAT, MISC, MSG_PATTERN_TYPE, SEC_DEF_TYPE, URL_TYPE, VAULT, ZATO_NONE
 from zato.common.broker_message import code_to_name, CHANNEL, SECURITY, VAULT as VAULT_BROKER_MSG
 from zato.common.dispatch import dispatcher
-from zato.common.util import parse_tls_channel_security_definition, update_apikey_username
+from zato.common.util import parse_tls_channel_security_definition, parse_xml, update_apikey_username
 from zato.server.connection.http_soap import Forbidden, Unauthorized
 from zato.server.jwt import JWT
 from zato.url_dispatcher import CyURLData, Matcher
@@ -80,6 +86,10 @@ class URLData(CyURLData, OAuthDataStore):
         self.json_pointer_store = json_pointer_store
         self.xpath_store = xpath_store
 
+        # XPath security definitions need the store to compile their expressions with
+        for item in (self.xpath_sec_config or {}).values():
+            self._compile_xpath_sec(item)
+
         self.url_sec_lock = RLock()
         self.update_lock = RLock()
         self._wss = WSSE()
@@ -273,6 +283,37 @@ class URLData(CyURLData, OAuthDataStore):
 
 # ################################################################################################################################
 
+    def _get_xml_doc(self, cid, body, wsgi_environ):
+        """ Returns the request parsed into an XML tree, parsing it only if it has not been parsed yet. The tree is kept
+        in the WSGI environment for SimpleIO to build the service's payload from.
+        """
+        doc = wsgi_environ.get('zato.request.xml_doc')
+        if doc is None:
+            doc = wsgi_environ['zato.request.xml_doc'] = parse_xml(cid, body)
+
+        return doc
+
+    def _get_wsse_doc(self, doc):
+        """ Returns a copy of the SOAP envelope, with its header only, for WSSE.validate to replace passwords and nonces in.
+        The original document is left intact for SimpleIO and the body, possibly a large one, is never copied.
+        """
+        envelope = etree.Element(doc.tag, doc.attrib, doc.nsmap)
+
+        for header in doc.iterchildren('{{{}}}Header'.format(etree.QName(doc).namespace)):
+            envelope.append(deepcopy(header))
+
+        return envelope
+
+    def _on_wsse_pwd(self, url_config, doc):
+        """ Same as secwall.server.on_wsse_pwd except that it validates an already parsed document.
+        """
+        try:
+            self._wss.validate(self._get_wsse_doc(doc), url_config)
+        except SecurityException, e:
+            return AuthResult(False, AUTH_WSSE_VALIDATION_ERROR, e.description)
+        else:
+            return AuthResult(True, '0')
+
     def _handle_security_wss(self, cid, sec_def, path_info, body, wsgi_environ, ignored_post_data=None, enforce_auth=True):
         """ Performs the authentication using WS-Security.
         """
@@ -292,7 +333,7 @@ class URLData(CyURLData, OAuthDataStore):
         url_config['wsse-pwd-nonce-freshness-time'] = sec_def['nonce_freshness_time']
 
         try:
-            result = on_wsse_pwd(self._wss, url_config, body, False)
+            result = self._on_wsse_pwd(url_config, self._get_xml_doc(cid, body, wsgi_environ))
         except Exception, e:
             if enforce_auth:
                 msg = 'Could not parse the WS-Security data, body:[{}], e:[{}]'.format(body, format_exc(e))
@@ -369,7 +410,10 @@ class URLData(CyURLData, OAuthDataStore):
         payload = wsgi_environ['zato.request.payload']
         user_msg = 'Invalid username or password'
 
-        username = payload.xpath(sec_def.username_expr)
+        # Expressions are compiled each time the definition changes rather than for each request
+        xpath_sec = self.xpath_sec_config[sec_def.name]
+
+        username = xpath_sec.compiled_username_expr(payload) if xpath_sec.compiled_username_expr else None
         if not username:
             if enforce_auth:
                 logger.error('%s `%s` expr:`%s`, value:`%r`', user_msg, '(no username)', sec_def.username_expr, username)
@@ -388,7 +432,7 @@ class URLData(CyURLData, OAuthDataStore):
 
         if sec_def.get('password_expr'):
 
-            password = payload.xpath(sec_def.password_expr)
+            password = xpath_sec.compiled_password_expr(payload) if xpath_sec.compiled_password_expr else None
             if not password:
                 if enforce_auth:
                     logger.error('%s `%s` expr:`%s`', user_msg, '(no password)', sec_def.password_expr)
@@ -475,7 +519,9 @@ class URLData(CyURLData, OAuthDataStore):
         # 3. No service and no default authentication method - need to extract all headers that may contain credentials
 
         sec_def_config = self.vault_conn_sec_config[sec_def.name]['config']
-        client = self.worker.vault_conn_api.get_client(sec_def.name)
+
+        # Results of authentication are cached so most requests need not go to Vault
+        client = self.worker.vault_conn_api.get_auth_cache(sec_def.name)
 
         try:
 
@@ -1000,9 +1046,25 @@ class URLData(CyURLData, OAuthDataStore):
 
 # ################################################################################################################################
 
+    def _compile_xpath_expr(self, name, expr):
+        """ Returns an expression compiled with all the namespaces known to the worker or None if it cannot be compiled,
+        in which case requests will be rejected.
+        """
+        try:
+            return self.xpath_store.compile(expr, self.worker.msg_ns_store.ns_map)
+        except Exception, e:
+            logger.warn('Could not compile expr:`%s` of XPath security definition `%s`, e:`%s`', expr, name, format_exc(e))
+
+    def _compile_xpath_sec(self, item):
+        config = item.config
+        item.compiled_username_expr = self._compile_xpath_expr(config.name, config.username_expr)
+        item.compiled_password_expr = self._compile_xpath_expr(config.name, config.password_expr) \
+            if config.get('password_expr') else None
+
     def _update_xpath_sec(self, name, config):
         self.xpath_sec_config[name] = Bunch()
         self.xpath_sec_config[name].config = config
+        self._compile_xpath_sec(self.xpath_sec_config[name])
 
     def xpath_sec_get(self, name):
         """ Returns the configuration of the XPath security definition
@@ -1140,6 +1202,10 @@ class URLData(CyURLData, OAuthDataStore):
 
             channel_item[name] = msg[name]
 
+        # Admission control limits are optional
+        channel_item['max_concurrency'] = msg.get('max_concurrency')
+        channel_item['max_queue_size'] = msg.get('max_queue_size')
+
         if msg.get('security_id'):
             channel_item['sec_type'] = msg['sec_type']
             channel_item['security_id'] = msg['security_id']
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2018, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+import os
+import socket
+from json import dumps, loads
+from logging import getLogger
+from multiprocessing.pool import ThreadPool
+from struct import Struct
+from thread import start_new_thread
+from threading import Lock
+from traceback import format_exc
+
+# ################################################################################################################################
+
+logger = getLogger(__name__)
+
+# ################################################################################################################################
+
+# Local transport between servers and WebSphere MQ connectors. Each frame is a 4-byte, big-endian length followed by
+# a JSON document. Requests carry an ID that the connector copies to its response so that many requests may be sent
+# over the same connection without waiting for responses to previous ones, and responses can be returned in any order.
+# The very first request on each connection must be a 'hello' one with credentials.
+
+# ################################################################################################################################
+
+_header = Struct(b'!I')
+_header_size = _header.size
+
+class PATH:
+    API = 'api'
+    HELLO = 'hello'
+    PING = 'ping'
+
+# ################################################################################################################################
+
+class FrameError(Exception):
+    """ Raised if the other side closed the connection or sent an invalid frame.
+    """
+
+# ################################################################################################################################
+
+class FramedResponse(object):
+    """ A response to a request sent to a connector.
+    """
+    __slots__ = ('status', 'data', 'content_type')
+
+    def __init__(self, status, data, content_type):
+        self.status = status
+        self.data = data
+        self.content_type = content_type
+
+    @property
+    def ok(self):
+        return self.status.startswith('200')
+
+    # For compatibility with what callers used to get from requests
+    text = property(lambda self: self.data)
+
+# ################################################################################################################################
+
+def send_frame(sock, data, _pack=_header.pack):
+    data = dumps(data)
+    sock.sendall(_pack(len(data)) + data)
+
+def _recv_exactly(sock, size):
+    buff = []
+    while size:
+        data = sock.recv(size)
+        if not data:
+            raise FrameError('Connection closed by peer')
+        buff.append(data)
+        size -= len(data)
+
+    return b''.join(buff)
+
+def recv_frame(sock, _unpack=_header.unpack, _header_size=_header_size):
+    size, = _unpack(_recv_exactly(sock, _header_size))
+    return loads(_recv_exactly(sock, size))
+
+# ################################################################################################################################
+
+class FramedServer(object):
+    """ Accepts connections on a UNIX socket and dispatches each incoming request to a pool of threads. Responses are sent
+    back as soon as they are ready, regardless of the order that requests arrived in.
+    """
+    def __init__(self, socket_path, pool_size, check_credentials, handle_request):
+        self.socket_path = socket_path
+        self.pool = ThreadPool(pool_size)
+        self.check_credentials = check_credentials
+        self.handle_request = handle_request
+
+    def serve_forever(self, backlog=32):
+
+        # Only a socket left over by a previous connector may exist under that path
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        # The socket is created with permissions of 0600 straightaway - changing them only after bind would leave
+        # a window during which other users could connect to it.
+        umask = os.umask(0o177)
+        try:
+            listener.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+
+        listener.listen(backlog)
+
+        while True:
+            sock, _ = listener.accept()
+            start_new_thread(self._handle_connection, (sock,))
+
+    def _handle_connection(self, sock):
+        write_lock = Lock()
+
+        try:
+            hello = recv_frame(sock)
+            data = hello.get('data') or {}
+
+            if hello.get('path') != PATH.HELLO or not self.check_credentials(data.get('username'), data.get('password')):
+                self._send_response(sock, write_lock, hello.get('id'), '403 Forbidden', 'Invalid credentials', 'text/plain')
+                return
+
+            self._send_response(sock, write_lock, hello['id'], '200 OK', '', 'text/plain')
+
+            while True:
+                request = recv_frame(sock)
+                self.pool.apply_async(self._handle_request, (sock, write_lock, request))
+
+        except FrameError:
+            pass
+
+        except Exception:
+            logger.warn('Exception in connection handler %s', format_exc())
+
+        finally:
+            sock.close()
+
+    def _handle_request(self, sock, write_lock, request):
+        try:
+            response = self.handle_request(request['path'], request['data'])
+            status, data, content_type = response.status, response.data, response.content_type
+        except Exception:
+            logger.warn(format_exc())
+            status, data, content_type = '500 Internal Server Error', 'Internal server error', 'text/plain'
+
+        try:
+            self._send_response(sock, write_lock, request['id'], status, data, content_type)
+        except Exception:
+            logger.warn('Could not send response %s', format_exc())
+
+            # E.g. data could not be serialized to JSON - the caller still needs to receive a response
+            try:
+                self._send_response(sock, write_lock, request['id'], '500 Internal Server Error', 'Could not send response',
+                    'text/plain')
+            except Exception:
+                logger.warn('Could not send error response %s', format_exc())
+
+    def _send_response(self, sock, write_lock, request_id, status, data, content_type):
+        with write_lock:
+            send_frame(sock, {'id': request_id, 'status': status, 'data': data, 'content_type': content_type})
+
+# ################################################################################################################################
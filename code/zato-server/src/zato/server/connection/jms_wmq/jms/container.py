@@ -31,9 +31,8 @@ from logging.handlers import RotatingFileHandler
 from os import getppid, path
 from thread import start_new_thread
 from threading import RLock
-from time import sleep
+from time import sleep, time
 from traceback import format_exc
-from wsgiref.simple_server import make_server
 import httplib
 
 # Bunch
@@ -46,9 +45,10 @@ from requests import post
 import yaml
 
 # Zato
-from zato.common.auth_util import parse_basic_auth
+from zato.common import WEBSPHERE_MQ
 from zato.common.broker_message import code_to_name
 from zato.common.zato_keyutils import KeyUtils
+from zato.server.connection.jms_wmq.ipc import FramedServer, PATH
 from zato.server.connection.jms_wmq.jms import WebSphereMQException, NoMessageAvailableException
 from zato.server.connection.jms_wmq.jms.connection import WebSphereMQConnection
 from zato.server.connection.jms_wmq.jms.core import TextMessage
@@ -74,17 +74,9 @@ default_logging_config = {
 # ################################################################################################################################
 
 _http_200 = b'{} {}'.format(httplib.OK, httplib.responses[httplib.OK])
-_http_400 = b'{} {}'.format(httplib.BAD_REQUEST, httplib.responses[httplib.BAD_REQUEST])
-_http_403 = b'{} {}'.format(httplib.FORBIDDEN, httplib.responses[httplib.FORBIDDEN])
 _http_406 = b'{} {}'.format(httplib.NOT_ACCEPTABLE, httplib.responses[httplib.NOT_ACCEPTABLE])
-_http_500 = b'{} {}'.format(httplib.INTERNAL_SERVER_ERROR, httplib.responses[httplib.INTERNAL_SERVER_ERROR])
 _http_503 = b'{} {}'.format(httplib.SERVICE_UNAVAILABLE, httplib.responses[httplib.SERVICE_UNAVAILABLE])
 
-_path_api = '/api'
-_path_ping = '/ping'
-
-_paths = (_path_api, _path_ping)
-
 # ################################################################################################################################
 
 class Response(object):
@@ -96,10 +88,10 @@ class Response(object):
 # ################################################################################################################################
 
 class _MessageCtx(object):
-    __slots__ = ('mq_msg', 'channel_id', 'queue_name', 'service_name')
+    __slots__ = ('mq_msgs', 'channel_id', 'queue_name', 'service_name')
 
-    def __init__(self, mq_msg, channel_id, queue_name, service_name):
-        self.mq_msg = mq_msg
+    def __init__(self, mq_msgs, channel_id, queue_name, service_name):
+        self.mq_msgs = mq_msgs
         self.channel_id = channel_id
         self.queue_name = queue_name
         self.service_name = service_name
@@ -109,11 +101,14 @@ class _MessageCtx(object):
 class WebSphereMQChannel(object):
     """ A process to listen for messages from WebSphere MQ queue managers.
     """
-    def __init__(self, conn, channel_id, queue_name, service_name, on_message_callback, logger):
+    def __init__(self, conn, channel_id, queue_name, service_name, on_message_callback, logger,
+            batch_size=WEBSPHERE_MQ.DEFAULT.BATCH_SIZE, linger_time=WEBSPHERE_MQ.DEFAULT.LINGER_TIME):
         self.conn = conn
         self.id = channel_id
         self.queue_name = queue_name
         self.service_name = service_name
+        self.batch_size = batch_size
+        self.linger_time = linger_time
         self.on_message_callback = on_message_callback
         self.keep_running = False
         self.logger = logger
@@ -128,6 +123,40 @@ class WebSphereMQChannel(object):
     def _get_destination_info(self):
         return 'destination:`%s`, %s' % (self.queue_name, self.conn.get_connection_info())
 
+# ################################################################################################################################
+
+    def _receive_batch(self):
+        """ Waits for a message and, once there is one, keeps receiving more until either batch_size messages
+        have been received or linger_time milliseconds have elapsed, whichever comes first.
+        """
+        msg = self.conn.receive(self.queue_name, 100)
+        if not msg:
+            return []
+
+        batch = [msg]
+        until = time() + self.linger_time / 1000.0
+
+        while len(batch) < self.batch_size and self.keep_running:
+
+            # Once linger time elapses, messages that are already available are still taken without waiting
+            wait_interval = max(0, int((until - time()) * 1000))
+
+            try:
+                msg = self.conn.receive(self.queue_name, wait_interval)
+            except NoMessageAvailableException:
+                break
+            except Exception:
+                # Whatever we have received so far will be still delivered,
+                # the error will be handled when it reoccurs during the next receive.
+                self.logger.warn('Exception while receiving a batch %s', format_exc())
+                break
+            else:
+                if not msg:
+                    break
+                batch.append(msg)
+
+        return batch
+
 # ################################################################################################################################
 
     def start(self, sleep_on_error=3):
@@ -144,17 +173,17 @@ class WebSphereMQChannel(object):
         def _impl():
             while self.keep_running:
                 try:
-                    msg = self.conn.receive(self.queue_name, 100)
+                    batch = self._receive_batch()
                     if self.has_debug:
-                        self.logger.debug('Message received `%s`' % str(msg).decode('utf-8'))
+                        self.logger.debug('Messages received `%s`' % [str(msg).decode('utf-8') for msg in batch])
 
-                    if msg:
-                        start_new_thread(_invoke_callback, (_MessageCtx(msg, self.id, self.queue_name, self.service_name),))
+                    if batch:
+                        start_new_thread(_invoke_callback, (_MessageCtx(batch, self.id, self.queue_name, self.service_name),))
 
                 except NoMessageAvailableException as e:
                     if self.has_debug:
                         self.logger.debug('Consumer for queue `%s` did not receive a message. `%s`' % (
-                            self.queue_name, self._get_destination_info(self.queue_name)))
+                            self.queue_name, self._get_destination_info()))
 
                 except self.pymqi.MQMIError as e:
                     if e.reason == self.pymqi.CMQC.MQRC_UNKNOWN_OBJECT_NAME:
@@ -188,8 +217,8 @@ class ConnectionContainer(object):
         import pymqi
         self.pymqi = pymqi
 
-        self.host = '127.0.0.1'
-        self.port = None
+        self.socket_path = None
+        self.pool_size = None
         self.username = None
         self.password = None
         self.server_auth = None
@@ -225,7 +254,8 @@ class ConnectionContainer(object):
         self.server_auth = (self.username, self.password)
 
         self.base_dir = config.base_dir
-        self.port = config.port
+        self.socket_path = config.socket_path
+        self.pool_size = config.pool_size
         self.server_port = config.server_port
         self.server_path = config.server_path
         self.server_address = self.server_address.format(self.server_port, self.server_path)
@@ -268,7 +298,7 @@ class ConnectionContainer(object):
 
     def on_mq_message_received(self, msg_ctx, _post=post):
         _post(self.server_address, data=dumps({
-            'msg': msg_ctx.mq_msg.to_dict(),
+            'msgs': [mq_msg.to_dict() for mq_msg in msg_ctx.mq_msgs],
             'channel_id': msg_ctx.channel_id,
             'queue_name': msg_ctx.queue_name,
             'service_name': msg_ctx.service_name,
@@ -509,7 +539,9 @@ class ConnectionContainer(object):
         with self.lock:
             conn = self.connections[msg.def_id]
             channel = WebSphereMQChannel(
-                conn, msg.id, msg.queue.encode('utf8'), msg.service_name, self.on_mq_message_received, self.logger)
+                conn, msg.id, msg.queue.encode('utf8'), msg.service_name, self.on_mq_message_received, self.logger,
+                msg.get('batch_size') or WEBSPHERE_MQ.DEFAULT.BATCH_SIZE,
+                msg.get('linger_time') or WEBSPHERE_MQ.DEFAULT.LINGER_TIME)
             channel.start()
             self.channels[channel.id] = channel
             self.channel_id_to_def_id[channel.id] = msg.def_id
@@ -525,6 +557,8 @@ class ConnectionContainer(object):
             channel.stop()
             channel.queue_name = msg.queue.encode('utf8')
             channel.service_name = msg.service_name
+            channel.batch_size = msg.get('batch_size') or WEBSPHERE_MQ.DEFAULT.BATCH_SIZE
+            channel.linger_time = msg.get('linger_time') or WEBSPHERE_MQ.DEFAULT.LINGER_TIME
             channel.keep_running = True
             channel.start()
 
@@ -546,15 +580,15 @@ class ConnectionContainer(object):
 
 # ################################################################################################################################
 
-    def handle_http_request(self, path, msg, ok=b'OK'):
-        """ Dispatches incoming HTTP requests - either reconfigures the connector or puts messages to queues.
+    def handle_request(self, path, msg):
+        """ Dispatches incoming requests - either reconfigures the connector or puts messages to queues.
         """
         self.logger.info('MSG received %s %s', path, msg)
 
-        if path == _path_ping:
+        if path == PATH.PING:
             return Response()
         else:
-            msg = bunchify(loads(msg))
+            msg = bunchify(msg)
 
             # Delete what handlers don't need
             msg.pop('msg_type', None) # Optional if message was sent by a server that is starting up vs. API call
@@ -565,11 +599,9 @@ class ConnectionContainer(object):
 
 # ################################################################################################################################
 
-    def check_credentials(self, auth):
+    def check_credentials(self, username, password):
         """ Checks incoming username/password and returns True only if they were valid and as expected.
         """
-        username, password = parse_basic_auth(auth)
-
         if username != self.username:
             self.logger.warn('Invalid username or password')
             return
@@ -578,50 +610,13 @@ class ConnectionContainer(object):
             self.logger.warn('Invalid username or password')
             return
         else:
-            # All good, we let the request in
+            # All good, we let the connection in
             return True
 
-# ################################################################################################################################
-
-    def on_wsgi_request(self, environ, start_response):
-
-        # Default values to use in case of any internal errors
-        status = _http_503
-        content_type = 'text/plain'
-
-        try:
-            content_length = environ['CONTENT_LENGTH']
-            if not content_length:
-                status = _http_400
-                data = 'Missing content'
-                content_type = 'text/plain'
-            else:
-                data = environ['wsgi.input'].read(int(content_length))
-                if self.check_credentials(environ.get('HTTP_AUTHORIZATION')):
-                    response = self.handle_http_request(environ['PATH_INFO'], data)
-                    status = response.status
-                    data = response.data
-                    content_type = response.content_type
-                else:
-                    status = _http_403
-                    data = 'You are not allowed to access this resource'
-                    content_type = 'text/plain'
-
-        except Exception:
-            self.logger.warn(format_exc())
-            content_type = 'text/plain'
-            status = _http_500
-            data = 'Internal server error'
-        finally:
-            headers = [('Content-type', content_type)]
-            start_response(status, headers)
-
-            return [data]
-
 # ################################################################################################################################
 
     def run(self):
-        server = make_server(self.host, self.port, self.on_wsgi_request)
+        server = FramedServer(self.socket_path, self.pool_size, self.check_credentials, self.handle_request)
         server.serve_forever()
 
 # ################################################################################################################################
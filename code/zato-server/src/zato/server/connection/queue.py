@@ -10,11 +10,15 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 # stdlib
 import logging
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from time import time
+from traceback import format_exc
 
 # gevent
 import gevent
-from gevent.lock import RLock
+from gevent.lock import BoundedSemaphore, RLock
 from gevent.queue import Empty, Queue
 
 # A set of utilities for constructing greenlets-safe outgoing connection objects.
@@ -140,3 +144,117 @@ class Wrapper(object):
                 self.client.build_queue()
             else:
                 logger.info('Skip building inactive connection queue for `%s` (%s)', self.client.conn_name, self.client.conn_type)
+
+# ################################################################################################################################
+
+class SessionPool(object):
+    """ Keeps up to pool_size sessions with a remote resource. Unlike ConnectionQueue, sessions are not established upfront -
+    they are created on demand, reused across callers and validated each time they are checked out. Sessions that stayed
+    idle for longer than max_idle_time seconds are closed instead of being reused. Callers wait up to checkout_timeout
+    seconds for a session if all of them are in use.
+    """
+    def __init__(self, pool_size, conn_name, create_func, close_func, is_valid_func=None, max_idle_time=None,
+            checkout_timeout=None):
+        self.pool_size = pool_size
+        self.conn_name = conn_name
+        self.create_func = create_func
+        self.close_func = close_func
+        self.is_valid_func = is_valid_func
+        self.max_idle_time = max_idle_time
+        self.checkout_timeout = checkout_timeout
+        self.is_closed = False
+
+        # Idle sessions, each along with the time it was last returned to the pool, most recently used ones on the right
+        self.idle = deque()
+
+        # How many sessions may be in use at a time
+        self.semaphore = BoundedSemaphore(pool_size)
+
+    def _close(self, session):
+        try:
+            self.close_func(session)
+        except Exception, e:
+            logger.info('Could not close a session to `%s`, e:`%s`', self.conn_name, format_exc(e))
+
+    def _is_valid(self, session):
+        try:
+            return self.is_valid_func(session)
+        except Exception, e:
+            logger.info('Session to `%s` is no longer valid, e:`%s`', self.conn_name, format_exc(e))
+
+    def close_idle(self):
+        """ Closes sessions that have not been used for longer than max_idle_time seconds.
+        """
+        if not self.max_idle_time:
+            return
+
+        idle_since = time() - self.max_idle_time
+
+        while self.idle and self.idle[0][1] < idle_since:
+            self._close(self.idle.popleft()[0])
+
+    def checkout(self):
+        """ Returns a session from the pool, creating a new one if there are no idle ones. Each session obtained
+        this way must be eventually given back through self.checkin.
+        """
+        if self.is_closed:
+            raise Exception('Session pool to `{}` is closed'.format(self.conn_name))
+
+        if not self.semaphore.acquire(timeout=self.checkout_timeout):
+            msg = 'No free sessions to `{}` after {}s'.format(self.conn_name, self.checkout_timeout)
+            logger.error(msg)
+            raise Exception(msg)
+
+        try:
+            self.close_idle()
+
+            while self.idle:
+                session, _ = self.idle.pop()
+
+                if self.is_valid_func and not self._is_valid(session):
+                    self._close(session)
+                    continue
+
+                return session
+
+            return self.create_func()
+
+        except Exception:
+            self.semaphore.release()
+            raise
+
+    def checkin(self, session, is_reusable=True):
+        """ Gives a session back to the pool. Sessions that are not reusable, e.g. because an exception was raised
+        while they were in use and we cannot tell what state they are in, are closed.
+        """
+        try:
+            if self.is_closed or not is_reusable:
+                self._close(session)
+            else:
+                self.idle.append((session, time()))
+        finally:
+            self.semaphore.release()
+
+    @contextmanager
+    def session(self):
+        """ Returns a session from the pool for the duration of a 'with' block.
+        """
+        session = self.checkout()
+
+        try:
+            yield session
+        except Exception:
+            self.checkin(session, False)
+            raise
+        else:
+            self.checkin(session)
+
+    def close(self):
+        """ Closes all idle sessions. Sessions currently in use will be closed once they are returned to the pool.
+        """
+        self.is_closed = True
+
+        while self.idle:
+            self._close(self.idle.popleft()[0])
+
+# ################################################################################################################################
@@ -8,7 +8,185 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+# stdlib
+from logging import getLogger
+from traceback import format_exc
+
+# gevent
+from gevent import spawn, spawn_later
+from gevent.lock import RLock
+
+# Zato
+from zato.common import SEARCH
+from zato.server.store import BaseStore
+
+# ################################################################################################################################
+
+logger = getLogger(__name__)
+
+# ################################################################################################################################
+
 class SearchAPI(object):
     def __init__(self, es, solr):
         self.es = es
         self.solr = solr
+
+# ################################################################################################################################
+
+class BulkIndexer(object):
+    """ Buffers documents to be indexed and sends them in bulk requests once there are max_docs of them, once they take up
+    max_bytes bytes or flush_interval seconds after the oldest of them was added, whichever comes first.
+
+    Documents are sent in the background or by the greenlet which added the one that filled the buffer up.
+    Each flush returns a list of (doc, error) tuples for documents that could not be indexed, and errors of flushes
+    that run in the background are logged. Callers which need to read their writes should call self.flush themselves.
+
+    Only one flush at a time sends documents, others wait until it is done.
+    """
+    def __init__(self, name, client, max_docs=SEARCH.BULK.DEFAULT.MAX_DOCS, max_bytes=SEARCH.BULK.DEFAULT.MAX_BYTES,
+            flush_interval=SEARCH.BULK.DEFAULT.FLUSH_INTERVAL):
+        self.name = name
+        self.client = client
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.is_closed = False
+        self.lock = RLock()
+
+        # True if documents were sent without being made visible to searches
+        self.needs_refresh = False
+
+        # (doc, entry) tuples, each entry is what self._prepare returned for its doc
+        self.buffer = []
+        self.buffer_bytes = 0
+
+        # Flushes the buffer flush_interval seconds after the first document was added to it
+        self.flusher = None
+
+    def _prepare(self, doc, **kwargs):
+        """ Returns an (entry, size) tuple - what to send for a given document and how many bytes it will take up.
+        """
+        raise NotImplementedError('Should be overridden by subclasses')
+
+    def _send(self, entries, is_sync):
+        """ Sends entries in a single request and returns a list of errors, or Nones for documents indexed successfully,
+        in the same order as entries. is_sync is True if the documents should be visible to searches once this returns.
+        """
+        raise NotImplementedError('Should be overridden by subclasses')
+
+    def _refresh(self):
+        """ Makes all the documents sent so far visible to searches.
+        """
+        raise NotImplementedError('Should be overridden by subclasses')
+
+    def add(self, doc, **kwargs):
+        """ Adds a document to the buffer, flushing it if it is full. Returns errors of the flush, if there was any.
+        """
+        if self.is_closed:
+            raise Exception('Bulk indexer `{}` is closed'.format(self.name))
+
+        entry, size = self._prepare(doc, **kwargs)
+
+        self.buffer.append((doc, entry))
+        self.buffer_bytes += size
+
+        if len(self.buffer) >= self.max_docs or self.buffer_bytes >= self.max_bytes:
+            return self._flush(False)
+
+        if not self.flusher:
+            self.flusher = spawn_later(self.flush_interval, self._flush_on_time)
+
+        return []
+
+    def _log_errors(self, errors):
+        for doc, e in errors:
+            logger.warn('Could not index a document in `%s`, doc:`%r`, e:`%s`', self.name, doc, e)
+
+    def _flush_on_time(self):
+        self.flusher = None
+        self._log_errors(self._flush(False))
+
+    def _flush(self, is_sync):
+
+        if self.flusher:
+            self.flusher.kill(block=False)
+            self.flusher = None
+
+        with self.lock:
+
+            # Documents added while these are being sent go to a new buffer
+            buffer, self.buffer, self.buffer_bytes = self.buffer, [], 0
+
+            # Documents sent earlier on without a refresh, e.g. by a flush this one waited for, need to be visible too,
+            # and sending ours with a refresh would not do it if they went to other indexes or shards.
+            refresh = is_sync and self.needs_refresh
+            errors = self._send_buffer(buffer, is_sync and not refresh) if buffer else []
+
+            if refresh:
+                self._refresh()
+
+            self.needs_refresh = not is_sync and (self.needs_refresh or bool(buffer))
+
+            return errors
+
+    def _send_buffer(self, buffer, is_sync):
+        try:
+            results = self._send([entry for doc, entry in buffer], is_sync)
+        except Exception, e:
+            logger.warn('Could not send %d document(s) to `%s`, e:`%s`', len(buffer), self.name, format_exc(e))
+            results = [e] * len(buffer)
+
+        errors = [(doc, error) for (doc, entry), error in zip(buffer, results) if error is not None]
+
+        logger.debug('Sent %d document(s) to `%s`, errors:%d', len(buffer), self.name, len(errors))
+
+        return errors
+
+    def flush(self):
+        """ Sends all the documents buffered so far and returns once they, and any other ones sent before, are visible
+        to searches.
+        """
+        return self._flush(True)
+
+    def close(self):
+        """ Sends all the documents buffered so far, no new ones can be added afterwards.
+        """
+        self.is_closed = True
+        self._log_errors(self._flush(False))
+
+# ################################################################################################################################
+
+class BulkIndexerStore(BaseStore):
+    """ A base class for stores of search connections, each of which is given a bulk indexer, available as item.bulk.
+    """
+    bulk_indexer_class = None
+
+    def __init__(self, bulk_config=None):
+        super(BulkIndexerStore, self).__init__()
+        self.bulk_config = bulk_config or {}
+
+    def get_bulk_client(self, item):
+        """ Returns a client the bulk indexer of a given item should use.
+        """
+        raise NotImplementedError('Should be overridden by subclasses')
+
+    def _create(self, name, config, **extra):
+        item = super(BulkIndexerStore, self)._create(name, config, **extra)
+
+        if item.is_created:
+            item.bulk = self.bulk_indexer_class(name, self.get_bulk_client(item), **self.bulk_config)
+
+        return item
+
+    def _delete(self, name):
+        item = self.items.get(name)
+
+        # Documents buffered so far are still sent using the connection being deleted, but without holding up
+        # the store's lock until they are.
+        if item and item.get('bulk'):
+            item.bulk.is_closed = True
+            spawn(item.bulk.close)
+
+        super(BulkIndexerStore, self)._delete(name)
+
+# ################################################################################################################################
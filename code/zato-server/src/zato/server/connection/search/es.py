@@ -12,14 +12,55 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 from elasticutils import get_es
 
 # Zato
-from zato.server.store import BaseAPI, BaseStore
+from zato.common.json_ import dumps
+from zato.server.connection.search import BulkIndexer, BulkIndexerStore
+from zato.server.store import BaseAPI
+
+class ElasticSearchBulkIndexer(BulkIndexer):
+    """ Sends documents to ElasticSearch through its bulk API, e.g. item.bulk.add(doc, index='my-index', doc_type='my-type').
+    """
+    def _prepare(self, doc, index, doc_type, id=None, op_type='index'):
+        meta = {'_index': index, '_type': doc_type}
+        if id is not None:
+            meta['_id'] = id
+
+        # Each action takes up two lines of the request, except for deletes which have no document to go with them
+        entry = dumps({op_type: meta}) + '\n'
+        if op_type != 'delete':
+            entry += dumps(doc) + '\n'
+
+        return entry, len(entry)
+
+    def _send(self, entries, is_sync):
+        params = {'refresh': 'true'} if is_sync else {}
+        response = self.client.bulk(''.join(entries), **params)
+
+        errors = []
+        for item in response['items']:
+            result = item.values()[0]
+            error = result.get('error')
+
+            if not error and result.get('status', 200) >= 300:
+                error = 'HTTP {}'.format(result['status'])
+
+            errors.append(error or None)
+
+        return errors
+
+    def _refresh(self):
+        self.client.indices.refresh()
 
 class ElasticSearchAPI(BaseAPI):
     """ API to obtain ElasticSearch connections through.
     """
 
-class ElasticSearchConnStore(BaseStore):
+class ElasticSearchConnStore(BulkIndexerStore):
     """ Stores connections to ElasticSearch.
     """
+    bulk_indexer_class = ElasticSearchBulkIndexer
+
     def create_impl(self, config, config_no_sensitive):
         return get_es(config.hosts.splitlines(), float(config.timeout), send_get_body_as=config.body_as)
+
+    def get_bulk_client(self, item):
+        return item.impl
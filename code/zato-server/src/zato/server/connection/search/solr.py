@@ -12,12 +12,14 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 from logging import getLogger
 
 # pysolr
-from pysolr import Solr
+from pysolr import Solr, SolrError
 
 # Zato
+from zato.common.json_ import dumps
 from zato.common.util import ping_solr
 from zato.server.connection.queue import Wrapper
-from zato.server.store import BaseAPI, BaseStore
+from zato.server.connection.search import BulkIndexer, BulkIndexerStore
+from zato.server.store import BaseAPI
 
 logger = getLogger(__name__)
 
@@ -34,14 +36,64 @@ class SolrWrapper(Wrapper):
         # Create a client now
         self.client.put_client(Solr(self.config.address, timeout=self.config.timeout))
 
+class SolrBulkIndexer(BulkIndexer):
+    """ Sends documents to Solr in batches, e.g. item.bulk.add(doc). Documents sent in the background are not committed
+    so they become visible to searches in line with Solr's own autoCommit settings, unless self.flush is called.
+    """
+    def _prepare(self, doc):
+        return doc, len(dumps(doc))
+
+    def _add_each(self, client, docs):
+        """ Solr rejects all the documents of a request if any of them is invalid so they are sent one by one
+        to find out which ones exactly.
+        """
+        errors = []
+        for doc in docs:
+            try:
+                client.add([doc], commit=False)
+            except Exception, e:
+                errors.append(e)
+            else:
+                errors.append(None)
+
+        return errors
+
+    def _send(self, docs, is_sync):
+        with self.client() as client:
+            try:
+                client.add(docs, commit=is_sync)
+            except SolrError:
+
+                # pysolr raises SolrError with no HTTP status attached both if Solr rejected the request and if it could not
+                # be reached at all, so any such error means documents need to be sent one by one, unless there was just one.
+                if len(docs) == 1:
+                    raise
+
+                errors = self._add_each(client, docs)
+                if is_sync:
+                    client.commit()
+
+                return errors
+
+            return [None] * len(docs)
+
+    def _refresh(self):
+        with self.client() as client:
+            client.commit()
+
 class SolrAPI(BaseAPI):
     """ API to obtain ElasticSearch connections through.
     """
 
-class SolrConnStore(BaseStore):
+class SolrConnStore(BulkIndexerStore):
     """ Stores connections to ElasticSearch.
     """
+    bulk_indexer_class = SolrBulkIndexer
+
     def create_impl(self, _, config_no_sensitive):
         w = SolrWrapper(config_no_sensitive)
         w.build_queue()
         return w
+
+    def get_bulk_client(self, item):
+        return item.impl.client
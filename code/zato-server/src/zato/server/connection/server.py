@@ -118,7 +118,12 @@ class Servers(object):
         # Remote server = use HTTP
         server_name, cluster_name = self._get_full_name(item)
         full_name = '{}@{}'.format(server_name, cluster_name)
-        return self._servers.setdefault(full_name, self._add_server(cluster_name, server_name))
+
+        server = self._servers.get(full_name)
+        if not server:
+            server = self._servers[full_name] = self._add_server(cluster_name, server_name)
+
+        return server
 
 # ################################################################################################################################
 
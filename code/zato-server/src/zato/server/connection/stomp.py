@@ -10,17 +10,21 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 # stdlib
 from logging import getLogger
+from traceback import format_exc
 
 # gevent
 from gevent import spawn
+from gevent.lock import RLock
+from gevent.pool import Pool
 
 # stompest
 from stompest.config import StompConfig
 from stompest.error import StompConnectionError
+from stompest.protocol import StompSpec
 from stompest.sync import Stomp
 
 # Zato
-from zato.common import CHANNEL as common_channel
+from zato.common import CHANNEL as common_channel, STOMP
 from zato.common.broker_message import CHANNEL, OUTGOING
 from zato.common.util import new_cid
 from zato.server.connection import BaseConnPoolStore, BasePoolAPI
@@ -38,22 +42,77 @@ class STOMPConnection(Stomp):
 
 # ################################################################################################################################
 
+def _handle_frame(session, frame, worker, service_name, needs_ack, send_lock, _stomp_channel=common_channel.STOMP,
+        _message=StompSpec.MESSAGE, _version_1_0=StompSpec.VERSION_1_0):
+
+    try:
+        worker.on_message_invoke_service({
+            'cid': new_cid(),
+            'service': service_name,
+            'payload': frame
+        }, _stomp_channel, 'STOMP_CHANNEL_MSG')
+    except Exception, e:
+        is_ok = False
+        logger.warn('Could not handle STOMP frame `%s`, e:`%s`', frame.info(), format_exc(e))
+    else:
+        is_ok = True
+
+    if needs_ack and frame.command == _message:
+
+        # Handlers run concurrently but only one of them at a time may write to the connection
+        with send_lock:
+            try:
+                if is_ok:
+                    session.ack(frame)
+
+                # There is no NACK in STOMP 1.0 so failed messages are acknowledged as well - otherwise, redelivered only
+                # once the connection is closed, each of them would use up a place within the prefetch limit until
+                # the broker stopped sending anything to the channel.
+                elif frame.version == _version_1_0:
+                    logger.warn('Acknowledging STOMP 1.0 frame `%s` that could not be handled', frame.info())
+                    session.ack(frame)
+
+                else:
+                    session.nack(frame)
+
+            except StompConnectionError, e:
+                if session.keep_running:
+                    logger.warn('Could not acknowledge STOMP frame `%s`, e:`%s`', frame.info(), format_exc(e))
+
 def _channel_main_loop(item, worker):
     session = item.conn
-    stomp_channel = common_channel.STOMP
     service_name = item.config.service_name
 
+    misc = worker.server.fs_server_config.misc
+    ack_mode = misc.get('stomp_channel_ack_mode') or STOMP.ACK_MODE.AUTO.id
+    prefetch = int(misc.get('stomp_channel_prefetch') or STOMP.DEFAULT.PREFETCH)
+    pool_size = int(misc.get('stomp_channel_pool_size') or STOMP.DEFAULT.POOL_SIZE)
+
+    # With client acknowledgements, a message is not lost if we stop before it is handled
+    needs_ack = ack_mode == STOMP.ACK_MODE.CLIENT_INDIVIDUAL.id
+
+    headers = {StompSpec.ACK_HEADER: ack_mode}
+    if needs_ack:
+        # Prefetch headers are broker-specific, respectively ActiveMQ and RabbitMQ ones
+        headers['activemq.prefetchSize'] = str(prefetch)
+        headers['prefetch-count'] = str(prefetch)
+
     for name in item.config.sub_to.splitlines():
-        session.subscribe(name)
+        name = name.strip()
+        if name:
+            sub_headers = dict(headers)
+            sub_headers[StompSpec.ID_HEADER] = name
+            session.subscribe(name, sub_headers)
+
+    pool = Pool(pool_size)
+    send_lock = RLock()
 
     try:
         while session.keep_running:
             frame = session.receiveFrame()
-            worker.on_message_invoke_service({
-                'cid': new_cid(),
-                'service': service_name,
-                'payload': frame
-            }, stomp_channel, 'STOMP_CHANNEL_MSG')
+
+            # Blocks if all handlers are busy so no more frames are read until one of them is done
+            pool.spawn(_handle_frame, session, frame, worker, service_name, needs_ack, send_lock)
 
     except StompConnectionError:
 
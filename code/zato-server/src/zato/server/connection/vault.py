@@ -12,7 +12,10 @@ from gevent.monkey import patch_all
 patch_all()
 
 # stdlib
+from collections import OrderedDict
+from hashlib import sha256
 from logging import basicConfig, getLogger, INFO
+from time import time as _now
 from traceback import format_exc
 
 # Bunch
@@ -24,9 +27,10 @@ from gevent.lock import RLock
 
 # Vault
 from hvac import Client
+from hvac.exceptions import Forbidden, InvalidPath, InvalidRequest, Unauthorized
 
 # Zato
-from zato.common import VAULT
+from zato.common import VAULT, VAULT_AUTH_CACHE
 
 # ################################################################################################################################
 
@@ -38,14 +42,15 @@ logger = getLogger(__name__)
 class VaultResponse(object):
     """ A convenience class to hold individual attributes of responses from Vault.
     """
-    __slots__ = ('action', 'client_token', 'lease_duration', 'accessor', 'policies')
+    __slots__ = ('action', 'client_token', 'lease_duration', 'accessor', 'policies', 'ttl')
 
-    def __init__(self, action=None, client_token=None, lease_duration=None, accessor=None, policies=None):
+    def __init__(self, action=None, client_token=None, lease_duration=None, accessor=None, policies=None, ttl=None):
         self.action = action
         self.client_token = client_token
         self.lease_duration = lease_duration
         self.accessor = accessor
         self.policies = policies
+        self.ttl = ttl
 
     def __str__(self):
         attrs = []
@@ -69,6 +74,9 @@ class VaultResponse(object):
         if has_lease_duration:
             vr.lease_duration = auth['lease_duration']
 
+        # Only token lookups return it - how many seconds the token has left before it expires, 0 if it never does
+        vr.ttl = auth.get('ttl')
+
         return vr
 
 # ################################################################################################################################
@@ -108,8 +116,166 @@ class _Client(Client):
 
 # ################################################################################################################################
 
+# Responses from Vault meaning that credentials are invalid, as opposed to Vault being unavailable
+_auth_errors = (Forbidden, InvalidPath, InvalidRequest, Unauthorized)
+
+# ################################################################################################################################
+
+class _AuthCacheEntry(object):
+    __slots__ = ('response', 'expires_at', 'renew_at', 'is_renewing')
+
+    def __init__(self, response):
+        self.response = response
+        self.expires_at = None
+        self.renew_at = None
+        self.is_renewing = False
+
+# ################################################################################################################################
+
+class AuthCache(object):
+    """ Caches results of successful authentication with Vault, keyed by a hash of credentials, for as long as Vault reports
+    tokens to be valid. Tokens that clients keep using are renewed in background before their lease ends. Failed attempts
+    are cached too, though for a few seconds only and up to a limit, so that clients repeating invalid credentials
+    are not let through to Vault each time.
+
+    Tokens revoked in Vault are still accepted until their cache entries expire - for up to token_ttl seconds
+    in the case of token lookups and up to max_ttl seconds, or until the end of their leases if sooner,
+    for other authentication methods.
+    """
+    def __init__(self, client, max_size=VAULT_AUTH_CACHE.DEFAULT.MAX_SIZE, token_ttl=VAULT_AUTH_CACHE.DEFAULT.TOKEN_TTL,
+            negative_ttl=VAULT_AUTH_CACHE.DEFAULT.NEGATIVE_TTL, negative_max_size=VAULT_AUTH_CACHE.DEFAULT.NEGATIVE_MAX_SIZE,
+            renew_after=VAULT_AUTH_CACHE.DEFAULT.RENEW_AFTER, max_ttl=VAULT_AUTH_CACHE.DEFAULT.MAX_TTL):
+        self.client = client
+        self.max_size = max_size
+        self.token_ttl = token_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.negative_max_size = negative_max_size
+        self.renew_after = renew_after
+
+        # Both map credential hashes to entries, in the order of insertion so that the oldest ones are evicted first
+        self.positive = OrderedDict()
+        self.negative = OrderedDict() # Values are (exception, expires_at) tuples
+
+        # Statistics only
+        self.hits = 0
+        self.misses = 0
+
+# ################################################################################################################################
+
+    def _get_key(self, auth_method, credentials):
+        key = sha256(auth_method.encode('utf8'))
+
+        for elem in credentials:
+            key.update(b'\0')
+            key.update((elem or '').encode('utf8'))
+
+        return key.hexdigest()
+
+    def _set_expiry(self, entry, now):
+        lease_duration = entry.response.lease_duration
+
+        # Token lookups have no lease but a token is never cached for longer than it is valid for
+        if lease_duration:
+
+            # Nor does a long lease keep a token cached for as long, in case it is revoked in the meantime - tokens that
+            # clients keep using are renewed, and so confirmed to be still valid, before their entries expire.
+            duration = min(lease_duration, self.max_ttl) if self.max_ttl else lease_duration
+            entry.expires_at = now + duration
+            entry.renew_at = now + duration * self.renew_after
+        else:
+            ttl = entry.response.ttl
+            entry.expires_at = now + (min(ttl, self.token_ttl) if ttl else self.token_ttl)
+            entry.renew_at = None
+
+    def _add(self, cache, max_size, key, value):
+        cache.pop(key, None)
+
+        if len(cache) >= max_size:
+            cache.popitem(False)
+
+        cache[key] = value
+
+# ################################################################################################################################
+
+    def _renew(self, entry):
+        try:
+            response = self.client.renew(entry.response.client_token)
+        except Exception, e:
+            logger.warn('Could not renew Vault token, accessor:`%s`, e:`%s`', entry.response.accessor, format_exc(e))
+
+            # There will be no further attempts, the entry will expire with its lease
+            entry.renew_at = None
+        else:
+            entry.response.lease_duration = response.lease_duration
+            self._set_expiry(entry, _now())
+        finally:
+            entry.is_renewing = False
+
+# ################################################################################################################################
+
+    def authenticate(self, auth_method, *credentials):
+        """ Same as _Client.authenticate but consults the cache first.
+        """
+        if not self.max_size:
+            return self.client.authenticate(auth_method, *credentials)
+
+        key = self._get_key(auth_method, credentials)
+        now = _now()
+
+        entry = self.positive.get(key)
+        if entry:
+            if entry.expires_at > now:
+                self.hits += 1
+
+                if entry.renew_at and entry.renew_at <= now and not entry.is_renewing:
+                    entry.is_renewing = True
+                    spawn(self._renew, entry)
+
+                return entry.response
+            else:
+                del self.positive[key]
+
+        negative = self.negative.get(key)
+        if negative:
+            e, expires_at = negative
+            if expires_at > now:
+                self.hits += 1
+                raise e
+            else:
+                del self.negative[key]
+
+        self.misses += 1
+
+        try:
+            response = self.client.authenticate(auth_method, *credentials)
+        except _auth_errors, e:
+            if self.negative_ttl:
+                self._add(self.negative, self.negative_max_size, key, (e, _now() + self.negative_ttl))
+            raise
+
+        if response:
+            entry = _AuthCacheEntry(response)
+            self._set_expiry(entry, _now())
+            self._add(self.positive, self.max_size, key, entry)
+
+        return response
+
+# ################################################################################################################################
+
+    def get_stats(self):
+        return {
+            'size': len(self.positive),
+            'negative_size': len(self.negative),
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+# ################################################################################################################################
+
 class _VaultConn(object):
-    def __init__(self, name, url, token, service_name, tls_verify, timeout, allow_redirects, client_class=_Client):
+    def __init__(self, name, url, token, service_name, tls_verify, timeout, allow_redirects, client_class=_Client,
+            auth_cache_config=None):
         self.name = name
         self.url = url
         self.token = token
@@ -119,15 +285,17 @@ class _VaultConn(object):
         self.allow_redirects = allow_redirects
         self.client = client_class(self.url, self.token, verify=self.tls_verify, timeout=self.timeout,
                 allow_redirects=self.allow_redirects)
+        self.auth_cache = AuthCache(self.client, **(auth_cache_config or {}))
 
 # ################################################################################################################################
 
 class VaultConnAPI(object):
     """ An API through which connections to Vault are established and managed.
     """
-    def __init__(self, config_list=None):
+    def __init__(self, config_list=None, auth_cache_config=None):
         self.config = Bunch()
         self.lock = RLock()
+        self.auth_cache_config = auth_cache_config or {}
 
         for config in config_list or []:
             self.create(config)
@@ -147,6 +315,11 @@ class VaultConnAPI(object):
     def get_client(self, name):
         return self.config[name].client
 
+# ################################################################################################################################
+
+    def get_auth_cache(self, name):
+        return self.config[name].auth_cache
+
 # ################################################################################################################################
 
     def _ping(self, name):
@@ -165,7 +338,7 @@ class VaultConnAPI(object):
     def _create(self, config):
         conn = _VaultConn(
             config.name, config.url, config.token, config.get('service_name'), config.tls_verify, config.timeout,
-            config.allow_redirects)
+            config.allow_redirects, auth_cache_config=self.auth_cache_config)
         self.config[config.name] = conn
         self.ping(config.name)
 
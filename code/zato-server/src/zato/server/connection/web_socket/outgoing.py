@@ -9,12 +9,17 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 # stdlib
+from collections import OrderedDict
 from contextlib import closing
 from logging import getLogger
+from time import time
 
 # Bunch
 from bunch import bunchify
 
+# gevent
+from gevent import joinall, spawn
+
 # Zato
 from zato.common import WEB_SOCKET
 from zato.common.odb.query import web_socket_client_list
@@ -28,12 +33,93 @@ _pattern = WEB_SOCKET.PATTERN
 class OutgoingWebSocket(object):
     """ Lets services send outgoing messages to WebSocket clients.
     """
-    def __init__(self, cluster_id, servers_api, odb_session_maker):
+    def __init__(self, cluster_id, servers_api, odb_session_maker, client_cache_ttl=WEB_SOCKET.DEFAULT.CLIENT_CACHE_TTL,
+            client_cache_max_size=WEB_SOCKET.DEFAULT.CLIENT_CACHE_MAX_SIZE):
         self.cluster_id = cluster_id
         self.servers_api = servers_api
         self.odb_session_maker = odb_session_maker
+        self.client_cache_ttl = client_cache_ttl
+        self.client_cache_max_size = client_cache_max_size
+
+        # (is_by_ext_id, is_by_channel, pattern) -> (expires_at, clients), in the order of insertion. All entries
+        # have the same TTL so this is also the order in which they expire.
+        self.client_cache = OrderedDict()
+
+        # Incremented each time the cache is invalidated so that results of lookups that started before that are not cached
+        self.client_cache_generation = 0
+
+# ################################################################################################################################
+
+    def invalidate_client_cache(self):
+        """ Drops all clients looked up so far, e.g. because a client connected to or disconnected from this worker.
+        Changes made in other workers or servers are picked up once their respective cache entries expire.
+        """
+        self.client_cache.clear()
+        self.client_cache_generation += 1
+
+# ################################################################################################################################
+
+    def _add_to_client_cache(self, key, value, now):
+        """ Adds a new entry to the cache, first dropping the ones that already expired and, if the cache is still full,
+        the oldest one.
+        """
+        cache = self.client_cache
+        cache.pop(key, None)
+
+        while cache:
+            oldest_key = next(iter(cache))
+            if cache[oldest_key][0] >= now and len(cache) < self.client_cache_max_size:
+                break
+            del cache[oldest_key]
+
+        cache[key] = value
+
+# ################################################################################################################################
+
+    def get_clients(self, is_by_ext_id, is_by_channel, pattern, _time=time):
+        """ Returns all WebSocket clients subscribed to a given pattern, either from cache or from ODB.
+        No lock is held while ODB is queried so that deliveries to other clients do not wait for it.
+        """
+        key = (is_by_ext_id, is_by_channel, pattern)
+        now = _time()
+
+        expires_at, clients = self.client_cache.get(key, (0, None))
+
+        if expires_at < now:
+            generation = self.client_cache_generation
+
+            with closing(self.odb_session_maker.session()) as session:
+                clients = []
+                for item, channel_name in web_socket_client_list(
+                        session, self.cluster_id, is_by_ext_id, is_by_channel, pattern).all():
+                    item = bunchify(item.asdict())
+                    item.channel_name = channel_name
+                    clients.append(item)
 
-    def invoke(self, request, id=None, channel=None, pattern=None):
+            if generation == self.client_cache_generation:
+                self._add_to_client_cache(key, (now + self.client_cache_ttl, clients), now)
+
+        return clients
+
+# ################################################################################################################################
+
+    def _deliver(self, server_name, pid, request, clients):
+        """ Delivers a request to all clients of a single worker process in one call and returns their responses
+        keyed by each client's public ID.
+        """
+        response = self.servers_api[server_name].invoke('zato.channel.web-socket.client.deliver-request', {
+            'request': request,
+            'client_list': [{'pub_client_id': item.pub_client_id, 'channel_name': item.channel_name} for item in clients],
+        }, pid=pid)
+
+        return response['response']
+
+# ################################################################################################################################
+
+    def invoke(self, request, id=None, channel=None, pattern=None, timeout=WEB_SOCKET.DEFAULT.DELIVERY_TIMEOUT):
+        """ Sends a request to all WebSocket clients matching the input criteria and returns their responses,
+        as described in self.deliver.
+        """
         if not any((id, channel, pattern)):
             raise ValueError('At least one of `id`, `channel` or `pattern` parameters is required')
 
@@ -45,22 +131,51 @@ class OutgoingWebSocket(object):
         else:
             p = _pattern.BY_EXT_ID.format(id) if is_by_ext_id else _pattern.BY_CHANNEL.format(channel)
 
+        return self.deliver(request, self.get_clients(is_by_ext_id, is_by_channel, p), timeout)
+
+# ################################################################################################################################
+
+    def deliver(self, request, clients, timeout=WEB_SOCKET.DEFAULT.DELIVERY_TIMEOUT):
+        """ Sends a request to WebSocket clients given on input and returns their responses. Clients are grouped
+        by the worker process they are connected to and each worker receives all of its clients in one call,
+        with all workers invoked concurrently. Responses from workers that did not reply within timeout seconds
+        or that raised an exception are not included in the result.
+        """
+        # (server_name, PID) -> clients connected to that worker process
+        by_worker = {}
+
+        for item in clients:
+            by_worker.setdefault((item.server_name, item.server_proc_pid), []).append(item)
+
+        greenlets = {}
+        for (server_name, pid), clients in by_worker.items():
+            greenlets[spawn(self._deliver, server_name, pid, request, clients)] = (server_name, pid, clients)
+
+        joinall(greenlets.keys(), timeout=timeout)
+
         # All individual responses from each WebSocket client that received this request
         responses = []
 
-        with closing(self.odb_session_maker.session()) as session:
+        for greenlet, (server_name, pid, clients) in greenlets.items():
+
+            if not greenlet.ready():
+                greenlet.kill(block=False)
+                logger.warn('Delivery to %d WebSocket client(s) in %s:%s did not complete within %ss',
+                    len(clients), server_name, pid, timeout)
+                continue
 
-            for item, channel_name in web_socket_client_list(session, self.cluster_id, is_by_ext_id, is_by_channel, p).all():
+            if not greenlet.successful():
+                logger.warn('Could not deliver a request to %d WebSocket client(s) in %s:%s, e:`%s`',
+                    len(clients), server_name, pid, greenlet.exception)
+                continue
 
-                item = bunchify(item.asdict())
+            worker_responses = greenlet.value
 
-                logger.warn('zzzz %r', item)
+            for item in clients:
 
-                response = self.servers_api[item.server_name].invoke('zato.channel.web-socket.client.deliver-request', {
-                    'pub_client_id': item.pub_client_id,
-                    'channel_name': channel_name,
-                    'request': request,
-                }, pid=item.server_proc_pid)
+                # The client may have disconnected in the meantime
+                if item.pub_client_id not in worker_responses:
+                    continue
 
                 responses.append({
                     'ext_client_id': item.ext_client_id,
@@ -68,7 +183,7 @@ class OutgoingWebSocket(object):
                     'local_address': item.local_address,
                     'peer_address': item.peer_address,
                     'peer_fqdn': item.peer_fqdn,
-                    'response': response['response']
+                    'response': worker_responses[item.pub_client_id]
                 })
 
         return responses
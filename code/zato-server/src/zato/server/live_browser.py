@@ -9,20 +9,23 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 # stdlib
-from contextlib import closing
+import re
+from itertools import count
+from logging import getLogger
+from traceback import format_exc
+
+# Bunch
+from bunch import bunchify
 
 # gevent
 from gevent import spawn
 
-# SQLAlchemy
-from sqlalchemy import and_
+# Zato
+from zato.common.odb.model import ChannelWebSocket, WebSocketClient, WebSocketMsgBrowserSub
 
-# TextBlob
-from textblob import TextBlob
+# ################################################################################################################################
 
-# Zato
-from zato.common import WEB_SOCKET
-from zato.common.odb.model import Server, WebSocketClient, WebSocketSubscription
+logger = getLogger(__name__)
 
 # ################################################################################################################################
 
@@ -30,37 +33,178 @@ _wsgi_ignore = ('HTTP_ACCEPT', 'zato.oauth.post_data', 'zato.channel_item', 'zat
     'zato.http.POST')
 _wsgi_sub_dicts = ('zato.http.response.headers', 'zato.http.GET', 'zato.http.POST')
 
+# Words, possibly hyphenated, e.g. 'aaa' or '111-qqq'
+_word_re = re.compile(r'\w+(?:-\w+)*', re.UNICODE)
+
+# Details of WebSocket clients needed to deliver messages to them
+_client_columns = ('pub_client_id', 'ext_client_id', 'ext_client_name', 'local_address', 'peer_address', 'peer_fqdn',
+    'server_name', 'server_proc_pid')
+
+# Services that deliver messages to WebSocket clients - were they matched too, each message delivered would be matched again
+_no_notify_prefix = 'zato.channel.web-socket.'
+
 # ################################################################################################################################
 
+def get_words(text, _findall=_word_re.findall):
+    """ Returns a set of lower-cased words extracted out of text. Each part of a hyphenated word is a word on its own too,
+    i.e. '111-qqq' results in '111-qqq', '111' and 'qqq'.
+    """
+    words = set()
+    for word in _findall(text.lower()):
+        words.add(word)
+        if '-' in word:
+            words.update(word.split('-'))
+
+    return words
+
 def match_pattern(text, pattern):
     """ Returns True if every element in pattern is contained in words extracted ouf of text,
     pattern is assumed to be a set of lower-cased string elements.
     """
-    return pattern <= set(elem.lower() for elem in TextBlob(text).words)
+    return pattern <= get_words(text)
 
 # ################################################################################################################################
 
+def get_client_details(client, channel_name):
+    """ Returns a dictionary of details of a WebSocket client that messages are delivered to it with.
+    """
+    out = dict((name, getattr(client, name)) for name in _client_columns)
+    out['channel_name'] = channel_name
+
+    return out
+
 def live_browser_patterns(session, cluster_id):
-    return session.query(WebSocketClient.ext_client_id, WebSocketSubscription.pattern).\
-        filter(WebSocketSubscription.client_id==WebSocketClient.id).\
-        filter(Server.cluster_id==cluster_id).\
-        filter(and_(
-            WebSocketSubscription.is_by_ext_id.is_(False),
-            WebSocketSubscription.is_by_channel.is_(False))).\
-        outerjoin(Server, Server.id==WebSocketClient.server_id).\
-        all()
+    """ Returns details of each WebSocket client subscribed to live message browser patterns, one dictionary
+    for each of its patterns, under the 'pattern' key.
+    """
+    columns = [getattr(WebSocketClient, name) for name in _client_columns]
+    columns.append(ChannelWebSocket.name.label('channel_name'))
+    columns.append(WebSocketMsgBrowserSub.pattern)
+
+    return [item._asdict() for item in session.query(*columns).\
+        filter(WebSocketMsgBrowserSub.cluster_id==cluster_id).\
+        filter(WebSocketMsgBrowserSub.client_id==WebSocketClient.id).\
+        outerjoin(ChannelWebSocket, ChannelWebSocket.id==WebSocketClient.channel_id).\
+        order_by(WebSocketMsgBrowserSub.id).\
+        all()]
 
 # ################################################################################################################################
 
-def notify_msg_browser(service, step):
+class PatternIndex(object):
+    """ In-memory subscriptions of live message browsers. Each client is subscribed to a set of words all of which need to
+    be found in a message for the client to be notified. Words are kept in an inverted index, word -> clients, so that
+    a message is tokenized once and all subscriptions are matched in a single pass over its words. Updated in place
+    as clients subscribe and unsubscribe.
+    """
+    def __init__(self, sample_every=1):
+
+        # Only each N-th message is matched, 1 = all of them
+        self.sample_every = max(int(sample_every or 1), 1)
+        self._counter = count(1)
 
-    with closing(service.odb.session()) as session:
+        # pub_client_id -> set of words
+        self.subs = {}
 
+        # pub_client_id -> client details, as returned by get_client_details
+        self.clients = {}
+
+        # word -> set of pub_client_id
+        self.index = {}
+
+    def load(self, patterns):
+        """ Populates the index out of client details, one for each pattern, as returned by live_browser_patterns.
+        """
+        clients = {}
         subs = {}
-        for ext_client_id, pattern in live_browser_patterns(session, service.server.cluster_id):
-            pattern = pattern.replace(WEB_SOCKET.PATTERN.MSG_BROWSER_PREFIX, '', 1)
-            patterns = subs.setdefault(ext_client_id, set())
-            patterns.add(pattern)
+
+        for item in patterns:
+            item = dict(item)
+            pattern = item.pop('pattern')
+            clients[item['pub_client_id']] = item
+            subs.setdefault(item['pub_client_id'], set()).add(pattern)
+
+        self.subs.clear()
+        self.clients.clear()
+        self.index.clear()
+
+        for pub_client_id, words in subs.items():
+            self.subscribe(clients[pub_client_id], words)
+
+    def subscribe(self, client, words):
+        """ Subscribes a client to messages containing all the words given on input, replacing its previous subscription.
+        """
+        pub_client_id = client['pub_client_id']
+        self.unsubscribe(pub_client_id)
+
+        words = set(word.lower() for word in words if word)
+        if not words:
+            return
+
+        self.subs[pub_client_id] = words
+        self.clients[pub_client_id] = bunchify(client)
+
+        for word in words:
+            self.index.setdefault(word, set()).add(pub_client_id)
+
+    def unsubscribe(self, pub_client_id):
+        self.clients.pop(pub_client_id, None)
+
+        for word in self.subs.pop(pub_client_id, ()):
+            clients = self.index[word]
+            clients.discard(pub_client_id)
+            if not clients:
+                del self.index[word]
+
+    def should_match(self):
+        """ Returns True if the next message should be matched at all - there must be subscriptions and the message
+        must be among the sampled ones. Checked before a message is turned into text so that nothing is computed needlessly.
+        """
+        if not self.subs:
+            return False
+
+        return self.sample_every == 1 or next(self._counter) % self.sample_every == 0
+
+    def match(self, text):
+        """ Returns details of all clients whose words are all found in text.
+        """
+        index = self.index
+        matched = {}
+
+        for word in get_words(text):
+            for pub_client_id in index.get(word, ()):
+                matched[pub_client_id] = matched.get(pub_client_id, 0) + 1
+
+        subs = self.subs
+        clients = self.clients
+
+        return [clients[pub_client_id] for pub_client_id, found in matched.items() if found == len(subs[pub_client_id])]
+
+# ################################################################################################################################
+
+def notify_msg_browser(service, step):
+    """ Delivers a service's request to all live message browsers subscribed to words found in it. Errors are logged
+    and never stop the service from handling the request.
+    """
+    try:
+        _notify_msg_browser(service, step)
+    except Exception, e:
+        logger.warn('Could not notify live message browsers, service:`%s`, e:`%s`', service.name, format_exc(e))
+
+def _notify_msg_browser(service, step):
+
+    if service.name.startswith(_no_notify_prefix):
+        return
+
+    server = service.server
+
+    if service.name.startswith('zato') and not server.live_msg_browser.include_internal:
+        return
+
+    index = server.msg_browser_index
+    if not index.should_match():
+        return
+
+    wsgi_environ = service.wsgi_environ or {}
 
     # All metadata
     meta = []
@@ -68,7 +212,7 @@ def notify_msg_browser(service, step):
     # WSGI keys and values of interest
     wsgi = []
 
-    for key, value in sorted(service.wsgi_environ.items()):
+    for key, value in sorted(wsgi_environ.items()):
 
         if key.startswith('SERVER_'):
             continue
@@ -91,21 +235,24 @@ def notify_msg_browser(service, step):
         wsgi.append('{} {}'.format(key.lower(), value.lower()))
 
     for _sub_dict in _wsgi_sub_dicts:
-        for key, value in service.wsgi_environ[_sub_dict].items():
+        for key, value in (wsgi_environ.get(_sub_dict) or {}).items():
             wsgi.append('{} {}'.format(key.lower(), value.lower()))
 
     channel_name = service.channel.name or 'invoker'
     wsgi_text = ' '.join(wsgi).strip() or ''
     meta = ' '.join([step, service.channel.type, channel_name, wsgi_text])
 
-    # Concatenation of input data + WSGI + other metadata
-    text = ('{} {}'.format(meta, service.request.raw_request.lower())).strip()
+    # Services invoked by other ones may have been given requests other than strings, e.g. dictionaries
+    raw_request = service.request.raw_request
+    if not isinstance(raw_request, basestring):
+        raw_request = '{}'.format(raw_request)
 
-    # Match all data against each subscription
-    for ext_client_id, pattern in subs.items():
+    # Concatenation of input data + WSGI + other metadata
+    text = ('{} {}'.format(meta, raw_request.lower())).strip()
 
-        # Ok, something matched, send that client a notification
-        if match_pattern(text, pattern):
-            spawn(service.out.websockets.invoke, {'meta':meta, 'request':service.request.raw_request}, id=ext_client_id)
+    # Match all data against all subscriptions at once and notify all the clients that matched
+    clients = index.match(text)
+    if clients:
+        spawn(service.out.websockets.deliver, {'meta':meta, 'request':raw_request}, clients)
 
 # ################################################################################################################################
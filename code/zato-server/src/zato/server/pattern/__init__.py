@@ -12,11 +12,38 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 from bunch import Bunch
 from json import dumps, loads
 from logging import DEBUG, getLogger
+from traceback import format_exc
+
+# gevent
+from gevent import spawn
+from gevent.event import Event
+
+# Zato
+from zato.common import CHANNEL
+from zato.common.util import new_cid
 
 logger = getLogger(__name__)
 
 JSON_KEYS = ('source', 'on_final', 'on_target', 'data', 'req_ts_utc')
 
+# (pattern name, CID) -> _LocalCall for calls whose targets all run in current worker process
+_local_calls = {}
+
+class _LocalCall(object):
+    """ State of a parallel call whose targets all run in current worker process.
+    """
+    __slots__ = ('cid', 'source', 'req_ts_utc', 'on_final', 'on_target', 'remaining', 'data', 'event')
+
+    def __init__(self, cid, source, req_ts_utc, on_final, on_target, remaining):
+        self.cid = cid
+        self.source = source
+        self.req_ts_utc = req_ts_utc
+        self.on_final = on_final
+        self.on_target = on_target
+        self.remaining = remaining
+        self.data = {}
+        self.event = Event()
+
 class ParallelBase(object):
     """ Base class containing code common across both fan-out/fan-in and parallel execution features.
     """
@@ -34,12 +61,14 @@ class ParallelBase(object):
         self.source = source
         self.cid = source.cid
 
-    def invoke(self, targets, on_final, on_target=None, cid=None):
+    def invoke(self, targets, on_final, on_target=None, cid=None, is_local=False):
         """ Invokes targets collecting their responses, can be both as a whole or individual ones,
-        and executes callback(s).
+        and executes callback(s). If is_local is True, all targets are invoked in current worker process
+        and their completion is tracked in RAM rather than in KVDB.
         """
-        # Can be user-provided or what our source gave us
-        cid = cid or self.cid
+        # Can be user-provided or what our source gave us. Local calls are tracked by their CIDs
+        # so each one needs a new CID, otherwise calls from the same source would overwrite one another.
+        cid = cid or (new_cid() if is_local else self.cid)
 
         on_final = [on_final] if isinstance(on_final, basestring) else on_final
         on_target = [on_target] if isinstance(on_target, basestring) else on_target
@@ -47,26 +76,104 @@ class ParallelBase(object):
         on_final = on_final or ''
         on_target = on_target or ''
 
-        # Keep everything under a distributed lock
-        with self.source.lock(self.lock_pattern.format(cid)):
+        if is_local:
+            return self._invoke_local(targets, on_final, on_target, cid)
 
-            # Store information how many targets there were + info on what to invoke when they complete
-            self.source.kvdb.conn.set(self.counter_pattern.format(cid), len(targets))
-            self.source.kvdb.conn.hmset(self.data_pattern.format(cid), {
+        # Store information how many targets there were + info on what to invoke when they complete.
+        # Nothing can complete before all of it is stored so there is no need for a distributed lock.
+        with self.source.kvdb.conn.pipeline() as pipeline:
+            pipeline.set(self.counter_pattern.format(cid), len(targets))
+            pipeline.hmset(self.data_pattern.format(cid), {
                   'source': self.source.name,
                   'on_final': dumps(on_final),
                   'on_target': dumps(on_target),
                   'req_ts_utc': self.source.time.utcnow()
                 })
+            pipeline.execute()
 
-            # Invoke targets
-            for name, payload in targets.items():
-                to_json_string = False if isinstance(payload, basestring) else True
-                self.source.invoke_async(name, payload, self.call_channel, to_json_string=to_json_string,
-                    zato_ctx={self.request_ctx_cid_key: cid})
+        # Invoke targets
+        for name, payload in targets.items():
+            to_json_string = False if isinstance(payload, basestring) else True
+            self.source.invoke_async(name, payload, self.call_channel, to_json_string=to_json_string,
+                zato_ctx={self.request_ctx_cid_key: cid})
 
         return cid
 
+    def _invoke_local(self, targets, on_final, on_target, cid):
+        """ Invokes each target in a greenlet of its own and tracks their completion in RAM.
+        """
+        if not targets:
+            return cid
+
+        call = _local_calls[(self.pattern_name, cid)] = _LocalCall(
+            cid, self.source.name, self.source.time.utcnow(), on_final, on_target, len(targets))
+
+        for name, payload in targets.items():
+            spawn(self._invoke_local_target, call, name, payload)
+
+        return cid
+
+    def _invoke_local_target(self, call, name, payload):
+        try:
+            # Targets get the same context as when invoked asynchronously
+            response, exception = self.source.invoke(name, payload, CHANNEL.INVOKE, wsgi_environ={
+                'zato.request_ctx.{}'.format(self.request_ctx_cid_key): call.cid}), None
+        except Exception, e:
+            response, exception = None, format_exc(e)
+
+        try:
+            self._on_local_target_finished(call, name, response, exception)
+        except Exception, e:
+            logger.warn('(%s) Could not handle a response from `%s`, e:`%s`', self.pattern_name, name, format_exc(e))
+
+    def _on_local_target_finished(self, call, name, response, exception):
+
+        data = Bunch()
+        data.cid = call.cid
+        data.resp_ts_utc = self.source.time.utcnow()
+        data.response = response
+        data.exception = exception
+        data.ok = False if exception else True
+        data.source = call.source
+        data.target = name
+        data.req_ts_utc = call.req_ts_utc
+
+        call.data[name] = data
+
+        if logger.isEnabledFor(DEBUG):
+            logger.debug('(%s) Before on_target callbacks `%s` after `%s`', self.pattern_name, call.on_target, name)
+
+        self.invoke_callbacks(self.source, data, call.on_target, self.on_target_channel, call.cid)
+
+        # Was it the last parallel call?
+        call.remaining -= 1
+        if not call.remaining:
+
+            # Waiters are woken up and the call is forgotten even if on_final callbacks could not be invoked
+            try:
+                if self.needs_on_final:
+
+                    if logger.isEnabledFor(DEBUG):
+                        logger.debug('(%s) Before on_final callbacks `%s` after `%s`', self.pattern_name, call.on_final, name)
+
+                    self.invoke_callbacks(self.source, {
+                        'source': call.source,
+                        'on_final': call.on_final,
+                        'on_target': call.on_target,
+                        'req_ts_utc': call.req_ts_utc,
+                        'data': call.data,
+                    }, call.on_final, self.on_final_channel, call.cid)
+            finally:
+                call.event.set()
+                _local_calls.pop((self.pattern_name, call.cid), None)
+
+    def wait(self, cid, timeout=None):
+        """ Waits until all targets of a call invoked with is_local=True complete. Returns True if they did,
+        or if no such call is currently running, and False if timeout was reached.
+        """
+        call = _local_calls.get((self.pattern_name, cid))
+        return call.event.wait(timeout) if call else True
+
     def _log_before_callbacks(self, cb_type, cb_list, invoked_service):
         logger.debug('(%s) Before %s callbacks `%s` after `%s`', self.pattern_name, cb_type, cb_list, invoked_service.name)
 
@@ -78,55 +185,57 @@ class ParallelBase(object):
         counter_key = self.counter_pattern.format(cid)
         source, req_ts_utc, on_target = invoked_service.kvdb.conn.hmget(data_key, 'source', 'req_ts_utc', 'on_target')
 
-        with invoked_service.lock(self.lock_pattern.format(cid)):
+        data = Bunch()
+        data.cid = cid
+        data.resp_ts_utc = now
+        data.response = response
+        data.exception = exception
+        data.ok = False if exception else True
+        data.source = source
+        data.target = invoked_service.name
+        data.req_ts_utc = req_ts_utc
 
-            data = Bunch()
-            data.cid = cid
-            data.resp_ts_utc = now
-            data.response = response
-            data.exception = exception
-            data.ok = False if exception else True
-            data.source = source
-            data.target = invoked_service.name
-            data.req_ts_utc = req_ts_utc
+        # First store our response and exception (if any)
+        invoked_service.kvdb.conn.hset(data_key, invoked_service.get_name(), dumps(data))
 
-            # First store our response and exception (if any)
-            json_data = dumps(data)
-            invoked_service.kvdb.conn.hset(data_key, invoked_service.get_name(), json_data)
+        on_target = loads(on_target)
 
-            on_target = loads(on_target)
+        if logger.isEnabledFor(DEBUG):
+            self._log_before_callbacks('on_target', on_target, invoked_service)
 
-            if logger.isEnabledFor(DEBUG):
-                self._log_before_callbacks('on_target', on_target, invoked_service)
+        # We always invoke 'on_target' callbacks, if there are any
+        self.invoke_callbacks(invoked_service, data, on_target, self.on_target_channel, cid)
 
-            # We always invoke 'on_target' callbacks, if there are any
-            self.invoke_callbacks(invoked_service, data, on_target, self.on_target_channel, cid)
+        # Was it the last parallel call? DECR is atomic so only one target will see zero, and each target
+        # stored its data before decrementing the counter, which is why no distributed lock is needed.
+        if not invoked_service.kvdb.conn.decr(counter_key):
 
-            # Was it the last parallel call?
-            if not invoked_service.kvdb.conn.decr(counter_key):
+            # Not every subclass will need final callbacks
+            if self.needs_on_final:
 
-                # Not every subclass will need final callbacks
-                if self.needs_on_final:
+                with invoked_service.kvdb.conn.pipeline() as pipeline:
+                    pipeline.hgetall(data_key)
+                    pipeline.delete(counter_key, data_key)
+                    payload, _ = pipeline.execute()
 
-                    payload = invoked_service.kvdb.conn.hgetall(data_key)
-                    payload['data'] = {}
+                payload['data'] = {}
 
-                    for key in (key for key in payload.keys() if key not in JSON_KEYS):
-                        payload['data'][key] = loads(payload.pop(key))
+                for key in (key for key in payload.keys() if key not in JSON_KEYS):
+                    payload['data'][key] = loads(payload.pop(key))
 
-                    for key in JSON_KEYS:
-                        if key not in ('source', 'data', 'req_ts_utc'):
-                            payload[key] = loads(payload[key])
+                for key in JSON_KEYS:
+                    if key not in ('source', 'data', 'req_ts_utc'):
+                        payload[key] = loads(payload[key])
 
-                    on_final = payload['on_final']
+                on_final = payload['on_final']
 
-                    if logger.isEnabledFor(DEBUG):
-                        self._log_before_callbacks('on_final', on_final, invoked_service)
+                if logger.isEnabledFor(DEBUG):
+                    self._log_before_callbacks('on_final', on_final, invoked_service)
 
-                    self.invoke_callbacks(invoked_service, payload, on_final, self.on_final_channel, cid)
+                self.invoke_callbacks(invoked_service, payload, on_final, self.on_final_channel, cid)
 
-                    invoked_service.kvdb.conn.delete(counter_key)
-                    invoked_service.kvdb.conn.delete(data_key)
+            else:
+                invoked_service.kvdb.conn.delete(counter_key, data_key)
 
     def invoke_callbacks(self, invoked_service, payload, cb_list, channel, cid):
         for name in cb_list:
@@ -9,18 +9,23 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 # stdlib
+from heapq import heappop, heappush
+from itertools import count
 from json import dumps
 from logging import getLogger
+from random import uniform
+from time import time
 from traceback import format_exc
 
 # Arrow
 from arrow import utcnow
 
 # gevent
-from gevent import sleep
+from gevent import spawn
+from gevent.event import AsyncResult, Event
 
 # Zato
-from zato.common import ZatoException
+from zato.common import INVOKE_RETRY, ZatoException
 from zato.common.util import new_cid
 
 logger = getLogger(__name__)
@@ -35,6 +40,10 @@ def retry_limit_reached_msg(retry_repeats, service_name, retry_seconds, orig_cid
     return '({}/{}) Retry limit reached for:`{}`, retry_seconds:`{}`, orig_cid:`{}`'.format(
         retry_repeats, retry_repeats, service_name, retry_seconds, orig_cid)
 
+def retry_budget_exhausted_msg(so_far, retry_repeats, service_name, retry_seconds, orig_cid):
+    return '({}/{}) Retry budget exhausted for:`{}`, retry_seconds:`{}`, orig_cid:`{}`'.format(
+        so_far, retry_repeats, service_name, retry_seconds, orig_cid)
+
 # ################################################################################################################################
 
 class NeedsRetry(ZatoException):
@@ -59,6 +68,167 @@ class RetryFailed(ZatoException):
 
 # ################################################################################################################################
 
+class TimerQueue(object):
+    """ A queue of functions to be called no sooner than at a given time. All pending entries are handled by a single greenlet
+    which exists only as long as there is anything to call so each waiting retry costs one heap entry rather than a greenlet.
+    """
+    def __init__(self):
+        self._heap = []
+        self._counter = count()
+        self._wakeup = Event()
+        self._runner = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, delay, func, *args):
+        """ Arranges for func(*args) to be called in a new greenlet after delay seconds.
+        """
+        # The counter makes sure functions themselves are never compared if two entries are due at the same time
+        heappush(self._heap, (time() + delay, next(self._counter), func, args))
+        self._wakeup.set()
+
+        if not self._runner:
+            self._runner = spawn(self._run)
+
+    def _run(self):
+        try:
+            while self._heap:
+                self._wakeup.clear()
+
+                # Wait until the earliest entry is due or until a new one is scheduled, possibly an earlier one
+                now = time()
+                due = self._heap[0][0]
+
+                if due > now:
+                    self._wakeup.wait(due - now)
+                    continue
+
+                _, _, func, args = heappop(self._heap)
+                spawn(func, *args)
+        finally:
+            self._runner = None
+
+# ################################################################################################################################
+
+class RetryBudget(object):
+    """ Limits the number of retries a worker may attempt in relation to the number of original invocations so that
+    a failing dependency does not turn into a retry storm. Each original invocation deposits a fraction of a token,
+    each retry withdraws a whole one and a minimum number of tokens becomes available each second regardless.
+    """
+    def __init__(self, ratio=INVOKE_RETRY.DEFAULT.BUDGET_RATIO, min_per_second=INVOKE_RETRY.DEFAULT.BUDGET_MIN_PER_SECOND,
+            max_tokens=INVOKE_RETRY.DEFAULT.BUDGET_MAX_TOKENS):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.last_refill = time()
+
+    def on_call(self):
+        """ Needs to be called for each original, i.e. not retried, invocation.
+        """
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def can_retry(self):
+        """ Returns True if a retry can be attempted, in which case it is subtracted from the budget.
+        """
+        now = time()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self.last_refill) * self.min_per_second)
+        self.last_refill = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+
+        return False
+
+# ################################################################################################################################
+
+class RetryPolicy(object):
+    """ Tells how many times and how often to retry invocations. Delays grow exponentially by a backoff factor,
+    optionally up to max_seconds, and each may be randomly shortened or lengthened by a jitter fraction
+    so that many callers failing at once do not retry in lockstep.
+    """
+    def __init__(self, repeats, seconds, backoff=None, max_seconds=None, jitter=None):
+        self.repeats = repeats
+        self.seconds = seconds
+        self.backoff = INVOKE_RETRY.DEFAULT.BACKOFF if backoff is None else backoff
+        self.max_seconds = max_seconds
+        self.jitter = INVOKE_RETRY.DEFAULT.JITTER if jitter is None else jitter
+
+    def get_delay(self, retry):
+        """ Returns how many seconds to wait before a given retry, counting from 1.
+        """
+        delay = self.seconds * self.backoff ** (retry - 1)
+
+        if self.max_seconds:
+            delay = min(delay, self.max_seconds)
+
+        if self.jitter:
+            delay += delay * uniform(-self.jitter, self.jitter)
+
+        return max(delay, 0)
+
+# ################################################################################################################################
+
+# Both are worker-local and shared by all retried invocations in a given worker
+timer_queue = TimerQueue()
+retry_budget = RetryBudget()
+
+# ################################################################################################################################
+
+class RetryCall(object):
+    """ An invocation of a target service retried according to a policy. Each pending attempt sits in the timer queue
+    and on_finished is called with (is_ok, response, error_msg) once the invocation succeeds or no more retries are possible.
+    """
+    def __init__(self, invoke_func, target, args, kwargs, policy, orig_cid, on_finished, attempts=0, budget=None,
+            queue=None):
+        self.invoke_func = invoke_func
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        self.policy = policy
+        self.orig_cid = orig_cid
+        self.on_finished = on_finished
+        self.attempts = attempts
+        self.retries = 0
+        self.budget = budget or retry_budget
+        self.timer_queue = queue or timer_queue
+
+    def start(self):
+        """ Schedules the first attempt to be made as soon as possible.
+        """
+        self.timer_queue.schedule(0, self._attempt)
+
+    def retry(self):
+        """ Schedules next attempt unless the limit of attempts is reached or the retry budget is exhausted.
+        """
+        if self.attempts >= self.policy.repeats:
+            self.on_finished(False, None, retry_limit_reached_msg(
+                self.policy.repeats, self.target, self.policy.seconds, self.orig_cid))
+
+        elif not self.budget.can_retry():
+            self.on_finished(False, None, retry_budget_exhausted_msg(
+                self.attempts, self.policy.repeats, self.target, self.policy.seconds, self.orig_cid))
+
+        else:
+            self.retries += 1
+            self.timer_queue.schedule(self.policy.get_delay(self.retries), self._attempt)
+
+    def _attempt(self):
+        self.attempts += 1
+
+        try:
+            response = self.invoke_func(self.target, *self.args, **self.kwargs)
+        except Exception, e:
+            logger.info(retry_failed_msg(
+                self.attempts, self.policy.repeats, self.target, self.policy.seconds, self.orig_cid, e))
+            self.retry()
+        else:
+            self.on_finished(True, response, None)
+
+# ################################################################################################################################
+
 class InvokeRetry(object):
     """ Provides the invoke-retry pattern that lets one invoke a service with parametrized retries.
     """
@@ -112,7 +282,15 @@ class InvokeRetry(object):
 
 # ################################################################################################################################
 
-    def _invoke_async_retry(self, target, retry_repeats, retry_seconds, orig_cid, call_cid, callback, callback_context, args, kwargs):
+    def _get_policy_settings(self, kwargs):
+        """ Pops from kwargs and returns optional settings of the retry policy.
+        """
+        return dict((name, kwargs.pop(name, None)) for name in ('backoff', 'max_seconds', 'jitter'))
+
+# ################################################################################################################################
+
+    def _invoke_async_retry(self, target, retry_repeats, retry_seconds, orig_cid, call_cid, callback, callback_context, args,
+            kwargs, policy_settings=None):
 
         # Request to invoke the background service with ..
         retry_request = {
@@ -128,21 +306,80 @@ class InvokeRetry(object):
             'kwargs': kwargs,
             'req_ts_utc': utcnow().isoformat()
         }
+        retry_request.update(policy_settings or {})
 
         return self.invoking_service.invoke_async('zato.pattern.invoke-retry.invoke-retry', dumps(retry_request), cid=call_cid)
 
 # ################################################################################################################################
 
     def invoke_async(self, target, *args, **kwargs):
+        policy_settings = self._get_policy_settings(kwargs)
         async_fallback, callback, callback_context, retry_repeats, retry_seconds, kwargs = self._get_retry_settings(
             target, **kwargs)
         return self._invoke_async_retry(
             target, retry_repeats, retry_seconds, self.invoking_service.cid, kwargs['cid'], callback,
-            callback_context, args, kwargs)
+            callback_context, args, kwargs, policy_settings)
+
+# ################################################################################################################################
+
+    def _retry_in_background(self, call_cid, callback, callback_context, policy, target, args, kwargs):
+        """ Retries an invocation from the current worker's timer queue and notifies the callback service of the outcome.
+        Pending retries exist in RAM only so they are lost, and the callback is never notified, if the worker stops.
+        """
+        req_ts_utc = utcnow().isoformat()
+
+        def on_finished(is_ok, response, error_msg):
+            if not is_ok:
+                logger.warn(error_msg)
+
+            self.invoking_service.invoke_async(callback, {
+                'ok': is_ok,
+                'orig_cid': self.invoking_service.cid,
+                'call_cid': call_cid,
+                'source': self.invoking_service.name,
+                'target': target,
+                'retry_seconds': policy.seconds,
+                'retry_repeats': policy.repeats,
+                'context': callback_context,
+                'req_ts_utc': req_ts_utc,
+                'resp_ts_utc': utcnow().isoformat(),
+                'response': response
+            })
+
+        RetryCall(self.invoking_service.invoke, target, args, kwargs, policy, self.invoking_service.cid, on_finished).retry()
+
+        return call_cid
+
+# ################################################################################################################################
+
+    def _retry_blocking(self, policy, target, args, kwargs):
+        """ Retries an invocation, blocking until it succeeds or there are no more retries possible. The caller waits
+        on a result object while pending attempts sit in the timer queue.
+        """
+        result = AsyncResult()
+
+        def on_finished(is_ok, response, error_msg):
+            result.set((is_ok, response, error_msg))
+
+        # The original invocation has already failed so it counts as the first attempt
+        RetryCall(self.invoking_service.invoke, target, args, kwargs, policy, self.invoking_service.cid, on_finished,
+            attempts=1).retry()
+
+        is_ok, response, error_msg = result.get()
+
+        if not is_ok:
+            raise ZatoException(self.invoking_service.cid, error_msg)
+
+        return response
 
 # ################################################################################################################################
 
     def invoke(self, target, *args, **kwargs):
+        """ Invokes a target service and retries it if it fails. With async_fallback, retries take place in background
+        in the current worker process and the callback service is notified of the outcome. Such retries are not persisted
+        anywhere so a worker that is restarted or stopped while they are pending will not carry them out.
+        """
+        policy_settings = self._get_policy_settings(kwargs)
         async_fallback, callback, callback_context, retry_repeats, retry_seconds, kwargs = self._get_retry_settings(
             target, **kwargs)
 
@@ -150,6 +387,7 @@ class InvokeRetry(object):
         # to retry anything.
 
         kwargs['cid'] = kwargs.get('cid', new_cid())
+        retry_budget.on_call()
 
         try:
             result = self.invoking_service.invoke(target, *args, **kwargs)
@@ -158,35 +396,18 @@ class InvokeRetry(object):
             msg = 'Could not invoke:`{}`, cid:`{}`, e:`{}`'.format(target, self.invoking_service.cid, format_exc(e))
             logger.warn(msg)
 
+            policy = RetryPolicy(retry_repeats, retry_seconds, **policy_settings)
+
             # How we handle the exception depends on whether the caller wants us
             # to block or prefers if we retry in background.
             if async_fallback:
 
-                # .. invoke the background service and return CID to the caller.
-                return self._invoke_async_retry(
-                    target, retry_repeats, retry_seconds, self.invoking_service.cid, kwargs['cid'], callback,
-                    callback_context, args, kwargs)
+                # .. retry in background and return CID to the caller.
+                return self._retry_in_background(kwargs['cid'], callback, callback_context, policy, target, args, kwargs)
 
-            # We are to block while repeating
+            # We are to block until the retries are over
             else:
-                # Repeat the given number of times sleeping for as many seconds as we are told
-                remaining = retry_repeats
-                result = None
-
-                while remaining > 1:
-                    try:
-                        result = self.invoking_service.invoke(target, *args, **kwargs)
-                    except Exception, e:
-                        msg = retry_failed_msg(
-                            (retry_repeats-remaining)+1, retry_repeats, target, retry_seconds, self.invoking_service.cid, e)
-                        logger.info(msg)
-                        sleep(retry_seconds)
-                        remaining -= 1
-
-                # OK, give up now, there's nothing more we can do
-                if not result:
-                    msg = retry_limit_reached_msg(retry_repeats, target, retry_seconds, self.invoking_service.cid)
-                    raise ZatoException(self.invoking_service.cid, msg)
+                return self._retry_blocking(policy, target, args, kwargs)
         else:
             # All good, simply return the response
             return result
@@ -28,8 +28,22 @@ class CassandraQueryStore(BaseStore):
         if not conn:
             logger.warn('Could not create a Cassandra query `%s`, conn is None`', config_no_sensitive)
         else:
+            # Also available by name through the connection itself
+            conn.add_query(config.name, config.value)
             return conn.prepare(config.value)
 
+    def _delete(self, name):
+        item = self.items.get(name)
+        conn = item.get('extra') if item else None
+
+        if conn is not None:
+            try:
+                conn.remove_query(name)
+            except ReferenceError:
+                pass # The connection has been already deleted
+
+        super(CassandraQueryStore, self)._delete(name)
+
     def update_by_def(self, del_name, new_def):
         """ Invoked when the underlying definition got updated.
         Iterates through all the queries that were using it and updates them accordingly.
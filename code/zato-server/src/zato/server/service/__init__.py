@@ -15,9 +15,6 @@ from httplib import BAD_REQUEST, METHOD_NOT_ALLOWED
 from sys import maxint
 from traceback import format_exc
 
-# anyjson
-from anyjson import dumps
-
 # Bunch
 from bunch import bunchify
 
@@ -33,6 +30,7 @@ from zato.bunch import Bunch
 from zato.common import BROKER, CHANNEL, DATA_FORMAT, Inactive, KVDB, PARAMS_PRIORITY, PUBSUB, ZatoException, zato_no_op_marker
 from zato.common.broker_message import SERVICE
 from zato.common.exception import Reportable
+from zato.common.json_ import dumps
 from zato.common.nav import DictNav, ListNav
 from zato.common.util import get_response_value, make_repr, new_cid, payload_from_request, service_name_from_impl, uncamelify
 from zato.server.connection import slow_response
@@ -41,6 +39,7 @@ from zato.server.connection.jms_wmq.outgoing import WMQFacade
 from zato.server.connection.search import SearchAPI
 from zato.server.connection.sms import SMSAPI
 from zato.server.connection.zmq_.outgoing import ZMQFacade
+from zato.server.live_browser import notify_msg_browser
 from zato.server.message import MessageFacade
 from zato.server.pattern.fanout import FanOut
 from zato.server.pattern.invoke_retry import InvokeRetry
@@ -406,7 +405,7 @@ class Service(object):
             transport, server, broker_client, worker_store, cid, simple_io_config, _utcnow=datetime.utcnow,
             _call_hook_with_service=call_hook_with_service, _call_hook_no_service=call_hook_no_service,
             _CHANNEL_SCHEDULER=CHANNEL.SCHEDULER, _pattern_channels=(CHANNEL.FANOUT_CALL, CHANNEL.PARALLEL_EXEC_CALL),
-            *args, **kwargs):
+            _XML=DATA_FORMAT.XML, *args, **kwargs):
 
         wsgi_environ = kwargs.get('wsgi_environ', {})
         payload = wsgi_environ.get('zato.request.payload')
@@ -415,7 +414,13 @@ class Service(object):
         # (though possibly with attributes), checking for 'not payload' alone won't suffice - this evaluates
         # to False so we'd be parsing the payload again superfluously.
         if not isinstance(payload, ObjectifiedElement) and not payload:
-            payload = payload_from_request(cid, raw_request, data_format, transport)
+
+            # The request may have been parsed already, e.g. to check its WS-Security header
+            xml_doc = wsgi_environ.get('zato.request.xml_doc')
+            if xml_doc is not None and data_format == _XML:
+                payload = payload_from_request(cid, xml_doc, data_format, transport)
+            else:
+                payload = payload_from_request(cid, raw_request, data_format, transport)
 
         job_type = kwargs.get('job_type')
         channel_params = kwargs.get('channel_params', {})
@@ -443,6 +448,10 @@ class Service(object):
                     service.usage = service.kvdb.conn.incr('{}{}'.format(KVDB.SERVICE_USAGE, service.name))
                 service.invocation_time = _utcnow()
 
+                # Live message browsers subscribed to words found in the request are sent a copy of it
+                if service.server.component_enabled.live_msg_browser:
+                    notify_msg_browser(service, 'request')
+
                 # All hooks are optional so we check if they have not been replaced with None by ServiceStore.
 
                 # Call before job hooks if any are defined and we are called from the scheduler
@@ -724,6 +733,9 @@ class Service(object):
     def translate(self, *args, **kwargs):
         raise NotImplementedError('An initializer should override this method')
 
+    def translate_many(self, *args, **kwargs):
+        raise NotImplementedError('An initializer should override this method')
+
     def handle(self):
         """ The only method Zato services need to implement in order to process
         incoming requests.
@@ -884,6 +896,7 @@ class Service(object):
         service.wsgi_environ = wsgi_environ
         service.job_type = job_type
         service.translate = server.kvdb.translate
+        service.translate_many = server.kvdb.translate_many
         service.user_config = server.user_config
         service.static_config = server.static_config
         service.time = server.time_util
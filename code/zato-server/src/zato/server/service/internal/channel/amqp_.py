@@ -16,6 +16,7 @@ from traceback import format_exc
 from zato.common.broker_message import CHANNEL
 from zato.common.odb.model import ChannelAMQP, Cluster, ConnDefAMQP, Service
 from zato.common.odb.query import channel_amqp_list
+from zato.server.service import Boolean, Integer
 from zato.server.service.internal import AdminService, AdminSIO, GetListAdminSIO
 
 # ################################################################################################################################
@@ -32,7 +33,7 @@ class GetList(AdminService):
         input_required = ('cluster_id',)
         output_required = ('id', 'name', 'is_active', 'queue', 'consumer_tag_prefix', 'def_name', 'def_id', 'service_name',
             'pool_size', 'ack_mode')
-        output_optional = ('data_format',)
+        output_optional = ('data_format', 'prefetch_count', Integer('max_concurrency'), Boolean('preserve_order'))
 
     def get_data(self, session):
         return self._search(channel_amqp_list, session, self.request.input.cluster_id, False)
@@ -53,7 +54,7 @@ class Create(AdminService):
         response_elem = 'zato_channel_amqp_create_response'
         input_required = ('cluster_id', 'name', 'is_active', 'def_id', 'queue', 'consumer_tag_prefix', 'service', 'pool_size',
             'ack_mode')
-        input_optional = ('data_format',)
+        input_optional = ('data_format', 'prefetch_count', Integer('max_concurrency'), Boolean('preserve_order'))
         output_required = ('id', 'name')
 
     def handle(self):
@@ -93,6 +94,9 @@ class Create(AdminService):
                 item.pool_size = input.pool_size
                 item.ack_mode = input.ack_mode
                 item.data_format = input.data_format
+                item.prefetch_count = input.prefetch_count
+                item.max_concurrency = input.max_concurrency
+                item.preserve_order = input.preserve_order
 
                 session.add(item)
                 session.commit()
@@ -123,7 +127,7 @@ class Edit(AdminService):
         response_elem = 'zato_channel_amqp_edit_response'
         input_required = ('id', 'cluster_id', 'name', 'is_active', 'def_id', 'queue', 'consumer_tag_prefix', 'service',
             'pool_size', 'ack_mode')
-        input_optional = ('data_format',)
+        input_optional = ('data_format', 'prefetch_count', Integer('max_concurrency'), Boolean('preserve_order'))
         output_required = ('id', 'name')
 
     def handle(self):
@@ -165,6 +169,9 @@ class Edit(AdminService):
                 item.pool_size = input.pool_size
                 item.ack_mode = input.ack_mode
                 item.data_format = input.data_format
+                item.prefetch_count = input.prefetch_count
+                item.max_concurrency = input.max_concurrency
+                item.preserve_order = input.preserve_order
 
                 session.add(item)
                 session.commit()
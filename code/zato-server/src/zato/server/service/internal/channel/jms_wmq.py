@@ -17,12 +17,16 @@ from traceback import format_exc
 # Arrow
 from arrow import get as arrow_get
 
+# gevent
+from gevent import joinall, spawn
+
 # Zato
-from zato.common import CHANNEL, DATA_FORMAT
+from zato.common import CHANNEL
 from zato.common.broker_message import CHANNEL as BROKER_MSG_CHANNEL
 from zato.common.odb.model import ChannelWMQ, Cluster, ConnDefWMQ, Service
 from zato.common.odb.query import channel_wmq_list
 from zato.common.time_util import datetime_from_ms
+from zato.server.service import Integer
 from zato.server.service.internal import AdminService, AdminSIO, GetListAdminSIO
 
 # ################################################################################################################################
@@ -37,7 +41,7 @@ class GetList(AdminService):
         response_elem = 'zato_channel_jms_wmq_get_list_response'
         input_required = ('cluster_id',)
         output_required = ('id', 'name', 'is_active', 'def_id', 'def_name', 'queue', 'service_name')
-        output_optional = ('data_format',)
+        output_optional = ('data_format', 'batch_size', Integer('linger_time'))
 
     def get_data(self, session):
         return self._search(channel_wmq_list, session, self.request.input.cluster_id, False)
@@ -55,7 +59,7 @@ class Create(AdminService):
         request_elem = 'zato_channel_jms_wmq_create_request'
         response_elem = 'zato_channel_jms_wmq_create_response'
         input_required = ('cluster_id', 'name', 'is_active', 'def_id', 'queue', 'service')
-        input_optional = ('data_format',)
+        input_optional = ('data_format', 'batch_size', Integer('linger_time'))
         output_required = ('id', 'name')
 
     def handle(self):
@@ -93,6 +97,8 @@ class Create(AdminService):
                 item.def_id = input.def_id
                 item.service = service
                 item.data_format = input.data_format
+                item.batch_size = input.batch_size
+                item.linger_time = input.linger_time
 
                 session.add(item)
                 session.commit()
@@ -120,7 +126,7 @@ class Edit(AdminService):
         request_elem = 'zato_channel_jms_wmq_edit_request'
         response_elem = 'zato_channel_jms_wmq_edit_response'
         input_required = ('id', 'cluster_id', 'name', 'is_active', 'def_id', 'queue', 'service')
-        input_optional = ('data_format',)
+        input_optional = ('data_format', 'batch_size', Integer('linger_time'))
         output_required = ('id', 'name')
 
     def handle(self):
@@ -157,6 +163,8 @@ class Edit(AdminService):
                 item.def_id = input.def_id
                 item.service = service
                 item.data_format = input.data_format
+                item.batch_size = input.batch_size
+                item.linger_time = input.linger_time
 
                 session.add(item)
                 session.commit()
@@ -208,16 +216,15 @@ class Delete(AdminService):
 # ################################################################################################################################
 
 class OnMessageReceived(AdminService):
-    """ A callback service invoked by WebSphere connectors for each taken off a queue.
+    """ A callback service invoked by WebSphere connectors for each batch of messages taken off a queue.
+    Messages from a batch are dispatched to their target service concurrently. The service raises an exception
+    if any of them could not be handled, once all of them have been.
     """
     class SimpleIO(AdminSIO):
         request_elem = 'zato_channel_jms_wmq_on_message_received_request'
         response_elem = 'zato_channel_jms_wmq_on_message_received_response'
 
-    def handle(self, _channel=CHANNEL.WEBSPHERE_MQ, _data_format=DATA_FORMAT.DICT, ts_format='YYYYMMDDHHmmssSS'):
-        request = loads(self.request.raw_request)
-        msg = request['msg']
-        service_name = request['service_name']
+    def _invoke_service(self, service_name, msg, _channel=CHANNEL.WEBSPHERE_MQ, ts_format='YYYYMMDDHHmmssSS'):
 
         # Make MQ-level attributes easier to handle
         correlation_id = unhexlify(msg['correlation_id']) if msg['correlation_id'] else None
@@ -236,4 +243,27 @@ class OnMessageReceived(AdminService):
             'reply_to': msg['reply_to'],
         })
 
+    def handle(self):
+        request = loads(self.request.raw_request)
+        service_name = request['service_name']
+
+        # Connectors from before batching was added send one message at a time
+        msgs = request['msgs'] if 'msgs' in request else [request['msg']]
+
+        if len(msgs) == 1:
+            self._invoke_service(service_name, msgs[0])
+            return
+
+        greenlets = [spawn(self._invoke_service, service_name, msg) for msg in msgs]
+        joinall(greenlets)
+
+        errors = [greenlet.exception for greenlet in greenlets if not greenlet.successful()]
+
+        if errors:
+            for e in errors:
+                self.logger.warn('Could not invoke `%s` with a WebSphere MQ message, e:`%s`', service_name, e)
+
+            raise Exception('Could not invoke `{}` with {} of {} WebSphere MQ message(s)'.format(
+                service_name, len(errors), len(msgs)))
+
 # ################################################################################################################################
@@ -15,15 +15,36 @@ from traceback import format_exc
 # dateutil
 from dateutil.parser import parse
 
+# gevent
+from gevent import joinall, spawn
+
 # Zato
-from zato.common.broker_message import PUBSUB as BROKER_MSG_PUBSUB
-from zato.common.odb.model import ChannelWebSocket, Cluster, WebSocketClient
+from zato.common import WEB_SOCKET
+from zato.common.broker_message import MSG_BROWSER, PUBSUB as BROKER_MSG_PUBSUB
+from zato.common.odb.model import ChannelWebSocket, Cluster, WebSocketClient, WebSocketMsgBrowserSub
 from zato.common.odb.query import web_socket_client_by_pub_id, web_socket_clients_by_server_id
-from zato.server.service import AsIs, List
+from zato.server.service import AsIs, Integer, List
 from zato.server.service.internal import AdminService, AdminSIO
 
 # ################################################################################################################################
 
+def _unsubscribe_msg_browser(service, pub_client_id_list):
+    """ Removes subscriptions of live message browsers of clients that are no longer connected from all workers.
+    """
+    if not pub_client_id_list:
+        return
+
+    # Our own worker is updated right away, other ones will be through the broker
+    for pub_client_id in pub_client_id_list:
+        service.server.msg_browser_index.unsubscribe(pub_client_id)
+
+    service.broker_client.publish({
+        'action': MSG_BROWSER.UNSUBSCRIBE.value,
+        'pub_client_id_list': pub_client_id_list,
+    })
+
+# ################################################################################################################################
+
 class Create(AdminService):
     """ Stores in ODB information about an established connection of an authenticated WebSocket client.
     """
@@ -64,6 +85,8 @@ class Create(AdminService):
 
             self.response.payload.ws_client_id = client.id
 
+        self.server.worker_store.outgoing_web_sockets.invalidate_client_cache()
+
 # ################################################################################################################################
 
 class DeleteByPubId(AdminService):
@@ -78,6 +101,9 @@ class DeleteByPubId(AdminService):
             session.delete(client)
             session.commit()
 
+        self.server.worker_store.outgoing_web_sockets.invalidate_client_cache()
+        _unsubscribe_msg_browser(self, [self.request.input.pub_client_id])
+
 # ################################################################################################################################
 
 class UnregisterWSSubKey(AdminService):
@@ -102,9 +128,19 @@ class DeleteByServer(AdminService):
 
         with closing(self.odb.session()) as session:
             clients = web_socket_clients_by_server_id(session, self.server.id)
+            client_list = clients.with_entities(WebSocketClient.id, WebSocketClient.pub_client_id).all()
+
+            # Deleted explicitly because deleting clients in bulk does not cascade to their subscriptions in all databases
+            if client_list:
+                session.query(WebSocketMsgBrowserSub).\
+                    filter(WebSocketMsgBrowserSub.client_id.in_([item.id for item in client_list])).\
+                    delete(synchronize_session=False)
+
             clients.delete()
             session.commit()
 
+        _unsubscribe_msg_browser(self, [item.pub_client_id for item in client_list])
+
 # ################################################################################################################################
 
 class NotifyPubSubMessage(AdminService):
@@ -124,3 +160,43 @@ class NotifyPubSubMessage(AdminService):
             raise
 
 # ################################################################################################################################
+
+class DeliverRequest(AdminService):
+    """ Delivers a request to one or more WebSocket clients connected to current worker process. Clients are invoked
+    concurrently and the response of each one is returned under its public ID. Clients that disconnected
+    or did not respond within the timeout are not included in the response.
+    """
+    class SimpleIO(AdminSIO):
+        input_required = (AsIs('request'), List('client_list'))
+        input_optional = (Integer('timeout'),)
+        output_required = (AsIs('response'),)
+
+    def _invoke_client(self, channel_name, pub_client_id):
+        return self.server.worker_store.web_socket_api.invoke(channel_name, self.cid, pub_client_id, self.request.input.request)
+
+    def handle(self):
+        timeout = self.request.input.get('timeout') or WEB_SOCKET.DEFAULT.DELIVERY_TIMEOUT
+        greenlets = {}
+
+        for item in self.request.input.client_list:
+            greenlets[item['pub_client_id']] = spawn(self._invoke_client, item['channel_name'], item['pub_client_id'])
+
+        joinall(greenlets.values(), timeout=timeout)
+
+        response = {}
+
+        for pub_client_id, greenlet in greenlets.items():
+            if not greenlet.ready():
+                greenlet.kill(block=False)
+                self.logger.info('WebSocket client `%s` did not respond within %ss', pub_client_id, timeout)
+
+            elif not greenlet.successful():
+                self.logger.warn('Could not deliver a request to WebSocket client `%s`, e:`%s`',
+                    pub_client_id, greenlet.exception)
+
+            else:
+                response[pub_client_id] = greenlet.value
+
+        self.response.payload.response = response
+
+# ################################################################################################################################
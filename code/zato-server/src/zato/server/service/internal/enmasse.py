@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from collections import OrderedDict
+from contextlib import closing
+from traceback import format_exc
+
+# Zato
+from zato.common import ZatoException
+from zato.common.broker_message import BATCH, MESSAGE_TYPE
+from zato.common.json_ import dumps, loads
+from zato.server.service import Opaque
+from zato.server.service.internal import AdminService, AdminSIO, logger as admin_logger
+
+# ################################################################################################################################
+
+# Only internal services of these methods are ever emitted by enmasse and nothing else can be invoked during an import
+_object_service_methods = ('create', 'edit')
+_password_service_methods = ('change-password',)
+
+# ################################################################################################################################
+
+class _SharedSession(object):
+    """ A session all the services invoked during an import use - their commits only flush changes to the database
+    so that IDs of new objects are known right away while everything is committed, or rolled back, once at the end.
+    """
+    def __init__(self, session):
+        self._session = session
+
+    def commit(self):
+        self._session.flush()
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+# ################################################################################################################################
+
+class _SharedODB(object):
+    """ Hands out the same shared session to each service asking for a new one.
+    """
+    def __init__(self, odb, session):
+        self._odb = odb
+        self._session = _SharedSession(session)
+
+    def session(self):
+        return self._session
+
+    def __getattr__(self, name):
+        return getattr(self._odb, name)
+
+# ################################################################################################################################
+
+class _DeferredBrokerClient(object):
+    """ Collects broker messages published by services invoked during an import, to be sent only once the transaction
+    is committed. Messages to all workers are sent in batches, one for each type of objects imported.
+    """
+    def __init__(self, broker_client):
+        self.broker_client = broker_client
+        self.item_type = None
+
+        # item_type -> messages to all workers
+        self.batches = OrderedDict()
+
+        # Everything else, e.g. messages to the scheduler, is sent as it was published
+        self.other = []
+
+    def publish(self, msg, msg_type=MESSAGE_TYPE.TO_PARALLEL_ALL, *args, **kwargs):
+
+        # Serialized now to find out about any errors before anything is committed
+        msg = loads(dumps(msg))
+
+        if msg_type == MESSAGE_TYPE.TO_PARALLEL_ALL:
+            msg['msg_type'] = msg_type
+            self.batches.setdefault(self.item_type, []).append(msg)
+        else:
+            self.other.append(('publish', msg, (msg_type,) + args, kwargs))
+
+    def invoke_async(self, msg, *args, **kwargs):
+        self.other.append(('invoke_async', loads(dumps(msg)), args, kwargs))
+
+    def flush(self):
+        for item_type, messages in self.batches.items():
+            self.broker_client.publish({
+                'action': BATCH.MESSAGES.value,
+                'item_type': item_type,
+                'messages': messages,
+            })
+
+        for func_name, msg, args, kwargs in self.other:
+            getattr(self.broker_client, func_name)(msg, *args, **kwargs)
+
+# ################################################################################################################################
+
+def _get_response_id(response):
+    """ Returns ID of an object a create or edit service returned, possibly wrapped in the service's response element.
+    """
+    if 'id' not in response and len(response) == 1:
+        response = response.values()[0]
+
+    return response['id']
+
+# ################################################################################################################################
+
+class Import(AdminService):
+    """ Imports objects of all types given on input, e.g. everything from an enmasse file, in one transaction.
+
+    Each object is a dictionary of:
+
+    * item_type - type of the object, e.g. basic_auth or http_soap
+    * service_name - name of an internal create or edit service to invoke
+    * request - input to the service
+    * deps - a list of {id_field, dependent_type, value} dictionaries for objects depending on others created
+             earlier on during the same import, by name, so their IDs can be filled in
+    * is_security - True if the object is a security definition
+    * password_service - name of an internal change-password service to set a password with, if any is needed
+
+    Objects must be sorted so that each one comes after all the ones it depends on. Workers are notified of changes
+    only after everything is committed and with one broker message per type of objects.
+    """
+    class SimpleIO(AdminSIO):
+        request_elem = 'zato_enmasse_import_request'
+        response_elem = 'zato_enmasse_import_response'
+        input_required = (Opaque('objects'),)
+        output_required = ('created', 'updated')
+
+    # Set for the duration of an import only
+    shared_odb = None
+
+    def update_handle(self, set_response_func, service, *args, **kwargs):
+        # Services we invoke during an import use its shared session - the ODB of any other service is never changed
+        if self.shared_odb and service is not self:
+            service.odb = self.shared_odb
+
+        return super(Import, self).update_handle(set_response_func, service, *args, **kwargs)
+
+    def before_handle(self):
+        # Input may contain thousands of objects, including passwords, so only their number is logged
+        admin_logger.info('cid:[%s], name:[%s], objects:[%s]', self.cid, self.name, len(self.request.input.objects))
+
+    def _validate_service_name(self, item, key, methods):
+        """ Makes sure a service to be invoked is an internal one of a method enmasse emits.
+        """
+        service_name = item.get(key)
+        prefix, _, method = (service_name or '').rpartition('.')
+
+        if not (prefix.startswith('zato.') and method in methods):
+            raise ZatoException(self.cid, 'Service `{}` cannot be invoked to import `{}` `{}`, expected one of `{}`'.format(
+                service_name, item['item_type'], item['request'].get('name'), ', '.join(methods)))
+
+    def _get_dep_id(self, ids, item, dep):
+        key = (dep['dependent_type'], dep['value'])
+        if key not in ids:
+            raise ZatoException(self.cid, 'Dependency `{}` `{}` of `{}` `{}` was not imported'.format(
+                dep['dependent_type'], dep['value'], item['item_type'], item['request'].get('name')))
+
+        return ids[key]
+
+    def _import_item(self, ids, item):
+        request = item['request']
+
+        for dep in item.get('deps') or []:
+            request[dep['id_field']] = self._get_dep_id(ids, item, dep)
+
+        object_id = _get_response_id(self.invoke(item['service_name'], request))
+
+        password_service = item.get('password_service')
+        if password_service:
+            self.invoke(password_service, {
+                'id': object_id,
+                'password1': request['password'],
+                'password2': request['password'],
+            })
+
+        # Objects imported later on may depend on this one
+        name = request.get('name')
+        ids[(item['item_type'], name)] = object_id
+
+        if item.get('is_security'):
+            ids[('def_sec', name)] = object_id
+
+    def handle(self):
+        broker_client = _DeferredBrokerClient(self.broker_client)
+
+        # (item_type, name) -> ID of each object imported
+        ids = {}
+
+        created = updated = 0
+
+        # Nothing is invoked unless all the services requested can be
+        for item in self.request.input.objects:
+            self._validate_service_name(item, 'service_name', _object_service_methods)
+            if item.get('password_service'):
+                self._validate_service_name(item, 'password_service', _password_service_methods)
+
+        with closing(self.odb.session()) as session:
+
+            # All services invoked from now on share our session and broker client
+            self.shared_odb = _SharedODB(self.odb, session)
+            self.broker_client = broker_client
+
+            for item in self.request.input.objects:
+                broker_client.item_type = item['item_type']
+                is_edit = bool(item['request'].get('id'))
+
+                try:
+                    self._import_item(ids, item)
+                except Exception, e:
+                    session.rollback()
+                    self.logger.warn('Could not import `%s` `%s`, e:`%s`', item['item_type'], item['request'].get('name'),
+                        format_exc(e))
+                    raise
+
+                if is_edit:
+                    updated += 1
+                else:
+                    created += 1
+
+            session.commit()
+
+        broker_client.flush()
+
+        self.response.payload.created = created
+        self.response.payload.updated = updated
+
+# ################################################################################################################################
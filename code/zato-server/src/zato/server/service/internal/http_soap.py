@@ -90,7 +90,9 @@ class _BaseGet(AdminService):
         output_optional = ('service_id', 'service_name', 'security_id', 'security_name', 'sec_type',
             'method', 'soap_action', 'soap_version', 'data_format', 'host', 'ping_method', 'pool_size', 'merge_url_params_req',
             'url_params_pri', 'params_pri', 'serialization_type', 'timeout', 'sec_tls_ca_cert_id', Boolean('has_rbac'),
-            'content_type', Boolean('sec_use_rbac'), 'cache_id', 'cache_name', Integer('cache_expiry'), 'cache_type')
+            'content_type', Boolean('sec_use_rbac'), 'cache_id', 'cache_name', Integer('cache_expiry'), 'cache_type',
+            Integer('max_concurrency'), Integer('max_queue_size'), Boolean('has_circuit_breaker'), Integer('cb_error_rate'),
+            Integer('cb_slow_call_rate'), Integer('cb_slow_call_time'), 'cb_window_size', Integer('cb_open_time'))
 
 # ################################################################################################################################
 
@@ -152,7 +154,9 @@ class Create(_CreateEdit):
         input_optional = ('service', 'security_id', 'method', 'soap_action', 'soap_version', 'data_format',
             'host', 'ping_method', 'pool_size', Boolean('merge_url_params_req'), 'url_params_pri', 'params_pri',
             'serialization_type', 'timeout', 'sec_tls_ca_cert_id', Boolean('has_rbac'), 'content_type',
-            'cache_id', Integer('cache_expiry'))
+            'cache_id', Integer('cache_expiry'), Integer('max_concurrency'), Integer('max_queue_size'),
+            Boolean('has_circuit_breaker'), Integer('cb_error_rate'), Integer('cb_slow_call_rate'), Integer('cb_slow_call_time'),
+            'cb_window_size', Integer('cb_open_time'))
         output_required = ('id', 'name')
 
     def handle(self):
@@ -223,6 +227,13 @@ class Create(_CreateEdit):
                 item.sec_use_rbac = input.sec_use_rbac
                 item.cache_id = input.cache_id
                 item.cache_expiry = input.cache_expiry
+                item.max_concurrency = input.get('max_concurrency') or None
+                item.max_queue_size = input.get('max_queue_size') or None
+                item.has_circuit_breaker = input.get('has_circuit_breaker') or False
+
+                for name in 'cb_error_rate', 'cb_slow_call_rate', 'cb_slow_call_time', 'cb_window_size', 'cb_open_time':
+                    value = input.get(name)
+                    setattr(item, name, None if value in (None, '') else value)
 
                 sec_tls_ca_cert_id = input.get('sec_tls_ca_cert_id')
                 item.sec_tls_ca_cert_id = sec_tls_ca_cert_id if sec_tls_ca_cert_id and sec_tls_ca_cert_id != ZATO_NONE else None
@@ -277,7 +288,9 @@ class Edit(_CreateEdit):
         input_optional = ('service', 'security_id', 'method', 'soap_action', 'soap_version', 'data_format',
             'host', 'ping_method', 'pool_size', Boolean('merge_url_params_req'), 'url_params_pri', 'params_pri',
             'serialization_type', 'timeout', 'sec_tls_ca_cert_id', Boolean('has_rbac'), 'content_type',
-            'cache_id', Integer('cache_expiry'))
+            'cache_id', Integer('cache_expiry'), Integer('max_concurrency'), Integer('max_queue_size'),
+            Boolean('has_circuit_breaker'), Integer('cb_error_rate'), Integer('cb_slow_call_rate'), Integer('cb_slow_call_time'),
+            'cb_window_size', Integer('cb_open_time'))
         output_required = ('id', 'name')
 
     def handle(self):
@@ -352,6 +365,13 @@ class Edit(_CreateEdit):
                 item.sec_use_rbac = input.sec_use_rbac
                 item.cache_id = input.cache_id
                 item.cache_expiry = input.cache_expiry
+                item.max_concurrency = input.get('max_concurrency') or None
+                item.max_queue_size = input.get('max_queue_size') or None
+                item.has_circuit_breaker = input.get('has_circuit_breaker') or False
+
+                for name in 'cb_error_rate', 'cb_slow_call_rate', 'cb_slow_call_time', 'cb_window_size', 'cb_open_time':
+                    value = input.get(name)
+                    setattr(item, name, None if value in (None, '') else value)
 
                 sec_tls_ca_cert_id = input.get('sec_tls_ca_cert_id')
                 item.sec_tls_ca_cert_id = sec_tls_ca_cert_id if sec_tls_ca_cert_id and sec_tls_ca_cert_id != ZATO_NONE else None
@@ -499,6 +519,39 @@ class GetURLSecurity(AdminService):
 
 # ################################################################################################################################
 
+class GetGauges(AdminService):
+    """ Returns a JSON document with in-flight request gauges of the worker process this service runs in - how many requests
+    are being handled by the worker and by each channel, their peaks since the previous read and how long requests
+    were queued before they were dispatched. Peaks and queue times start afresh after each read.
+    """
+    def handle(self):
+        response = self.worker_store.request_dispatcher.gauges.read()
+        response['admission'] = self.worker_store.request_dispatcher.admission.get_stats()
+        response['pid'] = self.server.pid
+        response['server_name'] = self.server.name
+        self.response.payload = dumps(response, sort_keys=True)
+        self.response.content_type = 'application/json'
+
+# ################################################################################################################################
+
+class GetCircuitBreakers(AdminService):
+    """ Returns a JSON document with the state of circuit breakers of outgoing HTTP/SOAP connections in the worker process
+    this service runs in, keyed by connection names. Connections without circuit breakers are not included.
+    """
+    def handle(self):
+        response = {}
+
+        for ignored, config_data in self.worker_store.yield_outconn_http_config_dicts():
+            circuit_breaker = getattr(config_data.get('conn'), 'circuit_breaker', None)
+            if circuit_breaker:
+                response[config_data.config.name] = circuit_breaker.get_stats()
+
+        self.response.payload = dumps({'pid':self.server.pid, 'server_name':self.server.name, 'circuit_breakers':response},
+            sort_keys=True)
+        self.response.content_type = 'application/json'
+
+# ################################################################################################################################
+
 class GetAuditConfig(AdminService):
     """ Returns audit configuration for a given HTTP/SOAP object.
     """
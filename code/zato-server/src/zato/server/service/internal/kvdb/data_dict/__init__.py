@@ -8,6 +8,7 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 
 # Zato
 from zato.common import KVDB, ZatoException
+from zato.common.broker_message import DATA_DICT
 from zato.common.util import multikeysort, translation_name
 from zato.server.service.internal import AdminService
 
@@ -19,6 +20,13 @@ class DataDictService(AdminService):
     def _name(self, system1, key1, value1, system2, key2):
         return translation_name(system1, key1, value1, system2, key2)
 
+    def _notify_changed(self):
+        """ Lets all workers know that their cached translations need to be reloaded, including our own one
+        so that the change is visible to this worker right away.
+        """
+        self.server.kvdb.invalidate_translations()
+        self.broker_client.publish({'action': DATA_DICT.CHANGED.value})
+
     def _get_dict_item(self, id):
         """ Returns a dictionary entry by its ID.
         """
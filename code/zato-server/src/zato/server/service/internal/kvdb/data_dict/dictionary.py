@@ -79,6 +79,11 @@ class _CreateEdit(DataDictService):
         self.server.kvdb.conn.hset(KVDB.DICTIONARY_ITEM, id, item)
         self.response.payload.id = id
 
+        self._on_saved()
+
+    def _on_saved(self):
+        pass
+
     def _handle(self, *args, **kwargs):
         raise NotImplementedError('Must be implemented by a subclass')
 
@@ -117,6 +122,11 @@ class Edit(_CreateEdit):
                 if item['id2'] == id:
                     self.server.kvdb.conn.hset(hash_name, 'value2', self.request.input.value)
 
+    def _on_saved(self):
+        """ Translations may have been renamed or given new values.
+        """
+        self._notify_changed()
+
 class Delete(DataDictService):
     """ Deletes a dictionary entry by its ID.
     """
@@ -133,6 +143,7 @@ class Delete(DataDictService):
             if item['id1'] == id or item['id2'] == id:
                 self.server.kvdb.conn.delete(self._name(item['system1'], item['key1'], item['value1'], item['system2'], item['key2']))
 
+        self._notify_changed()
         self.response.payload.id = self.request.input.id
 
 class _DictionaryEntryService(DataDictService):
@@ -54,3 +54,5 @@ class Import(DataDictService):
                     p.hset(key, value_key, value)
 
             p.execute()
+
+        self._notify_changed()
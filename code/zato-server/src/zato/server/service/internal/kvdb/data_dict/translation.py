@@ -26,6 +26,7 @@ class _DeletingService(DataDictService):
             if int(item['id']) == id:
                 delete_key = KVDB.SEPARATOR.join((KVDB.TRANSLATION, item['system1'], item['key1'], item['value1'], item['system2'], item['key2']))
                 self.server.kvdb.conn.delete(delete_key)
+                self._notify_changed()
 
 class GetList(DataDictService):
     """ Returns a list of translations.
@@ -100,6 +101,7 @@ class _CreateEdit(DataDictService):
 
         if self._validate_name(hash_name, system1, key1, value1, system2, key2, self.request.input.get('id')):
             self.response.payload.id = self._handle(hash_name, item_ids)
+            self._notify_changed()
 
     def _handle(self, *args, **kwargs):
         raise NotImplementedError('Must be implemented by a subclass')
@@ -11,13 +11,12 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 # stdlib
 from contextlib import closing
 
-# SQLAlchemy
-from sqlalchemy import and_
-
 # Zato
 from zato.common import WEB_SOCKET
-from zato.common.odb.model import WebSocketSubscription
-from zato.common.odb.query import jwt_by_username, web_socket_client_by_pub_id, web_socket_sub_list
+from zato.common.broker_message import MSG_BROWSER
+from zato.common.odb.model import WebSocketMsgBrowserSub
+from zato.common.odb.query import jwt_by_username, web_socket_client_by_pub_id
+from zato.server.live_browser import get_client_details
 from zato.server.service import AsIs, Opaque
 from zato.server.service.internal import AdminService, AdminSIO
 
@@ -28,8 +27,6 @@ whitelist = (
     'zato.ping',
 )
 
-_pattern = WEB_SOCKET.PATTERN
-
 # ################################################################################################################################
 
 class DeleteCurrentSubscriptions(AdminService):
@@ -42,16 +39,19 @@ class DeleteCurrentSubscriptions(AdminService):
 
     def handle(self):
         with closing(self.odb.session()) as session:
-
-            web_socket_sub_list(session, self.server.cluster_id).\
-                filter(WebSocketSubscription.client_id==self.request.input.client_id).\
-                filter(and_(
-                    WebSocketSubscription.is_by_ext_id.is_(False),
-                    WebSocketSubscription.is_by_channel.is_(False),
-                )).delete()
-
+            session.query(WebSocketMsgBrowserSub).\
+                filter(WebSocketMsgBrowserSub.cluster_id==self.server.cluster_id).\
+                filter(WebSocketMsgBrowserSub.client_id==self.request.input.client_id).\
+                delete()
             session.commit()
 
+        # Our own worker is updated right away, other ones will be through the broker
+        self.server.msg_browser_index.unsubscribe(self.request.input.pub_client_id)
+        self.broker_client.publish({
+            'action': MSG_BROWSER.UNSUBSCRIBE.value,
+            'pub_client_id_list': [self.request.input.pub_client_id],
+        })
+
 # ################################################################################################################################
 
 class Subscribe(AdminService):
@@ -64,6 +64,7 @@ class Subscribe(AdminService):
 
         with closing(self.odb.session()) as session:
             client, channel_name = web_socket_client_by_pub_id(session, self.request.input.pub_client_id)
+            client_details = get_client_details(client, channel_name)
 
             # First, remove all current subscriptions ..
             self.invoke(DeleteCurrentSubscriptions.get_name(), {
@@ -71,21 +72,25 @@ class Subscribe(AdminService):
                 'pub_client_id':self.request.input.pub_client_id,
             })
 
-            # .. now subscribe to all the new patterns.
-            for pattern in set(elem.strip() for elem in self.request.input.query.strip().split()):
-
-                self.invoke('zato.channel.web-socket.subscription.create', {
-                    'ext_client_id': client.ext_client_id,
-                    'client_id': client.id,
-                    'channel_id': client.channel_id,
-                    'channel_name': channel_name,
-                    'pattern': _pattern.MSG_BROWSER.format(pattern),
-                    'is_by_ext_id': False,
-                    'is_by_channel': False,
-                    'is_internal': False,
-                    'is_durable': False,
-                    'has_gd': False,
-                })
+            # .. now subscribe to all the new patterns ..
+            patterns = set(elem.lower() for elem in self.request.input.query.strip().split())
+
+            for pattern in patterns:
+                sub = WebSocketMsgBrowserSub()
+                sub.pattern = pattern
+                sub.client_id = client.id
+                sub.cluster_id = self.server.cluster_id
+                session.add(sub)
+
+            session.commit()
+
+        # .. and let all workers know about them, starting with our own one.
+        self.server.msg_browser_index.subscribe(client_details, patterns)
+        self.broker_client.publish({
+            'action': MSG_BROWSER.SUBSCRIBE.value,
+            'client': client_details,
+            'patterns': list(patterns),
+        })
 
 # ################################################################################################################################
 
@@ -16,7 +16,7 @@ from traceback import format_exc
 from zato.common.broker_message import OUTGOING
 from zato.common.odb.model import ConnDefAMQP, OutgoingAMQP
 from zato.common.odb.query import out_amqp_list
-from zato.server.service import AsIs
+from zato.server.service import AsIs, Boolean
 from zato.server.service.internal import AdminService, AdminSIO, GetListAdminSIO
 
 # ################################################################################################################################
@@ -32,7 +32,8 @@ class GetList(AdminService):
         response_elem = 'zato_outgoing_amqp_get_list_response'
         input_required = ('cluster_id',)
         output_required = ('id', 'name', 'is_active', 'def_id', 'delivery_mode', 'priority', 'def_name', 'pool_size')
-        output_optional = ('content_type', 'content_encoding', 'expiration', AsIs('user_id'), AsIs('app_id'))
+        output_optional = ('content_type', 'content_encoding', 'expiration', AsIs('user_id'), AsIs('app_id'),
+            Boolean('confirm_publish'))
 
     def get_data(self, session):
         return self._search(out_amqp_list, session, self.request.input.cluster_id, False)
@@ -52,7 +53,8 @@ class Create(AdminService):
         request_elem = 'zato_outgoing_amqp_create_request'
         response_elem = 'zato_outgoing_amqp_create_response'
         input_required = ('cluster_id', 'name', 'is_active', 'def_id', 'delivery_mode', 'priority', 'pool_size')
-        input_optional = ('content_type', 'content_encoding', 'expiration', AsIs('user_id'), AsIs('app_id'))
+        input_optional = ('content_type', 'content_encoding', 'expiration', AsIs('user_id'), AsIs('app_id'),
+            Boolean('confirm_publish'))
         output_required = ('id', 'name')
 
     def handle(self):
@@ -91,6 +93,7 @@ class Create(AdminService):
                 item.pool_size = input.pool_size
                 item.user_id = input.user_id
                 item.app_id = input.app_id
+                item.confirm_publish = input.confirm_publish
 
                 session.add(item)
                 session.commit()
@@ -119,7 +122,8 @@ class Edit(AdminService):
         request_elem = 'zato_outgoing_amqp_edit_request'
         response_elem = 'zato_outgoing_amqp_edit_response'
         input_required = ('id', 'cluster_id', 'name', 'is_active', 'def_id', 'delivery_mode', 'priority', 'pool_size')
-        input_optional = ('content_type', 'content_encoding', 'expiration', AsIs('user_id'), AsIs('app_id'))
+        input_optional = ('content_type', 'content_encoding', 'expiration', AsIs('user_id'), AsIs('app_id'),
+            Boolean('confirm_publish'))
         output_required = ('id', 'name')
 
     def handle(self):
@@ -161,6 +165,7 @@ class Edit(AdminService):
                 item.pool_size = input.pool_size
                 item.user_id = input.user_id
                 item.app_id = input.app_id
+                item.confirm_publish = input.confirm_publish
 
                 session.add(item)
                 session.commit()
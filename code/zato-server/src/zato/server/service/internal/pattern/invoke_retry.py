@@ -17,32 +17,14 @@ from arrow import utcnow
 # Bunch
 from bunch import Bunch
 
-# gevent
-from gevent import spawn, spawn_later
-
 # Zato
 from zato.server.service import Service
-from zato.server.pattern.invoke_retry import RetryFailed, retry_failed_msg, retry_limit_reached_msg
+from zato.server.pattern.invoke_retry import RetryCall, RetryPolicy, retry_budget
 
 # ################################################################################################################################
 
 class InvokeRetry(Service):
 
-# ################################################################################################################################
-
-    def _retry(self, remaining):
-
-        try:
-            response = self.invoke(self.req_bunch.target, *self.req_bunch.args, **self.req_bunch.kwargs)
-        except Exception, e:
-            msg = retry_failed_msg(
-                (self.req_bunch.retry_repeats-remaining)+1, self.req_bunch.retry_repeats,
-                self.req_bunch.target, self.req_bunch.retry_seconds, self.req_bunch.orig_cid, e)
-            self.logger.info(msg)
-            raise RetryFailed(remaining-1, e)
-        else:
-            return response
-
 # ################################################################################################################################
 
     def _notify_callback(self, is_ok, response):
@@ -64,30 +46,14 @@ class InvokeRetry(Service):
 
 # ################################################################################################################################
 
-    def _on_retry_finished(self, g):
-        """ A callback method invoked when a retry finishes. Will decide whether it should be
-        attempted to retry the invocation again or give up notifying the uses via callback
-        service if retry limit is reached.
+    def _on_retry_finished(self, is_ok, response, error_msg):
+        """ A callback invoked once the target service has been invoked successfully or no more retries are possible,
+        in which case users are warned in logs. Either way, the callback service is notified.
         """
-        # Was there any exception caught when retrying?
-        e = g.exception
-
-        if e:
-            # Can we retry again?
-            if e.remaining:
-                g = spawn_later(self.req_bunch.retry_seconds, self._retry, e.remaining)
-                g.link(self._on_retry_finished)
-
-            # Reached the limit, warn users in logs, notify callback service and give up.
-            else:
-                msg = retry_limit_reached_msg(self.req_bunch.retry_repeats,
-                    self.req_bunch.target, self.req_bunch.retry_seconds, self.req_bunch.orig_cid)
-                self.logger.warn(msg)
-                self._notify_callback(False, None)
-
-        # Let the callback know it's all good
-        else:
-            self._notify_callback(True, g.value)
+        if not is_ok:
+            self.logger.warn(error_msg)
+
+        self._notify_callback(is_ok, response)
 
 # ################################################################################################################################
 
@@ -95,8 +61,12 @@ class InvokeRetry(Service):
         # Convert to bunch so it's easier to read everything
         self.req_bunch = Bunch(loads(self.request.payload))
 
-        # Initial retry linked to a retry callback
-        g = spawn(self._retry, self.req_bunch.retry_repeats)
-        g.link(self._on_retry_finished)
+        policy = RetryPolicy(self.req_bunch.retry_repeats, self.req_bunch.retry_seconds, self.req_bunch.get('backoff'),
+            self.req_bunch.get('max_seconds'), self.req_bunch.get('jitter'))
+
+        # Each attempt, including the initial one, waits in the worker's timer queue rather than in a greenlet of its own
+        retry_budget.on_call()
+        RetryCall(self.invoke, self.req_bunch.target, self.req_bunch.args, self.req_bunch.kwargs, policy,
+            self.req_bunch.orig_cid, self._on_retry_finished).start()
 
 # ################################################################################################################################
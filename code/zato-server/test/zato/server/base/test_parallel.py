@@ -232,6 +232,7 @@ class AuditTestCase(TestCase):
                     ps = ParallelServer()
                     ps.worker_store = ws
                     ps.request_dispatcher_dispatch = ws.request_dispatcher.dispatch
+                    ps.http_gauges = ws.request_dispatcher.gauges
                     ps.on_wsgi_request(wsgi_environ, StartResponse(), cid=expected_cid)
 
                     if expected_audit_enabled:
@@ -430,6 +431,7 @@ class HTTPAccessLogTestCase(TestCase):
         ps = ParallelServer()
         ps.worker_store = ws
         ps.request_dispatcher_dispatch = ws.request_dispatcher.dispatch
+        ps.http_gauges = ws.request_dispatcher.gauges
         ps.access_logger = FakeAccessLogger()
         ps.access_logger_log = ps.access_logger._log
         ps.on_wsgi_request(wsgi_environ, StartResponse(), cid=cid, _utcnow=_utcnow)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from unittest import TestCase
+
+# gevent
+from gevent import GreenletExit, sleep, spawn
+from gevent.event import Event
+
+# mock
+from mock import patch
+
+# Zato
+from zato.common.exception import ServiceUnavailable
+from zato.server.connection.http_soap.admission import AdmissionControl, Limiter
+
+# ################################################################################################################################
+
+class AdmissionControlTestCase(TestCase):
+
+    def test_no_limits(self):
+        admission = AdmissionControl()
+        self.assertListEqual(admission.enter('cid', {'name':'channel1'}), [])
+
+    def test_worker_limit(self):
+        admission = AdmissionControl(max_concurrency=1, retry_after=5)
+        channel_item = {'name':'channel1'}
+
+        acquired = admission.enter('cid1', channel_item)
+
+        try:
+            admission.enter('cid2', channel_item)
+        except ServiceUnavailable, e:
+            self.assertEquals(e.cid, 'cid2')
+            self.assertEquals(e.retry_after, 5)
+        else:
+            self.fail('Expected ServiceUnavailable')
+
+        admission.exit(acquired)
+        admission.exit(admission.enter('cid3', channel_item))
+
+        self.assertEquals(admission.get_stats()['worker']['rejected'], 1)
+
+    def test_channel_limit(self):
+        admission = AdmissionControl()
+        channel1 = {'name':'channel1', 'max_concurrency':1}
+        channel2 = {'name':'channel2', 'max_concurrency':1}
+
+        admission.enter('cid1', channel1)
+        admission.enter('cid2', channel2)
+        self.assertRaises(ServiceUnavailable, admission.enter, 'cid3', channel1)
+
+        # A changed limit takes effect immediately
+        channel1['max_concurrency'] = 2
+        admission.enter('cid4', channel1)
+
+    def test_queue(self):
+        admission = AdmissionControl(max_concurrency=1, max_queue_size=1, queue_timeout=1)
+        channel_item = {'name':'channel1'}
+        admitted = []
+
+        def enter(cid):
+            try:
+                admitted.append(admission.enter(cid, channel_item))
+            except ServiceUnavailable:
+                admitted.append(None)
+
+        acquired = admission.enter('cid1', channel_item)
+
+        # The first one waits in the queue, the other one is rejected because the queue is full
+        spawn(enter, 'cid2')
+        spawn(enter, 'cid3')
+        sleep(0.1)
+
+        self.assertListEqual(admitted, [None])
+
+        # Releasing a slot hands it over to the request waiting in the queue
+        admission.exit(acquired)
+        sleep(0.1)
+
+        self.assertEquals(len(admitted), 2)
+        self.assertTrue(admitted[1])
+        self.assertEquals(admission.get_stats()['worker']['in_flight'], 1)
+
+    def test_queue_timeout(self):
+        admission = AdmissionControl(max_concurrency=1, max_queue_size=1, queue_timeout=0.05)
+        channel_item = {'name':'channel1'}
+
+        admission.enter('cid1', channel_item)
+        self.assertRaises(ServiceUnavailable, admission.enter, 'cid2', channel_item)
+        self.assertEquals(admission.get_stats()['worker']['waiting'], 0)
+
+    def test_queue_killed(self):
+        admission = AdmissionControl(max_concurrency=1, max_queue_size=1, queue_timeout=1)
+        channel_item = {'name':'channel1'}
+
+        acquired = admission.enter('cid1', channel_item)
+
+        # A request killed while waiting leaves the queue ..
+        waiter = spawn(admission.enter, 'cid2', channel_item)
+        sleep(0.01)
+        waiter.kill()
+
+        self.assertEquals(admission.get_stats()['worker']['waiting'], 0)
+
+        # .. so others may wait in its place.
+        waiter = spawn(admission.enter, 'cid3', channel_item)
+        sleep(0.01)
+
+        self.assertEquals(admission.get_stats()['worker']['waiting'], 1)
+
+        admission.exit(acquired)
+        self.assertTrue(waiter.get(timeout=1))
+
+    def test_queue_killed_after_hand_over(self):
+        limiter = Limiter(1, 1, 1)
+        limiter.acquire()
+
+        class KilledAfterHandOver(Event):
+            """ Stands for a waiter killed after the slot of a finishing request was handed over to it
+            but before the waiter could use it.
+            """
+            def wait(self, timeout=None):
+                limiter.release()
+                raise GreenletExit()
+
+        with patch('zato.server.connection.http_soap.admission.Event', KilledAfterHandOver):
+            self.assertRaises(GreenletExit, limiter.acquire)
+
+        # The slot was passed on rather than kept by the waiter killed
+        stats = limiter.get_stats()
+        self.assertEquals(stats['waiting'], 0)
+        self.assertEquals(stats['in_flight'], 0)
+
+# ################################################################################################################################
@@ -315,6 +315,7 @@ class TestRequestDispatcher(MessageHandlingBase):
         channel_item_return_value.match_target = uuid4().hex
         channel_item_return_value.audit_enabled = False
         channel_item_return_value.method = ''
+        channel_item_return_value.name = uuid4().hex
 
         payload = uuid4().hex
 
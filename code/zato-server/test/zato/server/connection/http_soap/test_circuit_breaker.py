@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from unittest import TestCase
+
+# Zato
+from zato.common import CIRCUIT_BREAKER
+from zato.server.connection.http_soap.circuit_breaker import CircuitBreaker, CircuitOpen
+
+# ################################################################################################################################
+
+class CircuitBreakerTestCase(TestCase):
+
+    def get_breaker(self, **kwargs):
+        config = {'error_rate':50, 'slow_call_rate':0, 'slow_call_time':0, 'window_size':10, 'open_time':30, 'min_calls':4}
+        config.update(kwargs)
+        return CircuitBreaker('test', **config)
+
+    def call(self, breaker, is_error, duration=0.01):
+        is_trial = breaker.before_call('cid')
+        breaker.after_call(is_trial, is_error, duration)
+
+    def test_opens_on_error_rate(self):
+        breaker = self.get_breaker()
+
+        # Not enough calls yet to tell
+        for x in range(3):
+            self.call(breaker, True)
+        self.assertEquals(breaker.state, CIRCUIT_BREAKER.STATE.CLOSED)
+
+        self.call(breaker, True)
+        self.assertEquals(breaker.state, CIRCUIT_BREAKER.STATE.OPEN)
+
+        try:
+            breaker.before_call('cid')
+        except CircuitOpen, e:
+            self.assertEquals(e.cid, 'cid')
+            self.assertTrue(0 < e.retry_after <= 30)
+        else:
+            self.fail('Expected CircuitOpen')
+
+        self.assertEquals(breaker.get_stats()['rejected'], 1)
+
+    def test_stays_closed_below_error_rate(self):
+        breaker = self.get_breaker()
+
+        for x in range(20):
+            self.call(breaker, x % 4 == 0)
+
+        self.assertEquals(breaker.state, CIRCUIT_BREAKER.STATE.CLOSED)
+
+    def test_opens_on_slow_calls(self):
+        breaker = self.get_breaker(error_rate=0, slow_call_rate=50, slow_call_time=100)
+
+        for x in range(4):
+            self.call(breaker, False, 0.2)
+
+        self.assertEquals(breaker.state, CIRCUIT_BREAKER.STATE.OPEN)
+
+    def test_half_open(self):
+        for is_trial_ok in True, False:
+
+            breaker = self.get_breaker()
+
+            for x in range(4):
+                self.call(breaker, True)
+
+            # Pretend open_time elapsed
+            breaker.opened_at -= 31
+
+            is_trial = breaker.before_call('cid')
+            self.assertTrue(is_trial)
+            self.assertEquals(breaker.state, CIRCUIT_BREAKER.STATE.HALF_OPEN)
+
+            # Only one trial call at a time
+            self.assertRaises(CircuitOpen, breaker.before_call, 'cid')
+
+            breaker.after_call(is_trial, not is_trial_ok, 0.01)
+
+            if is_trial_ok:
+                self.assertEquals(breaker.state, CIRCUIT_BREAKER.STATE.CLOSED)
+                self.assertEquals(breaker.get_stats()['calls'], 0)
+            else:
+                self.assertEquals(breaker.state, CIRCUIT_BREAKER.STATE.OPEN)
+                self.assertEquals(breaker.times_opened, 2)
+
+    def test_calls_in_flight_when_opened_are_ignored(self):
+        breaker = self.get_breaker()
+
+        in_flight = breaker.before_call('cid')
+
+        for x in range(4):
+            self.call(breaker, True)
+
+        breaker.after_call(in_flight, False, 0.01)
+        self.assertEquals(breaker.state, CIRCUIT_BREAKER.STATE.OPEN)
+
+# ################################################################################################################################
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from unittest import TestCase
+
+# Zato
+from zato.server.connection.http_soap.gauges import get_queue_time, HTTPGauges
+
+# ################################################################################################################################
+
+class GetQueueTimeTestCase(TestCase):
+
+    def test_no_header(self):
+        self.assertIsNone(get_queue_time({}, 1000.0))
+
+    def test_invalid_header(self):
+        self.assertIsNone(get_queue_time({'HTTP_X_REQUEST_START':'abc'}, 1000.0))
+
+    def test_units(self):
+        now = 1500000000.5
+
+        for value in ('1500000000.0', 't=1500000000000', 't=1500000000000000'):
+            self.assertAlmostEquals(get_queue_time({'HTTP_X_REQUEST_START':value}, now), 0.5)
+
+        self.assertAlmostEquals(get_queue_time({'HTTP_X_QUEUE_START':'t=1500000000250'}, now), 0.25)
+
+    def test_clock_skew(self):
+        self.assertEquals(get_queue_time({'HTTP_X_REQUEST_START':'2000.0'}, 1000.0), 0)
+
+# ################################################################################################################################
+
+class HTTPGaugesTestCase(TestCase):
+
+    def test_in_flight_and_peak(self):
+        gauges = HTTPGauges()
+
+        for x in range(3):
+            gauges.on_request({}, 1000.0)
+            gauges.get_channel_gauge('channel1').incr()
+
+        gauges.on_response()
+        gauges.get_channel_gauge('channel1').decr()
+
+        out = gauges.read()
+        self.assertDictEqual(out['worker'], {'current':2, 'peak':3, 'total':3})
+        self.assertDictEqual(out['channels'], {'channel1': {'current':2, 'peak':3, 'total':3}})
+
+        # Peaks are reported since the last read only
+        out = gauges.read()
+        self.assertDictEqual(out['worker'], {'current':2, 'peak':2, 'total':3})
+
+    def test_queue_time(self):
+        gauges = HTTPGauges()
+
+        gauges.on_request({'HTTP_X_REQUEST_START':'t=1000.0'}, 1001.0)
+        gauges.on_request({'HTTP_X_REQUEST_START':'t=1000.0'}, 1003.0)
+        gauges.on_request({}, 1003.0)
+
+        self.assertDictEqual(gauges.read()['queue_time'], {'count':2, 'mean':2.0, 'min':1.0, 'max':3.0})
+        self.assertDictEqual(gauges.read()['queue_time'], {'count':0, 'mean':None, 'min':None, 'max':None})
+
+# ################################################################################################################################
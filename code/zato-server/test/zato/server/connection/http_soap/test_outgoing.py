@@ -31,7 +31,7 @@ requests.packages.urllib3.disable_warnings()
 
 # Zato
 from zato.common.util import get_component_name
-from zato.common import CONTENT_TYPE, DATA_FORMAT, SEC_DEF_TYPE, soapenv11_namespace, soapenv12_namespace, URL_TYPE, ZATO_NONE
+from zato.common import CIRCUIT_BREAKER, CONTENT_TYPE, DATA_FORMAT, SEC_DEF_TYPE, soapenv11_namespace, soapenv12_namespace, URL_TYPE, ZATO_NONE
 from zato.common.test import rand_float, rand_int, rand_string
 from zato.common.test.tls import TLSServer
 from zato.common.test.tls_material import ca_cert, ca_cert_invalid, client1_cert, client1_key
@@ -161,6 +161,19 @@ class HTTPSOAPWrapperTestCase(TestCase, Base):
                 self.assertIn('timeout', requests_module.session_obj.request_kwargs)
                 eq_(expected_timeout, requests_module.session_obj.request_kwargs['timeout'])
 
+    def test_circuit_breaker_config(self):
+        config = self._get_config()
+        config.update({'name':rand_string(), 'has_circuit_breaker':True, 'cb_error_rate':0, 'cb_slow_call_rate':'20',
+            'cb_slow_call_time':None})
+
+        breaker = HTTPSOAPWrapper(config, _FakeRequestsModule()).circuit_breaker
+
+        # Explicit zeros are kept while values not given at all are replaced with defaults
+        eq_(breaker.error_rate, 0)
+        eq_(breaker.slow_call_rate, 20)
+        eq_(breaker.slow_call_time, CIRCUIT_BREAKER.DEFAULT.SLOW_CALL_TIME)
+        eq_(breaker.open_time, CIRCUIT_BREAKER.DEFAULT.OPEN_TIME)
+
     def test_set_address(self):
         address_host = rand_string()
         config = self._get_config()
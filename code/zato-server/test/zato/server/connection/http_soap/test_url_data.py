@@ -18,11 +18,15 @@ from bunch import Bunch
 # nose
 from nose.tools import eq_
 
+# sec-wall
+from secwall.wsse import WSSE, wsse_password_xpath
+
 # Zato
 from zato.common import DATA_FORMAT, MISC, URL_TYPE, ZATO_NONE
 from zato.common.test import rand_string
-from zato.common.util import new_cid, payload_from_request
+from zato.common.util import new_cid, parse_xml, payload_from_request
 from zato.server.connection.http_soap import Unauthorized, url_data
+from zato.server.message import XPathStore
 from zato.url_dispatcher import Matcher
 
 # ################################################################################################################################
@@ -493,8 +497,11 @@ class URLDataTestCase(TestCase):
             xml_username = valid_username if is_valid else rand_string()
 
             cid = rand_string()
-            ud = url_data.URLData(None, [])
-            sec_def = Bunch(username=valid_username, password=password, username_expr=username_expr, password_expr=password_expr)
+            ud = url_data.URLData(None, [], xpath_sec_config={}, xpath_store=XPathStore())
+            ud.worker = Bunch(msg_ns_store=Bunch(ns_map={}))
+            sec_def = Bunch(name=rand_string(), username=valid_username, password=password, username_expr=username_expr,
+                password_expr=password_expr)
+            ud._update_xpath_sec(sec_def.name, sec_def)
 
             xml = """<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:foo="http://foo.example.com">
                 <soapenv:Header/>
@@ -1423,3 +1430,54 @@ class URLDataTestCase(TestCase):
         eq_(dummy_lock.enter_called, True)
 
 # ################################################################################################################################
+
+class WSSETestCase(TestCase):
+
+    wsse_request = """<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
+        xmlns:wsse="http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd">
+      <soapenv:Header>
+        <wsse:Security>
+          <wsse:UsernameToken>
+            <wsse:Username>user1</wsse:Username>
+            <wsse:Password Type="{}">{}</wsse:Password>
+          </wsse:UsernameToken>
+        </wsse:Security>
+      </soapenv:Header>
+      <soapenv:Body><a><b>1</b></a></soapenv:Body>
+    </soapenv:Envelope>"""
+
+    def get_url_data(self):
+        ud = url_data.URLData.__new__(url_data.URLData)
+        ud._wss = WSSE()
+        return ud
+
+    def get_config(self):
+        return {
+            'wsse-pwd-username': 'user1',
+            'wsse-pwd-password': 'password1',
+            'wsse-pwd-reject-empty-nonce-creation': False,
+            'wsse-pwd-reject-stale-tokens': False,
+            'wsse-pwd-reject-expiry-limit': 0,
+            'wsse-pwd-nonce-freshness-time': 0,
+        }
+
+    def get_doc(self, password):
+        password_type = 'http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-username-token-profile-1.0#PasswordText'
+        return parse_xml('cid', self.wsse_request.format(password_type, password))
+
+    def test_validate_does_not_change_request(self):
+        doc = self.get_doc('password1')
+        self.assertTrue(self.get_url_data()._on_wsse_pwd(self.get_config(), doc))
+
+        # The password was not shadowed in the request that SimpleIO builds the payload from
+        self.assertEquals(wsse_password_xpath(doc)[0].text, 'password1')
+
+        payload = payload_from_request('cid', doc, DATA_FORMAT.XML, URL_TYPE.SOAP)
+        self.assertEquals(payload.b, 1)
+
+    def test_validate_invalid_password(self):
+        doc = self.get_doc('invalid')
+        self.assertFalse(self.get_url_data()._on_wsse_pwd(self.get_config(), doc))
+        self.assertEquals(wsse_password_xpath(doc)[0].text, 'invalid')
+
+# ################################################################################################################################
@@ -0,0 +1,12 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2018, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+# Tests in this package run WebSphere MQ connectors' IPC servers and their clients in the same process so the standard
+# library needs to be monkey-patched before any test module, or anything it imports, is loaded.
+from gevent.monkey import patch_all
+patch_all()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2018, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from time import sleep, time
+from unittest import TestCase
+
+# mock
+from mock import MagicMock, patch
+
+# Zato
+from zato.server.connection.jms_wmq.jms import NoMessageAvailableException
+from zato.server.connection.jms_wmq.jms.container import WebSphereMQChannel
+
+# ################################################################################################################################
+
+class FakeConnection(object):
+    """ Hands out messages once they are due, each given as a number of seconds since the connection was created.
+    """
+    def __init__(self, due):
+        self.start = time()
+        self.due = list(due)
+        self.wait_intervals = []
+
+    def receive(self, queue_name, wait_interval):
+        self.wait_intervals.append(wait_interval)
+
+        if self.due:
+            until = time() + wait_interval / 1000.0
+            msg_at = self.start + self.due[0]
+
+            if msg_at <= until:
+                sleep(max(0, msg_at - time()))
+                return 'msg{}'.format(self.due.pop(0))
+
+            sleep(wait_interval / 1000.0)
+
+        raise NoMessageAvailableException('No message available')
+
+# ################################################################################################################################
+
+class ReceiveBatchTestCase(TestCase):
+
+    def get_channel(self, conn, batch_size, linger_time):
+        with patch.dict('sys.modules', {'pymqi': MagicMock()}):
+            channel = WebSphereMQChannel(conn, 1, 'queue1', 'service1', None, MagicMock(), batch_size, linger_time)
+
+        channel.keep_running = True
+        return channel
+
+    def test_no_message(self):
+        channel = self.get_channel(FakeConnection([]), 10, 0)
+        self.assertRaises(NoMessageAvailableException, channel._receive_batch)
+
+    def test_batch_size(self):
+        conn = FakeConnection([0, 0, 0, 0, 0])
+        channel = self.get_channel(conn, 3, 1000)
+
+        start = time()
+
+        # The batch is full so there is no need to wait for the linger time to elapse
+        self.assertListEqual(channel._receive_batch(), ['msg0', 'msg0', 'msg0'])
+        self.assertLess(time() - start, 0.5)
+
+        # Remaining messages are taken next time
+        self.assertListEqual(channel._receive_batch(), ['msg0', 'msg0'])
+
+    def test_linger_time(self):
+        conn = FakeConnection([0, 0.05, 0.3])
+        channel = self.get_channel(conn, 10, 100)
+
+        start = time()
+
+        # The third message arrives after linger time so it is not waited for
+        self.assertListEqual(channel._receive_batch(), ['msg0', 'msg0.05'])
+        self.assertLess(time() - start, 0.25)
+
+        sleep(0.2)
+        self.assertListEqual(channel._receive_batch(), ['msg0.3'])
+
+    def test_no_linger_time(self):
+        conn = FakeConnection([0, 0, 0.1])
+        channel = self.get_channel(conn, 10, 0)
+
+        # Messages already on the queue are taken without waiting for further ones
+        self.assertListEqual(channel._receive_batch(), ['msg0', 'msg0'])
+        self.assertListEqual(conn.wait_intervals, [100, 0, 0])
+
+    def test_error_during_batch(self):
+        conn = FakeConnection([0, 0])
+        conn.receive = MagicMock(side_effect=['msg1', 'msg2', Exception('Connection broken')])
+
+        channel = self.get_channel(conn, 10, 100)
+
+        # Messages received before the error are still delivered
+        self.assertListEqual(channel._receive_batch(), ['msg1', 'msg2'])
+        self.assertEquals(channel.logger.warn.call_count, 1)
+
+    def test_stopped_during_batch(self):
+        conn = FakeConnection([0, 0])
+        channel = self.get_channel(conn, 10, 100)
+        channel.keep_running = False
+
+        self.assertListEqual(channel._receive_batch(), ['msg0'])
+
+# ################################################################################################################################
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2018, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+import os
+import socket
+import stat
+from json import dumps
+from shutil import rmtree
+from struct import pack
+from tempfile import mkdtemp
+from time import time
+from unittest import TestCase
+
+# gevent
+from gevent import sleep, spawn
+
+# Zato
+from zato.server.base.parallel.wmq import ConnectorClient
+from zato.server.connection.jms_wmq.ipc import FramedResponse, FramedServer, FrameError, PATH, recv_frame, send_frame
+
+# ################################################################################################################################
+
+class FrameTestCase(TestCase):
+
+    def setUp(self):
+        self.reader, self.writer = socket.socketpair()
+
+    def tearDown(self):
+        self.reader.close()
+        self.writer.close()
+
+    def test_partial_reads(self):
+        data = {'id': 1, 'path': PATH.API, 'data': 'abc' * 100}
+
+        body = dumps(data)
+        frame = pack(b'!I', len(body)) + body
+
+        def send_in_chunks():
+            for idx in range(len(frame)):
+                self.writer.sendall(frame[idx:idx+1])
+                sleep(0.0001)
+
+        spawn(send_in_chunks)
+
+        self.assertDictEqual(recv_frame(self.reader), data)
+
+    def test_frames_back_to_back(self):
+        send_frame(self.writer, {'id': 1})
+        send_frame(self.writer, {'id': 2})
+
+        self.assertDictEqual(recv_frame(self.reader), {'id': 1})
+        self.assertDictEqual(recv_frame(self.reader), {'id': 2})
+
+    def test_peer_disconnects_mid_frame(self):
+        data = dumps({'id': 1, 'data': 'abc'})
+
+        # Header says more is coming than is sent before the connection is closed
+        self.writer.sendall(b'\x00\x00\x00\x64' + data)
+        self.writer.close()
+
+        self.assertRaises(FrameError, recv_frame, self.reader)
+
+    def test_peer_disconnects_mid_header(self):
+        self.writer.sendall(b'\x00\x00')
+        self.writer.close()
+
+        self.assertRaises(FrameError, recv_frame, self.reader)
+
+# ################################################################################################################################
+
+class TrackingServer(FramedServer):
+    """ Keeps track of connections accepted so that tests can close them as though the connector went away.
+    """
+    def __init__(self, *args, **kwargs):
+        super(TrackingServer, self).__init__(*args, **kwargs)
+        self.connections = []
+
+    def _handle_connection(self, sock):
+        self.connections.append(sock)
+        super(TrackingServer, self)._handle_connection(sock)
+
+# ################################################################################################################################
+
+class ServerClientTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = mkdtemp()
+        self.socket_path = os.path.join(self.tmp_dir, 'connector.sock')
+
+        # With the standard library monkey-patched, threads of the server are greenlets running alongside the client's ones
+        self.server = TrackingServer(self.socket_path, 10, self.check_credentials, self.handle_request)
+        self.server_greenlet = spawn(self.server.serve_forever)
+
+        while not os.path.exists(self.socket_path):
+            sleep(0.01)
+
+        self.client = ConnectorClient(self.socket_path, 'user1', 'password1')
+
+    def tearDown(self):
+        self.client.close()
+        self.server_greenlet.kill()
+        rmtree(self.tmp_dir)
+
+    def check_credentials(self, username, password):
+        return (username, password) == ('user1', 'password1')
+
+    def handle_request(self, path, data):
+
+        if path == PATH.PING:
+            return FramedResponse('200 OK', '', 'text/plain')
+
+        sleep(data.get('sleep', 0))
+
+        if data.get('is_invalid'):
+            return FramedResponse('200 OK', object(), 'text/json')
+
+        return FramedResponse('200 OK', data['value'], 'text/json')
+
+    def test_socket_permissions(self):
+        self.assertEquals(stat.S_IMODE(os.stat(self.socket_path).st_mode), 0o600)
+
+    def test_invalid_credentials(self):
+        client = ConnectorClient(self.socket_path, 'user1', 'invalid')
+        self.assertRaises(Exception, client.invoke, PATH.PING, {}, 1)
+
+    def test_concurrent_requests(self):
+
+        # Requests sent first take longest so their responses arrive last, each has to be matched with its request by ID
+        requests = [{'value': idx, 'sleep': 0.05 * (5 - idx)} for idx in range(5)]
+
+        start = time()
+        greenlets = [spawn(self.client.invoke, PATH.API, request, 5) for request in requests]
+        responses = [greenlet.get() for greenlet in greenlets]
+
+        self.assertListEqual([response.data for response in responses], range(5))
+        self.assertTrue(all(response.ok for response in responses))
+
+        # Requests were handled concurrently rather than one after another
+        self.assertLess(time() - start, 0.6)
+
+    def test_timeout(self):
+        try:
+            self.client.invoke(PATH.API, {'value': 1, 'sleep': 0.5}, 0.1)
+        except Exception, e:
+            self.assertIn('No response from WebSphere MQ connector within 0.1s', e.args[0])
+        else:
+            self.fail('Expected a timeout')
+
+        self.assertDictEqual(self.client.pending, {})
+
+        # The late response is dropped while the connection can be used for further requests
+        sleep(0.5)
+        self.assertEquals(self.client.invoke(PATH.API, {'value': 2}, 1).data, 2)
+
+    def test_response_not_serializable(self):
+        response = self.client.invoke(PATH.API, {'is_invalid': True}, 1)
+
+        self.assertFalse(response.ok)
+        self.assertEquals(response.status, '500 Internal Server Error')
+
+    def test_connector_disconnects(self):
+        self.assertTrue(self.client.invoke(PATH.PING, {}, 1).ok)
+
+        # Requests waiting for responses are given an exception as soon as the connection is closed
+        result = spawn(self.client.invoke, PATH.API, {'value': 1, 'sleep': 1}, 5)
+        sleep(0.1)
+
+        for sock in self.server.connections:
+            sock.shutdown(socket.SHUT_RDWR)
+
+        self.assertRaises(FrameError, result.get, timeout=1)
+
+        # A new connection is established for next requests
+        sleep(0.1)
+        self.assertTrue(self.client.invoke(PATH.PING, {}, 1).ok)
+
+# ################################################################################################################################
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from collections import defaultdict
+from socket import timeout as socket_timeout
+from time import time
+from unittest import TestCase
+
+# Bunch
+from bunch import Bunch
+
+# gevent
+from gevent import sleep
+
+# mock
+from mock import MagicMock, patch
+
+# Zato
+from zato.common import AMQP
+from zato.server.connection.amqp_ import _PublisherConfirms, Consumer, PublishNotConfirmed
+
+# ################################################################################################################################
+
+class FakeMessage(object):
+    def __init__(self, body, routing_key='rk1', redelivered=False):
+        self.body = body
+        self._state = 'RECEIVED'
+        self.delivery_info = {'routing_key': routing_key, 'redelivered': redelivered}
+
+    def ack(self):
+        self._state = 'ACK'
+
+    def reject(self, requeue=False):
+        self._state = 'REQUEUED' if requeue else 'REJECTED'
+
+# ################################################################################################################################
+
+class ConsumerTestCase(TestCase):
+
+    def get_consumer(self, on_message, **kwargs):
+        config = Bunch(name='channel1', queue='queue1', ack_mode=AMQP.ACK_MODE.ACK.id, max_concurrency=1, prefetch_count=None,
+            preserve_order=False, conn_class=MagicMock(), conn_url='amqp://', consumer_tag_prefix='zato')
+        config.update(kwargs)
+
+        return Consumer(config, lambda body, msg, name, config: on_message(body, msg))
+
+    def test_prefetch_count(self):
+
+        def on_message(body, msg):
+            pass
+
+        # Messages are handled inline so no prefetch is needed
+        self.assertEquals(self.get_consumer(on_message).prefetch_count, 0)
+
+        # By default, each handler has one message waiting for it
+        self.assertEquals(self.get_consumer(on_message, max_concurrency=5).prefetch_count, 10)
+
+        # Unless configured explicitly
+        self.assertEquals(self.get_consumer(on_message, max_concurrency=5, prefetch_count=3).prefetch_count, 3)
+
+    def test_qos(self):
+        consumer = self.get_consumer(lambda body, msg: None, max_concurrency=5)
+
+        with patch('zato.server.connection.amqp_._Consumer') as kombu_consumer:
+            consumer._get_consumer()
+
+        kombu_consumer.return_value.qos.assert_called_once_with(prefetch_count=10)
+        kombu_consumer.return_value.consume.assert_called_once_with()
+
+    def test_concurrency(self):
+        in_flight = []
+        max_in_flight = []
+
+        def on_message(body, msg):
+            in_flight.append(body)
+            max_in_flight.append(len(in_flight))
+            sleep(0.1)
+            in_flight.remove(body)
+
+        consumer = self.get_consumer(on_message, max_concurrency=5)
+        messages = [FakeMessage(idx) for idx in range(10)]
+
+        start = time()
+
+        for msg in messages:
+            consumer._on_amqp_message(msg.body, msg)
+        consumer.handlers.join()
+
+        # Ten messages, five at a time, take about two handling times
+        self.assertLess(time() - start, 0.5)
+        self.assertEquals(max(max_in_flight), 5)
+        self.assertListEqual([msg._state for msg in messages], ['ACK'] * 10)
+
+    def test_preserve_order(self):
+        handled = []
+
+        def on_message(body, msg):
+            routing_key, idx = body
+
+            # Earlier messages take longer to handle so they would finish last if nothing kept them in order
+            sleep(0.01 * (5 - idx))
+            handled.append(body)
+
+        consumer = self.get_consumer(on_message, max_concurrency=5, preserve_order=True)
+
+        for idx in range(5):
+            for routing_key in 'rk1', 'rk2':
+                consumer._on_amqp_message((routing_key, idx), FakeMessage((routing_key, idx), routing_key))
+
+        consumer.handlers.join()
+
+        for routing_key in 'rk1', 'rk2':
+            self.assertListEqual([body for body in handled if body[0] == routing_key], [(routing_key, idx) for idx in range(5)])
+
+        self.assertDictEqual(consumer.ordered_backlog, {})
+
+    def test_error_rejects_message(self):
+
+        def on_message(body, msg):
+            raise Exception('Handler error')
+
+        consumer = self.get_consumer(on_message, max_concurrency=5)
+
+        msg = FakeMessage('1')
+        redelivered = FakeMessage('1', redelivered=True)
+
+        consumer._on_amqp_message(msg.body, msg)
+        consumer._on_amqp_message(redelivered.body, redelivered)
+        consumer.handlers.join()
+
+        # Requeued the first time, in case the error was temporary, and rejected for good if it happens again
+        self.assertEquals(msg._state, 'REQUEUED')
+        self.assertEquals(redelivered._state, 'REJECTED')
+
+    def test_error_inline(self):
+
+        def on_message(body, msg):
+            raise Exception('Handler error')
+
+        consumer = self.get_consumer(on_message)
+
+        msg = FakeMessage('1')
+        consumer._on_amqp_message(msg.body, msg)
+
+        # Without concurrent handlers, the message is left unacknowledged, as previously
+        self.assertEquals(msg._state, 'RECEIVED')
+
+    def test_message_already_acknowledged(self):
+
+        def on_message(body, msg):
+            msg.reject()
+
+        consumer = self.get_consumer(on_message)
+
+        msg = FakeMessage('1')
+        consumer._on_amqp_message(msg.body, msg)
+
+        # The service rejected the message itself so the consumer does not acknowledge it
+        self.assertEquals(msg._state, 'REJECTED')
+
+# ################################################################################################################################
+
+class FakeChannel(object):
+    def __init__(self):
+        self.events = defaultdict(set)
+        self.confirm_select_calls = 0
+
+    def confirm_select(self):
+        self.confirm_select_calls += 1
+
+# ################################################################################################################################
+
+class FakeConnection(object):
+    """ Delivers broker confirmations, given as (event_name, delivery_tag, multiple) tuples, one each time it is drained.
+    """
+    def __init__(self, channel, confirms):
+        self.channel = channel
+        self.confirms = list(confirms)
+
+    def drain_events(self, timeout):
+        if not self.confirms:
+            sleep(min(timeout, 0.01))
+            raise socket_timeout()
+
+        event_name, delivery_tag, multiple = self.confirms.pop(0)
+        for callback in list(self.channel.events[event_name]):
+            callback(delivery_tag, multiple)
+
+# ################################################################################################################################
+
+class PublisherConfirmsTestCase(TestCase):
+
+    def publish(self, channel, count):
+        confirms = _PublisherConfirms(channel)
+        for x in range(count):
+            confirms.add()
+
+        return confirms
+
+    def test_ack(self):
+        channel = FakeChannel()
+        confirms = self.publish(channel, 3)
+
+        # One message acknowledged on its own and the rest of them in one go
+        confirms.wait(FakeConnection(channel, [('basic_ack', 1, False), ('basic_ack', 3, True)]), 1)
+        self.assertEquals(confirms.pending, set())
+
+        confirms.close()
+        self.assertEquals(channel.events['basic_ack'], set())
+        self.assertEquals(channel.events['basic_nack'], set())
+
+    def test_channel_reused(self):
+        channel = FakeChannel()
+
+        confirms = self.publish(channel, 2)
+        confirms.wait(FakeConnection(channel, [('basic_ack', 2, True)]), 1)
+        confirms.close()
+
+        # Delivery tags continue from where the previous publisher left off and confirm mode is not selected again
+        confirms = self.publish(channel, 1)
+        self.assertEquals(confirms.pending, set([3]))
+        self.assertEquals(channel.confirm_select_calls, 1)
+
+        confirms.wait(FakeConnection(channel, [('basic_ack', 3, False)]), 1)
+        confirms.close()
+
+    def test_nack(self):
+        channel = FakeChannel()
+        confirms = self.publish(channel, 3)
+
+        connection = FakeConnection(channel, [('basic_ack', 1, False), ('basic_nack', 3, True)])
+
+        try:
+            confirms.wait(connection, 1)
+        except PublishNotConfirmed, e:
+            self.assertEquals(e.rejected, 2)
+            self.assertEquals(e.unconfirmed, 0)
+            self.assertEquals(e.args[0], '2 of 3 message(s) rejected by the broker')
+        else:
+            self.fail('Expected PublishNotConfirmed')
+
+    def test_timeout(self):
+        channel = FakeChannel()
+        confirms = self.publish(channel, 3)
+
+        start = time()
+
+        try:
+            confirms.wait(FakeConnection(channel, [('basic_ack', 1, False)]), 0.1)
+        except PublishNotConfirmed, e:
+            self.assertEquals(e.unconfirmed, 2)
+            self.assertEquals(e.rejected, 0)
+            self.assertEquals(e.args[0], '2 of 3 message(s) not confirmed by the broker within 0.1s')
+        else:
+            self.fail('Expected PublishNotConfirmed')
+
+        self.assertLess(time() - start, 0.5)
+
+# ################################################################################################################################
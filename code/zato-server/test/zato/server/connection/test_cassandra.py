@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from unittest import TestCase
+
+# Zato
+from zato.server.connection.cassandra import CassandraSession
+
+# ################################################################################################################################
+
+class FakeSession(object):
+    def __init__(self):
+        self.prepared = []
+        self.executed = []
+        self.keyspace = 'my_keyspace'
+
+    def prepare(self, query):
+        self.prepared.append(query)
+        return 'prepared.{}'.format(query)
+
+    def execute(self, statement, params=None):
+        self.executed.append((statement, params))
+        return [{'id': 1}]
+
+# ################################################################################################################################
+
+class CassandraSessionTestCase(TestCase):
+
+    def test_named_query(self):
+        session = FakeSession()
+        conn = CassandraSession(session)
+        conn.add_query('get-customer', 'SELECT * FROM customer WHERE id=?')
+
+        for x in range(3):
+            self.assertListEqual(conn.execute_query('get-customer', [x]), [{'id': 1}])
+
+        # Prepared only once but executed each time with bound parameters
+        self.assertListEqual(session.prepared, ['SELECT * FROM customer WHERE id=?'])
+        self.assertListEqual(session.executed, [('prepared.SELECT * FROM customer WHERE id=?', [x]) for x in range(3)])
+
+        self.assertRaises(KeyError, conn.execute_query, 'no-such-query')
+
+        conn.remove_query('get-customer')
+        self.assertRaises(KeyError, conn.execute_query, 'get-customer')
+
+    def test_max_prepared(self):
+        session = FakeSession()
+        conn = CassandraSession(session, 2)
+
+        conn.prepare('q1')
+        conn.prepare('q2')
+        conn.prepare('q1')
+
+        # q2 is the least recently used one now
+        conn.prepare('q3')
+        self.assertListEqual(list(conn.prepared), ['q1', 'q3'])
+
+        conn.prepare('q1')
+        self.assertListEqual(session.prepared, ['q1', 'q2', 'q3'])
+
+    def test_driver_session_attributes(self):
+        conn = CassandraSession(FakeSession())
+        self.assertEquals(conn.keyspace, 'my_keyspace')
+        self.assertListEqual(conn.execute('SELECT 1'), [{'id': 1}])
+
+# ################################################################################################################################
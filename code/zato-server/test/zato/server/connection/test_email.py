@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+import asyncore
+from smtpd import SMTPServer
+from threading import Thread
+from unittest import TestCase
+
+# Bunch
+from bunch import Bunch
+
+# Zato
+from zato.common import SMTPMessage
+from zato.common.test import rand_string
+from zato.common.util import get_free_port
+from zato.server.connection.email import SMTPConnection
+
+# ################################################################################################################################
+
+class _SMTPServer(SMTPServer):
+    """ A stand-in SMTP server that keeps track of how many connections were made to it and what messages it received.
+    """
+    def __init__(self, *args, **kwargs):
+        SMTPServer.__init__(self, *args, **kwargs)
+        self.connections = 0
+        self.messages = []
+        self.rejected = set()
+
+    def handle_accept(self):
+        self.connections += 1
+        SMTPServer.handle_accept(self)
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        if set(rcpttos) & self.rejected:
+            return '554 Message rejected'
+
+        self.messages.append(data)
+
+# ################################################################################################################################
+
+class SMTPConnectionTestCase(TestCase):
+
+    def setUp(self):
+        self.port = get_free_port()
+        self.server = _SMTPServer(('127.0.0.1', self.port), None)
+
+        self.server_thread = Thread(target=asyncore.loop, kwargs={'timeout':0.1})
+        self.server_thread.daemon = True
+        self.server_thread.start()
+
+        config = Bunch({'name':rand_string(), 'host':'127.0.0.1', 'port':self.port, 'mode_outbox':None, 'is_debug':False,
+            'timeout':5, 'username':'', 'password':''})
+
+        self.conn = SMTPConnection(config, config)
+
+    def tearDown(self):
+        self.conn.close()
+        self.server.close()
+
+    def get_msg(self, to='to@example.com'):
+        return SMTPMessage('from@example.com', to, rand_string(), rand_string())
+
+    def test_send_many_single_session(self):
+        result = self.conn.send_many([self.get_msg() for x in range(3)])
+
+        self.assertListEqual(result, [True, True, True])
+        self.assertEquals(len(self.server.messages), 3)
+        self.assertEquals(self.server.connections, 1)
+
+    def test_session_reused(self):
+        self.assertTrue(self.conn.send(self.get_msg()))
+        self.assertTrue(self.conn.send(self.get_msg()))
+        self.assertTrue(self.conn.send(self.get_msg()))
+
+        self.assertEquals(len(self.server.messages), 3)
+        self.assertEquals(self.server.connections, 1)
+
+    def test_message_rejected(self):
+        self.server.rejected.add('rejected@example.com')
+
+        result = self.conn.send_many([self.get_msg(), self.get_msg('rejected@example.com'), self.get_msg()])
+
+        # A message rejected by the server does not break the session for the other ones
+        self.assertListEqual(result, [True, False, True])
+        self.assertEquals(len(self.server.messages), 2)
+        self.assertEquals(self.server.connections, 1)
+        self.assertEquals(len(self.conn.pool.idle), 1)
+
+    def test_invalid_session_replaced(self):
+        self.assertTrue(self.conn.send(self.get_msg()))
+
+        # The session is closed while idle in the pool so it fails the check before it is reused
+        self.conn.pool.idle[0][0].smtp.close()
+
+        self.assertTrue(self.conn.send(self.get_msg()))
+        self.assertEquals(self.server.connections, 2)
+
+    def test_transport_error(self):
+        self.assertTrue(self.conn.send(self.get_msg()))
+
+        # Sessions are not checked when taken from the pool so the error is only found when a message is sent
+        self.conn.pool.is_valid_func = None
+        self.conn.pool.idle[0][0].smtp.close()
+
+        self.assertListEqual(self.conn.send_many([self.get_msg(), self.get_msg()]), [False, False])
+
+        # The broken session was discarded and a new one is used next time
+        self.assertEquals(len(self.conn.pool.idle), 0)
+        self.assertTrue(self.conn.send(self.get_msg()))
+        self.assertEquals(self.server.connections, 2)
+
+# ################################################################################################################################
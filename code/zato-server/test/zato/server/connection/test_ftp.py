@@ -9,11 +9,15 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 # stdlib
+from time import time
 from unittest import TestCase
 
 # Bunch
 from bunch import Bunch
 
+# gevent
+from gevent import GreenletExit
+
 # mock
 from mock import patch
 
@@ -42,3 +46,122 @@ class TestFTP(TestCase):
             store.add_params([params])
             conn = store.get(conn_name)
             self.assertIsInstance(conn.timeout, float)
+
+    def test_sessions_reused(self):
+        """ Sessions are logged in once and then reused by subsequent callers.
+        """
+        instances = []
+
+        class _FTP(object):
+            def voidcmd(self, cmd):
+                return '200 OK'
+
+        class FTPFacade(object):
+            def __init__(self, *ignored):
+                self.ftp = _FTP()
+                instances.append(self)
+
+            def close(self):
+                pass
+
+        with patch('zato.server.connection.ftp.FTPFacade', FTPFacade):
+            store = FTPStore()
+
+            conn_name = 'test'
+            params = Bunch({'name':conn_name, 'is_active':True, 'port':21, 'dircache':True, 'timeout':None})
+
+            for name in 'host', 'user', 'password', 'acct':
+                params[name] = rand_string()
+
+            store.add_params([params])
+
+            with store.session(conn_name) as conn1:
+                pass
+
+            with store.session(conn_name) as conn2:
+                self.assertIs(conn2, conn1)
+
+                # Another session is needed if the one so far is still checked out
+                with store.session(conn_name) as conn3:
+                    self.assertIsNot(conn3, conn2)
+
+            self.assertEquals(len(instances), 2)
+
+            # Sessions obtained through get are never pooled
+            self.assertNotIn(store.get(conn_name), instances[:2])
+            self.assertEquals(len(instances), 3)
+
+    def test_session_error(self):
+        """ Sessions in use when an exception was raised, including GreenletExit, are closed rather than reused.
+        """
+        closed = []
+
+        class FTPFacade(object):
+            def __init__(self, *ignored):
+                pass
+
+            def close(self):
+                closed.append(self)
+
+        with patch('zato.server.connection.ftp.FTPFacade', FTPFacade):
+            store = FTPStore()
+
+            conn_name = 'test'
+            params = Bunch({'name':conn_name, 'is_active':True, 'port':21, 'dircache':True, 'timeout':'0.1', 'pool_size':1})
+
+            for name in 'host', 'user', 'password', 'acct':
+                params[name] = rand_string()
+
+            store.add_params([params])
+
+            for exc_class in ValueError, GreenletExit:
+                try:
+                    with store.session(conn_name) as conn:
+                        raise exc_class()
+                except exc_class:
+                    pass
+
+                self.assertIs(closed[-1], conn)
+
+            # Each time, the only place in the pool was given back
+            with store.session(conn_name) as conn:
+                self.assertNotIn(conn, closed)
+
+    def test_pool_exhausted(self):
+        """ Callers give up waiting for a session if all of them are checked out for longer than the timeout.
+        """
+        class FTPFacade(object):
+            def __init__(self, *ignored):
+                pass
+
+            def close(self):
+                pass
+
+        with patch('zato.server.connection.ftp.FTPFacade', FTPFacade):
+            store = FTPStore()
+
+            conn_name = 'test'
+            params = Bunch({'name':conn_name, 'is_active':True, 'port':21, 'dircache':True, 'timeout':'0.1', 'pool_size':1})
+
+            for name in 'host', 'user', 'password', 'acct':
+                params[name] = rand_string()
+
+            store.add_params([params])
+
+            with store.session(conn_name):
+
+                start = time()
+
+                try:
+                    with store.session(conn_name):
+                        pass
+                except Exception, e:
+                    self.assertEquals(e.args[0], 'No free sessions to `test` after 0.1s')
+                else:
+                    self.fail('Expected an exception')
+
+                self.assertLess(time() - start, 1)
+
+            # The session can be obtained again once it is given back
+            with store.session(conn_name):
+                pass
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from contextlib import contextmanager
+from json import loads
+from unittest import TestCase
+
+# gevent
+from gevent import sleep, spawn
+
+# pysolr
+from pysolr import SolrError
+
+# Zato
+from zato.server.connection.search import BulkIndexerStore
+from zato.server.connection.search.es import ElasticSearchBulkIndexer
+from zato.server.connection.search.solr import SolrBulkIndexer
+
+# ################################################################################################################################
+
+class FakeIndices(object):
+    def __init__(self, events):
+        self.events = events
+
+    def refresh(self):
+        self.events.append('refresh')
+
+class FakeES(object):
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.requests = []
+        self.events = []
+        self.indices = FakeIndices(self.events)
+
+    def bulk(self, body, **params):
+        self.events.append('bulk')
+        sleep(self.delay)
+        self.events.append('bulk-done')
+
+        self.requests.append((body, params))
+
+        items = []
+        lines = body.splitlines()
+
+        while lines:
+            op_type, meta = loads(lines.pop(0)).items()[0]
+            doc = loads(lines.pop(0)) if op_type != 'delete' else None
+
+            if doc and doc.get('is_invalid'):
+                items.append({op_type: {'status': 400, 'error': 'MapperParsingException'}})
+            else:
+                items.append({op_type: {'status': 201}})
+
+        return {'items': items}
+
+# ################################################################################################################################
+
+class FakeSolr(object):
+    def __init__(self, error_message='[Reason: Document is missing mandatory uniqueKey field]'):
+        self.error_message = error_message # What pysolr 3.2.0 raises if Solr returns HTTP 400
+        self.added = []
+        self.commits = 0
+
+    def add(self, docs, commit=True):
+        if any(doc.get('is_invalid') for doc in docs):
+            raise SolrError(self.error_message)
+
+        self.added.extend(docs)
+        self.commits += commit
+
+    def commit(self):
+        self.commits += 1
+
+# ################################################################################################################################
+
+class BulkIndexerTestCase(TestCase):
+
+    def get_es_indexer(self, delay=0, **kwargs):
+        es = FakeES(delay)
+        return es, ElasticSearchBulkIndexer('test', es, **kwargs)
+
+    def test_flush_on_max_docs(self):
+        es, indexer = self.get_es_indexer(max_docs=3, flush_interval=10)
+
+        for idx in range(7):
+            self.assertListEqual(indexer.add({'idx': idx}, index='my-index', doc_type='my-type', id=idx), [])
+
+        self.assertEquals(len(es.requests), 2)
+        self.assertEquals(len(indexer.buffer), 1)
+
+        body, params = es.requests[0]
+        self.assertEquals(params, {})
+        self.assertEquals(loads(body.splitlines()[0]), {'index': {'_index': 'my-index', '_type': 'my-type', '_id': 0}})
+
+    def test_flush_on_max_bytes(self):
+        es, indexer = self.get_es_indexer(max_bytes=200, flush_interval=10)
+
+        indexer.add({'data': 'a' * 50}, index='my-index', doc_type='my-type')
+        self.assertEquals(len(es.requests), 0)
+
+        indexer.add({'data': 'a' * 100}, index='my-index', doc_type='my-type')
+        self.assertEquals(len(es.requests), 1)
+
+    def test_flush_on_time(self):
+        es, indexer = self.get_es_indexer(flush_interval=0.05)
+
+        indexer.add({'idx': 1}, index='my-index', doc_type='my-type')
+        self.assertEquals(len(es.requests), 0)
+
+        sleep(0.1)
+        self.assertEquals(len(es.requests), 1)
+        self.assertIsNone(indexer.flusher)
+
+    def test_sync_flush(self):
+        es, indexer = self.get_es_indexer(flush_interval=0.05)
+
+        indexer.add({'idx': 1}, index='my-index', doc_type='my-type')
+        indexer.add({'is_invalid': True}, index='my-index', doc_type='my-type')
+        indexer.add(None, index='my-index', doc_type='my-type', id=1, op_type='delete')
+
+        errors = indexer.flush()
+
+        self.assertListEqual(errors, [({'is_invalid': True}, 'MapperParsingException')])
+        self.assertEquals(es.requests[0][1], {'refresh': 'true'})
+
+        # The timer was cancelled so nothing is sent again
+        sleep(0.1)
+        self.assertEquals(len(es.requests), 1)
+
+    def test_sync_flush_waits_for_flush_in_progress(self):
+        es, indexer = self.get_es_indexer(0.05, flush_interval=10)
+
+        indexer.add({'idx': 1}, index='my-index', doc_type='my-type')
+        spawn(indexer._flush, False)
+        sleep(0)
+
+        # Nothing is left to send but the documents sent in the background are made visible once they have been sent
+        self.assertListEqual(indexer.flush(), [])
+        self.assertListEqual(es.events, ['bulk', 'bulk-done', 'refresh'])
+        self.assertFalse(indexer.needs_refresh)
+
+        # Nothing was sent since then
+        indexer.flush()
+        self.assertListEqual(es.events, ['bulk', 'bulk-done', 'refresh'])
+
+    def test_sync_flush_after_flush_in_progress(self):
+        es, indexer = self.get_es_indexer(0.05, flush_interval=10)
+
+        indexer.add({'idx': 1}, index='my-index', doc_type='my-type')
+        spawn(indexer._flush, False)
+        sleep(0)
+
+        indexer.add({'idx': 2}, index='my-other-index', doc_type='my-type')
+        indexer.flush()
+
+        # The two flushes did not overlap and the documents of both are refreshed
+        self.assertListEqual(es.events, ['bulk', 'bulk-done', 'bulk', 'bulk-done', 'refresh'])
+        self.assertListEqual([params for body, params in es.requests], [{}, {}])
+
+    def test_close(self):
+        es, indexer = self.get_es_indexer()
+
+        indexer.add({'idx': 1}, index='my-index', doc_type='my-type')
+        indexer.close()
+
+        self.assertEquals(len(es.requests), 1)
+        self.assertRaises(Exception, indexer.add, {'idx': 2}, index='my-index', doc_type='my-type')
+
+    def test_solr_errors_per_document(self):
+        solr = FakeSolr()
+
+        @contextmanager
+        def client():
+            yield solr
+
+        indexer = SolrBulkIndexer('test', client, flush_interval=10)
+
+        indexer.add({'id': 1})
+        indexer.add({'is_invalid': True})
+        indexer.add({'id': 2})
+
+        errors = indexer.flush()
+
+        self.assertEquals(len(errors), 1)
+        self.assertEquals(errors[0][0], {'is_invalid': True})
+        self.assertIsInstance(errors[0][1], SolrError)
+
+        self.assertListEqual(solr.added, [{'id': 1}, {'id': 2}])
+        self.assertEquals(solr.commits, 1)
+
+    def test_solr_errors_newer_format(self):
+        solr = FakeSolr('Solr responded with an error (HTTP 400): [Reason: Document is missing mandatory uniqueKey field]')
+
+        @contextmanager
+        def client():
+            yield solr
+
+        indexer = SolrBulkIndexer('test', client, flush_interval=10)
+
+        indexer.add({'id': 1})
+        indexer.add({'is_invalid': True})
+
+        errors = indexer.flush()
+
+        self.assertEquals(len(errors), 1)
+        self.assertEquals(errors[0][0], {'is_invalid': True})
+        self.assertListEqual(solr.added, [{'id': 1}])
+
+    def test_solr_refresh(self):
+        solr = FakeSolr()
+
+        @contextmanager
+        def client():
+            yield solr
+
+        indexer = SolrBulkIndexer('test', client, flush_interval=10)
+
+        indexer.add({'id': 1})
+        indexer._flush(False)
+        self.assertEquals(solr.commits, 0)
+
+        # Documents sent in the background are committed even though there are no new ones to send
+        indexer.flush()
+        self.assertEquals(solr.commits, 1)
+
+# ################################################################################################################################
+
+class FakeStore(BulkIndexerStore):
+    bulk_indexer_class = ElasticSearchBulkIndexer
+
+    def create_impl(self, config, config_no_sensitive):
+        return FakeES(0.05)
+
+    def get_bulk_client(self, item):
+        return item.impl
+
+class BulkIndexerStoreTestCase(TestCase):
+
+    def test_delete(self):
+        store = FakeStore()
+        store.create('test', {'name': 'test'})
+
+        item = store['test']
+        item.bulk.add({'idx': 1}, index='my-index', doc_type='my-type')
+
+        # Deleting the connection does not wait for the documents buffered to be sent ..
+        store.delete('test')
+        self.assertNotIn('test', store.items)
+        self.assertListEqual(item.impl.requests, [])
+
+        # .. but no new ones can be added ..
+        self.assertRaises(Exception, item.bulk.add, {'idx': 2}, index='my-index', doc_type='my-type')
+
+        # .. and the ones buffered are sent in the background.
+        sleep(0.1)
+        self.assertEquals(len(item.impl.requests), 1)
+
+# ################################################################################################################################
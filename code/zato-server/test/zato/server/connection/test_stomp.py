@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from time import time
+from unittest import TestCase
+
+# gevent
+from gevent import sleep
+from gevent.event import Event
+from gevent.queue import Queue
+
+# stompest
+from stompest.error import StompConnectionError
+from stompest.protocol import StompFrame, StompSpec
+
+# Zato
+from zato.bunch import Bunch
+from zato.common import STOMP
+from zato.server.connection.stomp import _channel_main_loop
+
+# ################################################################################################################################
+
+class FakeSession(object):
+    """ A local stand-in for a STOMP connection, hands out frames put on its queue. Like a broker, it sends nothing
+    while there are prefetch messages not acknowledged yet, in which case it stops after a while, setting self.stalled.
+    """
+    def __init__(self, version=StompSpec.VERSION_1_2, prefetch=None):
+        self.version = version
+        self.prefetch = prefetch
+        self.keep_running = True
+        self.stalled = False
+        self.frames = Queue()
+        self.subscriptions = []
+        self.acks = []
+        self.nacks = []
+        self.in_flight = 0
+        self.has_room = Event()
+        self.has_room.set()
+
+    def put(self, body):
+        self.frames.put(StompFrame(StompSpec.MESSAGE, {
+            StompSpec.MESSAGE_ID_HEADER: body,
+            StompSpec.SUBSCRIPTION_HEADER: 'queue1',
+            StompSpec.ACK_HEADER: body,
+        }, body, version=self.version))
+
+    def subscribe(self, destination, headers):
+        self.subscriptions.append((destination, headers))
+
+    def receiveFrame(self):
+        if not self.has_room.wait(0.5):
+            self.stalled = True
+            self.keep_running = False
+            raise StompConnectionError()
+
+        frame = self.frames.get()
+        if frame is None:
+            self.keep_running = False
+            raise StompConnectionError()
+
+        self.in_flight += 1
+        if self.prefetch and self.in_flight >= self.prefetch:
+            self.has_room.clear()
+
+        return frame
+
+    def _settle(self):
+        self.in_flight -= 1
+        self.has_room.set()
+
+    def ack(self, frame):
+        self.acks.append(frame.body)
+        self._settle()
+
+    def nack(self, frame):
+        self.nacks.append(frame.body)
+        self._settle()
+
+    def stop(self):
+        self.frames.put(None)
+
+# ################################################################################################################################
+
+class FakeWorker(object):
+    def __init__(self, handle_time=0, ack_mode=STOMP.ACK_MODE.CLIENT_INDIVIDUAL.id, pool_size=STOMP.DEFAULT.POOL_SIZE):
+        self.handle_time = handle_time
+        self.handled = []
+        self.server = Bunch(fs_server_config=Bunch(misc=Bunch(
+            stomp_channel_ack_mode=ack_mode, stomp_channel_prefetch=STOMP.DEFAULT.PREFETCH, stomp_channel_pool_size=pool_size)))
+
+    def on_message_invoke_service(self, msg, channel, action):
+        sleep(self.handle_time)
+        if msg['payload'].body == 'error':
+            raise Exception('Handler error')
+        self.handled.append(msg['payload'].body)
+
+# ################################################################################################################################
+
+class ChannelMainLoopTestCase(TestCase):
+
+    def run_loop(self, session, worker, bodies):
+        for body in bodies:
+            session.put(body)
+
+        item = Bunch(conn=session, config=Bunch(service_name='my.service', sub_to='queue1\n\nqueue2\n'))
+        session.stop()
+        _channel_main_loop(item, worker)
+
+        # Let all handlers finish
+        sleep(worker.handle_time + 0.1)
+
+    def test_subscribe(self):
+        session = FakeSession()
+        self.run_loop(session, FakeWorker(), [])
+
+        self.assertEquals([name for name, headers in session.subscriptions], ['queue1', 'queue2'])
+
+        headers = session.subscriptions[0][1]
+        self.assertEquals(headers[StompSpec.ACK_HEADER], STOMP.ACK_MODE.CLIENT_INDIVIDUAL.id)
+        self.assertEquals(headers[StompSpec.ID_HEADER], 'queue1')
+        self.assertEquals(headers['activemq.prefetchSize'], str(STOMP.DEFAULT.PREFETCH))
+
+    def test_ack_nack(self):
+        session = FakeSession()
+        self.run_loop(session, FakeWorker(), ['1', 'error', '2'])
+
+        self.assertEquals(sorted(session.acks), ['1', '2'])
+        self.assertEquals(session.nacks, ['error'])
+
+    def test_no_nack_in_stomp_10(self):
+        session = FakeSession(StompSpec.VERSION_1_0)
+        self.run_loop(session, FakeWorker(), ['1', 'error'])
+
+        # Without NACK, failed messages are acknowledged too
+        self.assertEquals(session.acks, ['1', 'error'])
+        self.assertEquals(session.nacks, [])
+
+    def test_stomp_10_failures_over_prefetch(self):
+        session = FakeSession(StompSpec.VERSION_1_0, STOMP.DEFAULT.PREFETCH)
+        worker = FakeWorker(pool_size=1)
+        bodies = ['error'] * (STOMP.DEFAULT.PREFETCH * 2) + ['1']
+
+        self.run_loop(session, worker, bodies)
+
+        # The channel keeps receiving messages after more failures in a row than the broker's prefetch limit
+        self.assertFalse(session.stalled)
+        self.assertEquals(worker.handled, ['1'])
+        self.assertEquals(len(session.acks), len(bodies))
+
+    def test_default_ack_mode(self):
+        session = FakeSession()
+        worker = FakeWorker(ack_mode=None)
+        self.run_loop(session, worker, ['1'])
+
+        self.assertEquals(session.subscriptions[0][1][StompSpec.ACK_HEADER], STOMP.ACK_MODE.AUTO.id)
+        self.assertEquals(session.acks, [])
+
+    def test_auto_ack(self):
+        session = FakeSession()
+        worker = FakeWorker(ack_mode=STOMP.ACK_MODE.AUTO.id)
+        self.run_loop(session, worker, ['1', '2'])
+
+        self.assertEquals(sorted(worker.handled), ['1', '2'])
+        self.assertEquals(session.acks, [])
+        self.assertNotIn('activemq.prefetchSize', session.subscriptions[0][1])
+
+    def test_concurrency(self):
+        session = FakeSession()
+        worker = FakeWorker(handle_time=0.1, pool_size=10)
+        bodies = [str(idx) for idx in range(20)]
+
+        start = time()
+        self.run_loop(session, worker, bodies)
+
+        # Twenty messages, ten at a time, take about two handling times, not twenty
+        self.assertLess(time() - start, 1)
+        self.assertEquals(sorted(session.acks), sorted(bodies))
+
+# ################################################################################################################################
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from time import time
+from unittest import TestCase
+
+# gevent
+from gevent import sleep
+
+# Vault
+from hvac.exceptions import Unauthorized, VaultDown
+
+# Zato
+from zato.server.connection.vault import AuthCache, VaultResponse
+
+# ################################################################################################################################
+
+class FakeClient(object):
+    def __init__(self, lease_duration=100, ttl=None):
+        self.lease_duration = lease_duration
+        self.ttl = ttl
+        self.auth_calls = []
+        self.renew_calls = []
+        self.error = None
+
+    def authenticate(self, auth_method, *credentials):
+        self.auth_calls.append((auth_method,) + credentials)
+        if self.error:
+            raise self.error
+        return VaultResponse('auth', 'token.{}'.format(len(self.auth_calls)), self.lease_duration, ttl=self.ttl)
+
+    def renew(self, client_token):
+        self.renew_calls.append(client_token)
+        return VaultResponse('renew', client_token, self.lease_duration * 2)
+
+# ################################################################################################################################
+
+class AuthCacheTestCase(TestCase):
+
+    def test_positive(self):
+        client = FakeClient()
+        cache = AuthCache(client)
+
+        response1 = cache.authenticate('userpass', 'user1', 'secret1')
+        response2 = cache.authenticate('userpass', 'user1', 'secret1')
+        response3 = cache.authenticate('userpass', 'user1', 'secret2')
+
+        self.assertIs(response1, response2)
+        self.assertIsNot(response1, response3)
+        self.assertEquals(len(client.auth_calls), 2)
+        self.assertEquals(cache.get_stats()['hits'], 1)
+
+    def test_expiry(self):
+        client = FakeClient()
+        cache = AuthCache(client)
+
+        cache.authenticate('userpass', 'user1', 'secret1')
+        cache.positive.values()[0].expires_at -= 101
+
+        cache.authenticate('userpass', 'user1', 'secret1')
+        self.assertEquals(len(client.auth_calls), 2)
+
+    def test_max_ttl(self):
+
+        # The lease is longer than entries may be kept for
+        client = FakeClient(1000)
+        cache = AuthCache(client, max_ttl=10)
+
+        before = time()
+        cache.authenticate('userpass', 'user1', 'secret1')
+        entry = cache.positive.values()[0]
+
+        self.assertTrue(before + 10 <= entry.expires_at <= time() + 10)
+        self.assertTrue(before + 7.5 <= entry.renew_at <= time() + 7.5)
+
+        # The renewed token is cached for no longer than max_ttl either
+        cache._renew(entry)
+        self.assertEquals(entry.response.lease_duration, 2000)
+        self.assertTrue(entry.expires_at <= time() + 10)
+
+    def test_max_ttl_off(self):
+        client = FakeClient(1000)
+        cache = AuthCache(client, max_ttl=0)
+
+        before = time()
+        cache.authenticate('userpass', 'user1', 'secret1')
+
+        self.assertTrue(before + 1000 <= cache.positive.values()[0].expires_at <= time() + 1000)
+
+    def test_token_ttl(self):
+        client = FakeClient(None)
+        cache = AuthCache(client, token_ttl=10)
+
+        before = time()
+        cache.authenticate('token', 'abc')
+        entry = cache.positive.values()[0]
+
+        self.assertTrue(before + 10 <= entry.expires_at <= time() + 10)
+        self.assertIsNone(entry.renew_at)
+
+    def test_token_ttl_capped(self):
+
+        # The token itself expires sooner than token lookups are cached for
+        client = FakeClient(None, 3)
+        cache = AuthCache(client, token_ttl=10)
+
+        before = time()
+        cache.authenticate('token', 'abc')
+        entry = cache.positive.values()[0]
+
+        self.assertTrue(before + 3 <= entry.expires_at <= time() + 3)
+
+    def test_token_ttl_not_expiring(self):
+
+        # Vault reports a TTL of 0 for tokens that never expire
+        client = FakeClient(None, 0)
+        cache = AuthCache(client, token_ttl=10)
+
+        before = time()
+        cache.authenticate('token', 'abc')
+        entry = cache.positive.values()[0]
+
+        self.assertTrue(before + 10 <= entry.expires_at <= time() + 10)
+
+    def test_max_size(self):
+        client = FakeClient()
+        cache = AuthCache(client, max_size=2)
+
+        for name in ('user1', 'user2', 'user3', 'user1'):
+            cache.authenticate('userpass', name, 'secret')
+
+        self.assertEquals(len(cache.positive), 2)
+        self.assertEquals(len(client.auth_calls), 4)
+
+    def test_negative(self):
+        client = FakeClient()
+        client.error = Unauthorized('Invalid credentials')
+        cache = AuthCache(client, negative_max_size=1)
+
+        for x in range(2):
+            self.assertRaises(Unauthorized, cache.authenticate, 'userpass', 'user1', 'invalid')
+
+        self.assertEquals(len(client.auth_calls), 1)
+
+        # Only so many failed attempts are kept
+        self.assertRaises(Unauthorized, cache.authenticate, 'userpass', 'user2', 'invalid')
+        self.assertEquals(len(cache.negative), 1)
+
+        # Once the negative entry expires, Vault is asked again
+        key, (e, expires_at) = cache.negative.items()[0]
+        cache.negative[key] = (e, 0)
+        client.error = None
+
+        cache.authenticate('userpass', 'user2', 'invalid')
+        self.assertEquals(len(client.auth_calls), 3)
+
+    def test_vault_down_not_cached(self):
+        client = FakeClient()
+        client.error = VaultDown('Sealed')
+        cache = AuthCache(client)
+
+        for x in range(2):
+            self.assertRaises(VaultDown, cache.authenticate, 'userpass', 'user1', 'secret1')
+
+        self.assertEquals(len(client.auth_calls), 2)
+        self.assertEquals(len(cache.negative), 0)
+
+    def test_renew(self):
+        client = FakeClient()
+        cache = AuthCache(client)
+
+        response = cache.authenticate('userpass', 'user1', 'secret1')
+        entry = cache.positive.values()[0]
+        entry.renew_at -= 100
+
+        self.assertIs(cache.authenticate('userpass', 'user1', 'secret1'), response)
+        sleep(0.01)
+
+        self.assertListEqual(client.renew_calls, [response.client_token])
+        self.assertEquals(response.lease_duration, 200)
+        self.assertFalse(entry.is_renewing)
+        self.assertEquals(len(client.auth_calls), 1)
+
+# ################################################################################################################################
+
+class VaultResponseTestCase(TestCase):
+
+    def test_token_lookup_ttl(self):
+        response = VaultResponse.from_vault('auth_token', {'data': {'id': 'abc', 'accessor': 'def', 'policies': ['default'],
+            'ttl': 30}}, 'data', 'id', False)
+
+        self.assertEquals(response.client_token, 'abc')
+        self.assertEquals(response.ttl, 30)
+        self.assertIsNone(response.lease_duration)
+
+# ################################################################################################################################
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2018, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from time import time
+from unittest import TestCase
+
+# Bunch
+from bunch import bunchify
+
+# gevent
+from gevent import sleep
+
+# mock
+from mock import MagicMock, patch
+
+# Zato
+from zato.server.connection.web_socket.outgoing import OutgoingWebSocket
+
+# ################################################################################################################################
+
+class FakeClient(object):
+    def __init__(self, server_name, pid, pub_client_id):
+        self.data = {
+            'server_name': server_name,
+            'server_proc_pid': pid,
+            'pub_client_id': pub_client_id,
+            'ext_client_id': 'ext.{}'.format(pub_client_id),
+            'ext_client_name': 'name.{}'.format(pub_client_id),
+            'local_address': 'local.{}'.format(pub_client_id),
+            'peer_address': 'peer.{}'.format(pub_client_id),
+            'peer_fqdn': 'fqdn.{}'.format(pub_client_id),
+        }
+
+    def asdict(self):
+        return self.data
+
+# ################################################################################################################################
+
+class FakeServer(object):
+    """ Stands for a server whose worker processes reply after a delay configured for each PID.
+    """
+    def __init__(self, delays=None, errors=None):
+        self.delays = delays or {}
+        self.errors = errors or ()
+        self.calls = []
+
+    def invoke(self, service, request, pid):
+        self.calls.append((pid, sorted(item['pub_client_id'] for item in request['client_list'])))
+
+        sleep(self.delays.get(pid, 0))
+
+        if pid in self.errors:
+            raise Exception('Worker error')
+
+        return {'response': dict(
+            (item['pub_client_id'], 'response.{}'.format(item['pub_client_id'])) for item in request['client_list'])}
+
+# ################################################################################################################################
+
+class _Base(TestCase):
+
+    def get_outgoing(self, clients, servers=None, **kwargs):
+        self.queries = []
+
+        def web_socket_client_list(session, cluster_id, is_by_ext_id, is_by_channel, pattern):
+            self.queries.append(pattern)
+            result = MagicMock()
+            result.all.return_value = [(client, 'channel1') for client in clients]
+            return result
+
+        patcher = patch('zato.server.connection.web_socket.outgoing.web_socket_client_list', web_socket_client_list)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        return OutgoingWebSocket(1, servers or {}, MagicMock(), **kwargs)
+
+# ################################################################################################################################
+
+class DeliveryTestCase(_Base):
+
+    def test_grouped_by_worker(self):
+        servers = {'server1': FakeServer(), 'server2': FakeServer()}
+        clients = [FakeClient('server1', 11, 'a'), FakeClient('server1', 12, 'b'), FakeClient('server1', 11, 'c'),
+            FakeClient('server2', 11, 'd')]
+
+        responses = self.get_outgoing(clients, servers).invoke({'data': 1}, channel='channel1')
+
+        # Each worker process is invoked once, with all of its clients
+        self.assertListEqual(sorted(servers['server1'].calls), [(11, ['a', 'c']), (12, ['b'])])
+        self.assertListEqual(servers['server2'].calls, [(11, ['d'])])
+
+        responses = sorted(responses, key=lambda item: item['ext_client_id'])
+        self.assertListEqual([item['response'] for item in responses], ['response.a', 'response.b', 'response.c',
+            'response.d'])
+        self.assertEquals(responses[0]['peer_fqdn'], 'fqdn.a')
+
+    def test_concurrent_with_timeout(self):
+        servers = {'server1': FakeServer({11: 0.1, 12: 0.1, 13: 1}, errors=(14,))}
+        clients = [FakeClient('server1', pid, 'client.{}'.format(pid)) for pid in (11, 12, 13, 14)]
+
+        start = time()
+        responses = self.get_outgoing(clients, servers).invoke({'data': 1}, channel='channel1', timeout=0.3)
+
+        # Workers are invoked concurrently, the one that did not reply on time and the one that failed are left out
+        self.assertLess(time() - start, 0.5)
+        self.assertListEqual(sorted(item['response'] for item in responses), ['response.client.11', 'response.client.12'])
+
+    def test_no_criteria(self):
+        self.assertRaises(ValueError, self.get_outgoing([]).invoke, {'data': 1})
+
+    def test_deliver(self):
+        servers = {'server1': FakeServer()}
+        clients = [bunchify(dict(FakeClient('server1', 11, 'a').asdict(), channel_name='channel1'))]
+
+        # Clients already known are delivered to without looking any up
+        responses = self.get_outgoing([], servers).deliver({'data': 1}, clients)
+
+        self.assertListEqual(self.queries, [])
+        self.assertListEqual(servers['server1'].calls, [(11, ['a'])])
+        self.assertListEqual([item['response'] for item in responses], ['response.a'])
+
+# ################################################################################################################################
+
+class ClientCacheTestCase(_Base):
+
+    def test_cached_until_expired(self):
+        outgoing = self.get_outgoing([FakeClient('server1', 11, 'a')], client_cache_ttl=5)
+
+        clients = outgoing.get_clients(False, True, 'pattern1', _time=lambda: 100)
+        self.assertEquals(clients[0].pub_client_id, 'a')
+        self.assertEquals(clients[0].channel_name, 'channel1')
+
+        outgoing.get_clients(False, True, 'pattern1', _time=lambda: 105)
+        self.assertListEqual(self.queries, ['pattern1'])
+
+        outgoing.get_clients(False, True, 'pattern1', _time=lambda: 106)
+        self.assertListEqual(self.queries, ['pattern1', 'pattern1'])
+
+    def test_invalidate(self):
+        outgoing = self.get_outgoing([])
+
+        outgoing.get_clients(False, True, 'pattern1')
+        outgoing.invalidate_client_cache()
+        outgoing.get_clients(False, True, 'pattern1')
+
+        self.assertListEqual(self.queries, ['pattern1', 'pattern1'])
+
+    def test_invalidated_during_lookup(self):
+        outgoing = self.get_outgoing([])
+
+        # Clients changed while they were being looked up so what was found may be already stale and is not cached
+        outgoing.odb_session_maker.session.side_effect = lambda: (outgoing.invalidate_client_cache(), MagicMock())[1]
+
+        outgoing.get_clients(False, True, 'pattern1')
+        self.assertDictEqual(outgoing.client_cache, {})
+
+    def test_expired_entries_dropped(self):
+        outgoing = self.get_outgoing([], client_cache_ttl=5)
+
+        outgoing.get_clients(False, True, 'pattern1', _time=lambda: 100)
+        outgoing.get_clients(False, True, 'pattern2', _time=lambda: 103)
+        outgoing.get_clients(False, True, 'pattern3', _time=lambda: 106)
+
+        self.assertListEqual([key[2] for key in outgoing.client_cache], ['pattern2', 'pattern3'])
+
+    def test_max_size(self):
+        outgoing = self.get_outgoing([], client_cache_max_size=3)
+
+        for idx in range(5):
+            outgoing.get_clients(False, True, 'pattern{}'.format(idx))
+
+        self.assertListEqual([key[2] for key in outgoing.client_cache], ['pattern2', 'pattern3', 'pattern4'])
+
+# ################################################################################################################################
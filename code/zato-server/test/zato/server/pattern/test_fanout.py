@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from unittest import TestCase
+
+# Bunch
+from bunch import Bunch
+
+# Zato
+from zato.common import CHANNEL
+from zato.common.test import rand_string
+from zato.common.util import new_cid
+from zato.server.pattern import _local_calls
+from zato.server.pattern.fanout import FanOut
+from zato.server.pattern.parallel import ParallelExec
+
+# ################################################################################################################################
+
+class DummySourceService(object):
+    def __init__(self, raise_on=None):
+        self.cid = new_cid()
+        self.name = rand_string()
+        self.time = Bunch(utcnow=lambda: '2017-01-01 00:00:00')
+        self.raise_on = raise_on or []
+        self.invoked = []
+        self.invoked_async = []
+        self.wsgi_environ = []
+
+    def invoke(self, name, payload, channel, wsgi_environ=None):
+        self.invoked.append((name, payload, channel))
+        self.wsgi_environ.append(wsgi_environ)
+        if name in self.raise_on:
+            raise Exception(name)
+        return {'target': name, 'payload': payload}
+
+    def invoke_async(self, name, payload, channel, **kwargs):
+        self.invoked_async.append((name, payload, channel))
+        if name in self.raise_on:
+            raise Exception(name)
+
+# ################################################################################################################################
+
+class LocalFanOutTestCase(TestCase):
+
+    def test_fanout_local(self):
+        source = DummySourceService(raise_on=['target2'])
+        fanout = FanOut(source)
+
+        cid = fanout.invoke({'target1': 'abc', 'target2': 'def'}, 'on_final', 'on_target', is_local=True)
+        self.assertTrue(fanout.wait(cid, 1))
+
+        self.assertEquals(sorted(name for name, _, _ in source.invoked), ['target1', 'target2'])
+
+        on_target = [payload for name, payload, _ in source.invoked_async if name == 'on_target']
+        on_final = [payload for name, payload, _ in source.invoked_async if name == 'on_final']
+
+        # Per-target callbacks are invoked for each target and the final one only once
+        self.assertEquals(len(on_target), 2)
+        self.assertEquals(len(on_final), 1)
+
+        data = on_final[0]['data']
+        self.assertTrue(data['target1'].ok)
+        self.assertEquals(data['target1'].response, {'target': 'target1', 'payload': 'abc'})
+        self.assertFalse(data['target2'].ok)
+        self.assertIn('target2', data['target2'].exception)
+
+        for name, payload, channel in source.invoked_async:
+            self.assertEquals(channel, CHANNEL.FANOUT_ON_FINAL if name == 'on_final' else CHANNEL.FANOUT_ON_TARGET)
+
+    def test_fanout_local_on_final_error(self):
+        source = DummySourceService(raise_on=['on_final'])
+        fanout = FanOut(source)
+
+        cid = fanout.invoke({'target1': 'abc'}, 'on_final', is_local=True)
+
+        # The call completes even though its on_final callback could not be invoked
+        self.assertTrue(fanout.wait(cid, 1))
+        self.assertNotIn((fanout.pattern_name, cid), _local_calls)
+
+    def test_fanout_local_cids(self):
+        source = DummySourceService()
+        fanout = FanOut(source)
+
+        # Each local call from the same source gets a CID of its own
+        cid1 = fanout.invoke({'target1': 'abc'}, 'on_final1', is_local=True)
+        cid2 = fanout.invoke({'target2': 'def'}, 'on_final2', is_local=True)
+
+        self.assertNotEquals(cid1, cid2)
+        self.assertNotEquals(cid1, source.cid)
+
+        self.assertTrue(fanout.wait(cid1, 1))
+        self.assertTrue(fanout.wait(cid2, 1))
+
+        on_final = sorted((name, payload['data'].keys()) for name, payload, _ in source.invoked_async)
+        self.assertListEqual(on_final, [('on_final1', ['target1']), ('on_final2', ['target2'])])
+
+    def test_fanout_local_request_ctx(self):
+        source = DummySourceService()
+        fanout = FanOut(source)
+
+        cid = fanout.invoke({'target1': 'abc'}, 'on_final', cid='cid1', is_local=True)
+        self.assertEquals(cid, 'cid1')
+        self.assertTrue(fanout.wait(cid, 1))
+
+        # Targets are given the same context as if they were invoked asynchronously
+        self.assertListEqual(source.wsgi_environ, [{'zato.request_ctx.fanout_cid': 'cid1'}])
+
+    def test_parallel_local(self):
+        source = DummySourceService()
+        parallel = ParallelExec(source)
+
+        cid = parallel.invoke({'target1': 'abc', 'target2': 'def', 'target3': 'ghi'}, 'on_target', is_local=True)
+        self.assertTrue(parallel.wait(cid, 1))
+        self.assertNotIn((parallel.pattern_name, cid), _local_calls)
+
+        self.assertEquals(len(source.invoked), 3)
+        self.assertEquals(len(source.invoked_async), 3)
+
+        for name, payload, channel in source.invoked_async:
+            self.assertEquals(name, 'on_target')
+            self.assertEquals(channel, CHANNEL.PARALLEL_EXEC_ON_TARGET)
+
+# ################################################################################################################################
@@ -16,6 +16,9 @@ from unittest import TestCase
 # bunch
 from bunch import Bunch
 
+# gevent
+from gevent.event import Event
+
 # mock
 from mock import patch
 
@@ -23,7 +26,8 @@ from mock import patch
 from zato.common import ZatoException
 from zato.common.test import rand_int, rand_string
 from zato.common.util import new_cid
-from zato.server.pattern.invoke_retry import InvokeRetry, retry_failed_msg, retry_limit_reached_msg
+from zato.server.pattern.invoke_retry import InvokeRetry, RetryBudget, RetryPolicy, TimerQueue, retry_failed_msg, \
+     retry_limit_reached_msg
 
 # ################################################################################################################################
 
@@ -46,6 +50,7 @@ class DummyTargetService(object):
 
         self.invoke_async_args = None
         self.invoke_async_kwargs = None
+        self.invoke_async_called = Event()
 
     def invoke(self, *args, **kwargs):
         self.invoke_args = args
@@ -60,6 +65,7 @@ class DummyTargetService(object):
     def invoke_async(self, *args, **kwargs):
         self.invoke_async_args = args
         self.invoke_async_kwargs = kwargs
+        self.invoke_async_called.set()
 
         return self.cid
 
@@ -380,52 +386,37 @@ class InvokeRetryTestCase(TestCase):
 
     def test_invoke_retry_exception_no_async(self):
 
-        class Sleep(object):
-            def __init__(self):
-                self.times_called = 0
-                self.retry_seconds = []
-
-            def __call__(self, retry_seconds):
-                self.times_called += 1
-                self.retry_seconds.append(retry_seconds)
-
-        sleep = Sleep()
-
-        with patch('zato.server.pattern.invoke_retry.sleep', sleep):
-
-            target = 'target_{}'.format(rand_string())
-            callback = 'callback_{}'.format(rand_string())
-            callback_impl_name = 'callback_impl_name_{}'.format(rand_string())
-            cid = new_cid()
-            expected_result = rand_string()
+        target = 'target_{}'.format(rand_string())
+        callback = 'callback_{}'.format(rand_string())
+        callback_impl_name = 'callback_impl_name_{}'.format(rand_string())
+        cid = new_cid()
+        expected_result = rand_string()
 
-            invoking_service = DummyTargetService(callback, callback_impl_name, cid, expected_result, raise_on_invoke=True)
-            ir = InvokeRetry(invoking_service)
+        invoking_service = DummyTargetService(callback, callback_impl_name, cid, expected_result, raise_on_invoke=True)
+        ir = InvokeRetry(invoking_service)
 
-            kwargs = {
-                'async_fallback': False,
-                'callback': callback,
-                'context': {rand_string():rand_string()},
-                'repeats': rand_int(1, 10),
-                'seconds': 0.01,
-                'minutes': 0,
-            }
+        kwargs = {
+            'async_fallback': False,
+            'callback': callback,
+            'context': {rand_string():rand_string()},
+            'repeats': rand_int(1, 10),
+            'seconds': 0.01,
+            'minutes': 0,
+        }
 
-            kwargs_copy = deepcopy(kwargs)
+        kwargs_copy = deepcopy(kwargs)
 
-            try:
+        try:
+            with patch('zato.server.pattern.invoke_retry.RetryPolicy.get_delay', return_value=0):
                 ir.invoke(target, 1, 2, 3, **kwargs)
-            except ZatoException, e:
-                expected_msg = retry_limit_reached_msg(kwargs_copy['repeats'], target, kwargs_copy['seconds'], invoking_service.cid)
-                self.assertEquals(e.cid, cid)
-                self.assertEquals(e.message, expected_msg)
-                self.assertEquals(invoking_service.invoke_called_times, kwargs_copy['repeats'])
-
-                self.assertEquals(sleep.times_called, kwargs_copy['repeats']-1)
-                self.assertEquals(sleep.retry_seconds, [kwargs_copy['seconds']] * (kwargs_copy['repeats']-1))
+        except ZatoException, e:
+            expected_msg = retry_limit_reached_msg(kwargs_copy['repeats'], target, kwargs_copy['seconds'], invoking_service.cid)
+            self.assertEquals(e.cid, cid)
+            self.assertEquals(e.message, expected_msg)
+            self.assertEquals(invoking_service.invoke_called_times, kwargs_copy['repeats'])
 
-            else:
-                self.fail('Expected a ZatoException')
+        else:
+            self.fail('Expected a ZatoException')
 
 # ################################################################################################################################
 
@@ -434,7 +425,7 @@ class InvokeRetryTestCase(TestCase):
         target = 'target_{}'.format(rand_string())
         callback = 'callback_{}'.format(rand_string())
         callback_impl_name = 'callback_impl_name_{}'.format(rand_string())
-        cid = new_cid()
+        cid, call_cid = new_cid(), new_cid()
         expected_result = rand_string()
 
         invoking_service = DummyTargetService(callback, callback_impl_name, cid, expected_result, raise_on_invoke=True)
@@ -447,9 +438,97 @@ class InvokeRetryTestCase(TestCase):
             'repeats': rand_int(1, 10),
             'seconds': 0.01,
             'minutes': 0,
+            'cid': call_cid,
         }
 
-        result = ir.invoke(target, 1, 2, 3, **kwargs)
-        self.assertEquals(result, cid)
+        repeats = kwargs['repeats']
+
+        with patch('zato.server.pattern.invoke_retry.RetryPolicy.get_delay', return_value=0):
+            result = ir.invoke(target, 1, 2, 3, **kwargs)
+            self.assertEquals(result, call_cid)
+
+            # Retries take place in background, after which the callback is notified
+            self.assertTrue(invoking_service.invoke_async_called.wait(1))
+
+        self.assertEquals(invoking_service.invoke_called_times, repeats + 1)
+
+        callback_name, callback_request = invoking_service.invoke_async_args
+        self.assertEquals(callback_name, callback)
+        self.assertFalse(callback_request['ok'])
+        self.assertEquals(callback_request['call_cid'], call_cid)
+        self.assertEquals(callback_request['orig_cid'], cid)
+        self.assertEquals(callback_request['retry_repeats'], repeats)
+
+# ################################################################################################################################
+
+class RetryPolicyTestCase(TestCase):
+
+    def test_constant_delay(self):
+        policy = RetryPolicy(3, 5)
+        self.assertListEqual([policy.get_delay(retry) for retry in range(1, 4)], [5, 5, 5])
+
+    def test_backoff(self):
+        policy = RetryPolicy(5, 1, backoff=2, max_seconds=10)
+        self.assertListEqual([policy.get_delay(retry) for retry in range(1, 6)], [1, 2, 4, 8, 10])
+
+    def test_explicit_zero(self):
+        policy = RetryPolicy(3, 4, backoff=0, jitter=0)
+        self.assertEquals(policy.backoff, 0)
+        self.assertEquals(policy.jitter, 0)
+        self.assertListEqual([policy.get_delay(retry) for retry in range(1, 4)], [4, 0, 0])
+
+    def test_jitter(self):
+        policy = RetryPolicy(10, 10, jitter=0.5)
+        for retry in range(1, 11):
+            delay = policy.get_delay(retry)
+            self.assertTrue(5 <= delay <= 15, delay)
+
+# ################################################################################################################################
+
+class RetryBudgetTestCase(TestCase):
+
+    def test_budget_exhausted(self):
+        budget = RetryBudget(ratio=0.5, min_per_second=0, max_tokens=2)
+
+        self.assertTrue(budget.can_retry())
+        self.assertTrue(budget.can_retry())
+        self.assertFalse(budget.can_retry())
+
+        # Two original invocations make up for one retry
+        budget.on_call()
+        self.assertFalse(budget.can_retry())
+
+        budget.on_call()
+        self.assertTrue(budget.can_retry())
+        self.assertFalse(budget.can_retry())
+
+# ################################################################################################################################
+
+class TimerQueueTestCase(TestCase):
+
+    def test_order(self):
+        queue = TimerQueue()
+        called = []
+        all_called = Event()
+
+        def on_called(value):
+            called.append(value)
+            if len(called) == 3:
+                all_called.set()
+
+        with patch('zato.server.pattern.invoke_retry.time') as time:
+
+            # All entries are scheduled at the same time ..
+            time.return_value = 0
+            queue.schedule(20, on_called, 3)
+            queue.schedule(10, on_called, 2)
+            queue.schedule(0, on_called, 1)
+
+            # .. and are called in order once they are due.
+            time.return_value = 30
+            self.assertTrue(all_called.wait(1))
+
+        self.assertListEqual(called, [1, 2, 3])
+        self.assertEquals(len(queue), 0)
 
 # ################################################################################################################################
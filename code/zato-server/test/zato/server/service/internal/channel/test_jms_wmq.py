@@ -8,14 +8,21 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+# stdlib
+from json import dumps
+from unittest import TestCase
+
 # Bunch
 from bunch import Bunch
 
+# mock
+from mock import MagicMock
+
 # Zato
 from zato.common import zato_namespace
-from zato.common.test import rand_bool, rand_int, rand_string, ServiceTestCase
+from zato.common.test import enrich_with_static_config, rand_bool, rand_int, rand_string, ServiceTestCase
 from zato.server.service.internal import GetListAdminSIO
-from zato.server.service.internal.channel.jms_wmq import Create, Edit, Delete, GetList
+from zato.server.service.internal.channel.jms_wmq import Create, Edit, Delete, GetList, OnMessageReceived
 
 ################################################################################
 
@@ -32,7 +39,7 @@ class GetListTestCase(ServiceTestCase):
         return Bunch(
             {'id':rand_int(), 'name':rand_string(), 'is_active':rand_bool(), 'def_id':rand_int(),
              'def_name':rand_string(), 'queue':rand_string(),
-             'service_name':rand_string(), 'data_format':rand_string()}
+             'service_name':rand_string(), 'data_format':rand_string(), 'batch_size':rand_int(), 'linger_time':rand_int()}
         )
 
     def test_sio(self):
@@ -41,7 +48,7 @@ class GetListTestCase(ServiceTestCase):
         self.assertEquals(self.sio.input_required, ('cluster_id',))
         self.assertEquals(self.sio.input_optional, GetListAdminSIO.input_optional)
         self.assertEquals(self.sio.output_required, ('id', 'name', 'is_active', 'def_id', 'def_name', 'queue', 'service_name'))
-        self.assertEquals(self.sio.output_optional, ('data_format',))
+        self.assertEquals(self.sio.output_optional, ('data_format', 'batch_size', 'linger_time'))
         self.assertEquals(self.sio.namespace, zato_namespace)
 
     def test_impl(self):
@@ -67,7 +74,7 @@ class CreateTestCase(ServiceTestCase):
         self.assertEquals(self.sio.request_elem, 'zato_channel_jms_wmq_create_request')
         self.assertEquals(self.sio.response_elem, 'zato_channel_jms_wmq_create_response')
         self.assertEquals(self.sio.input_required, ('cluster_id', 'name', 'is_active', 'def_id', 'queue', 'service'))
-        self.assertEquals(self.sio.input_optional, ('data_format',))
+        self.assertEquals(self.sio.input_optional, ('data_format', 'batch_size', 'linger_time'))
         self.assertEquals(self.sio.output_required, ('id', 'name'))
         self.assertEquals(self.sio.namespace, zato_namespace)
         self.assertRaises(AttributeError, getattr, self.sio, 'output_optional')
@@ -95,7 +102,7 @@ class EditTestCase(ServiceTestCase):
         self.assertEquals(self.sio.request_elem, 'zato_channel_jms_wmq_edit_request')
         self.assertEquals(self.sio.response_elem, 'zato_channel_jms_wmq_edit_response')
         self.assertEquals(self.sio.input_required, ('id', 'cluster_id', 'name', 'is_active', 'def_id', 'queue', 'service'))
-        self.assertEquals(self.sio.input_optional, ('data_format',))
+        self.assertEquals(self.sio.input_optional, ('data_format', 'batch_size', 'linger_time'))
         self.assertEquals(self.sio.output_required, ('id', 'name'))
         self.assertEquals(self.sio.namespace, zato_namespace)
         self.assertRaises(AttributeError, getattr, self.sio, 'output_optional')
@@ -130,3 +137,55 @@ class DeleteTestCase(ServiceTestCase):
 
     def test_impl(self):
         self.assertEquals(self.service_class.get_name(), 'zato.channel.jms-wmq.delete')
+
+################################################################################
+
+class OnMessageReceivedTestCase(TestCase):
+
+    def get_service(self, request, invoked):
+
+        def _invoke_service(service_name, msg):
+            invoked.append(msg['text'])
+            if msg['text'] == 'invalid':
+                raise ValueError('Invalid message')
+
+        enrich_with_static_config(OnMessageReceived)
+
+        service = OnMessageReceived()
+        service.logger = MagicMock()
+        service.request = Bunch(raw_request=dumps(request))
+        service._invoke_service = _invoke_service
+
+        return service
+
+    def test_single_message(self):
+        invoked = []
+
+        self.get_service({'service_name': 'service1', 'msg': {'text': 'msg1'}}, invoked).handle()
+        self.assertListEqual(invoked, ['msg1'])
+
+        service = self.get_service({'service_name': 'service1', 'msgs': [{'text': 'invalid'}]}, invoked)
+        self.assertRaises(ValueError, service.handle)
+
+    def test_batch(self):
+        invoked = []
+
+        msgs = [{'text': 'msg1'}, {'text': 'msg2'}]
+        self.get_service({'service_name': 'service1', 'msgs': msgs}, invoked).handle()
+        self.assertListEqual(sorted(invoked), ['msg1', 'msg2'])
+
+    def test_batch_error(self):
+        invoked = []
+
+        msgs = [{'text': 'msg1'}, {'text': 'invalid'}, {'text': 'msg2'}]
+        service = self.get_service({'service_name': 'service1', 'msgs': msgs}, invoked)
+
+        # Just like with a single message, the error is raised, but only after all of the messages have been handled
+        try:
+            service.handle()
+        except Exception, e:
+            self.assertEquals(e.args[0], 'Could not invoke `service1` with 1 of 3 WebSphere MQ message(s)')
+        else:
+            self.fail('Expected an exception')
+
+        self.assertListEqual(sorted(invoked), ['invalid', 'msg1', 'msg2'])
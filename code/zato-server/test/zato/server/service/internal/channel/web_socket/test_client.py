@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2016, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from contextlib import closing
+from datetime import datetime
+
+# Bunch
+from bunch import Bunch
+
+# mock
+from mock import MagicMock
+
+# SQLAlchemy
+from sqlalchemy.orm import sessionmaker
+
+# Zato
+from zato.common.broker_message import MSG_BROWSER
+from zato.common.odb.model import WebSocketClient, WebSocketMsgBrowserSub
+from zato.common.test import enrich_with_static_config, ODBTestCase
+from zato.server.live_browser import PatternIndex
+from zato.server.service.internal.channel.web_socket.client import DeleteByPubId, DeleteByServer
+
+# ################################################################################################################################
+
+class DeleteTestCase(ODBTestCase):
+    """ Subscriptions of live message browsers are removed along with the WebSocket clients they were made through.
+    """
+    def setUp(self):
+        super(DeleteTestCase, self).setUp()
+        self.session_class = sessionmaker(bind=self.engine)
+        self.index = PatternIndex()
+
+        session = self.session_class()
+
+        # Clients 1 and 2 are connected to our server, client 3 to another one
+        for idx, server_id in (1, 1), (2, 1), (3, 2):
+            pub_client_id = 'pub.{}'.format(idx)
+
+            client = WebSocketClient(is_internal=False, pub_client_id=pub_client_id, ext_client_id='ext.1',
+                local_address='', peer_address='', peer_fqdn='', connection_time=datetime.utcnow(),
+                last_seen=datetime.utcnow(), server_proc_pid=123, server_name='server1', channel_id=1,
+                server_id=server_id, cluster_id=1)
+            session.add(client)
+            session.flush()
+
+            session.add(WebSocketMsgBrowserSub(pattern='aaa', client_id=client.id, cluster_id=1))
+            self.index.subscribe({'pub_client_id': pub_client_id}, ['aaa'])
+
+        session.commit()
+        session.close()
+
+    def get_service(self, class_, request=None):
+        enrich_with_static_config(class_)
+
+        service = class_()
+        service.odb = Bunch(session=self.session_class)
+        service.server = Bunch(id=1, cluster_id=1, msg_browser_index=self.index, worker_store=MagicMock())
+        service.broker_client = MagicMock()
+        service.request = Bunch(input=Bunch(request or {}))
+
+        return service
+
+    def get_state(self):
+        with closing(self.session_class()) as session:
+            clients = sorted(item.pub_client_id for item in session.query(WebSocketClient))
+            subs = sorted(item.client_id for item in session.query(WebSocketMsgBrowserSub))
+
+        return clients, subs, sorted(client.pub_client_id for client in self.index.match('aaa'))
+
+    def test_delete_by_pub_id(self):
+        service = self.get_service(DeleteByPubId, {'pub_client_id': 'pub.2'})
+        service.handle()
+
+        self.assertEquals(self.get_state(), (['pub.1', 'pub.3'], [1, 3], ['pub.1', 'pub.3']))
+        service.broker_client.publish.assert_called_once_with({
+            'action': MSG_BROWSER.UNSUBSCRIBE.value,
+            'pub_client_id_list': ['pub.2'],
+        })
+
+    def test_delete_by_server(self):
+        service = self.get_service(DeleteByServer)
+        service.handle()
+
+        self.assertEquals(self.get_state(), (['pub.3'], [3], ['pub.3']))
+        service.broker_client.publish.assert_called_once_with({
+            'action': MSG_BROWSER.UNSUBSCRIBE.value,
+            'pub_client_id_list': ['pub.1', 'pub.2'],
+        })
+
+# ################################################################################################################################
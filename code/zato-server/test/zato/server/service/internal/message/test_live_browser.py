@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2016 Dariusz Suchojad <dsuch at zato.io>
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from contextlib import closing
+from datetime import datetime
+
+# Bunch
+from bunch import Bunch
+
+# mock
+from mock import MagicMock
+
+# SQLAlchemy
+from sqlalchemy.orm import sessionmaker
+
+# Zato
+from zato.common.broker_message import MSG_BROWSER
+from zato.common.odb.model import ChannelWebSocket, WebSocketClient, WebSocketMsgBrowserSub
+from zato.common.test import enrich_with_static_config, ODBTestCase
+from zato.server.live_browser import PatternIndex
+from zato.server.service.internal.message.live_browser import DeleteCurrentSubscriptions, Subscribe
+
+# ################################################################################################################################
+
+class _Base(ODBTestCase):
+
+    def setUp(self):
+        super(_Base, self).setUp()
+        self.session_class = sessionmaker(bind=self.engine)
+        self.index = PatternIndex()
+
+        session = self.session_class()
+        session.add(ChannelWebSocket(None, 'channel1', True, False, 'ws://localhost:48902/test', 'json', 5, 3600, cluster_id=1))
+        session.flush()
+
+        for idx in 1, 2:
+            session.add(WebSocketClient(is_internal=False, pub_client_id='pub.{}'.format(idx),
+                ext_client_id='ext.{}'.format(idx), local_address='', peer_address='', peer_fqdn='',
+                connection_time=datetime.utcnow(), last_seen=datetime.utcnow(), server_proc_pid=123,
+                server_name='server1', channel_id=1, server_id=1, cluster_id=1))
+
+        session.commit()
+        session.close()
+
+    def get_service(self, class_, request):
+        enrich_with_static_config(class_)
+
+        service = class_()
+        service.odb = Bunch(session=self.session_class)
+        service.server = Bunch(cluster_id=1, msg_browser_index=self.index)
+        service.broker_client = MagicMock()
+        service.request = Bunch(input=Bunch(request))
+
+        return service
+
+    def subscribe(self, pub_client_id, query):
+        service = self.get_service(Subscribe, {'pub_client_id': pub_client_id, 'query': query})
+
+        def invoke(name, request):
+            self.get_service(DeleteCurrentSubscriptions, request).handle()
+
+        service.invoke = invoke
+        service.handle()
+
+        return service
+
+    def get_patterns(self):
+        with closing(self.session_class()) as session:
+            return sorted((item.client_id, item.pattern) for item in session.query(WebSocketMsgBrowserSub))
+
+# ################################################################################################################################
+
+class SubscribeTestCase(_Base):
+
+    def test_subscribe(self):
+        service = self.subscribe('pub.1', 'aaa BBB')
+        self.assertListEqual(self.get_patterns(), [(1, 'aaa'), (1, 'bbb')])
+
+        # Our own worker can deliver messages to the client ..
+        client = self.index.match('aaa bbb')[0]
+        self.assertEquals(client.pub_client_id, 'pub.1')
+        self.assertEquals(client.channel_name, 'channel1')
+        self.assertEquals(client.server_proc_pid, 123)
+
+        # .. and other ones are told how to do it too.
+        msg = service.broker_client.publish.call_args[0][0]
+        self.assertEquals(msg['action'], MSG_BROWSER.SUBSCRIBE.value)
+        self.assertEquals(msg['client']['pub_client_id'], 'pub.1')
+        self.assertListEqual(sorted(msg['patterns']), ['aaa', 'bbb'])
+
+    def test_subscribe_again(self):
+        self.subscribe('pub.1', 'aaa bbb')
+        self.subscribe('pub.2', 'aaa')
+        self.subscribe('pub.1', 'ccc')
+
+        # Previous subscriptions of a client are replaced, other clients keep theirs
+        self.assertListEqual(self.get_patterns(), [(1, 'ccc'), (2, 'aaa')])
+        self.assertListEqual([client.pub_client_id for client in self.index.match('aaa bbb')], ['pub.2'])
+
+# ################################################################################################################################
+
+class DeleteCurrentSubscriptionsTestCase(_Base):
+
+    def test_handle(self):
+        self.subscribe('pub.1', 'aaa')
+        self.subscribe('pub.2', 'aaa')
+
+        service = self.get_service(DeleteCurrentSubscriptions, {'client_id': 1, 'pub_client_id': 'pub.1'})
+        service.handle()
+
+        self.assertListEqual(self.get_patterns(), [(2, 'aaa')])
+        self.assertListEqual([client.pub_client_id for client in self.index.match('aaa')], ['pub.2'])
+
+        service.broker_client.publish.assert_called_once_with({
+            'action': MSG_BROWSER.UNSUBSCRIBE.value,
+            'pub_client_id_list': ['pub.1'],
+        })
+
+# ################################################################################################################################
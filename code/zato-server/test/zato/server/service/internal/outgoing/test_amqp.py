@@ -46,7 +46,7 @@ class GetListTestCase(ServiceTestCase):
         self.assertEquals(self.sio.output_required,
             ('id', 'name', 'is_active', 'def_id', 'delivery_mode', 'priority', 'def_name', 'pool_size'))
         self.assertEquals(self.sio.output_optional, ('content_type', 'content_encoding', 'expiration',
-            self.wrap_force_type(AsIs('user_id')), self.wrap_force_type(AsIs('app_id'))))
+            self.wrap_force_type(AsIs('user_id')), self.wrap_force_type(AsIs('app_id')), 'confirm_publish'))
         self.assertEquals(self.sio.namespace, zato_namespace)
 
     def test_impl(self):
@@ -75,7 +75,7 @@ class CreateTestCase(ServiceTestCase):
         self.assertEquals(self.sio.input_required,
             ('cluster_id', 'name', 'is_active', 'def_id', 'delivery_mode', 'priority', 'pool_size'))
         self.assertEquals(self.sio.input_optional, ('content_type', 'content_encoding', 'expiration',
-            self.wrap_force_type(AsIs('user_id')), self.wrap_force_type(AsIs('app_id'))))
+            self.wrap_force_type(AsIs('user_id')), self.wrap_force_type(AsIs('app_id')), 'confirm_publish'))
         self.assertEquals(self.sio.output_required, ('id', 'name'))
         self.assertEquals(self.sio.namespace, zato_namespace)
         self.assertRaises(AttributeError, getattr, self.sio, 'output_optional')
@@ -107,7 +107,7 @@ class EditTestCase(ServiceTestCase):
         self.assertEquals(self.sio.input_required, ('id', 'cluster_id', 'name', 'is_active', 'def_id', 'delivery_mode',
             self.wrap_force_type(Integer('priority')), 'pool_size'))
         self.assertEquals(self.sio.input_optional, ('content_type', 'content_encoding', 'expiration',
-            self.wrap_force_type(AsIs('user_id')), self.wrap_force_type(AsIs('app_id'))))
+            self.wrap_force_type(AsIs('user_id')), self.wrap_force_type(AsIs('app_id')), 'confirm_publish'))
         self.assertEquals(self.sio.output_required, ('id', 'name'))
         self.assertEquals(self.sio.namespace, zato_namespace)
         self.assertRaises(AttributeError, getattr, self.sio, 'output_optional')
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+
+"""
+Copyright (C) 2017, Zato Source s.r.o. https://zato.io
+
+Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+# stdlib
+from contextlib import closing
+from unittest import TestCase
+
+# Bunch
+from bunch import Bunch
+
+# mock
+from mock import MagicMock, patch
+
+# SQLAlchemy
+from sqlalchemy.orm import sessionmaker
+
+# Zato
+from zato.common import ZatoException
+from zato.common.broker_message import BATCH, MESSAGE_TYPE
+from zato.common.odb.model import HTTPBasicAuth
+from zato.common.test import enrich_with_static_config, ODBTestCase
+from zato.server.service.internal.enmasse import _DeferredBrokerClient, Import
+
+# ################################################################################################################################
+
+class FakeService(object):
+    """ Stands for a create service invoked by Import - it creates a Basic Auth definition and notifies workers about it.
+    """
+    def __init__(self, name, request, broker_client, sessions):
+        self.name = name
+        self.request = request
+        self.broker_client = broker_client
+        self.sessions = sessions
+        self.odb = None
+
+    def run(self):
+        with closing(self.odb.session()) as session:
+            self.sessions.append(session)
+
+            if self.request.get('is_invalid'):
+                raise ValueError('Invalid object `{}`'.format(self.request['name']))
+
+            # Passwords are set on objects already created
+            if 'password1' in self.request:
+                return {}
+
+            item = HTTPBasicAuth(None, self.request['name'], True, self.request['name'], 'realm', 'password')
+            item.cluster_id = 1
+
+            session.add(item)
+            session.commit()
+
+        self.broker_client.publish({'action': 'create', 'name': item.name})
+
+        return {'zato_security_basic_auth_create_response': {'id': item.id, 'name': item.name}}
+
+# ################################################################################################################################
+
+class ImportTestCase(ODBTestCase):
+
+    def setUp(self):
+        super(ImportTestCase, self).setUp()
+        self.session_class = sessionmaker(bind=self.engine)
+
+        # Sessions and requests of all the services invoked
+        self.sessions = []
+        self.invoked = []
+
+    def get_service(self, objects):
+        enrich_with_static_config(Import)
+
+        service = Import()
+        service.cid = 'cid1'
+        service.logger = MagicMock()
+        service.odb = Bunch(session=self.session_class)
+        service.broker_client = self.broker_client = MagicMock()
+        service.request = Bunch(input=Bunch(objects=objects))
+        service.response = Bunch(payload=Bunch())
+
+        def invoke(name, request):
+            self.invoked.append((name, dict(request)))
+            return service.update_handle(None, FakeService(name, request, service.broker_client, self.sessions))
+
+        service.invoke = invoke
+
+        return service
+
+    def get_names(self):
+        with closing(self.session_class()) as session:
+            return sorted(item.name for item in session.query(HTTPBasicAuth))
+
+    def handle(self, service):
+        with patch('zato.server.service.Service.update_handle') as update_handle:
+            update_handle.side_effect = lambda set_response_func, service, *args, **kwargs: service.run()
+            service.handle()
+
+    def test_import(self):
+        service = self.get_service([
+            {'item_type': 'basic_auth', 'service_name': 'zato.security.basic-auth.create',
+             'request': {'name': 'sec1', 'password': 'abc'}, 'is_security': True,
+             'password_service': 'zato.security.basic-auth.change-password'},
+            {'item_type': 'http_soap', 'service_name': 'zato.http-soap.create', 'request': {'name': 'conn1'},
+             'deps': [{'id_field': 'security_id', 'dependent_type': 'def_sec', 'value': 'sec1'}]},
+            {'item_type': 'http_soap', 'service_name': 'zato.http-soap.edit', 'request': {'id': 123, 'name': 'conn2'}},
+        ])
+        self.handle(service)
+
+        self.assertListEqual(self.get_names(), ['conn1', 'conn2', 'sec1'])
+        self.assertEquals(service.response.payload.created, 2)
+        self.assertEquals(service.response.payload.updated, 1)
+
+        # All the services shared one session ..
+        self.assertEquals(len(self.sessions), 4)
+        self.assertEquals(len(set(id(session._session) for session in self.sessions)), 1)
+
+        # .. the password was set on the object just created ..
+        self.assertEquals(self.invoked[1][0], 'zato.security.basic-auth.change-password')
+        self.assertEquals(self.invoked[1][1]['password1'], 'abc')
+
+        # .. and its ID was filled in for the object depending on it.
+        with closing(self.session_class()) as session:
+            sec1_id = session.query(HTTPBasicAuth).filter(HTTPBasicAuth.name=='sec1').one().id
+
+        self.assertEquals(self.invoked[1][1]['id'], sec1_id)
+        self.assertEquals(self.invoked[2][1]['security_id'], sec1_id)
+
+    def test_rollback(self):
+        service = self.get_service([
+            {'item_type': 'basic_auth', 'service_name': 'zato.security.basic-auth.create', 'request': {'name': 'sec1'}},
+            {'item_type': 'basic_auth', 'service_name': 'zato.security.basic-auth.create',
+             'request': {'name': 'sec2', 'is_invalid': True}},
+        ])
+        self.assertRaises(ValueError, self.handle, service)
+
+        # The first object was flushed but nothing was committed and workers were not notified
+        self.assertListEqual(self.get_names(), [])
+        self.assertListEqual(self.broker_client.publish.mock_calls, [])
+
+    def test_dependency_missing(self):
+        service = self.get_service([
+            {'item_type': 'http_soap', 'service_name': 'zato.http-soap.create', 'request': {'name': 'conn1'},
+             'deps': [{'id_field': 'security_id', 'dependent_type': 'def_sec', 'value': 'sec1'}]},
+        ])
+
+        try:
+            self.handle(service)
+        except ZatoException, e:
+            self.assertEquals(e.msg, 'Dependency `def_sec` `sec1` of `http_soap` `conn1` was not imported')
+        else:
+            self.fail('Expected ZatoException')
+
+        self.assertListEqual(self.invoked, [])
+
+    def test_service_not_allowed(self):
+        for service_name, password_service in (
+            ('zato.service.invoke', None),
+            ('my.service.create', None),
+            ('create', None),
+            (None, None),
+            ('zato.security.basic-auth.create', 'zato.security.basic-auth.create'),
+            ('zato.security.basic-auth.create', 'my.service.change-password'),
+        ):
+            service = self.get_service([
+                {'item_type': 'basic_auth', 'service_name': 'zato.security.basic-auth.create', 'request': {'name': 'sec1'}},
+                {'item_type': 'basic_auth', 'service_name': service_name, 'request': {'name': 'sec2', 'password': 'abc'},
+                 'password_service': password_service},
+            ])
+            self.assertRaises(ZatoException, self.handle, service)
+
+        # Nothing was invoked because not all the services requested were allowed
+        self.assertListEqual(self.invoked, [])
+        self.assertListEqual(self.get_names(), [])
+
+    def test_broker_messages(self):
+        service = self.get_service([
+            {'item_type': 'basic_auth', 'service_name': 'zato.security.basic-auth.create', 'request': {'name': 'sec1'}},
+            {'item_type': 'basic_auth', 'service_name': 'zato.security.basic-auth.create', 'request': {'name': 'sec2'}},
+            {'item_type': 'http_soap', 'service_name': 'zato.http-soap.create', 'request': {'name': 'conn1'}},
+        ])
+        self.handle(service)
+
+        # One batch for each type of objects, in the order they were imported
+        self.assertListEqual(self.broker_client.publish.call_args_list, [
+            (({'action': BATCH.MESSAGES.value, 'item_type': 'basic_auth', 'messages': [
+                {'action': 'create', 'name': 'sec1', 'msg_type': MESSAGE_TYPE.TO_PARALLEL_ALL},
+                {'action': 'create', 'name': 'sec2', 'msg_type': MESSAGE_TYPE.TO_PARALLEL_ALL},
+            ]},), {}),
+            (({'action': BATCH.MESSAGES.value, 'item_type': 'http_soap', 'messages': [
+                {'action': 'create', 'name': 'conn1', 'msg_type': MESSAGE_TYPE.TO_PARALLEL_ALL},
+            ]},), {}),
+        ])
+
+    def test_shared_odb_scope(self):
+        service = self.get_service([])
+        other = FakeService('service1', {}, None, [])
+
+        with patch('zato.server.service.Service.update_handle'):
+
+            # Outside of an import, no ODB is changed ..
+            service.update_handle(None, other)
+            self.assertIsNone(other.odb)
+
+            service.handle()
+            service.update_handle(None, service)
+
+        # .. and during an import, only services invoked get the shared one.
+        self.assertIsNotNone(service.shared_odb)
+        self.assertIsNone(other.odb)
+        self.assertIsInstance(service.odb, Bunch)
+
+# ################################################################################################################################
+
+class DeferredBrokerClientTestCase(TestCase):
+
+    def test_flush(self):
+        broker_client = MagicMock()
+
+        deferred = _DeferredBrokerClient(broker_client)
+        deferred.item_type = 'basic_auth'
+        deferred.publish({'action': 'create', 'name': 'sec1'})
+        deferred.publish({'action': 'job1'}, MESSAGE_TYPE.TO_SCHEDULER)
+        deferred.invoke_async({'service': 'service1'}, expiration=10)
+
+        deferred.item_type = 'http_soap'
+        deferred.publish({'action': 'create', 'name': 'conn1'})
+
+        # Nothing is sent until flushed
+        self.assertListEqual(broker_client.mock_calls, [])
+
+        deferred.flush()
+
+        # Batches first, then everything else as it was published
+        self.assertListEqual(broker_client.mock_calls, [
+            ('publish', ({'action': BATCH.MESSAGES.value, 'item_type': 'basic_auth', 'messages': [
+                {'action': 'create', 'name': 'sec1', 'msg_type': MESSAGE_TYPE.TO_PARALLEL_ALL}]},), {}),
+            ('publish', ({'action': BATCH.MESSAGES.value, 'item_type': 'http_soap', 'messages': [
+                {'action': 'create', 'name': 'conn1', 'msg_type': MESSAGE_TYPE.TO_PARALLEL_ALL}]},), {}),
+            ('publish', ({'action': 'job1'}, MESSAGE_TYPE.TO_SCHEDULER), {}),
+            ('invoke_async', ({'service': 'service1'},), {'expiration': 10}),
+        ])
+
+    def test_invalid_message(self):
+        deferred = _DeferredBrokerClient(MagicMock())
+
+        # Messages which cannot be serialized are rejected right away, before the import is committed
+        self.assertRaises(TypeError, deferred.publish, {'action': 'create', 'value': object()})
+        self.assertDictEqual(deferred.batches, {})
+
+# ################################################################################################################################
@@ -9,11 +9,24 @@ Licensed under LGPLv3, see LICENSE.txt for terms and conditions.
 from __future__ import absolute_import, division, print_function, unicode_literals
 
 # stdlib
+from contextlib import closing
+from datetime import datetime
 from json import dumps
 from unittest import TestCase
 
+# Bunch
+from bunch import Bunch
+
+# mock
+from mock import MagicMock, patch
+
+# SQLAlchemy
+from sqlalchemy.orm import sessionmaker
+
 # Zato
-from zato.server.live_browser import match_pattern
+from zato.common.odb.model import ChannelWebSocket, WebSocketClient, WebSocketMsgBrowserSub
+from zato.common.test import ODBTestCase
+from zato.server.live_browser import live_browser_patterns, match_pattern, notify_msg_browser, PatternIndex
 
 # ################################################################################################################################
 
@@ -68,3 +81,160 @@ class PatternMatcherTestCase(TestCase):
         self.assertTrue(match_pattern(text, pattern))
 
 # ################################################################################################################################
+
+class PatternIndexTestCase(TestCase):
+
+    def get_client(self, pub_client_id):
+        return {'pub_client_id': pub_client_id, 'server_name': 'server1', 'server_proc_pid': 123, 'channel_name': 'channel1'}
+
+    def match(self, index, text):
+        return sorted(client.pub_client_id for client in index.match(text))
+
+    def test_match(self):
+
+        index = PatternIndex()
+        index.load([
+            dict(self.get_client('client1'), pattern='aaa'),
+            dict(self.get_client('client1'), pattern='111'),
+            dict(self.get_client('client2'), pattern='AAA'),
+            dict(self.get_client('client3'), pattern='zzz'),
+        ])
+
+        text = dumps({
+            'aaa:aaa':'111-qqq',
+            'ccc':'333-ggg'
+        })
+        self.assertListEqual(self.match(index, text), ['client1', 'client2'])
+
+        # Details of each client are returned so that messages can be delivered to it
+        client = index.match('zzz')[0]
+        self.assertEquals(client.server_name, 'server1')
+        self.assertEquals(client.server_proc_pid, 123)
+        self.assertEquals(client.channel_name, 'channel1')
+
+# ################################################################################################################################
+
+    def test_subscribe_unsubscribe(self):
+
+        index = PatternIndex()
+        self.assertFalse(index.should_match())
+
+        index.subscribe(self.get_client('client1'), ['aaa', 'bbb'])
+        index.subscribe(self.get_client('client2'), ['aaa'])
+        self.assertTrue(index.should_match())
+        self.assertListEqual(self.match(index, 'aaa ccc'), ['client2'])
+
+        # A new subscription replaces the previous one
+        index.subscribe(self.get_client('client1'), ['ccc'])
+        self.assertListEqual(self.match(index, 'aaa bbb ccc'), ['client1', 'client2'])
+        self.assertNotIn('bbb', index.index)
+
+        index.unsubscribe('client1')
+        index.unsubscribe('client2')
+        self.assertDictEqual(index.subs, {})
+        self.assertDictEqual(index.clients, {})
+        self.assertDictEqual(index.index, {})
+        self.assertFalse(index.should_match())
+
+# ################################################################################################################################
+
+    def test_sample_every(self):
+
+        index = PatternIndex(3)
+        index.subscribe(self.get_client('client1'), ['aaa'])
+        self.assertListEqual([index.should_match() for x in range(6)], [False, False, True, False, False, True])
+
+# ################################################################################################################################
+
+class LiveBrowserPatternsTestCase(ODBTestCase):
+
+    def test_patterns(self):
+        session = sessionmaker(bind=self.engine)()
+
+        channel = ChannelWebSocket(None, 'channel1', True, False, 'ws://localhost:48902/test', 'json', 5, 3600, cluster_id=1)
+        session.add(channel)
+        session.flush()
+
+        for pub_client_id, cluster_id, patterns in (('pub.1', 1, ['aaa', 'bbb']), ('pub.2', 1, []), ('pub.3', 2, ['aaa'])):
+            client = WebSocketClient(is_internal=False, pub_client_id=pub_client_id, ext_client_id='ext.1',
+                local_address='', peer_address='', peer_fqdn='', connection_time=datetime.utcnow(),
+                last_seen=datetime.utcnow(), server_proc_pid=123, server_name='server1', channel_id=channel.id,
+                server_id=1, cluster_id=cluster_id)
+            session.add(client)
+            session.flush()
+
+            for pattern in patterns:
+                session.add(WebSocketMsgBrowserSub(pattern=pattern, client_id=client.id, cluster_id=cluster_id))
+
+        session.commit()
+
+        with closing(session):
+            patterns = live_browser_patterns(session, 1)
+
+        # Only clients of the cluster given on input that have any subscriptions are returned
+        self.assertListEqual([(item['pub_client_id'], item['pattern']) for item in patterns], [
+            ('pub.1', 'aaa'), ('pub.1', 'bbb')])
+        self.assertEquals(patterns[0]['channel_name'], 'channel1')
+        self.assertEquals(patterns[0]['server_name'], 'server1')
+        self.assertEquals(patterns[0]['server_proc_pid'], 123)
+
+        index = PatternIndex()
+        index.load(patterns)
+        self.assertListEqual([item.pub_client_id for item in index.match('aaa bbb ccc')], ['pub.1'])
+
+# ################################################################################################################################
+
+class NotifyMsgBrowserTestCase(TestCase):
+
+    def get_service(self, name, raw_request, include_internal=False):
+        index = PatternIndex()
+        index.subscribe({'pub_client_id': 'pub.1', 'server_name': 'server1', 'server_proc_pid': 123}, ['aaa'])
+
+        service = Bunch(name=name, wsgi_environ={'REQUEST_METHOD': 'POST'}, out=Bunch(websockets=MagicMock()))
+        service.server = Bunch(msg_browser_index=index, live_msg_browser=Bunch(include_internal=include_internal))
+        service.channel = Bunch(name='channel1', type='http-soap')
+        service.request = Bunch(raw_request=raw_request)
+
+        return service
+
+    def notify(self, service):
+        with patch('zato.server.live_browser.spawn') as spawn:
+            notify_msg_browser(service, 'request')
+
+        return spawn
+
+    def test_notify(self):
+        service = self.get_service('my.service', '{"aaa": 1}')
+        spawn = self.notify(service)
+
+        (func, request, clients), _ = spawn.call_args
+        self.assertIs(func, service.out.websockets.deliver)
+        self.assertEquals(request['request'], '{"aaa": 1}')
+        self.assertIn('request http-soap channel1', request['meta'])
+        self.assertListEqual([client.pub_client_id for client in clients], ['pub.1'])
+
+    def test_no_match(self):
+        self.assertFalse(self.notify(self.get_service('my.service', '{"bbb": 1}')).called)
+
+    def test_non_string_request(self):
+        spawn = self.notify(self.get_service('my.service', {'aaa': 1}))
+        self.assertTrue(spawn.called)
+
+    def test_internal(self):
+
+        # Internal services are matched only if configured to ..
+        self.assertFalse(self.notify(self.get_service('zato.my.service', '{"aaa": 1}')).called)
+        self.assertTrue(self.notify(self.get_service('zato.my.service', '{"aaa": 1}', True)).called)
+
+        # .. but never the ones which deliver messages to WebSocket clients.
+        service = self.get_service('zato.channel.web-socket.client.deliver-request', '{"aaa": 1}', True)
+        self.assertFalse(self.notify(service).called)
+
+    def test_error(self):
+        service = self.get_service('my.service', '{"aaa": 1}')
+        service.server.msg_browser_index = None
+
+        # Errors are logged, never raised to the service
+        self.assertFalse(self.notify(service).called)
+
+# ################################################################################################################################